@@ -0,0 +1,74 @@
+import json
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.utils.admission import AdmissionController, Rejection, retry_after_header
+
+_DETAILS = {
+    "overload": "Server overloaded, try again later",
+    "concurrency": "Too many requests in progress, try again later",
+    "rate_limit": "Rate limit exceeded, try again later",
+}
+_BODIES = {
+    reason: json.dumps({"detail": detail}).encode()
+    for reason, detail in _DETAILS.items()
+}
+
+
+async def _reject(send: Send, rejection: Rejection) -> None:
+    body = _BODIES[rejection.reason]
+    await send(
+        {
+            "type": "http.response.start",
+            "status": rejection.status,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", retry_after_header(rejection)),
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
+
+
+class AdmissionMiddleware:
+    """Puts the requests to the routes under `prefix` through an `AdmissionController`.
+
+    A rejected request is answered right away with 429 or 503, a `Retry-After` header and a JSON `detail`, without reading its body or reaching FastAPI. Clients are told apart by the `client_header` if the request has it, e.g. an API key or a client id set by the gateway, and by their address otherwise.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        controller: AdmissionController,
+        prefix: str = "",
+        client_header: str | None = None,
+    ):
+        self.app = app
+        self.controller = controller
+        self.prefix = prefix
+        self.client_header = (
+            client_header.lower().encode() if client_header is not None else None
+        )
+
+    def _client(self, scope: Scope) -> str:
+        if self.client_header is not None:
+            for name, value in scope["headers"]:
+                if name == self.client_header:
+                    return value.decode("latin-1")
+        client = scope.get("client")
+        return client[0] if client else ""
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not scope["path"].startswith(self.prefix):
+            await self.app(scope, receive, send)
+            return
+        controller = self.controller
+        rejection = controller.admit(self._client(scope))
+        if rejection is not None:
+            await _reject(send, rejection)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            controller.release()
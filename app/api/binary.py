@@ -0,0 +1,132 @@
+import asyncio
+import datetime
+
+import numpy as np
+
+from app.utils.binary_protocol import (
+    INVALID,
+    MALFORMED,
+    OK,
+    MalformedFrameError,
+    decode_request,
+    encode_response,
+    max_request_size,
+    read_frame,
+)
+from app.utils.fast_decode import LOWER_BOUNDS
+from app.utils.pricing_rules import PricingRulesStore
+
+_UTC = datetime.timezone.utc
+_EPOCH = datetime.datetime(1970, 1, 1, tzinfo=_UTC)
+_MICROSECOND = datetime.timedelta(microseconds=1)
+# Epoch microseconds a datetime can hold
+_MIN_TIME = (datetime.datetime.min.replace(tzinfo=_UTC) - _EPOCH) // _MICROSECOND
+_MAX_TIME = (datetime.datetime.max.replace(tzinfo=_UTC) - _EPOCH) // _MICROSECOND
+
+# Below this many orders, pricing them one by one beats setting up the columns
+SCALAR_BATCH_LIMIT = 8
+
+# Bytes of responses buffered on a connection before waiting for the client
+_WRITE_BUFFER_LIMIT = 1 << 20
+
+
+def _validation_error(orders: np.ndarray) -> str | None:
+    """Check the orders against the constraints of `FeeCalculatorRequest`.
+
+    Returns:
+        str | None: The error of the first invalid order, or None if all are valid
+    """
+    for name, bound in LOWER_BOUNDS.items():
+        invalid = np.flatnonzero(orders[name] <= bound)
+        if invalid.size:
+            return f"Order {invalid[0]}: {name} should be greater than {bound}"
+    times = orders["time"]
+    invalid = np.flatnonzero((times < _MIN_TIME) | (times > _MAX_TIME))
+    if invalid.size:
+        return f"Order {invalid[0]}: time is out of range"
+    return None
+
+
+class BinaryFeeServer:
+    """Prices orders sent in the binary protocol of `app.utils.binary_protocol`.
+
+    A connection carries any number of request frames back to back, each answered in order, so a client can stream batches without waiting for their responses. The orders are checked against the same constraints as `FeeCalculatorRequest` and priced by the fee calculator of the current rule set, the same one the HTTP routes use: small batches order by order like `calculate_fee`, larger ones vectorized like `calculate_fees`. Order times are epoch microseconds in UTC, priced like a `time` ending in `Z`. Zones, quote tokens and breakdowns are only served over HTTP.
+    """
+
+    def __init__(self, pricing_store: PricingRulesStore, max_batch: int):
+        self.pricing_store = pricing_store
+        self.max_request_size = max_request_size(max_batch)
+
+    def respond(self, payload: bytes) -> bytes:
+        """Price the orders of a request frame body.
+
+        Args:
+            payload (bytes): The frame body
+
+        Returns:
+            bytes: The response frame
+        """
+        try:
+            request_id, orders = decode_request(payload)
+        except MalformedFrameError as e:
+            return encode_response(0, MALFORMED, str(e))
+        error = _validation_error(orders)
+        if error is not None:
+            return encode_response(request_id, INVALID, error)
+
+        snapshot = self.pricing_store.snapshot
+        fee_calculator = snapshot.fee_calculator
+        if len(orders) < SCALAR_BATCH_LIMIT:
+            delivery_fees = [
+                fee_calculator.calculate_delivery_fee(
+                    cart_value=cart_value,
+                    delivery_distance=delivery_distance,
+                    number_of_items=number_of_items,
+                    time=_EPOCH + time * _MICROSECOND,
+                )
+                for cart_value, delivery_distance, number_of_items, time in (
+                    orders.tolist()
+                )
+            ]
+        else:
+            delivery_fees = fee_calculator.calculate_delivery_fees(
+                orders["cart_value"],
+                orders["delivery_distance"],
+                orders["number_of_items"],
+                orders["time"].astype("datetime64[us]"),
+            )
+        return encode_response(request_id, OK, snapshot.rules.VERSION, delivery_fees)
+
+    async def handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """Serve one connection until the client closes it."""
+        try:
+            while True:
+                try:
+                    payload = await read_frame(reader, self.max_request_size)
+                except MalformedFrameError as e:
+                    # The frame is not read, so the next one can't be found
+                    writer.write(encode_response(0, MALFORMED, str(e)))
+                    break
+                if payload is None:
+                    break
+                writer.write(self.respond(payload))
+                if writer.transport.get_write_buffer_size() > _WRITE_BUFFER_LIMIT:
+                    await writer.drain()
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(
+        self, host: str = "127.0.0.1", port: int = 8001, path: str | None = None
+    ) -> asyncio.AbstractServer:
+        """Listen on the Unix socket at `path` if given, or else on the TCP port.
+
+        The TCP port is bound with `SO_REUSEPORT`, so every worker process of the server can listen on it and the kernel spreads the connections over them.
+        """
+        if path is not None:
+            return await asyncio.start_unix_server(self.handle, path)
+        return await asyncio.start_server(self.handle, host, port, reuse_port=True)
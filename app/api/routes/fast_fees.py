@@ -0,0 +1,292 @@
+import email.message
+import json
+import time as time_module
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from pydantic import ValidationError
+from starlette.types import Receive, Scope, Send
+
+from app.api.warmup import is_warm_up
+from app.schemas.fees import FeeCalculatorRequest
+from app.utils.audit_log import AuditLog
+from app.utils.fast_decode import decode_fee_request
+from app.utils.fee_calculator import FeeBreakdown
+from app.utils.fee_coalescer import FeeCoalescer
+from app.utils.metrics import Histogram
+from app.utils.pricing_rules import PricingRulesStore
+from app.utils.quote_tokens import InvalidQuoteTokenError, QuoteSigner
+from app.utils.surge import SurgePricing
+from app.utils.zones import UnknownZoneError
+
+_JSON_HEADERS = [(b"content-type", b"application/json")]
+
+QUOTE_TOKENS_DISABLED = "Quote tokens are disabled, QUOTE_TOKEN_SECRET is not set"
+
+
+def _is_json(content_type: bytes | None) -> bool:
+    """Tell whether FastAPI would decode a body with this content type as JSON."""
+    if content_type is None:
+        return True
+    message = email.message.Message()
+    message["content-type"] = content_type.decode("latin-1")
+    if message.get_content_maintype() != "application":
+        return False
+    subtype = message.get_content_subtype()
+    return subtype == "json" or subtype.endswith("+json")
+
+
+def breakdown_components(breakdown: FeeBreakdown) -> dict:
+    """The fields of a breakdown in a response, all but the fee itself."""
+    return dict(zip(FeeBreakdown._fields[1:], breakdown[1:]))
+
+
+async def _read_body(receive: Receive) -> bytes:
+    body = b""
+    more_body = True
+    while more_body:
+        message = await receive()
+        body += message.get("body", b"")
+        more_body = message.get("more_body", False)
+    return body
+
+
+async def _send(send: Send, status: int, content: bytes) -> None:
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                *_JSON_HEADERS,
+                (b"content-length", str(len(content)).encode()),
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": content})
+
+
+class FastFeeEndpoint:
+    """Raw ASGI endpoint equivalent to the `calculate_fee` route.
+
+    Skips FastAPI dependency resolution and Pydantic models on the common path: the body is decoded by `decode_fee_request` and the response bytes are written directly. Bodies the fast decoder doesn't accept go through `FeeCalculatorRequest` exactly like in FastAPI, so both routes accept the same requests, price them the same way and answer invalid ones with the same 422 error details.
+    """
+
+    def __init__(
+        self,
+        pricing_store: PricingRulesStore,
+        stage_seconds: Histogram | None = None,
+        route: str = "/calculate_fee_fast",
+        coalescer: FeeCoalescer | None = None,
+        quote_signer: QuoteSigner | None = None,
+        surge_pricing: SurgePricing | None = None,
+        audit_log: AuditLog | None = None,
+    ):
+        self.pricing_store = pricing_store
+        self.coalescer = coalescer
+        self.quote_signer = quote_signer
+        self.surge_pricing = surge_pricing
+        self.audit_log = audit_log
+        self._stages = None
+        if stage_seconds is not None:
+            self._stages = [
+                stage_seconds.labels(route, stage).observe
+                for stage in ("decode", "validation", "endpoint", "encode")
+            ]
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if self._stages is None:
+            await self._handle(scope, receive, send, None)
+            return
+
+        times = [time_module.perf_counter()]
+        await self._handle(scope, receive, send, times)
+        times.append(time_module.perf_counter())
+        # Consecutive timestamps delimit the stages, a request that failed
+        # validation stops early
+        for observe, start, end in zip(self._stages, times, times[1:]):
+            observe(end - start)
+
+    async def _handle(
+        self, scope: Scope, receive: Receive, send: Send, times: list[float] | None
+    ) -> None:
+        body = await _read_body(receive)
+
+        order = None
+        zone = None
+        include_quote_token = False
+        include_breakdown = False
+        content_type = None
+        for name, value in scope["headers"]:
+            if name == b"content-type":
+                content_type = value
+        if _is_json(content_type):
+            order = decode_fee_request(body)
+        if times is not None:
+            times.append(time_module.perf_counter())
+
+        if order is None:
+            status, content = self._validate(body, content_type)
+            if status != 200:
+                await _send(send, status, content)
+                return
+            order, zone, include_quote_token, include_breakdown = content
+        if times is not None:
+            times.append(time_module.perf_counter())
+
+        if include_quote_token and self.quote_signer is None:
+            await _send(send, 422, orjson.dumps({"detail": QUOTE_TOKENS_DISABLED}))
+            return
+
+        cart_value, delivery_distance, number_of_items, time = order
+        snapshot = self.pricing_store.snapshot
+        surge_multiplier = None
+        if zone is not None:
+            try:
+                if self.surge_pricing is None:
+                    snapshot = snapshot.for_zone(*zone)
+                else:
+                    snapshot, zone_id = snapshot.locate(*zone)
+                    if zone_id is not None:
+                        surge_multiplier = self.surge_pricing.quote(zone_id)
+            except UnknownZoneError as e:
+                await _send(send, 422, orjson.dumps({"detail": str(e)}))
+                return
+        breakdown = None
+        if include_breakdown:
+            breakdown = snapshot.fee_calculator.calculate_delivery_fee_breakdown(
+                cart_value=cart_value,
+                delivery_distance=delivery_distance,
+                number_of_items=number_of_items,
+                time=time,
+                surge_multiplier=surge_multiplier,
+            )
+            delivery_fee = breakdown.delivery_fee
+        elif self.coalescer is not None:
+            delivery_fee = await self.coalescer.calculate_delivery_fee(
+                snapshot.fee_calculator,
+                cart_value=cart_value,
+                delivery_distance=delivery_distance,
+                number_of_items=number_of_items,
+                time=time,
+                surge_multiplier=surge_multiplier,
+            )
+        else:
+            delivery_fee = snapshot.fee_calculator.calculate_delivery_fee(
+                cart_value=cart_value,
+                delivery_distance=delivery_distance,
+                number_of_items=number_of_items,
+                time=time,
+                surge_multiplier=surge_multiplier,
+            )
+        content = {"delivery_fee": delivery_fee, "rule_version": snapshot.rules.VERSION}
+        if include_quote_token:
+            try:
+                content["quote_token"] = self.quote_signer.sign(
+                    *order, delivery_fee, snapshot.rules.VERSION
+                )
+            except ValueError as e:
+                await _send(send, 422, orjson.dumps({"detail": str(e)}))
+                return
+        if breakdown is not None:
+            content["breakdown"] = breakdown_components(breakdown)
+        if self.audit_log is not None and not is_warm_up(scope):
+            self.audit_log.record(
+                *order, delivery_fee, snapshot.rules.VERSION, surge_multiplier
+            )
+        if times is not None:
+            times.append(time_module.perf_counter())
+        await _send(send, 200, orjson.dumps(content))
+
+    @staticmethod
+    def _validate(body: bytes, content_type: bytes | None) -> tuple[int, object]:
+        """Validate a body the way FastAPI does for the `calculate_fee` route.
+
+        Returns:
+            tuple[int, object]: 200 with the decoded order, its zone id and coordinates (or None if it has neither) and whether it asks for a quote token and a breakdown, or 422 and the error response body
+        """
+        if not body:
+            errors = [
+                {
+                    "type": "missing",
+                    "loc": ("body",),
+                    "msg": "Field required",
+                    "input": None,
+                }
+            ]
+            return 422, orjson.dumps({"detail": errors})
+
+        data: object = body
+        if _is_json(content_type):
+            try:
+                data = json.loads(body)
+            except json.JSONDecodeError as e:
+                errors = [
+                    {
+                        "type": "json_invalid",
+                        "loc": ("body", e.pos),
+                        "msg": "JSON decode error",
+                        "input": {},
+                        "ctx": {"error": e.msg},
+                    }
+                ]
+                return 422, orjson.dumps({"detail": errors})
+
+        try:
+            # FastAPI validates request bodies with from_attributes enabled
+            request = FeeCalculatorRequest.model_validate(data, from_attributes=True)
+        except ValidationError as e:
+            errors = [
+                {**error, "loc": ("body", *error["loc"])}
+                for error in e.errors(include_url=False)
+            ]
+            return 422, orjson.dumps(jsonable_encoder({"detail": errors}))
+
+        order = (
+            request.cart_value,
+            request.delivery_distance,
+            request.number_of_items,
+            request.time,
+        )
+        zone = None
+        if request.zone_id is not None or request.location is not None:
+            zone = (request.zone_id, request.coordinates)
+        return 200, (
+            order,
+            zone,
+            request.include_quote_token,
+            request.include_breakdown,
+        )
+
+
+class QuoteVerifyEndpoint:
+    """Raw ASGI endpoint checking the quote tokens issued by `calculate_fee`.
+
+    The body is a JSON object with a `quote_token` string. An authentic, unexpired token is answered with `valid` and the quote it vouches for, any other with `valid: false` and the reason. Neither the fee calculator nor a Pydantic model is involved, and skipping FastAPI routing keeps a verification several times cheaper than a quote.
+    """
+
+    def __init__(self, quote_signer: QuoteSigner | None):
+        self.quote_signer = quote_signer
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        body = await _read_body(receive)
+        if self.quote_signer is None:
+            await _send(send, 422, orjson.dumps({"detail": QUOTE_TOKENS_DISABLED}))
+            return
+
+        try:
+            data = orjson.loads(body)
+        except orjson.JSONDecodeError:
+            data = None
+        quote_token = data.get("quote_token") if type(data) is dict else None
+        if type(quote_token) is not str:
+            detail = "Expected a JSON object with a quote_token string"
+            await _send(send, 422, orjson.dumps({"detail": detail}))
+            return
+
+        try:
+            quote = self.quote_signer.verify(quote_token)
+        except InvalidQuoteTokenError as e:
+            content = {"valid": False, "reason": e.reason}
+        else:
+            content = {"valid": True, **quote._asdict()}
+        await _send(send, 200, orjson.dumps(content, option=orjson.OPT_UTC_Z))
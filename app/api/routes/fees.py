@@ -1,16 +1,345 @@
+import asyncio
 from typing import Any
 
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+from fastapi.routing import APIRoute
+from starlette.types import Receive, Scope, Send
 
-from app.schemas.fees import FeeCalculatorRequest, FeeCalculatorResponse
-from app.utils.fee_calculator import FeeCalculator
+from app.api.instrumentation import InstrumentedRoute
+from app.api.routes.fast_fees import (
+    QUOTE_TOKENS_DISABLED,
+    FastFeeEndpoint,
+    QuoteVerifyEndpoint,
+    breakdown_components,
+)
+from app.api.warmup import is_warm_up
+from app.core.audit_log import audit_log
+from app.core.config import settings
+from app.core.metrics import REQUEST_STAGE_SECONDS
+from app.core.pricing import (
+    fee_coalescer,
+    fee_grid_cache,
+    pricing_store,
+    quote_signer,
+    surge_pricing,
+)
+from app.schemas.fees import (
+    FeeCacheStatsResponse,
+    FeeCalculatorBatchRequest,
+    FeeCalculatorBatchResponse,
+    FeeCalculatorRequest,
+    FeeCalculatorResponse,
+    FeeGridRequest,
+    FeeSearchRequest,
+    FeeSearchResponse,
+)
+from app.utils.fee_grid import MEDIA_TYPES, GridAxis, GridSpec, fee_grid
+from app.utils.fee_search import search_engine, search_input
+from app.utils.fee_stream import aprice_ndjson
+from app.utils.pricing_rules import PricingSnapshot
+from app.utils.rules_export import etag_matches, export_rules
+from app.utils.zones import UnknownZoneError
 
-router = APIRouter()
+router = APIRouter(
+    route_class=InstrumentedRoute if settings.METRICS_ENABLED else APIRoute
+)
 
-fee_calculator = FeeCalculator()
 
+class DuplexStreamingResponse(StreamingResponse):
+    """Streaming response whose body is produced while the request body is still being read.
 
-@router.post("/calculate_fee", response_model=FeeCalculatorResponse)
-def calculate_fee(request: FeeCalculatorRequest) -> Any:
-    delivery_fee = fee_calculator.calculate_delivery_fee(**request.model_dump())
-    return FeeCalculatorResponse(delivery_fee=delivery_fee)
+    `StreamingResponse` watches for client disconnects by reading from `receive`, which would steal the request body from the body iterator. Here the iterator is the only reader, and a disconnect surfaces through `Request.stream()` instead.
+    """
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+
+def _zone_snapshot(
+    snapshot: PricingSnapshot,
+    order: FeeCalculatorRequest | FeeSearchRequest | FeeGridRequest,
+) -> tuple[PricingSnapshot, str | None]:
+    """The snapshot pricing an order, and its zone when surge pricing needs it."""
+    try:
+        if surge_pricing is None:
+            return snapshot.for_zone(order.zone_id, order.coordinates), None
+        return snapshot.locate(order.zone_id, order.coordinates)
+    except UnknownZoneError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+# The fee is computed inline on the event loop, it is too cheap to be worth a
+# hop to the threadpool that sync routes go through
+@router.post(
+    "/calculate_fee",
+    response_model=FeeCalculatorResponse,
+    response_model_exclude_none=True,
+)
+async def calculate_fee(request: FeeCalculatorRequest, http_request: Request) -> Any:
+    if request.include_quote_token and quote_signer is None:
+        raise HTTPException(status_code=422, detail=QUOTE_TOKENS_DISABLED)
+    snapshot, zone_id = _zone_snapshot(pricing_store.snapshot, request)
+    surge_multiplier = None
+    if zone_id is not None:
+        surge_multiplier = surge_pricing.quote(zone_id)
+    breakdown = None
+    if request.include_breakdown:
+        # The breakdown replaces the calculation, it doesn't add to it
+        breakdown = snapshot.fee_calculator.calculate_delivery_fee_breakdown(
+            cart_value=request.cart_value,
+            delivery_distance=request.delivery_distance,
+            number_of_items=request.number_of_items,
+            time=request.time,
+            surge_multiplier=surge_multiplier,
+        )
+        delivery_fee = breakdown.delivery_fee
+    elif fee_coalescer is not None:
+        delivery_fee = await fee_coalescer.calculate_delivery_fee(
+            snapshot.fee_calculator,
+            cart_value=request.cart_value,
+            delivery_distance=request.delivery_distance,
+            number_of_items=request.number_of_items,
+            time=request.time,
+            surge_multiplier=surge_multiplier,
+        )
+    else:
+        delivery_fee = snapshot.fee_calculator.calculate_delivery_fee(
+            cart_value=request.cart_value,
+            delivery_distance=request.delivery_distance,
+            number_of_items=request.number_of_items,
+            time=request.time,
+            surge_multiplier=surge_multiplier,
+        )
+
+    quote_token = None
+    if request.include_quote_token:
+        try:
+            quote_token = quote_signer.sign(
+                request.cart_value,
+                request.delivery_distance,
+                request.number_of_items,
+                request.time,
+                delivery_fee,
+                snapshot.rules.VERSION,
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+    if audit_log is not None and not is_warm_up(http_request.scope):
+        audit_log.record(
+            request.cart_value,
+            request.delivery_distance,
+            request.number_of_items,
+            request.time,
+            delivery_fee,
+            snapshot.rules.VERSION,
+            surge_multiplier,
+        )
+    return FeeCalculatorResponse(
+        delivery_fee=delivery_fee,
+        rule_version=snapshot.rules.VERSION,
+        quote_token=quote_token,
+        breakdown=breakdown_components(breakdown) if breakdown is not None else None,
+    )
+
+
+# A raw ASGI endpoint, so verifying a quote costs a fraction of pricing it
+quote_verify_endpoint = QuoteVerifyEndpoint(quote_signer)
+router.add_route(
+    "/verify_quote", quote_verify_endpoint, methods=["POST"], include_in_schema=False
+)
+
+
+if settings.FAST_PATH_ENABLED:
+    router.add_route(
+        "/calculate_fee_fast",
+        FastFeeEndpoint(
+            pricing_store,
+            REQUEST_STAGE_SECONDS if settings.METRICS_ENABLED else None,
+            coalescer=fee_coalescer,
+            quote_signer=quote_signer,
+            surge_pricing=surge_pricing,
+            audit_log=audit_log,
+        ),
+        methods=["POST"],
+        include_in_schema=False,
+    )
+
+
+@router.post(
+    "/calculate_fees",
+    response_model=FeeCalculatorBatchResponse,
+    response_model_exclude_none=True,
+)
+def calculate_fees(request: FeeCalculatorBatchRequest) -> Any:
+    snapshot = pricing_store.snapshot
+    orders = request.orders
+    if any(order.include_quote_token for order in orders):
+        raise HTTPException(
+            status_code=422, detail="Quote tokens are only issued for single quotes"
+        )
+    if any(order.include_breakdown for order in orders):
+        raise HTTPException(
+            status_code=422, detail="Breakdowns are only returned for single quotes"
+        )
+    located = [_zone_snapshot(snapshot, order) for order in orders]
+    order_snapshots = [order_snapshot for order_snapshot, _ in located]
+    surge_multipliers = None
+    if surge_pricing is not None:
+        surge_multipliers = surge_pricing.quote_many(
+            [zone_id for _, zone_id in located]
+        )
+
+    # Orders are priced together per rule set, usually all with the base rules
+    groups: dict[int, tuple[PricingSnapshot, list[int]]] = {}
+    for i, order_snapshot in enumerate(order_snapshots):
+        groups.setdefault(id(order_snapshot), (order_snapshot, []))[1].append(i)
+
+    delivery_fees = [0] * len(orders)
+    for group_snapshot, indices in groups.values():
+        group_surge_multipliers = None
+        if surge_multipliers is not None and any(
+            surge_multipliers[i] is not None for i in indices
+        ):
+            group_surge_multipliers = [
+                1.0 if surge_multipliers[i] is None else surge_multipliers[i]
+                for i in indices
+            ]
+        group_fees = group_snapshot.fee_calculator.calculate_delivery_fees(
+            cart_values=[orders[i].cart_value for i in indices],
+            delivery_distances=[orders[i].delivery_distance for i in indices],
+            numbers_of_items=[orders[i].number_of_items for i in indices],
+            times=[orders[i].time for i in indices],
+            surge_multipliers=group_surge_multipliers,
+        )
+        for i, delivery_fee in zip(indices, group_fees.tolist()):
+            delivery_fees[i] = delivery_fee
+
+    rule_versions = None
+    if any(order_snapshot is not snapshot for order_snapshot in order_snapshots):
+        rule_versions = [
+            order_snapshot.rules.VERSION for order_snapshot in order_snapshots
+        ]
+    return FeeCalculatorBatchResponse(
+        delivery_fees=delivery_fees,
+        rule_version=snapshot.rules.VERSION,
+        rule_versions=rule_versions,
+    )
+
+
+@router.post(
+    "/calculate_fees_stream",
+    response_class=DuplexStreamingResponse,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/x-ndjson": {
+                    "schema": {"type": "string"},
+                    "example": '{"cart_value": 790, "delivery_distance": 2235, '
+                    '"number_of_items": 4, "time": "2024-01-15T13:00:00Z"}\n',
+                }
+            },
+        }
+    },
+)
+async def calculate_fees_stream(request: Request) -> DuplexStreamingResponse:
+    snapshot = pricing_store.snapshot
+    return DuplexStreamingResponse(
+        aprice_ndjson(request.stream(), snapshot.fee_calculator, zones=snapshot.zones),
+        media_type="application/x-ndjson",
+    )
+
+
+# Bisects the fee of about 31 values per bound, which is too little work for
+# the threadpool
+@router.post("/search", response_model=FeeSearchResponse)
+async def search_fees(request: FeeSearchRequest) -> Any:
+    snapshot, zone_id = _zone_snapshot(pricing_store.snapshot, request)
+    # The surge multiplier the order would get now, without counting the
+    # search as demand
+    surge_multiplier = None
+    if zone_id is not None:
+        surge_multiplier = surge_pricing.multiplier(zone_id)
+    result = search_input(
+        search_engine(snapshot.rules),
+        request.vary,
+        request.max_fee,
+        request.min_fee,
+        cart_value=request.cart_value,
+        delivery_distance=request.delivery_distance,
+        number_of_items=request.number_of_items,
+        time=request.time,
+        surge_multiplier=surge_multiplier,
+    )
+    return FeeSearchResponse(**result._asdict(), rule_version=snapshot.rules.VERSION)
+
+
+@router.post(
+    "/grid",
+    response_class=Response,
+    responses={
+        200: {"content": {media_type: {} for media_type in MEDIA_TYPES.values()}}
+    },
+)
+async def calculate_fee_grid(request: FeeGridRequest) -> Response:
+    # Surge multipliers follow live demand, the grid is of the rules alone
+    snapshot, _ = _zone_snapshot(pricing_store.snapshot, request)
+    spec = GridSpec(
+        request.start,
+        request.hours,
+        GridAxis(**request.delivery_distance.model_dump()),
+        GridAxis(**request.cart_value.model_dump()),
+        GridAxis(**request.number_of_items.model_dump()),
+    )
+    if spec.cells > settings.FEE_GRID_MAX_CELLS:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Grid of {spec.cells} orders, at most {settings.FEE_GRID_MAX_CELLS} are priced at once",
+        )
+    # Tens of milliseconds for the largest grids, off the event loop
+    data = await asyncio.to_thread(
+        fee_grid, snapshot.rules, spec, request.format, fee_grid_cache
+    )
+    return Response(
+        data,
+        media_type=MEDIA_TYPES[request.format],
+        headers={"X-Rule-Version": snapshot.rules.VERSION},
+    )
+
+
+@router.get("/cache_stats", response_model=FeeCacheStatsResponse)
+async def cache_stats() -> Any:
+    snapshot = pricing_store.snapshot
+    cache = getattr(snapshot.fee_calculator, "cache", None)
+    if cache is None:
+        return FeeCacheStatsResponse(enabled=False, rule_version=snapshot.rules.VERSION)
+    return FeeCacheStatsResponse(
+        enabled=True, rule_version=snapshot.rules.VERSION, **cache.stats()
+    )
+
+
+@router.get(
+    "/rules",
+    response_class=Response,
+    responses={
+        200: {"content": {"application/json": {}}},
+        304: {"description": "The table matching `If-None-Match` is current"},
+    },
+)
+async def pricing_rules(request: Request, zone_id: str | None = None) -> Response:
+    snapshot = pricing_store.snapshot
+    if zone_id is not None:
+        try:
+            snapshot = snapshot.for_zone(zone_id)
+        except UnknownZoneError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+    export = export_rules(snapshot.rules)
+    # Clients revalidate on every use, which costs them a 304 while the rules
+    # stay the same
+    headers = {"ETag": export.etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), export.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(export.body, media_type="application/json", headers=headers)
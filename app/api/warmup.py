@@ -0,0 +1,87 @@
+import json
+
+from fastapi import FastAPI
+from starlette.types import Scope
+
+from app.schemas.fees import FeeCalculatorBatchRequest, FeeCalculatorRequest
+
+_ORDER = FeeCalculatorRequest.model_config["json_schema_extra"]["examples"][0]
+_BATCH = FeeCalculatorBatchRequest.model_config["json_schema_extra"]["examples"][0]
+
+# Key of the request state marking warm-up requests
+WARM_UP_STATE = "warm_up"
+
+# Routes relative to the API prefix and the body each is warmed up with
+WARM_UP_REQUESTS = (
+    ("/fees/calculate_fee", json.dumps(_ORDER).encode()),
+    ("/fees/calculate_fee_fast", json.dumps(_ORDER).encode()),
+    ("/fees/calculate_fees", json.dumps(_BATCH).encode()),
+)
+
+
+async def _post(app: FastAPI, path: str, body: bytes) -> int:
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0", "spec_version": "2.3"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"content-type", b"application/json")],
+        "client": ("127.0.0.1", 0),
+        "server": ("127.0.0.1", 0),
+        "state": {WARM_UP_STATE: True},
+    }
+    received = False
+
+    async def receive() -> dict:
+        nonlocal received
+        if received:
+            return {"type": "http.disconnect"}
+        received = True
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    status = 0
+
+    async def send(message: dict) -> None:
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(scope, receive, send)
+    return status
+
+
+def is_warm_up(scope: Scope) -> bool:
+    """Tell whether a request is one of `warm_up`, whose made-up quotes stay out of the audit log."""
+    return scope.get("state", {}).get(WARM_UP_STATE, False)
+
+
+async def warm_up(app: FastAPI, prefix: str = "") -> list[str]:
+    """Send one request through each fee route before the app serves traffic.
+
+    Pydantic builds the model validators when the schemas are imported, but FastAPI and Starlette set up parts of every route on its first request, e.g. the endpoint context reported with errors and the threadpool of sync routes. That costs the first request over ten times a warm one, paid here instead. The requests are counted in the metrics like any other, but not recorded in the audit log.
+
+    Args:
+        app (FastAPI): The application, with its routers included
+        prefix (str): Prefix of the API routes
+
+    Returns:
+        list[str]: The paths that were warmed up, routes not served are skipped
+
+    Raises:
+        RuntimeError: If a route doesn't price the example order
+    """
+    warmed = []
+    for path, body in WARM_UP_REQUESTS:
+        path = prefix + path
+        status = await _post(app, path, body)
+        if status == 404:
+            continue
+        if status != 200:
+            raise RuntimeError(f"Warm-up request to {path} failed with status {status}")
+        warmed.append(path)
+    return warmed
@@ -0,0 +1,132 @@
+import argparse
+import json
+import sys
+from functools import partial
+
+from app.utils.backtest import DEFAULT_CHUNK_SIZE as BACKTEST_CHUNK_SIZE
+from app.utils.backtest import SEGMENTATIONS, run_backtest
+from app.utils.fee_calculator import FeeCalculator, PricingRules
+from app.utils.fee_stream import DEFAULT_CHUNK_SIZE, MAX_LINE_BYTES, price_ndjson
+from app.utils.pricing_rules import PricingRulesStore, load_pricing_rules
+from app.utils.shared_tables import TablesPublisher
+
+
+def price(args: argparse.Namespace) -> None:
+    snapshot = PricingRulesStore(FeeCalculator, args.rules, args.zones).snapshot
+    source = open(args.input, "rb") if args.input != "-" else sys.stdin.buffer
+    target = open(args.output, "wb") if args.output != "-" else sys.stdout.buffer
+    with source, target:
+        blocks = iter(partial(source.read, MAX_LINE_BYTES), b"")
+        for chunk in price_ndjson(
+            blocks,
+            snapshot.fee_calculator,
+            chunk_size=args.chunk_size,
+            zones=snapshot.zones,
+        ):
+            target.write(chunk)
+
+
+def backtest(args: argparse.Namespace) -> None:
+    old_rules = load_pricing_rules(args.old_rules) if args.old_rules else PricingRules()
+    new_rules = load_pricing_rules(args.new_rules)
+    result = run_backtest(
+        args.orders,
+        old_rules,
+        new_rules,
+        segment_by=args.segment_by,
+        chunk_size=args.chunk_size,
+        workers=args.workers,
+    )
+    output = json.dumps(result, indent=2) + "\n"
+    if args.output == "-":
+        sys.stdout.write(output)
+    else:
+        with open(args.output, "w") as target:
+            target.write(output)
+
+
+def publish_tables(args: argparse.Namespace) -> None:
+    publisher = TablesPublisher(args.path, args.rules, args.zones)
+    print(f"Published generation {publisher.generation} to {args.path}")
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.cli")
+    subparsers = parser.add_subparsers(required=True)
+
+    price_parser = subparsers.add_parser(
+        "price", help="Price newline-delimited JSON orders"
+    )
+    price_parser.add_argument(
+        "input", nargs="?", default="-", help="Input NDJSON file (default: stdin)"
+    )
+    price_parser.add_argument(
+        "-o", "--output", default="-", help="Output NDJSON file (default: stdout)"
+    )
+    price_parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=DEFAULT_CHUNK_SIZE,
+        help="Number of orders priced together",
+    )
+    price_parser.add_argument(
+        "--rules", help="Pricing rule set file or directory (default: built-in rules)"
+    )
+    price_parser.add_argument("--zones", help="Zone file")
+    price_parser.set_defaults(func=price)
+
+    backtest_parser = subparsers.add_parser(
+        "backtest",
+        help="Compare the fees of two rule sets over historical orders",
+        description="Re-price orders stored as one .npy file per column "
+        "(cart_value, delivery_distance, number_of_items, time) "
+        "with two rule sets and print the aggregate and per-segment deltas as JSON.",
+    )
+    backtest_parser.add_argument("orders", help="Directory of the order columns")
+    backtest_parser.add_argument(
+        "--new-rules", required=True, help="Rule set file or directory to evaluate"
+    )
+    backtest_parser.add_argument(
+        "--old-rules",
+        help="Current rule set file or directory (default: built-in rules)",
+    )
+    backtest_parser.add_argument(
+        "--segment-by",
+        nargs="*",
+        choices=list(SEGMENTATIONS),
+        default=list(SEGMENTATIONS),
+        help="Segmentations to break the results down by (default: all)",
+    )
+    backtest_parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=BACKTEST_CHUNK_SIZE,
+        help="Number of orders priced together",
+    )
+    backtest_parser.add_argument(
+        "--workers", type=int, help="Number of processes (default: all cores)"
+    )
+    backtest_parser.add_argument(
+        "-o", "--output", default="-", help="Output JSON file (default: stdout)"
+    )
+    backtest_parser.set_defaults(func=backtest)
+
+    publish_parser = subparsers.add_parser(
+        "publish-tables",
+        help="Publish the pricing tables to a shared table file",
+        description="Compile the rule set and zone files into the table file "
+        "the workers of a server with SHARED_TABLES_PATH map, as a new generation.",
+    )
+    publish_parser.add_argument("path", help="The table file, e.g. /dev/shm/fee-tables")
+    publish_parser.add_argument(
+        "--rules", help="Pricing rule set file or directory (default: built-in rules)"
+    )
+    publish_parser.add_argument("--zones", help="Zone file")
+    publish_parser.set_defaults(func=publish_tables)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
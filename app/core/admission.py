@@ -0,0 +1,44 @@
+from app.core.config import settings
+from app.core.metrics import (
+    FEE_ADMISSION_QUEUE_DELAY_SECONDS,
+    FEE_ADMISSION_REJECTED,
+    FEE_ADMISSION_SHED_FRACTION,
+)
+from app.utils.admission import AdmissionController, DelayShedder, TokenBuckets
+
+
+def build_admission_controller() -> AdmissionController | None:
+    if not settings.ADMISSION_CONTROL_ENABLED:
+        return None
+    buckets = None
+    if settings.ADMISSION_CLIENT_RATE > 0:
+        buckets = TokenBuckets(
+            settings.ADMISSION_CLIENT_RATE,
+            settings.ADMISSION_CLIENT_BURST,
+            settings.ADMISSION_MAX_CLIENTS,
+        )
+    shedder = None
+    if settings.ADMISSION_TARGET_DELAY > 0:
+        if settings.METRICS_ENABLED:
+            shedder = DelayShedder(
+                settings.ADMISSION_TARGET_DELAY,
+                fraction=FEE_ADMISSION_SHED_FRACTION.labels(),
+                delay=FEE_ADMISSION_QUEUE_DELAY_SECONDS.labels(),
+            )
+        else:
+            shedder = DelayShedder(settings.ADMISSION_TARGET_DELAY)
+    rejected = None
+    if settings.METRICS_ENABLED:
+        rejected = {
+            reason: FEE_ADMISSION_REJECTED.labels(reason)
+            for reason in ("overload", "concurrency", "rate_limit")
+        }
+    return AdmissionController(
+        buckets,
+        settings.ADMISSION_MAX_CONCURRENCY,
+        shedder,
+        rejected=rejected,
+    )
+
+
+admission_controller = build_admission_controller()
@@ -0,0 +1,28 @@
+from app.core.config import settings
+from app.core.metrics import FEE_AUDIT_DROPPED, FEE_AUDIT_RECORDS
+from app.utils.audit_log import AuditLog
+
+
+def build_audit_log() -> AuditLog | None:
+    if settings.AUDIT_LOG_PATH is None:
+        return None
+    written = dropped = None
+    if settings.METRICS_ENABLED:
+        written = FEE_AUDIT_RECORDS.labels()
+        dropped = {
+            reason: FEE_AUDIT_DROPPED.labels(reason)
+            for reason in ("queue_full", "write_error")
+        }
+    return AuditLog(
+        settings.AUDIT_LOG_PATH,
+        settings.AUDIT_LOG_MAX_QUEUE,
+        settings.AUDIT_LOG_FLUSH_INTERVAL,
+        settings.AUDIT_LOG_FSYNC_INTERVAL,
+        settings.AUDIT_LOG_MAX_FILE_BYTES,
+        settings.AUDIT_LOG_MAX_FILE_AGE,
+        written=written,
+        dropped=dropped,
+    )
+
+
+audit_log = build_audit_log()
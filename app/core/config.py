@@ -1,4 +1,12 @@
-from pydantic_settings import BaseSettings, SettingsConfigDict
+import os
+from typing import Literal
+
+from pydantic import Field, SecretStr, TypeAdapter
+from pydantic_settings import (
+    BaseSettings,
+    PydanticBaseSettingsSource,
+    SettingsConfigDict,
+)
 
 
 class Setting(BaseSettings):
@@ -7,5 +15,130 @@ class Setting(BaseSettings):
     PROJECT_NAME: str
     API_V1_STR: str = "/api/v1"
 
+    # Production server, see app/server.py
+    SERVER_HOST: str = "127.0.0.1"
+    SERVER_PORT: int = 8000
+    SERVER_WORKERS: int = 1
+    SERVER_LOOP: Literal["auto", "asyncio", "uvloop"] = "uvloop"
+    SERVER_HTTP: Literal["auto", "h11", "httptools"] = "httptools"
+    SERVER_BACKLOG: int = 2048
+    SERVER_KEEP_ALIVE: int = 5
+    SERVER_ACCESS_LOG: bool = False
+
+    # "compiled" prices orders from lookup tables precomputed at startup
+    FEE_ENGINE: Literal["default", "compiled"] = "default"
+
+    # Lean production startup: no OpenAPI schema or docs routes, settings only
+    # from the environment and the fee routes warmed up before serving. Only
+    # read from the environment, as it decides whether .env is read at all.
+    LEAN_STARTUP: bool = False
+
+    # Per-stage latency histograms and rule counters, served from /metrics
+    METRICS_ENABLED: bool = True
+    # Time the individual rule helpers on one in this many fee calculations
+    METRICS_RULE_PROFILE_EVERY: int = Field(default=100, gt=0)
+
+    # LRU cache in front of the fee calculation, bounded by a memory ceiling
+    FEE_CACHE_ENABLED: bool = False
+    FEE_CACHE_MAX_BYTES: int = 16 * 1024 * 1024
+    FEE_CACHE_TTL: float = 300.0
+
+    # Share fee calculations between concurrent identical quotes and price the
+    # others queued within the window together, see app/utils/fee_coalescer.py
+    FEE_COALESCING_ENABLED: bool = False
+    FEE_COALESCING_WINDOW: float = Field(default=0.0005, ge=0)
+    FEE_COALESCING_MAX_BATCH: int = Field(default=1024, gt=0)
+
+    # Fee grids of /fees/grid: orders per grid at most, and size in bytes of the
+    # recent grids cached per worker
+    FEE_GRID_MAX_CELLS: int = Field(default=2**24, gt=0)
+    FEE_GRID_CACHE_MAX_BYTES: int = Field(default=64 * 1024 * 1024, ge=0)
+
+    # Admission control of the API routes, see app/utils/admission.py. Every
+    # limit is per worker. Requests per second and burst of each client, a
+    # rate of 0 disables the rate limit.
+    ADMISSION_CONTROL_ENABLED: bool = False
+    ADMISSION_CLIENT_RATE: float = Field(default=0.0, ge=0)
+    ADMISSION_CLIENT_BURST: int = Field(default=50, gt=0)
+    # Request header telling clients apart, e.g. a gateway's client id, the
+    # client address is used without it. Clients remembered at most.
+    ADMISSION_CLIENT_HEADER: str | None = None
+    ADMISSION_MAX_CLIENTS: int = Field(default=100_000, gt=0)
+    # Requests handled at once, 0 for no limit
+    ADMISSION_MAX_CONCURRENCY: int = Field(default=0, ge=0)
+    # Queueing delay in seconds over which requests are shed, 0 never sheds,
+    # and seconds between its samples
+    ADMISSION_TARGET_DELAY: float = Field(default=0.01, ge=0)
+    ADMISSION_DELAY_INTERVAL: float = Field(default=0.005, gt=0)
+
+    # HMAC secret signing quote tokens, which are disabled without one. Tokens
+    # signed with the previous secrets, a JSON list, are still accepted.
+    QUOTE_TOKEN_SECRET: SecretStr | None = None
+    QUOTE_TOKEN_PREVIOUS_SECRETS: list[SecretStr] = []
+    # Seconds a quote token stays valid
+    QUOTE_TOKEN_TTL: float = Field(default=900.0, gt=0)
+
+    # Serve the binary fee protocol next to HTTP, see app/api/binary.py. Every
+    # worker listens on the TCP port on SERVER_HOST, or on the Unix socket if
+    # one is set, which takes a single worker.
+    BINARY_PROTOCOL_ENABLED: bool = False
+    BINARY_PROTOCOL_PORT: int = 8001
+    BINARY_PROTOCOL_SOCKET: str | None = None
+    BINARY_PROTOCOL_MAX_BATCH: int = Field(default=65536, gt=0)
+
+    # Serve /fees/calculate_fee_fast, which bypasses FastAPI and Pydantic models
+    FAST_PATH_ENABLED: bool = False
+
+    # A JSON rule set file, or a directory of them where the last by name is active
+    PRICING_RULES_PATH: str | None = None
+    # A JSON file of zone polygons and the rule sets pricing orders in them
+    PRICING_ZONES_PATH: str | None = None
+    # Seconds between checks for a changed rule set or zone file, 0 disables reloading
+    PRICING_RULES_RELOAD_INTERVAL: float = 5.0
+    # A file, best on /dev/shm, the server process publishes the compiled tables
+    # of the rule set and zone files to. Every worker maps it instead of loading
+    # the files, and picks up new generations on the reload interval.
+    SHARED_TABLES_PATH: str | None = None
+
+    # A JSON file mapping zone ids to the orders their couriers can deliver over
+    # SURGE_WINDOW. Zones in it are surge priced, and it is checked for changes
+    # on the reload interval.
+    SURGE_CAPACITY_PATH: str | None = None
+    # Seconds of quotes counted as the demand of a zone, in ring buffer slots
+    SURGE_WINDOW: float = Field(default=600.0, gt=0)
+    SURGE_BUCKETS: int = Field(default=60, gt=0)
+    # Multiplier added per multiple of the capacity demand exceeds it by, the
+    # step it moves in and its cap
+    SURGE_SENSITIVITY: float = Field(default=0.5, gt=0)
+    SURGE_STEP: float = Field(default=0.1, gt=0)
+    SURGE_MAX_MULTIPLIER: float = Field(default=2.0, ge=1)
+
+    # Directory every worker writes the quotes of calculate_fee to, in rotating
+    # binary files, see app/utils/audit_log.py. Disabled without one.
+    AUDIT_LOG_PATH: str | None = None
+    # Quotes waiting to be written at most, more are dropped from the log
+    AUDIT_LOG_MAX_QUEUE: int = Field(default=65536, gt=0)
+    # Seconds between writes of the queued quotes, and between fsyncs at most
+    AUDIT_LOG_FLUSH_INTERVAL: float = Field(default=0.05, gt=0)
+    AUDIT_LOG_FSYNC_INTERVAL: float = Field(default=1.0, ge=0)
+    # Size in bytes and age in seconds from which a file is rotated
+    AUDIT_LOG_MAX_FILE_BYTES: int = Field(default=64 * 1024 * 1024, gt=0)
+    AUDIT_LOG_MAX_FILE_AGE: float = Field(default=3600.0, gt=0)
+
+    @classmethod
+    def settings_customise_sources(
+        cls,
+        settings_cls: type[BaseSettings],
+        init_settings: PydanticBaseSettingsSource,
+        env_settings: PydanticBaseSettingsSource,
+        dotenv_settings: PydanticBaseSettingsSource,
+        file_secret_settings: PydanticBaseSettingsSource,
+    ) -> tuple[PydanticBaseSettingsSource, ...]:
+        # Production gets its settings from the environment, so a lean startup
+        # skips looking for a .env file and a secrets directory
+        if TypeAdapter(bool).validate_python(os.environ.get("LEAN_STARTUP", False)):
+            return init_settings, env_settings
+        return init_settings, env_settings, dotenv_settings, file_secret_settings
+
 
 settings = Setting()
@@ -0,0 +1,64 @@
+from app.utils.metrics import Registry
+
+# Metrics are kept per process. With several server workers every scrape of
+# /metrics is answered by one of them.
+registry = Registry()
+
+REQUEST_STAGE_SECONDS = registry.histogram(
+    "fee_request_stage_seconds",
+    "Time spent in each stage of handling a request",
+    ["route", "stage"],
+)
+FEE_CALCULATION_SECONDS = registry.histogram(
+    "fee_calculation_seconds",
+    "Time spent in FeeCalculator.calculate_delivery_fee",
+)
+FEE_RULE_SECONDS = registry.histogram(
+    "fee_rule_seconds",
+    "Time spent evaluating each pricing rule helper",
+    ["rule"],
+)
+FEE_RULES_APPLIED = registry.counter(
+    "fee_rules_applied",
+    "Quotes on which a pricing rule changed the fee",
+    ["rule"],
+)
+FEE_COALESCED_REQUESTS = registry.counter(
+    "fee_coalesced_requests",
+    "Fee requests that went through the coalescer",
+)
+FEE_COALESCED_COMPUTATIONS = registry.counter(
+    "fee_coalesced_computations",
+    "Distinct orders the coalescer priced, its coalescing ratio is requests / computations",
+)
+FEE_COALESCING_QUEUE_SECONDS = registry.histogram(
+    "fee_coalescing_queue_seconds",
+    "Time requests waited in the coalescer for their fee",
+)
+FEE_COALESCING_BATCH_SIZE = registry.histogram(
+    "fee_coalescing_batch_size",
+    "Distinct orders priced together per coalescer batch",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 2048, 4096),
+)
+FEE_ADMISSION_REJECTED = registry.counter(
+    "fee_admission_rejected",
+    "Requests rejected by admission control",
+    ["reason"],
+)
+FEE_ADMISSION_SHED_FRACTION = registry.gauge(
+    "fee_admission_shed_fraction",
+    "Share of requests admission control sheds for overload",
+)
+FEE_ADMISSION_QUEUE_DELAY_SECONDS = registry.histogram(
+    "fee_admission_queue_delay_seconds",
+    "Event loop delay sampled by admission control",
+)
+FEE_AUDIT_RECORDS = registry.counter(
+    "fee_audit_records",
+    "Quotes written to the audit log",
+)
+FEE_AUDIT_DROPPED = registry.counter(
+    "fee_audit_dropped",
+    "Quotes dropped from the audit log",
+    ["reason"],
+)
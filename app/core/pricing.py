@@ -0,0 +1,133 @@
+from app.core.config import settings
+from app.core.metrics import (
+    FEE_CALCULATION_SECONDS,
+    FEE_COALESCED_COMPUTATIONS,
+    FEE_COALESCED_REQUESTS,
+    FEE_COALESCING_BATCH_SIZE,
+    FEE_COALESCING_QUEUE_SECONDS,
+    FEE_RULE_SECONDS,
+    FEE_RULES_APPLIED,
+)
+from app.utils.fee_cache import CachedFeeCalculator, FeeCache
+from app.utils.fee_calculator import FeeCalculator, PricingRules
+from app.utils.fee_coalescer import FeeCoalescer
+from app.utils.fee_grid import FeeGridCache
+from app.utils.instrumented_fee_calculator import (
+    InstrumentedFeeCalculator,
+    instrument_rule_helpers,
+)
+from app.utils.pricing_rules import PricingRulesStore
+from app.utils.quote_tokens import QuoteSigner
+from app.utils.shared_tables import (
+    SharedPricingRulesStore,
+    SharedRuleSet,
+    compile_engine,
+)
+from app.utils.surge import SurgePricing
+
+
+def build_engine(
+    rules: PricingRules, shared: SharedRuleSet | None = None
+) -> FeeCalculator:
+    if shared is not None:
+        return shared.build_engine()
+    if settings.FEE_ENGINE == "compiled":
+        # Falls back to the default engine for rules it can't tabulate
+        return compile_engine(rules)
+    return FeeCalculator(rules)
+
+
+def build_fee_calculator(
+    rules: PricingRules, shared: SharedRuleSet | None = None
+) -> FeeCalculator:
+    fee_calculator = build_engine(rules, shared)
+
+    if settings.FEE_CACHE_ENABLED:
+        # A fresh cache per rule set, so no fee outlives the rules that priced it
+        cache = FeeCache(settings.FEE_CACHE_MAX_BYTES, settings.FEE_CACHE_TTL)
+        fee_calculator = CachedFeeCalculator(fee_calculator, cache)
+
+    if settings.METRICS_ENABLED:
+        fee_calculator = InstrumentedFeeCalculator(
+            fee_calculator,
+            FEE_CALCULATION_SECONDS.labels(),
+            FEE_RULES_APPLIED,
+            rule_profiler=instrument_rule_helpers(
+                build_engine(rules, shared), FEE_RULE_SECONDS
+            ),
+            profile_every=settings.METRICS_RULE_PROFILE_EVERY,
+        )
+    return fee_calculator
+
+
+def build_pricing_store() -> PricingRulesStore:
+    if settings.SHARED_TABLES_PATH is not None:
+        return SharedPricingRulesStore(
+            build_fee_calculator, settings.SHARED_TABLES_PATH
+        )
+    return PricingRulesStore(
+        build_fee_calculator, settings.PRICING_RULES_PATH, settings.PRICING_ZONES_PATH
+    )
+
+
+pricing_store = build_pricing_store()
+
+
+def build_fee_coalescer() -> FeeCoalescer | None:
+    if not settings.FEE_COALESCING_ENABLED:
+        return None
+    if not settings.METRICS_ENABLED:
+        return FeeCoalescer(
+            settings.FEE_COALESCING_WINDOW, settings.FEE_COALESCING_MAX_BATCH
+        )
+    return FeeCoalescer(
+        settings.FEE_COALESCING_WINDOW,
+        settings.FEE_COALESCING_MAX_BATCH,
+        requests=FEE_COALESCED_REQUESTS.labels(),
+        computations=FEE_COALESCED_COMPUTATIONS.labels(),
+        queue_seconds=FEE_COALESCING_QUEUE_SECONDS.labels(),
+        batch_size=FEE_COALESCING_BATCH_SIZE.labels(),
+    )
+
+
+fee_coalescer = build_fee_coalescer()
+
+
+def build_quote_signer() -> QuoteSigner | None:
+    if settings.QUOTE_TOKEN_SECRET is None:
+        return None
+    secrets = [settings.QUOTE_TOKEN_SECRET, *settings.QUOTE_TOKEN_PREVIOUS_SECRETS]
+    return QuoteSigner(
+        [secret.get_secret_value().encode() for secret in secrets],
+        settings.QUOTE_TOKEN_TTL,
+    )
+
+
+quote_signer = build_quote_signer()
+
+
+def build_surge_pricing() -> SurgePricing | None:
+    if settings.SURGE_CAPACITY_PATH is None:
+        return None
+    return SurgePricing(
+        settings.SURGE_WINDOW,
+        settings.SURGE_BUCKETS,
+        settings.SURGE_SENSITIVITY,
+        settings.SURGE_MAX_MULTIPLIER,
+        settings.SURGE_STEP,
+        # Each worker sees its share of the quotes behind the load balancer
+        capacity_share=1 / settings.SERVER_WORKERS,
+        capacity_path=settings.SURGE_CAPACITY_PATH,
+    )
+
+
+surge_pricing = build_surge_pricing()
+
+
+def build_fee_grid_cache() -> FeeGridCache | None:
+    if settings.FEE_GRID_CACHE_MAX_BYTES == 0:
+        return None
+    return FeeGridCache(settings.FEE_GRID_CACHE_MAX_BYTES)
+
+
+fee_grid_cache = build_fee_grid_cache()
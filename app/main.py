@@ -1,9 +1,90 @@
+import asyncio
+import contextlib
+from collections.abc import AsyncIterator
+
 from fastapi import FastAPI
 
+from app.api.admission import AdmissionMiddleware
+from app.api.binary import BinaryFeeServer
 from app.api.main import api_router
+from app.api.routes import metrics
+from app.api.warmup import warm_up
+from app.core.admission import admission_controller
+from app.core.audit_log import audit_log
 from app.core.config import settings
+from app.core.pricing import pricing_store, surge_pricing
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    tasks = []
+    if (
+        settings.PRICING_RULES_PATH
+        or settings.PRICING_ZONES_PATH
+        or settings.SHARED_TABLES_PATH
+    ) and settings.PRICING_RULES_RELOAD_INTERVAL > 0:
+        tasks.append(
+            asyncio.create_task(
+                pricing_store.watch(settings.PRICING_RULES_RELOAD_INTERVAL)
+            )
+        )
+    if surge_pricing is not None and settings.PRICING_RULES_RELOAD_INTERVAL > 0:
+        tasks.append(
+            asyncio.create_task(
+                surge_pricing.watch(settings.PRICING_RULES_RELOAD_INTERVAL)
+            )
+        )
+    if admission_controller is not None and admission_controller.shedder is not None:
+        tasks.append(
+            asyncio.create_task(
+                admission_controller.shedder.monitor(settings.ADMISSION_DELAY_INTERVAL)
+            )
+        )
+    if audit_log is not None:
+        tasks.append(asyncio.create_task(audit_log.run()))
+    binary_server = None
+    if settings.BINARY_PROTOCOL_ENABLED:
+        if settings.BINARY_PROTOCOL_SOCKET and settings.SERVER_WORKERS > 1:
+            raise RuntimeError("BINARY_PROTOCOL_SOCKET takes a single server worker")
+        binary_server = await BinaryFeeServer(
+            pricing_store, settings.BINARY_PROTOCOL_MAX_BATCH
+        ).start(
+            settings.SERVER_HOST,
+            settings.BINARY_PROTOCOL_PORT,
+            settings.BINARY_PROTOCOL_SOCKET,
+        )
+    if settings.LEAN_STARTUP:
+        await warm_up(app, settings.API_V1_STR)
+    yield
+    for task in tasks:
+        task.cancel()
+    if binary_server is not None:
+        binary_server.close()
+        await binary_server.wait_closed()
+    # Quotes answered until now are still written
+    if audit_log is not None:
+        await audit_log.close()
+
+
+# FastAPI only generates the OpenAPI schema when it is first requested, a lean
+# startup doesn't serve it or the docs built on it at all
+app = FastAPI(
+    title=settings.PROJECT_NAME,
+    lifespan=lifespan,
+    openapi_url=None if settings.LEAN_STARTUP else "/openapi.json",
+)
+
 
-app = FastAPI(title=settings.PROJECT_NAME)
+# Rejects requests over the limits before they reach the routes
+if admission_controller is not None:
+    app.add_middleware(
+        AdmissionMiddleware,
+        controller=admission_controller,
+        prefix=settings.API_V1_STR,
+        client_header=settings.ADMISSION_CLIENT_HEADER,
+    )
 
 
 app.include_router(api_router, prefix=settings.API_V1_STR)
+if settings.METRICS_ENABLED:
+    app.include_router(metrics.router)
@@ -1,9 +1,33 @@
 import datetime
+from typing import Literal
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 
 
-class FeeCalculatorRequest(BaseModel):
+class Location(BaseModel):
+    lat: float = Field(ge=-90, le=90, description="Latitude in degrees")
+    lon: float = Field(ge=-180, le=180, description="Longitude in degrees")
+
+
+class ZonedRequest(BaseModel):
+    zone_id: str | None = Field(
+        default=None,
+        description="Delivery zone whose rules price the request, takes precedence over `location`",
+    )
+    location: Location | None = Field(
+        default=None,
+        description="Delivery location, priced with the rules of the zone containing it",
+    )
+
+    @property
+    def coordinates(self) -> tuple[float, float] | None:
+        """Latitude and longitude of `location`, if given."""
+        if self.location is None:
+            return None
+        return self.location.lat, self.location.lon
+
+
+class FeeCalculatorRequest(ZonedRequest):
     cart_value: int = Field(gt=0, description="Value of the shopping cart in cents")
     delivery_distance: int = Field(
         gt=0,
@@ -13,6 +37,14 @@ class FeeCalculatorRequest(BaseModel):
         gt=0, description="The number of items in the customer's shopping cart"
     )
     time: datetime.datetime = Field(description="Order time in UTC in ISO format")
+    include_quote_token: bool = Field(
+        default=False,
+        description="Include a signed quote token in the response, single quotes only",
+    )
+    include_breakdown: bool = Field(
+        default=False,
+        description="Include the components of the fee in the response, single quotes only",
+    )
     model_config = {
         "json_schema_extra": {
             "examples": [
@@ -27,6 +59,233 @@ class FeeCalculatorRequest(BaseModel):
     }
 
 
+class FeeBreakdownResponse(BaseModel):
+    cart_value_surcharge: int = Field(
+        description="Surcharge for a cart below the base cart value in cents"
+    )
+    distance_surcharge: int = Field(
+        description="Base and additional distance surcharge in cents"
+    )
+    item_surcharge: int = Field(
+        description="Additional item and bulk surcharge in cents"
+    )
+    rush_hour_surcharge: int = Field(
+        description="Rush hour surcharge in cents, before the fee limit"
+    )
+    free_delivery: bool = Field(
+        description="Whether the cart value qualified for free delivery"
+    )
+    fee_limit_applied: bool = Field(
+        description="Whether the fee was capped at the fee limit"
+    )
+    surge_surcharge: int = Field(
+        description="Demand surge surcharge in cents, before the fee limit"
+    )
+
+
 class FeeCalculatorResponse(BaseModel):
     delivery_fee: int = Field(ge=0, description="Calculated delivery fee in cents")
-    model_config = {"json_schema_extra": {"examples": [{"delivery_fee": 710}]}}
+    rule_version: str = Field(description="Version of the pricing rules used")
+    quote_token: str | None = Field(
+        default=None,
+        description="Signed token vouching for the order, fee and rule version until it expires",
+    )
+    breakdown: FeeBreakdownResponse | None = Field(
+        default=None, description="Components of the fee, if requested"
+    )
+    model_config = {
+        "json_schema_extra": {
+            "examples": [{"delivery_fee": 710, "rule_version": "default"}]
+        }
+    }
+
+
+class FeeCalculatorBatchRequest(BaseModel):
+    orders: list[FeeCalculatorRequest] = Field(description="Orders to price")
+    model_config = {
+        "json_schema_extra": {
+            "examples": [
+                {
+                    "orders": [
+                        {
+                            "cart_value": 790,
+                            "delivery_distance": 2235,
+                            "number_of_items": 4,
+                            "time": "2024-01-15T13:00:00Z",
+                        },
+                        {
+                            "cart_value": 900,
+                            "delivery_distance": 500,
+                            "number_of_items": 2,
+                            "time": "2024-03-15T15:00:00Z",
+                        },
+                    ]
+                }
+            ]
+        }
+    }
+
+
+class FeeCalculatorBatchResponse(BaseModel):
+    delivery_fees: list[int] = Field(
+        description="Calculated delivery fees in cents, in the order of the request"
+    )
+    rule_version: str = Field(description="Version of the pricing rules used")
+    rule_versions: list[str] | None = Field(
+        default=None,
+        description="Version of the rules used for each order, when some orders are priced by zone",
+    )
+    model_config = {
+        "json_schema_extra": {
+            "examples": [{"delivery_fees": [710, 360], "rule_version": "default"}]
+        }
+    }
+
+
+class FeeSearchRequest(ZonedRequest):
+    vary: Literal["cart_value", "delivery_distance", "number_of_items"] = Field(
+        description="The input to search the values of"
+    )
+    max_fee: int | None = Field(
+        default=None, ge=0, description="Largest fee accepted in cents"
+    )
+    min_fee: int | None = Field(
+        default=None, ge=0, description="Smallest fee accepted in cents"
+    )
+    cart_value: int | None = Field(
+        default=None,
+        gt=0,
+        description="Value of the shopping cart in cents, unless it is varied",
+    )
+    delivery_distance: int | None = Field(
+        default=None,
+        gt=0,
+        description="The distance between the store and customer’s location in meters, unless it is varied",
+    )
+    number_of_items: int | None = Field(
+        default=None,
+        gt=0,
+        description="The number of items in the customer's shopping cart, unless it is varied",
+    )
+    time: datetime.datetime = Field(description="Order time in UTC in ISO format")
+    model_config = {
+        "json_schema_extra": {
+            "examples": [
+                {
+                    "vary": "cart_value",
+                    "max_fee": 600,
+                    "delivery_distance": 2235,
+                    "number_of_items": 4,
+                    "time": "2024-01-15T13:00:00Z",
+                }
+            ]
+        }
+    }
+
+    @model_validator(mode="after")
+    def _check_inputs(self) -> "FeeSearchRequest":
+        if self.max_fee is None and self.min_fee is None:
+            raise ValueError("A search needs a max_fee or a min_fee")
+        for name in ("cart_value", "delivery_distance", "number_of_items"):
+            if name != self.vary and getattr(self, name) is None:
+                raise ValueError(f"{name} is required unless it is varied")
+        return self
+
+
+class FeeSearchResponse(BaseModel):
+    min_value: int | None = Field(
+        description="Smallest value of the input meeting the fee bounds, null if none does"
+    )
+    max_value: int | None = Field(
+        description="Largest value of the input meeting the fee bounds, null if there is no upper bound"
+    )
+    min_value_fee: int | None = Field(
+        description="Delivery fee in cents at the smallest value"
+    )
+    max_value_fee: int | None = Field(
+        description="Delivery fee in cents at the largest value, or at the end of the search range"
+    )
+    rule_version: str = Field(description="Version of the pricing rules used")
+    model_config = {
+        "json_schema_extra": {
+            "examples": [
+                {
+                    "min_value": 900,
+                    "max_value": None,
+                    "min_value_fee": 600,
+                    "max_value_fee": 0,
+                    "rule_version": "default",
+                }
+            ]
+        }
+    }
+
+
+class FeeGridAxis(BaseModel):
+    first: int = Field(gt=0, le=2**31 - 1, description="First value of the axis")
+    last: int = Field(
+        gt=0, le=2**31 - 1, description="Last value of the axis, included if on a step"
+    )
+    step: int = Field(default=1, gt=0, description="Difference between two values")
+
+    @model_validator(mode="after")
+    def _check_range(self) -> "FeeGridAxis":
+        if self.last < self.first:
+            raise ValueError("last must not be smaller than first")
+        return self
+
+
+class FeeGridRequest(ZonedRequest):
+    start: datetime.datetime = Field(
+        description="Time of the first hour of the grid in UTC in ISO format"
+    )
+    hours: int = Field(
+        default=168, gt=0, le=168, description="Number of hours from `start`"
+    )
+    delivery_distance: FeeGridAxis = Field(description="Delivery distances in meters")
+    cart_value: FeeGridAxis = Field(description="Cart values in cents")
+    number_of_items: FeeGridAxis = Field(description="Numbers of items")
+    format: Literal["raw", "npy"] = Field(
+        default="raw",
+        description="`raw` for a header and little-endian integers, `npy` for the NumPy file format",
+    )
+    model_config = {
+        "json_schema_extra": {
+            "examples": [
+                {
+                    "start": "2024-01-15T00:00:00Z",
+                    "hours": 168,
+                    "delivery_distance": {"first": 500, "last": 10000, "step": 500},
+                    "cart_value": {"first": 100, "last": 20000, "step": 100},
+                    "number_of_items": {"first": 1, "last": 20},
+                }
+            ]
+        }
+    }
+
+    @model_validator(mode="after")
+    def _check_hours(self) -> "FeeGridRequest":
+        try:
+            self.start + datetime.timedelta(hours=self.hours - 1)
+        except OverflowError:
+            raise ValueError("The last hour of the grid is past year 9999") from None
+        return self
+
+
+class FeeCacheStatsResponse(BaseModel):
+    enabled: bool = Field(description="Whether the fee cache is enabled")
+    rule_version: str = Field(
+        description="Version of the pricing rules the cache serves"
+    )
+    entries: int = Field(default=0, description="Number of cached fees")
+    max_entries: int = Field(
+        default=0, description="Capacity derived from the memory ceiling"
+    )
+    hits: int = Field(default=0, description="Lookups answered from the cache")
+    misses: int = Field(default=0, description="Lookups that had to calculate the fee")
+    evictions: int = Field(
+        default=0, description="Entries dropped to stay under the ceiling"
+    )
+    expirations: int = Field(
+        default=0, description="Entries dropped for outliving their TTL"
+    )
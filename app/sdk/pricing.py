@@ -0,0 +1,164 @@
+import datetime
+import json
+import math
+import urllib.error
+import urllib.request
+import zoneinfo
+
+# Versions of the artifact layout this module evaluates
+FORMAT = 1
+
+_UTC = datetime.timezone.utc
+_DAY = 24 * 60 * 60
+_WEEK = 7 * _DAY
+# The calendar, weekdays included, and the timezone rules at either end of time
+# repeat every 400 years
+_CALENDAR_CYCLE = datetime.timedelta(days=146_097)
+
+
+class FeeTable:
+    """Prices orders from a rule set exported by `GET /api/v1/fees/rules`, without calling the service.
+
+    Gives the same fees as `calculate_delivery_fee` of the service for the rule set it was exported from. Only the standard library is used, so callers can vendor this module as it is. Zone rules and surge multipliers are decided by the service: the table of a zone is exported with `?zone_id=`, and a surge multiplier can be passed in.
+    """
+
+    def __init__(self, artifact: dict, etag: str | None = None):
+        """
+        Args:
+            artifact (dict): The decoded artifact
+            etag (str | None): The ETag it was served with, to check for a newer one
+
+        Raises:
+            ValueError: If the artifact is of a format this module doesn't know
+        """
+        if artifact.get("FORMAT") != FORMAT:
+            raise ValueError(f"Unsupported fee table format {artifact.get('FORMAT')!r}")
+        self.artifact = artifact
+        self.etag = etag
+        self.version: str = artifact["VERSION"]
+        timezone = artifact["RUSH_HOUR_TIMEZONE"]
+        self._timezone = zoneinfo.ZoneInfo(timezone) if timezone is not None else None
+        self._windows = [tuple(window) for window in artifact["RUSH_HOUR_WINDOWS"]]
+        self._base_cart_value = artifact["BASE_CART_VALUE"]
+        self._base_surcharge = artifact["BASE_SURCHARGE"]
+        self._base_distance = artifact["BASE_DISTANCE"]
+        self._additional_distance_surcharge = artifact["ADDITIONAL_DISTANCE_SURCHARGE"]
+        self._additional_distance = artifact["ADDITIONAL_DISTANCE"]
+        self._additional_item_limit = artifact["ADDITIONAL_ITEM_LIMIT"]
+        self._additional_item_surcharge = artifact["ADDITIONAL_ITEM_SURCHARGE"]
+        self._bulk_item_limit = artifact["BULK_ITEM_LIMIT"]
+        self._bulk_surcharge = artifact["BULK_SURCHARGE"]
+        self._fee_limit = artifact["FEE_LIMIT"]
+        self._free_delivery = artifact["CART_VALUE_FOR_FREE_DELIVERY"]
+
+    @classmethod
+    def from_json(cls, data: bytes | str, etag: str | None = None) -> "FeeTable":
+        """Load a fee table from the JSON of the artifact."""
+        return cls(json.loads(data), etag)
+
+    def rush_hour_multiplier(self, time: datetime.datetime) -> float | None:
+        """Find the rush hour multiplier applying at an order time.
+
+        Args:
+            time (datetime.datetime): Order time, taken as UTC if naive
+
+        Returns:
+            float | None: The multiplier, or None outside rush hours
+        """
+        if self._timezone is not None:
+            if time.tzinfo is None:
+                time = time.replace(tzinfo=_UTC)
+            try:
+                time = time.astimezone(_UTC).astimezone(self._timezone)
+            except OverflowError:
+                # The local time is past the first or last datetime, the same
+                # time 400 years in has its weekday and wall-clock time
+                shift = _CALENDAR_CYCLE if time.year < 5000 else -_CALENDAR_CYCLE
+                time = (time + shift).astimezone(_UTC).astimezone(self._timezone)
+        seconds = (time.isoweekday() - 1) * _DAY + (
+            time.hour * 3600 + time.minute * 60 + time.second + time.microsecond / 1e6
+        )
+        for start, end, multiplier in self._windows:
+            if start <= seconds < end or start <= seconds + _WEEK < end:
+                return multiplier
+        return None
+
+    def calculate_delivery_fee(
+        self,
+        cart_value: int,
+        delivery_distance: int,
+        number_of_items: int,
+        time: datetime.datetime,
+        surge_multiplier: float | None = None,
+    ) -> int:
+        """Calculate the delivery fee of an order.
+
+        Args:
+            cart_value (int): Value of the shopping cart in cents
+            delivery_distance (int): Delivery distance in meters
+            number_of_items (int): Number of items in the cart
+            time (datetime.datetime): Order time, taken as UTC if naive
+            surge_multiplier (float | None): Surge multiplier of the order's zone, None for no surge
+
+        Returns:
+            int: The delivery fee in cents
+        """
+        if cart_value >= self._free_delivery:
+            return 0
+
+        delivery_fee = 0
+        if cart_value < self._base_cart_value:
+            delivery_fee += self._base_cart_value - cart_value
+
+        delivery_fee += self._base_surcharge
+        if delivery_distance > self._base_distance:
+            delivery_fee += (
+                math.ceil(
+                    (delivery_distance - self._base_distance)
+                    / self._additional_distance
+                )
+                * self._additional_distance_surcharge
+            )
+
+        if number_of_items > self._additional_item_limit:
+            delivery_fee += (
+                number_of_items - self._additional_item_limit
+            ) * self._additional_item_surcharge
+            if number_of_items > self._bulk_item_limit:
+                delivery_fee += self._bulk_surcharge
+
+        multiplier = self.rush_hour_multiplier(time)
+        if multiplier is not None:
+            delivery_fee += int(delivery_fee * multiplier - delivery_fee)
+        if surge_multiplier is not None:
+            delivery_fee += int(delivery_fee * surge_multiplier - delivery_fee)
+
+        return min(delivery_fee, self._fee_limit)
+
+
+def fetch_fee_table(
+    url: str, table: FeeTable | None = None, timeout: float = 10.0
+) -> FeeTable:
+    """Download the fee table of the service, or check that a table is still current.
+
+    Args:
+        url (str): The rules endpoint, e.g. `https://fees.example.com/api/v1/fees/rules`
+        table (FeeTable | None): The table downloaded last, sent as `If-None-Match` so an unchanged table isn't downloaded again
+        timeout (float): Seconds to wait for the service
+
+    Returns:
+        FeeTable: The current table, which is `table` itself if it hasn't changed
+
+    Raises:
+        urllib.error.URLError: If the service can't be reached or answers with an error
+    """
+    request = urllib.request.Request(url, headers={"Accept": "application/json"})
+    if table is not None and table.etag is not None:
+        request.add_header("If-None-Match", table.etag)
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return FeeTable.from_json(response.read(), response.headers.get("ETag"))
+    except urllib.error.HTTPError as e:
+        if e.code == 304 and table is not None:
+            return table
+        raise
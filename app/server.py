@@ -0,0 +1,42 @@
+import threading
+
+import uvicorn
+
+from app.core.config import settings
+from app.utils.shared_tables import TablesPublisher
+
+
+def main() -> None:
+    """Run the production server.
+
+    Starts `SERVER_WORKERS` worker processes with the event loop and HTTP parser set in the settings, uvloop and httptools by default. With `SHARED_TABLES_PATH`, this process publishes the pricing tables before the workers start, and a thread publishes them again whenever the rule set or zone file changes.
+    """
+    if settings.SHARED_TABLES_PATH is not None:
+        publisher = TablesPublisher(
+            settings.SHARED_TABLES_PATH,
+            settings.PRICING_RULES_PATH,
+            settings.PRICING_ZONES_PATH,
+        )
+        if (
+            settings.PRICING_RULES_PATH or settings.PRICING_ZONES_PATH
+        ) and settings.PRICING_RULES_RELOAD_INTERVAL > 0:
+            threading.Thread(
+                target=publisher.run,
+                args=(settings.PRICING_RULES_RELOAD_INTERVAL,),
+                daemon=True,
+            ).start()
+    uvicorn.run(
+        "app.main:app",
+        host=settings.SERVER_HOST,
+        port=settings.SERVER_PORT,
+        workers=settings.SERVER_WORKERS,
+        loop=settings.SERVER_LOOP,
+        http=settings.SERVER_HTTP,
+        backlog=settings.SERVER_BACKLOG,
+        timeout_keep_alive=settings.SERVER_KEEP_ALIVE,
+        access_log=settings.SERVER_ACCESS_LOG,
+    )
+
+
+if __name__ == "__main__":
+    main()
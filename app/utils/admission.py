@@ -0,0 +1,221 @@
+import asyncio
+import math
+import random
+import time as time_module
+from collections.abc import Callable
+from typing import NamedTuple
+
+from app.utils.metrics import CounterChild, GaugeChild, HistogramChild
+
+
+class Rejection(NamedTuple):
+    """Why a request was not admitted, and the response it gets."""
+
+    status: int
+    reason: str
+    # Seconds until the client should try again
+    retry_after: float
+
+
+# Shared by every request rejected for the same reason
+_OVERLOADED = Rejection(503, "overload", 1.0)
+_BUSY = Rejection(503, "concurrency", 1.0)
+
+
+class TokenBuckets:
+    """A token bucket per client, refilled lazily when the client is seen.
+
+    A bucket is the token count and the time it was last updated, so taking a token is a dict lookup and some arithmetic. Buckets live on the event loop of their worker, which runs one request at a time between awaits, so they need no lock. The least recently seen clients are dropped past `max_clients`, and come back with a full bucket as an idle client would have anyway.
+    """
+
+    def __init__(self, rate: float, burst: int, max_clients: int = 100_000):
+        """
+        Args:
+            rate (float): Tokens added per second
+            burst (int): Tokens a bucket holds at most, and starts with
+            max_clients (int): Buckets kept
+        """
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets: dict[str, tuple[float, float]] = {}
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def take(self, client: str, now: float) -> float:
+        """Take a token from the bucket of a client.
+
+        Args:
+            client (str): The client
+            now (float): The current time in seconds
+
+        Returns:
+            float: 0 if a token was taken, else the seconds until one is available
+        """
+        buckets = self._buckets
+        # Popped and added back, so the dict stays ordered from least to most
+        # recently seen
+        bucket = buckets.pop(client, None)
+        if bucket is None:
+            tokens = self.burst
+            if len(buckets) >= self.max_clients:
+                del buckets[next(iter(buckets))]
+        else:
+            tokens, last = bucket
+            tokens += (now - last) * self.rate
+            if tokens > self.burst:
+                tokens = self.burst
+        if tokens >= 1:
+            buckets[client] = (tokens - 1, now)
+            return 0.0
+        buckets[client] = (tokens, now)
+        return (1 - tokens) / self.rate
+
+
+class DelayShedder:
+    """Sheds a share of the requests while the event loop runs behind.
+
+    A worker handles requests on one event loop, so when more arrive than it can price they queue up as work the loop hasn't got to yet. `monitor` measures that queueing delay by how late a timer fires. As in CoDel, the decision is made on the smallest delay sampled over every `window` seconds: a burst or a scheduling hiccup delays some samples, but only a standing queue delays all of them. Each window whose smallest delay is over `target` sheds `increase` more of the requests, and each one under it `decrease` less, up to `max_fraction` so some traffic keeps going through. Shedding quickly and recovering slowly keeps the delay close to the target instead of oscillating around it.
+    """
+
+    def __init__(
+        self,
+        target: float,
+        window: float = 0.1,
+        increase: float = 0.1,
+        decrease: float = 0.05,
+        max_fraction: float = 0.95,
+        draw: Callable[[], float] = random.random,
+        fraction: GaugeChild | None = None,
+        delay: HistogramChild | None = None,
+    ):
+        """
+        Args:
+            target (float): Queueing delay in seconds above which requests are shed
+            window (float): Seconds the smallest delay is taken over
+            increase (float): Share of requests shed more per window over the target
+            decrease (float): Share of requests shed less per window under the target
+            max_fraction (float): Largest share of requests shed
+            draw (Callable[[], float]): Draws a float in [0, 1) deciding whether a request is shed
+            fraction (GaugeChild | None): Set to the share of requests shed
+            delay (HistogramChild | None): Records the delay samples
+        """
+        self.target = target
+        self.window = window
+        self.increase = increase
+        self.decrease = decrease
+        self.max_fraction = max_fraction
+        self.fraction = 0.0
+        self._draw = draw
+        self._fraction_gauge = fraction
+        self._delay = delay
+        self._window_end: float | None = None
+        self._min_delay = math.inf
+
+    def admit(self) -> bool:
+        """Tell whether a request gets through at the current share of requests shed."""
+        return self.fraction == 0.0 or self._draw() >= self.fraction
+
+    def observe(self, delay: float, now: float) -> None:
+        """Record a queueing delay sample, adjusting the share of requests shed at the end of a window.
+
+        Args:
+            delay (float): The queueing delay in seconds
+            now (float): The time of the sample in seconds
+        """
+        if self._delay is not None:
+            self._delay.observe(delay)
+        if delay < self._min_delay:
+            self._min_delay = delay
+        if self._window_end is None:
+            self._window_end = now + self.window
+        if now < self._window_end:
+            return
+        if self._min_delay > self.target:
+            self.fraction = min(self.fraction + self.increase, self.max_fraction)
+        else:
+            self.fraction = max(self.fraction - self.decrease, 0.0)
+        self._window_end = now + self.window
+        self._min_delay = math.inf
+        if self._fraction_gauge is not None:
+            self._fraction_gauge.set(self.fraction)
+
+    async def monitor(self, interval: float) -> None:
+        """Sample the delay of the event loop every `interval` seconds, until cancelled."""
+        while True:
+            start = time_module.perf_counter()
+            await asyncio.sleep(interval)
+            now = time_module.perf_counter()
+            self.observe(max(now - start - interval, 0.0), now)
+
+
+class AdmissionController:
+    """Decides which requests a worker handles and which get a quick rejection.
+
+    A request is checked, cheapest check first, against:
+
+    - the `shedder`, which sheds a share of the requests while the queueing delay is over its target (503)
+    - `max_concurrency`, the requests the worker handles at once (503)
+    - the `buckets` of the client, which limit the rate of every client (429)
+
+    The controller runs on the event loop of its worker, one request at a time between awaits, so the checks and the count of requests in flight are plain reads and writes without a lock. Every limit is per worker.
+    """
+
+    def __init__(
+        self,
+        buckets: TokenBuckets | None = None,
+        max_concurrency: int = 0,
+        shedder: DelayShedder | None = None,
+        clock: Callable[[], float] = time_module.monotonic,
+        rejected: dict[str, CounterChild] | None = None,
+    ):
+        """
+        Args:
+            buckets (TokenBuckets | None): The rate limits of the clients, None for no rate limit
+            max_concurrency (int): Requests handled at once, 0 for no limit
+            shedder (DelayShedder | None): Sheds requests under overload, None to never shed
+            clock (Callable[[], float]): Time in seconds for the token buckets
+            rejected (dict[str, CounterChild] | None): Counts rejections by reason: `overload`, `concurrency` and `rate_limit`
+        """
+        self.buckets = buckets
+        self.max_concurrency = max_concurrency
+        self.shedder = shedder
+        self.in_flight = 0
+        self._clock = clock
+        self._rejected = rejected
+
+    def admit(self, client: str) -> Rejection | None:
+        """Admit a request or reject it.
+
+        An admitted request counts as in flight until `release` is called for it.
+
+        Args:
+            client (str): The client sending the request
+
+        Returns:
+            Rejection | None: Why the request is rejected, or None if it is admitted
+        """
+        rejection = None
+        if self.shedder is not None and not self.shedder.admit():
+            rejection = _OVERLOADED
+        elif self.max_concurrency and self.in_flight >= self.max_concurrency:
+            rejection = _BUSY
+        elif self.buckets is not None:
+            wait = self.buckets.take(client, self._clock())
+            if wait > 0:
+                rejection = Rejection(429, "rate_limit", wait)
+        if rejection is None:
+            self.in_flight += 1
+        elif self._rejected is not None:
+            self._rejected[rejection.reason].inc()
+        return rejection
+
+    def release(self) -> None:
+        """Mark an admitted request as done."""
+        self.in_flight -= 1
+
+
+def retry_after_header(rejection: Rejection) -> bytes:
+    """The `Retry-After` header value of a rejection, in whole seconds."""
+    return str(max(math.ceil(rejection.retry_after), 1)).encode()
@@ -0,0 +1,345 @@
+import asyncio
+import contextlib
+import datetime
+import logging
+import os
+import struct
+import time as time_module
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import BinaryIO, NamedTuple
+
+from app.utils.metrics import CounterChild
+
+logger = logging.getLogger(__name__)
+
+# Every file starts with the magic and the format version
+MAGIC = b"FEEAUDIT"
+VERSION = 1
+_HEADER = struct.Struct("<8sH")
+
+# Kinds of record. A rule version is written once per file, before the first
+# quote priced with it, and quotes refer to it by its id in that file.
+RULE_VERSION = 0
+QUOTE = 1
+
+# Kind, id and length of the UTF-8 rule version
+_RULE_VERSION = struct.Struct("<BHH")
+# Kind, time of the quote and order time in microseconds since the epoch in UTC,
+# cart value, delivery distance, number of items, delivery fee, surge multiplier
+# and rule version id
+_QUOTE = struct.Struct("<BqqqqqqdH")
+
+# Records packed between handing the GIL back to the event loop
+_YIELD_EVERY = 64
+
+# Active files are renamed to this suffix once they are complete
+SUFFIX = ".audit"
+ACTIVE_SUFFIX = ".audit.open"
+
+_UTC = datetime.timezone.utc
+_EPOCH = datetime.datetime(1970, 1, 1, tzinfo=_UTC)
+_NAIVE_EPOCH = datetime.datetime(1970, 1, 1)
+_MICROSECOND = datetime.timedelta(microseconds=1)
+
+
+class AuditRecord(NamedTuple):
+    """A quote read back from the audit log."""
+
+    quoted_at: datetime.datetime
+    cart_value: int
+    delivery_distance: int
+    number_of_items: int
+    time: datetime.datetime
+    delivery_fee: int
+    rule_version: str
+    surge_multiplier: float
+
+
+def _microseconds(time: datetime.datetime) -> int:
+    # Naive order times are UTC, as everywhere else
+    epoch = _NAIVE_EPOCH if time.tzinfo is None else _EPOCH
+    return (time - epoch) // _MICROSECOND
+
+
+class AuditLog:
+    """Records the quotes returned to clients in rotating binary files, off the request path.
+
+    `record` appends the inputs, fee and rule version of a quote to an in-memory queue, which is a list append on the event loop. `run` flushes the queue every `flush_interval` seconds: the records are packed and appended to the active file with a single write, on a thread of its own so the event loop never waits for the disk. The file is fsynced at most every `fsync_interval` seconds, so a crash loses at most that much of the log, and always before it is rotated or closed.
+
+    The queue holds at most `max_queue` records. When it is full, because the disk falls behind or stalls, further quotes are dropped from the log and counted rather than slowing down or failing the requests. A write that fails drops its batch the same way.
+
+    Each worker process writes its own files, named after the time they were opened and the process id. A file is rotated once it reaches `max_file_bytes` or is `max_file_age` seconds old, and renamed from `.audit.open` to `.audit` when complete, so whatever ships the files can take every `.audit` file.
+    """
+
+    def __init__(
+        self,
+        directory: str | Path,
+        max_queue: int = 65536,
+        flush_interval: float = 0.05,
+        fsync_interval: float = 1.0,
+        max_file_bytes: int = 64 * 1024 * 1024,
+        max_file_age: float = 3600.0,
+        written: CounterChild | None = None,
+        dropped: dict[str, CounterChild] | None = None,
+    ):
+        """
+        Args:
+            directory (str | Path): Directory of the audit files, created if missing
+            max_queue (int): Records waiting to be written at most, more are dropped
+            flush_interval (float): Seconds between writes of the queued records
+            fsync_interval (float): Seconds between fsyncs of the active file at most, 0 to fsync every write
+            max_file_bytes (int): Size from which a file is rotated
+            max_file_age (float): Seconds after which a file is rotated
+            written (CounterChild | None): Counts the records written
+            dropped (dict[str, CounterChild] | None): Counts the records dropped by reason: `queue_full` and `write_error`
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_queue = max_queue
+        self.flush_interval = flush_interval
+        self.fsync_interval = fsync_interval
+        self.max_file_bytes = max_file_bytes
+        self.max_file_age = max_file_age
+        self.path: Path | None = None
+        self._pending: list[tuple] = []
+        self._written = written
+        self._dropped = dropped
+        # A single thread, so writes land in order and never run concurrently
+        self._executor = ThreadPoolExecutor(1, thread_name_prefix="audit-log")
+        self._file: BinaryIO | None = None
+        self._size = 0
+        self._opened = 0.0
+        self._synced = 0.0
+        self._rule_version_ids: dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def record(
+        self,
+        cart_value: int,
+        delivery_distance: int,
+        number_of_items: int,
+        time: datetime.datetime,
+        delivery_fee: int,
+        rule_version: str,
+        surge_multiplier: float | None = None,
+    ) -> bool:
+        """Queue a quote to be written.
+
+        Args:
+            cart_value (int): Value of the shopping cart in cents
+            delivery_distance (int): Delivery distance in meters
+            number_of_items (int): Number of items in the cart
+            time (datetime.datetime): Order time
+            delivery_fee (int): The quoted delivery fee in cents
+            rule_version (str): Version of the rules that priced the quote
+            surge_multiplier (float | None): The surge multiplier of the quote, None for no surge
+
+        Returns:
+            bool: Whether the quote was queued, False if it was dropped
+        """
+        pending = self._pending
+        if len(pending) >= self.max_queue:
+            if self._dropped is not None:
+                self._dropped["queue_full"].inc()
+            return False
+        pending.append(
+            (
+                time_module.time(),
+                cart_value,
+                delivery_distance,
+                number_of_items,
+                time,
+                delivery_fee,
+                rule_version,
+                surge_multiplier,
+            )
+        )
+        return True
+
+    async def flush(self) -> None:
+        """Write the queued records, without waiting for an fsync."""
+        records, self._pending = self._pending, []
+        if not records:
+            return
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(self._executor, self._write, records)
+        except Exception:
+            # Whatever the failure, `run` must keep flushing the records after it
+            logger.exception("Failed to write %d audit records", len(records))
+            if self._dropped is not None:
+                self._dropped["write_error"].inc(len(records))
+
+    async def run(self) -> None:
+        """Flush the queue every `flush_interval` seconds, until cancelled."""
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def close(self) -> None:
+        """Write the queued records and complete the active file."""
+        await self.flush()
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._executor, self._close_file)
+        self._executor.shutdown()
+
+    def _open_file(self, now: float) -> None:
+        opened = datetime.datetime.fromtimestamp(now, _UTC)
+        name = f"{opened:%Y%m%dT%H%M%S%fZ}-{os.getpid()}"
+        self.path = self.directory / (name + ACTIVE_SUFFIX)
+        self._file = open(self.path, "xb", buffering=0)
+        self._file.write(_HEADER.pack(MAGIC, VERSION))
+        self._size = _HEADER.size
+        self._opened = now
+        self._synced = now
+        self._rule_version_ids = {}
+
+    def _close_file(self) -> None:
+        if self._file is None:
+            return
+        os.fsync(self._file.fileno())
+        self._file.close()
+        self._file = None
+        self.path.rename(
+            self.path.with_name(self.path.name[: -len(ACTIVE_SUFFIX)] + SUFFIX)
+        )
+
+    def _write(self, records: list[tuple]) -> None:
+        now = time_module.time()
+        if self._file is not None and (
+            self._size >= self.max_file_bytes or now - self._opened >= self.max_file_age
+        ):
+            self._close_file()
+        if self._file is None:
+            self._open_file(now)
+
+        # Rule versions join the file only once the batch is written, so no
+        # later quote refers to one that a failed batch never wrote
+        rule_version_ids = dict(self._rule_version_ids)
+        buffer = bytearray()
+        written = 0
+        for i, (
+            quoted_at,
+            cart_value,
+            delivery_distance,
+            number_of_items,
+            time,
+            delivery_fee,
+            rule_version,
+            surge_multiplier,
+        ) in enumerate(records):
+            if i % _YIELD_EVERY == _YIELD_EVERY - 1:
+                # Hand the GIL back to the event loop, which would otherwise
+                # wait up to the switch interval of 5 ms for it
+                time_module.sleep(0)
+            rule_version_id = rule_version_ids.get(rule_version)
+            header = b""
+            try:
+                if rule_version_id is None:
+                    rule_version_id = len(rule_version_ids)
+                    encoded = rule_version.encode()
+                    header = (
+                        _RULE_VERSION.pack(RULE_VERSION, rule_version_id, len(encoded))
+                        + encoded
+                    )
+                quote = _QUOTE.pack(
+                    QUOTE,
+                    int(quoted_at * 1e6),
+                    _microseconds(time),
+                    cart_value,
+                    delivery_distance,
+                    number_of_items,
+                    delivery_fee,
+                    1.0 if surge_multiplier is None else surge_multiplier,
+                    rule_version_id,
+                )
+            except (struct.error, OverflowError):
+                # A value too large for its field, which no real order or rule
+                # version has, e.g. a rule version over 65535 bytes
+                if self._dropped is not None:
+                    self._dropped["write_error"].inc()
+                continue
+            if header:
+                rule_version_ids[rule_version] = rule_version_id
+                buffer += header
+            buffer += quote
+            written += 1
+        try:
+            self._file.write(buffer)
+        except OSError:
+            # What was written of the batch would garble the records after it,
+            # so they go to a new file
+            file, self._file = self._file, None
+            with contextlib.suppress(OSError):
+                file.close()
+            raise
+        self._size += len(buffer)
+        self._rule_version_ids = rule_version_ids
+        if now - self._synced >= self.fsync_interval:
+            os.fsync(self._file.fileno())
+            self._synced = now
+        if self._written is not None:
+            self._written.inc(written)
+
+
+def read_audit_file(path: str | Path) -> Iterator[AuditRecord]:
+    """Read the quotes of an audit file.
+
+    A record cut short, as the last one of a file whose writer crashed can be, ends the file.
+
+    Args:
+        path (str | Path): The audit file
+
+    Returns:
+        Iterator[AuditRecord]: The quotes in the order they were recorded
+
+    Raises:
+        ValueError: If the file is not an audit file of this format version
+    """
+    data = Path(path).read_bytes()
+    if len(data) < _HEADER.size or _HEADER.unpack_from(data) != (MAGIC, VERSION):
+        raise ValueError(f"{path} is not a version {VERSION} audit file")
+    rule_versions: dict[int, str] = {}
+    offset = _HEADER.size
+    while offset < len(data):
+        kind = data[offset]
+        if kind == RULE_VERSION:
+            if offset + _RULE_VERSION.size > len(data):
+                return
+            _, rule_version_id, length = _RULE_VERSION.unpack_from(data, offset)
+            offset += _RULE_VERSION.size
+            if offset + length > len(data):
+                return
+            rule_versions[rule_version_id] = data[offset : offset + length].decode()
+            offset += length
+        elif kind == QUOTE:
+            if offset + _QUOTE.size > len(data):
+                return
+            (
+                _,
+                quoted_at,
+                time,
+                cart_value,
+                delivery_distance,
+                number_of_items,
+                delivery_fee,
+                surge_multiplier,
+                rule_version_id,
+            ) = _QUOTE.unpack_from(data, offset)
+            offset += _QUOTE.size
+            yield AuditRecord(
+                _EPOCH + quoted_at * _MICROSECOND,
+                cart_value,
+                delivery_distance,
+                number_of_items,
+                _EPOCH + time * _MICROSECOND,
+                delivery_fee,
+                rule_versions[rule_version_id],
+                surge_multiplier,
+            )
+        else:
+            raise ValueError(f"Unknown audit record kind {kind} in {path}")
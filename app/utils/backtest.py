@@ -0,0 +1,283 @@
+import concurrent.futures
+import os
+from collections.abc import Callable, Sequence
+from pathlib import Path
+from typing import NamedTuple
+
+import numpy as np
+
+from app.utils.fee_calculator import FeeCalculator, PricingRules
+
+ORDER_COLUMNS = ("cart_value", "delivery_distance", "number_of_items", "time")
+DEFAULT_CHUNK_SIZE = 1 << 20
+
+# Lower edges of the fee delta bins in cents, after an open-ended first bin.
+# 0 and 1 are both edges, so unchanged fees get a bin of their own.
+DELTA_EDGES = (-500, -200, -100, -50, -10, 0, 1, 11, 51, 101, 201, 501)
+
+_HOUR = np.timedelta64(1, "h")
+
+
+class Segmentation(NamedTuple):
+    """A way of splitting orders into segments, e.g. by distance band."""
+
+    labels: tuple[str, ...]
+    codes: Callable[[dict[str, np.ndarray]], np.ndarray]
+
+
+def _bands(width: int, count: int) -> tuple[str, ...]:
+    labels = [f"{i * width}-{(i + 1) * width - 1}" for i in range(count)]
+    return (*labels, f"{count * width}+")
+
+
+def _days(times: np.ndarray) -> np.ndarray:
+    return times.astype("datetime64[D]")
+
+
+SEGMENTATIONS = {
+    "distance": Segmentation(
+        _bands(500, 20),
+        lambda columns: np.clip(columns["delivery_distance"] // 500, 0, 20),
+    ),
+    "cart_value": Segmentation(
+        _bands(1000, 20),
+        lambda columns: np.clip(columns["cart_value"] // 1000, 0, 20),
+    ),
+    "number_of_items": Segmentation(
+        (*map(str, range(1, 21)), "21+"),
+        lambda columns: np.clip(columns["number_of_items"], 1, 21) - 1,
+    ),
+    "weekday": Segmentation(
+        ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"),
+        # 1970-01-01 was a Thursday
+        lambda columns: (_days(columns["time"]).astype(np.int64) + 3) % 7,
+    ),
+    "hour": Segmentation(
+        tuple(f"{hour:02}" for hour in range(24)),
+        lambda columns: (columns["time"] - _days(columns["time"])) // _HOUR,
+    ),
+}
+
+
+def write_order_columns(directory: str | Path, **columns: np.ndarray) -> None:
+    """Write orders as one `.npy` file per column, the layout `run_backtest` reads.
+
+    Args:
+        directory (str | Path): Directory for the column files, created if missing
+        **columns (np.ndarray): The `ORDER_COLUMNS`, integers and `datetime64` order times
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    for name in ORDER_COLUMNS:
+        np.save(directory / f"{name}.npy", np.asarray(columns[name]))
+
+
+def open_order_columns(directory: str | Path) -> dict[str, np.ndarray]:
+    """Memory-map the order columns of a directory, without reading them.
+
+    Args:
+        directory (str | Path): Directory with one `.npy` file per column of `ORDER_COLUMNS`
+
+    Returns:
+        dict[str, np.ndarray]: The read-only memory-mapped columns
+
+    Raises:
+        ValueError: If a column is missing, has the wrong type or length
+    """
+    directory = Path(directory)
+    columns = {}
+    for name in ORDER_COLUMNS:
+        path = directory / f"{name}.npy"
+        if not path.exists():
+            raise ValueError(f"Missing order column {path}")
+        columns[name] = np.load(path, mmap_mode="r")
+
+    for name, column in columns.items():
+        expected = "M" if name == "time" else "iu"
+        if column.ndim != 1 or column.dtype.kind not in expected:
+            raise ValueError(
+                f"Order column {name} must be one-dimensional "
+                f"{'datetime64' if name == 'time' else 'integer'}, got {column.dtype}"
+            )
+    if len({len(column) for column in columns.values()}) > 1:
+        raise ValueError("Order columns must have the same length")
+    return columns
+
+
+class _ChunkPricer:
+    """Prices chunks of the memory-mapped orders with both rule sets and tallies them."""
+
+    def __init__(
+        self,
+        directory: str | Path,
+        old_rules: PricingRules,
+        new_rules: PricingRules,
+        segment_by: Sequence[str],
+        delta_edges: Sequence[int],
+    ):
+        self.columns = open_order_columns(directory)
+        self.old = FeeCalculator(old_rules)
+        self.new = FeeCalculator(new_rules)
+        self.segment_by = segment_by
+        self.delta_edges = np.asarray(delta_edges, dtype=np.int64)
+
+    def __call__(self, bounds: tuple[int, int]) -> dict[str, np.ndarray]:
+        """Price the orders in [start, stop).
+
+        Returns:
+            dict[str, np.ndarray]: By segmentation, an int64 table with a row per segment holding the number of orders, the old and new fee totals and the counts of each fee delta bin
+        """
+        start, stop = bounds
+        # Slicing the memory maps only reads this chunk from disk
+        chunk = {name: column[start:stop] for name, column in self.columns.items()}
+        inputs = (
+            chunk["cart_value"],
+            chunk["delivery_distance"],
+            chunk["number_of_items"],
+            chunk["time"],
+        )
+        old_fees = self.old.calculate_delivery_fees(*inputs)
+        new_fees = self.new.calculate_delivery_fees(*inputs)
+        delta_bins = np.searchsorted(self.delta_edges, new_fees - old_fees, "right")
+        bin_count = len(self.delta_edges) + 1
+
+        tables = {}
+        for name in ("all", *self.segment_by):
+            if name == "all":
+                labels, codes = ("all",), np.zeros(stop - start, dtype=np.int64)
+            else:
+                labels = SEGMENTATIONS[name].labels
+                codes = SEGMENTATIONS[name].codes(chunk).astype(np.int64)
+            count = len(labels)
+            table = np.empty((count, 3 + bin_count), dtype=np.int64)
+            table[:, 0] = np.bincount(codes, minlength=count)
+            # Float weights are exact, a chunk sums to far less than 2**53
+            table[:, 1] = np.bincount(codes, weights=old_fees, minlength=count)
+            table[:, 2] = np.bincount(codes, weights=new_fees, minlength=count)
+            table[:, 3:] = np.bincount(
+                codes * bin_count + delta_bins, minlength=count * bin_count
+            ).reshape(count, bin_count)
+            tables[name] = table
+        return tables
+
+
+# The pricer of a pool worker, set up once per process
+_worker_pricer: _ChunkPricer | None = None
+
+
+def _init_worker(*args) -> None:
+    global _worker_pricer
+    _worker_pricer = _ChunkPricer(*args)
+
+
+def _price_chunk_in_worker(bounds: tuple[int, int]) -> dict[str, np.ndarray]:
+    return _worker_pricer(bounds)
+
+
+def _delta_labels(delta_edges: Sequence[int]) -> list[str]:
+    labels = [f"<{delta_edges[0]}"]
+    for low, high in zip(delta_edges, delta_edges[1:]):
+        labels.append(str(low) if high == low + 1 else f"{low}..{high - 1}")
+    labels.append(f">={delta_edges[-1]}")
+    return labels
+
+
+def _summarize(table: np.ndarray, labels: Sequence[str]) -> list[dict]:
+    return [
+        {
+            "segment": label,
+            "orders": int(row[0]),
+            "old_total": int(row[1]),
+            "new_total": int(row[2]),
+            "delta_total": int(row[2] - row[1]),
+            "delta_histogram": row[3:].tolist(),
+        }
+        for label, row in zip(labels, table)
+    ]
+
+
+def _add_tables(
+    totals: dict[str, np.ndarray] | None, tables: dict[str, np.ndarray]
+) -> dict[str, np.ndarray]:
+    if totals is None:
+        return tables
+    for name, table in tables.items():
+        totals[name] += table
+    return totals
+
+
+def run_backtest(
+    directory: str | Path,
+    old_rules: PricingRules,
+    new_rules: PricingRules,
+    segment_by: Sequence[str] = tuple(SEGMENTATIONS),
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    workers: int | None = None,
+    delta_edges: Sequence[int] = DELTA_EDGES,
+) -> dict:
+    """Re-price historical orders with two rule sets and compare the fees.
+
+    The orders are memory-mapped column files, see `write_order_columns`, and are priced chunk by chunk with the vectorized path of `FeeCalculator`. With more than one worker the chunks are spread over a process pool, where every worker maps the files itself, so only chunk bounds and the small per-segment tables cross process boundaries. Memory stays bounded by a few chunks per worker whatever the number of orders.
+
+    Args:
+        directory (str | Path): Directory with the order columns
+        old_rules (PricingRules): The current rule set
+        new_rules (PricingRules): The rule set under evaluation
+        segment_by (Sequence[str]): Names of the `SEGMENTATIONS` to break the results down by
+        chunk_size (int): Number of orders priced at once
+        workers (int | None): Number of processes, all cores if None, 1 prices in this process
+        delta_edges (Sequence[int]): Increasing edges of the fee delta histogram bins in cents
+
+    Returns:
+        dict: The rule versions, order count, fee totals and delta, how many fees went up, down or stayed, the delta bin labels and the per-segment totals and delta histograms of each segmentation
+    """
+    for name in segment_by:
+        if name not in SEGMENTATIONS:
+            raise ValueError(f"Unknown segmentation {name!r}")
+    if chunk_size <= 0:
+        raise ValueError("chunk_size must be positive")
+    if list(delta_edges) != sorted(set(delta_edges)) or not {0, 1} <= set(delta_edges):
+        raise ValueError("delta_edges must be increasing and include 0 and 1")
+    rows = len(open_order_columns(directory)["time"])
+    chunks = [
+        (start, min(start + chunk_size, rows)) for start in range(0, rows, chunk_size)
+    ]
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(min(workers, len(chunks)), 1)
+
+    args = (directory, old_rules, new_rules, tuple(segment_by), tuple(delta_edges))
+    totals: dict[str, np.ndarray] | None = None
+    if workers == 1:
+        results = map(_ChunkPricer(*args), chunks)
+        for tables in results:
+            totals = _add_tables(totals, tables)
+    else:
+        with concurrent.futures.ProcessPoolExecutor(
+            workers, initializer=_init_worker, initargs=args
+        ) as pool:
+            for tables in pool.map(_price_chunk_in_worker, chunks):
+                totals = _add_tables(totals, tables)
+    if totals is None:
+        # No orders, price an empty chunk for tables of zeros
+        totals = _ChunkPricer(*args)((0, 0))
+
+    overall = totals["all"][0]
+    zero_bin = list(delta_edges).index(0) + 1
+    return {
+        "old_version": old_rules.VERSION,
+        "new_version": new_rules.VERSION,
+        "orders": int(overall[0]),
+        "old_total": int(overall[1]),
+        "new_total": int(overall[2]),
+        "delta_total": int(overall[2] - overall[1]),
+        "decreased_orders": int(overall[3 : 3 + zero_bin].sum()),
+        "unchanged_orders": int(overall[3 + zero_bin]),
+        "increased_orders": int(overall[4 + zero_bin :].sum()),
+        "delta_bins": _delta_labels(delta_edges),
+        "delta_histogram": overall[3:].tolist(),
+        "segments": {
+            name: _summarize(totals[name], SEGMENTATIONS[name].labels)
+            for name in segment_by
+        },
+    }
@@ -0,0 +1,268 @@
+import asyncio
+import struct
+from collections.abc import AsyncIterator, Iterable, Sequence
+from typing import NamedTuple
+
+import numpy as np
+
+VERSION = 1
+
+# Kinds of request
+PRICE = 1
+
+# Statuses of a response. An invalid order fails its batch, a malformed frame
+# also closes the connection if its length can't be trusted.
+OK = 0
+INVALID = 1
+MALFORMED = 2
+
+# Every frame is its length followed by that many bytes
+_LENGTH = struct.Struct("<I")
+# Version, kind, request id and number of orders
+_REQUEST_HEADER = struct.Struct("<BBII")
+# Version, status, request id, number of fees and length of the text, which is
+# the rule version or the error
+_RESPONSE_HEADER = struct.Struct("<BBIIH")
+
+# Cart value in cents, delivery distance in meters, number of items and the order
+# time in microseconds since the epoch, in UTC
+ORDER = struct.Struct("<IIIq")
+ORDER_DTYPE = np.dtype(
+    [
+        ("cart_value", "<u4"),
+        ("delivery_distance", "<u4"),
+        ("number_of_items", "<u4"),
+        ("time", "<i8"),
+    ]
+)
+FEE_DTYPE = np.dtype("<u4")
+
+
+class MalformedFrameError(ValueError):
+    """A frame that doesn't follow the protocol."""
+
+
+class FeeResponse(NamedTuple):
+    """A decoded response: the fees of a batch with their rule version, or an error."""
+
+    request_id: int
+    status: int
+    text: str
+    delivery_fees: list[int]
+
+
+def max_request_size(max_batch: int) -> int:
+    """Largest request frame body with up to `max_batch` orders."""
+    return _REQUEST_HEADER.size + max_batch * ORDER.size
+
+
+def encode_request(
+    request_id: int, orders: Sequence[tuple[int, int, int, int]] | np.ndarray
+) -> bytes:
+    """Frame a batch of orders.
+
+    Args:
+        request_id (int): Echoed in the response, to match responses on a pipelined connection
+        orders (Sequence[tuple[int, int, int, int]] | np.ndarray): Cart value, delivery distance, number of items and epoch microseconds of each order, or an `ORDER_DTYPE` array
+
+    Returns:
+        bytes: The frame, length prefix included
+
+    Raises:
+        struct.error: If a value doesn't fit its field
+    """
+    if isinstance(orders, np.ndarray):
+        body = orders.astype(ORDER_DTYPE, copy=False).tobytes()
+    else:
+        body = b"".join([ORDER.pack(*order) for order in orders])
+    header = _REQUEST_HEADER.pack(VERSION, PRICE, request_id, len(orders))
+    return _LENGTH.pack(len(header) + len(body)) + header + body
+
+
+def decode_request(payload: bytes) -> tuple[int, np.ndarray]:
+    """Read the request id and orders of a request frame body.
+
+    Returns:
+        tuple[int, np.ndarray]: The request id and an `ORDER_DTYPE` view of the orders
+
+    Raises:
+        MalformedFrameError: If the body is not a price request of this protocol version
+    """
+    if len(payload) < _REQUEST_HEADER.size:
+        raise MalformedFrameError("Frame shorter than the request header")
+    version, kind, request_id, count = _REQUEST_HEADER.unpack_from(payload)
+    if version != VERSION:
+        raise MalformedFrameError(f"Unsupported protocol version {version}")
+    if kind != PRICE:
+        raise MalformedFrameError(f"Unknown request kind {kind}")
+    if len(payload) != _REQUEST_HEADER.size + count * ORDER.size:
+        raise MalformedFrameError(f"Frame length doesn't match {count} orders")
+    orders = np.frombuffer(payload, ORDER_DTYPE, count, _REQUEST_HEADER.size)
+    return request_id, orders
+
+
+def encode_response(
+    request_id: int,
+    status: int,
+    text: str,
+    delivery_fees: Sequence[int] | np.ndarray = (),
+) -> bytes:
+    """Frame a response.
+
+    Args:
+        request_id (int): Id of the request answered
+        status (int): `OK`, `INVALID` or `MALFORMED`
+        text (str): The rule version, or the error
+        delivery_fees (Sequence[int] | np.ndarray): The fees in cents, in the order of the request
+
+    Returns:
+        bytes: The frame, length prefix included
+    """
+    text = text.encode()[:0xFFFF]
+    fees = np.asarray(delivery_fees, dtype=FEE_DTYPE).tobytes()
+    header = _RESPONSE_HEADER.pack(
+        VERSION, status, request_id, len(fees) // 4, len(text)
+    )
+    return _LENGTH.pack(len(header) + len(text) + len(fees)) + header + text + fees
+
+
+def decode_response(payload: bytes) -> FeeResponse:
+    """Read a response frame body.
+
+    Raises:
+        MalformedFrameError: If the body is not a response of this protocol version
+    """
+    if len(payload) < _RESPONSE_HEADER.size:
+        raise MalformedFrameError("Frame shorter than the response header")
+    version, status, request_id, count, text_length = _RESPONSE_HEADER.unpack_from(
+        payload
+    )
+    if version != VERSION:
+        raise MalformedFrameError(f"Unsupported protocol version {version}")
+    fees_offset = _RESPONSE_HEADER.size + text_length
+    if len(payload) != fees_offset + count * FEE_DTYPE.itemsize:
+        raise MalformedFrameError(f"Frame length doesn't match {count} fees")
+    return FeeResponse(
+        request_id,
+        status,
+        payload[_RESPONSE_HEADER.size : fees_offset].decode(),
+        np.frombuffer(payload, FEE_DTYPE, count, fees_offset).tolist(),
+    )
+
+
+async def read_frame(reader: asyncio.StreamReader, max_size: int) -> bytes | None:
+    """Read the body of the next frame.
+
+    Args:
+        reader (asyncio.StreamReader): The connection
+        max_size (int): Largest frame body accepted
+
+    Returns:
+        bytes | None: The frame body, or None if the connection was closed between frames
+
+    Raises:
+        MalformedFrameError: If the frame is larger than `max_size`
+        asyncio.IncompleteReadError: If the connection was closed within a frame
+    """
+    try:
+        prefix = await reader.readexactly(_LENGTH.size)
+    except asyncio.IncompleteReadError as e:
+        if not e.partial:
+            return None
+        raise
+    (size,) = _LENGTH.unpack(prefix)
+    if size > max_size:
+        raise MalformedFrameError(f"Frame of {size} bytes exceeds {max_size} bytes")
+    return await reader.readexactly(size)
+
+
+class BinaryFeeClient:
+    """Client of the binary fee protocol, over TCP or a Unix socket.
+
+    `price` sends one batch and waits for its fees. `stream` pipelines many batches over the connection, sending the next ones while the fees of earlier ones are on their way back.
+    """
+
+    def __init__(
+        self,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+        max_response_size: int = 1 << 26,
+    ):
+        self.reader = reader
+        self.writer = writer
+        self.max_response_size = max_response_size
+        self._next_request_id = 0
+
+    @classmethod
+    async def connect(
+        cls, host: str = "127.0.0.1", port: int = 8001, path: str | None = None
+    ) -> "BinaryFeeClient":
+        """Open a connection, to the Unix socket at `path` if given."""
+        if path is not None:
+            reader, writer = await asyncio.open_unix_connection(path)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    def _request_id(self) -> int:
+        self._next_request_id = (self._next_request_id + 1) & 0xFFFFFFFF
+        return self._next_request_id
+
+    async def _read_response(self) -> FeeResponse:
+        payload = await read_frame(self.reader, self.max_response_size)
+        if payload is None:
+            raise ConnectionError("Connection closed by the server")
+        return decode_response(payload)
+
+    async def price(
+        self, orders: Sequence[tuple[int, int, int, int]] | np.ndarray
+    ) -> FeeResponse:
+        """Price one batch of orders, see `encode_request`."""
+        self.writer.write(encode_request(self._request_id(), orders))
+        await self.writer.drain()
+        return await self._read_response()
+
+    async def stream(
+        self,
+        batches: Iterable[Sequence[tuple[int, int, int, int]] | np.ndarray],
+        window: int = 64,
+    ) -> AsyncIterator[FeeResponse]:
+        """Price batches pipelined over the connection, yielding their responses in order.
+
+        Args:
+            batches (Iterable[Sequence[tuple[int, int, int, int]] | np.ndarray]): The batches, see `encode_request`
+            window (int): Most batches sent ahead of their responses
+        """
+        in_flight = asyncio.Semaphore(window)
+        # One entry per request sent, then None once all are
+        sent: asyncio.Queue[int | None] = asyncio.Queue()
+
+        async def send() -> None:
+            try:
+                for orders in batches:
+                    await in_flight.acquire()
+                    request_id = self._request_id()
+                    self.writer.write(encode_request(request_id, orders))
+                    sent.put_nowait(request_id)
+                    await self.writer.drain()
+            finally:
+                # Also when a batch fails to encode, so the responses of the
+                # batches sent before it are read and the error raised after
+                sent.put_nowait(None)
+
+        sender = asyncio.create_task(send())
+        try:
+            while await sent.get() is not None:
+                response = await self._read_response()
+                in_flight.release()
+                yield response
+            await sender
+        finally:
+            sender.cancel()
+
+    async def close(self) -> None:
+        self.writer.close()
+        try:
+            await self.writer.wait_closed()
+        except ConnectionError:
+            pass
@@ -0,0 +1,256 @@
+import datetime
+import math
+from collections.abc import Sequence
+from typing import NamedTuple
+
+from app.utils.fee_calculator import FeeCalculator, PricingRules
+from app.utils.rush_hours import RushHourSchedule
+
+# Entries of a table at most. The tables grow with the fee limit and the base
+# cart value and distance of the rules, and building one takes a few
+# microseconds per entry, so rules needing larger ones are left to
+# `FeeCalculator`.
+MAX_TABLE_ENTRIES = 2**16
+
+
+class CompiledTables(NamedTuple):
+    """The lookup tables of a rule set, indexed by the input they price."""
+
+    # Surcharges by cart value, delivery distance and number of items
+    cart_value: Sequence[int]
+    delivery_distance: Sequence[int]
+    number_of_items: Sequence[int]
+    # The fee after each rush hour multiplier and the fee limit, by the fee before
+    rush_hour: dict[float, Sequence[int]]
+
+
+class CompiledFeeCalculator(FeeCalculator):
+    """Fee calculator that precomputes the pricing rules into lookup tables.
+
+    Cart value, distance and item count are step functions that stop mattering once their surcharge alone reaches the fee limit, so each of them is tabulated up to that point when the calculator is built. Each rush hour multiplier and the fee limit are folded into one more table indexed by the fee. Pricing an order then takes a few clamped list lookups and one rush hour check.
+
+    A surge multiplier changes from quote to quote, so an order with one is priced by applying the rush hour and surge multipliers to the fee from the tables directly, before the fee limit.
+
+    The tables are built with the helpers of `FeeCalculator`, so both always agree.
+    """
+
+    def __init__(
+        self,
+        rules: PricingRules | None = None,
+        rush_hour_schedule: RushHourSchedule | None = None,
+        tables: CompiledTables | None = None,
+    ):
+        """
+        Args:
+            rules (PricingRules | None): The rule set, the `Const` defaults if not given
+            rush_hour_schedule (RushHourSchedule | None): The schedule of the `RUSH_HOURS` of the rules, built from them if not given
+            tables (CompiledTables | None): The tables of the rules, e.g. mapped from shared memory, built from them if not given
+
+        Raises:
+            ValueError: If a rush hour multiplier is below 1, or a table would have more than `MAX_TABLE_ENTRIES` entries
+        """
+        super().__init__(rules, rush_hour_schedule)
+        rules = self.rules
+        multipliers = (
+            {window.MULTIPLIER for window in rules.RUSH_HOURS}
+            if rules.RUSH_HOURS is not None
+            else {rules.RUSH_HOUR_MULTIPLIER}
+        )
+        if min(multipliers, default=1) < 1:
+            raise ValueError("Compiled tables require rush hour multipliers >= 1")
+
+        self._fee_limit = rules.FEE_LIMIT
+        self._cart_value_for_free_delivery = rules.CART_VALUE_FOR_FREE_DELIVERY
+        self._rush_hour_isoweekday = rules.RUSH_HOUR_ISOWEEKDAY
+        self._rush_hour_start = rules.RUSH_HOUR_START
+        self._rush_hour_end = rules.RUSH_HOUR_END
+
+        if tables is None:
+            tables = self._build_tables(multipliers)
+        self.tables = tables
+        # Inputs past the last entry of a table price like the last entry
+        self._cart_value_table = tables.cart_value
+        self._max_cart_value = len(tables.cart_value) - 1
+        self._distance_table = tables.delivery_distance
+        self._max_delivery_distance = len(tables.delivery_distance) - 1
+        self._item_table = tables.number_of_items
+        self._max_number_of_items = len(tables.number_of_items) - 1
+        self._rush_hour_tables = tables.rush_hour
+        self._rush_hour_table = tables.rush_hour.get(rules.RUSH_HOUR_MULTIPLIER)
+
+    def _build_tables(self, multipliers: set[float]) -> CompiledTables:
+        rules = self.rules
+        fee_limit = rules.FEE_LIMIT
+
+        # Past these, the surcharge alone reaches the fee limit, or stays constant
+        # when its step is free
+        additional_distances = 1
+        if rules.ADDITIONAL_DISTANCE_SURCHARGE > 0:
+            additional_distances = max(
+                math.ceil(
+                    (fee_limit - rules.BASE_SURCHARGE)
+                    / rules.ADDITIONAL_DISTANCE_SURCHARGE
+                ),
+                1,
+            )
+        max_delivery_distance = (
+            rules.BASE_DISTANCE + additional_distances * rules.ADDITIONAL_DISTANCE
+        )
+        additional_items = 0
+        if rules.ADDITIONAL_ITEM_SURCHARGE > 0:
+            additional_items = math.ceil(fee_limit / rules.ADDITIONAL_ITEM_SURCHARGE)
+        max_number_of_items = (
+            max(rules.ADDITIONAL_ITEM_LIMIT, rules.BULK_ITEM_LIMIT)
+            + 1
+            + additional_items
+        )
+
+        sizes = {
+            "cart value": rules.BASE_CART_VALUE + 1,
+            "delivery distance": max_delivery_distance + 1,
+            "number of items": max_number_of_items + 1,
+            "rush hour": fee_limit + 1,
+        }
+        for name, size in sizes.items():
+            if size > MAX_TABLE_ENTRIES:
+                raise ValueError(
+                    f"The {name} table would have {size} entries,"
+                    f" compiled tables have at most {MAX_TABLE_ENTRIES}"
+                )
+
+        cart_value_table = [
+            self._calculate_cart_value_surcharge(cart_value)
+            for cart_value in range(rules.BASE_CART_VALUE + 1)
+        ]
+        distance_table = [
+            self._calculate_distance_surcharge(delivery_distance)
+            for delivery_distance in range(max_delivery_distance + 1)
+        ]
+        item_table = [
+            self._calculate_item_surcharge(number_of_items)
+            for number_of_items in range(max_number_of_items + 1)
+        ]
+
+        # One table per multiplier, applying it and the fee limit
+        rush_hour_tables = {
+            multiplier: [
+                self._limit_delivery_fee(
+                    delivery_fee + int(delivery_fee * multiplier - delivery_fee)
+                )
+                for delivery_fee in range(fee_limit + 1)
+            ]
+            for multiplier in multipliers
+        }
+        return CompiledTables(
+            cart_value_table, distance_table, item_table, rush_hour_tables
+        )
+
+    def calculate_delivery_fee(self, **inputs) -> int:
+        """Calculate the delivery fee from the precomputed tables.
+
+        Args:
+            **inputs: Arbitrary keyword arguments
+
+        Returns:
+            int: The delivery fee in cents
+        """
+        cart_value = inputs["cart_value"]
+        if cart_value >= self._cart_value_for_free_delivery:
+            return 0
+
+        delivery_distance = inputs["delivery_distance"]
+        number_of_items = inputs["number_of_items"]
+        time: datetime.datetime = inputs["time"]
+
+        # Conditional expressions are noticeably cheaper than calls to min()
+        max_cart_value = self._max_cart_value
+        max_delivery_distance = self._max_delivery_distance
+        max_number_of_items = self._max_number_of_items
+        delivery_fee = (
+            self._cart_value_table[
+                cart_value if cart_value < max_cart_value else max_cart_value
+            ]
+            + self._distance_table[
+                (
+                    delivery_distance
+                    if delivery_distance < max_delivery_distance
+                    else max_delivery_distance
+                )
+            ]
+            + self._item_table[
+                (
+                    number_of_items
+                    if number_of_items < max_number_of_items
+                    else max_number_of_items
+                )
+            ]
+        )
+
+        fee_limit = self._fee_limit
+        if delivery_fee > fee_limit:
+            delivery_fee = fee_limit
+
+        surge_multiplier = inputs.get("surge_multiplier")
+        if surge_multiplier is not None:
+            if surge_multiplier < 1:
+                # A discount can take a fee over the limit back under it
+                return FeeCalculator.calculate_delivery_fee(self, **inputs)
+            return self._surge_delivery_fee(delivery_fee, time, surge_multiplier)
+
+        schedule = self.rush_hour_schedule
+        if schedule is not None:
+            multiplier = schedule.multiplier(time)
+            if multiplier is not None:
+                return self._rush_hour_tables[multiplier][delivery_fee]
+        elif (
+            time.isoweekday() == self._rush_hour_isoweekday
+            and self._rush_hour_start <= time.time() < self._rush_hour_end
+        ):
+            return self._rush_hour_table[delivery_fee]
+        return delivery_fee
+
+    def calculate_delivery_fee_and_limit(self, **inputs) -> tuple[int, bool]:
+        """`calculate_delivery_fee`, also telling whether the fee limit cut the fee.
+
+        Only a fee at the limit can have been cut. The tables apply the limit, so for those the fee before it is worked out with the rule helpers, which take a few arithmetic operations.
+
+        Args:
+            **inputs: Arbitrary keyword arguments
+
+        Returns:
+            tuple[int, bool]: The delivery fee in cents, and whether it is the fee limit in place of a higher fee
+        """
+        surge_multiplier = inputs.get("surge_multiplier")
+        if surge_multiplier is not None and surge_multiplier < 1:
+            return FeeCalculator.calculate_delivery_fee_and_limit(self, **inputs)
+        delivery_fee = self.calculate_delivery_fee(**inputs)
+        if delivery_fee != self._fee_limit:
+            return delivery_fee, False
+
+        fee_before_limit = (
+            self._calculate_cart_value_surcharge(inputs["cart_value"])
+            + self._calculate_distance_surcharge(inputs["delivery_distance"])
+            + self._calculate_item_surcharge(inputs["number_of_items"])
+        )
+        multiplier = self._rush_hour_multiplier(inputs["time"])
+        if multiplier is not None:
+            fee_before_limit += int(fee_before_limit * multiplier - fee_before_limit)
+        if surge_multiplier is not None:
+            fee_before_limit += int(
+                fee_before_limit * surge_multiplier - fee_before_limit
+            )
+        return delivery_fee, fee_before_limit > delivery_fee
+
+    def _surge_delivery_fee(
+        self, delivery_fee: int, time: datetime.datetime, surge_multiplier: float
+    ) -> int:
+        """Apply the rush hour and surge multipliers and the fee limit to a fee from the tables.
+
+        Both multipliers are at least 1, so a fee already clamped to the fee limit stays at it.
+        """
+        multiplier = self._rush_hour_multiplier(time)
+        if multiplier is not None:
+            delivery_fee += int(delivery_fee * multiplier - delivery_fee)
+        delivery_fee += int(delivery_fee * surge_multiplier - delivery_fee)
+        fee_limit = self._fee_limit
+        return delivery_fee if delivery_fee < fee_limit else fee_limit
@@ -0,0 +1,352 @@
+import datetime
+import math
+import random
+import time as time_module
+import zoneinfo
+from collections.abc import Callable, Sequence
+from typing import NamedTuple
+
+import numpy as np
+
+from app.utils.compiled_fee_calculator import CompiledFeeCalculator
+from app.utils.fee_cache import CachedFeeCalculator, FeeCache
+from app.utils.fee_calculator import FeeCalculator, PricingRules, to_wall_clock
+
+# Prices a list of orders, given as keyword arguments of `calculate_delivery_fee`
+Engine = Callable[[Sequence[dict]], list[int]]
+
+_UTC = datetime.timezone.utc
+_MICROSECOND = datetime.timedelta(microseconds=1)
+# Around the int32 columns of the vectorized engine, and far past them
+_HUGE_VALUES = (2**31, 10**12)
+# Offsets order times are given with, the rules only look at the wall clock or instant
+_OFFSETS = tuple(
+    datetime.timezone(datetime.timedelta(hours=hours)) for hours in (-5, 0, 2, 9)
+)
+# Rush hour schedules are precompiled between 2000 and 2100, times outside are
+# converted instead, overflowing within hours of the first and last datetime
+_YEARS = (1, 1990, 2001, 2024, 2025, 2099, 2150, 9999)
+
+
+class Disagreement(NamedTuple):
+    """An order some engine priced differently than the reference engine."""
+
+    order: dict
+    fees: dict[str, int]
+
+
+def build_engines(rules: PricingRules) -> dict[str, Engine]:
+    """Every way the service can price orders with a rule set.
+
+    `scalar` is `FeeCalculator.calculate_delivery_fee`, evaluating one rule after the other. Orders may carry a `surge_multiplier`, which every engine applies. The others are the breakdown, the compiled tables, the fee cache in front of the scalar engine, and the vectorized engine given datetimes or `datetime64` columns like the backtests. The compiled engine is left out for rules it can't tabulate.
+
+    Args:
+        rules (PricingRules): The rule set
+
+    Returns:
+        dict[str, Engine]: The engines by name, `scalar` first
+    """
+    scalar = FeeCalculator(rules)
+    # Large enough to keep every order, so repeated orders are answered from it
+    cached = CachedFeeCalculator(FeeCalculator(rules), FeeCache(1 << 30, math.inf))
+
+    def vectorized(orders: Sequence[dict]) -> list[int]:
+        return scalar.calculate_delivery_fees(
+            [order["cart_value"] for order in orders],
+            [order["delivery_distance"] for order in orders],
+            [order["number_of_items"] for order in orders],
+            [order["time"] for order in orders],
+            _surge_column(orders),
+        ).tolist()
+
+    def vectorized_datetime64(orders: Sequence[dict]) -> list[int]:
+        times = [order["time"] for order in orders]
+        if rules.RUSH_HOURS is None:
+            columns = to_wall_clock(times)
+        else:
+            # Schedules take the columns as UTC instants
+            columns = np.array(
+                [
+                    time.astimezone(_UTC).replace(tzinfo=None) if time.tzinfo else time
+                    for time in times
+                ],
+                dtype="datetime64[us]",
+            )
+        return scalar.calculate_delivery_fees(
+            [order["cart_value"] for order in orders],
+            [order["delivery_distance"] for order in orders],
+            [order["number_of_items"] for order in orders],
+            columns,
+            _surge_column(orders),
+        ).tolist()
+
+    engines: dict[str, Engine] = {
+        "scalar": lambda orders: [
+            scalar.calculate_delivery_fee(**order) for order in orders
+        ],
+        "breakdown": lambda orders: [
+            scalar.calculate_delivery_fee_breakdown(**order).delivery_fee
+            for order in orders
+        ],
+        "cached": lambda orders: [
+            cached.calculate_delivery_fee(**order) for order in orders
+        ],
+        "vectorized": vectorized,
+        "vectorized_datetime64": vectorized_datetime64,
+    }
+    try:
+        compiled = CompiledFeeCalculator(rules)
+    except ValueError:
+        return engines
+    engines["compiled"] = lambda orders: [
+        compiled.calculate_delivery_fee(**order) for order in orders
+    ]
+    engines["compiled_breakdown"] = lambda orders: [
+        compiled.calculate_delivery_fee_breakdown(**order).delivery_fee
+        for order in orders
+    ]
+    return engines
+
+
+def _surge_column(orders: Sequence[dict]) -> list[float] | None:
+    """The surge multipliers of the orders for the vectorized engine, None if no order has one."""
+    multipliers = [order.get("surge_multiplier") for order in orders]
+    if all(multiplier is None for multiplier in multipliers):
+        return None
+    return [1.0 if multiplier is None else multiplier for multiplier in multipliers]
+
+
+def _multipliers(rules: PricingRules) -> set[float]:
+    if rules.RUSH_HOURS is not None:
+        return {window.MULTIPLIER for window in rules.RUSH_HOURS}
+    return {rules.RUSH_HOUR_MULTIPLIER}
+
+
+def _around(*values: int) -> set[int]:
+    return {value + step for value in values for step in (-1, 0, 1)}
+
+
+def _boundaries(*values: int) -> tuple[int, ...]:
+    """The valid inputs around the values, and inputs too large for the faster engines."""
+    return tuple(
+        sorted(value for value in _around(*values, *_HUGE_VALUES) if value > 0)
+    )
+
+
+class _BoundaryOrders:
+    """The boundary values of every rule, and orders drawn mostly from them."""
+
+    def __init__(self, rules: PricingRules, rng: random.Random):
+        self.rules = rules
+        self.rng = rng
+        self.calculator = FeeCalculator(rules)
+
+        fee_limit = rules.FEE_LIMIT
+        self.cart_values = _boundaries(
+            1, rules.BASE_CART_VALUE, rules.CART_VALUE_FOR_FREE_DELIVERY
+        )
+
+        # Every distance step up to where the distance surcharge alone reaches
+        # the fee limit, and a few past it
+        steps = 3
+        if rules.ADDITIONAL_DISTANCE_SURCHARGE > 0:
+            steps += math.ceil(fee_limit / rules.ADDITIONAL_DISTANCE_SURCHARGE)
+        steps = min(steps, 200)
+        self.delivery_distances = _boundaries(
+            1,
+            *(
+                rules.BASE_DISTANCE + step * rules.ADDITIONAL_DISTANCE
+                for step in range(steps)
+            ),
+        )
+        self.max_delivery_distance = (
+            rules.BASE_DISTANCE + steps * rules.ADDITIONAL_DISTANCE
+        )
+
+        # Past the item count whose surcharge alone reaches the fee limit
+        self.max_number_of_items = (
+            max(rules.ADDITIONAL_ITEM_LIMIT, rules.BULK_ITEM_LIMIT) + 3
+        )
+        if rules.ADDITIONAL_ITEM_SURCHARGE > 0:
+            self.max_number_of_items += math.ceil(
+                fee_limit / rules.ADDITIONAL_ITEM_SURCHARGE
+            )
+        self.numbers_of_items = _boundaries(
+            1,
+            rules.ADDITIONAL_ITEM_LIMIT,
+            rules.BULK_ITEM_LIMIT,
+            self.max_number_of_items,
+        )
+
+        # Fees before the fee limit and rush hours that end up right at the limit
+        targets = [fee_limit]
+        for multiplier in _multipliers(rules):
+            if multiplier > 0:
+                targets.append(math.ceil(fee_limit / multiplier))
+        self.fee_targets = tuple(sorted(_around(*targets)))
+
+        self.timezone = zoneinfo.ZoneInfo(rules.RUSH_HOUR_TIMEZONE)
+        if rules.RUSH_HOURS is not None:
+            self.windows = [
+                (window.ISOWEEKDAY, window.START, window.END)
+                for window in rules.RUSH_HOURS
+            ]
+        else:
+            self.windows = [
+                (rules.RUSH_HOUR_ISOWEEKDAY, rules.RUSH_HOUR_START, rules.RUSH_HOUR_END)
+            ]
+
+    def _pick(self, boundaries: tuple[int, ...], high: int) -> int:
+        if self.rng.random() < 0.7:
+            return self.rng.choice(boundaries)
+        return self.rng.randint(1, high)
+
+    def _time(self) -> datetime.datetime:
+        rng = self.rng
+        year = rng.choice(_YEARS)
+        try:
+            return self._time_in(year)
+        except OverflowError:
+            # The window edge is past the first or last datetime, a time in the
+            # day before it instead, naive or at an offset
+            within_day = datetime.timedelta(microseconds=rng.randrange(86_400_000_000))
+            if year < 5000:
+                time = datetime.datetime.min + within_day
+            else:
+                time = datetime.datetime.max - within_day
+            if rng.random() < 0.5:
+                return time
+            return time.replace(tzinfo=rng.choice(_OFFSETS))
+
+    def _time_in(self, year: int) -> datetime.datetime:
+        rng = self.rng
+        # A date in a week with the clocks changing, or any other, or in the
+        # first or last month, next to the ends of the datetime range in years 1
+        # and 9999
+        edge_month = 1 if year < 5000 else 12
+        month = rng.choice((3, 10, rng.randint(1, 12), edge_month))
+        day = datetime.date(year, month, rng.randint(1, 28))
+        if rng.random() < 0.2:
+            # Any moment of that day
+            local = datetime.datetime.combine(
+                day, datetime.time()
+            ) + datetime.timedelta(microseconds=rng.randrange(86_400_000_000))
+        else:
+            # At, or a microsecond or second around, the edge of a window, on
+            # its weekday or next to it
+            isoweekday, start, end = rng.choice(self.windows)
+            day += datetime.timedelta(
+                days=(isoweekday - day.isoweekday()) % 7 + rng.choice((0, 0, 0, -1, 1))
+            )
+            edge = rng.choice((start, end))
+            local = datetime.datetime.combine(day, edge) + rng.choice(
+                (-_MICROSECOND, datetime.timedelta(0), _MICROSECOND)
+            ) * rng.choice((1, 1_000_000))
+
+        if self.rules.RUSH_HOURS is None:
+            # The window is on the wall clock of the order time, whatever its offset
+            if rng.random() < 0.5:
+                return local
+            return local.replace(tzinfo=rng.choice(_OFFSETS))
+        # The window is on the wall clock of the schedule's timezone, of which
+        # the order time is an instant, naive in UTC
+        instant = local.replace(tzinfo=self.timezone, fold=rng.randint(0, 1))
+        choice = rng.random()
+        if choice < 0.4:
+            return instant.astimezone(_UTC).replace(tzinfo=None)
+        if choice < 0.7:
+            return instant
+        return instant.astimezone(rng.choice(_OFFSETS))
+
+    def order(self) -> dict:
+        rules = self.rules
+        rng = self.rng
+        delivery_distance = self._pick(
+            self.delivery_distances, self.max_delivery_distance
+        )
+        number_of_items = self._pick(self.numbers_of_items, self.max_number_of_items)
+        cart_value = self._pick(
+            self.cart_values, 2 * max(rules.CART_VALUE_FOR_FREE_DELIVERY, 1)
+        )
+        if rng.random() < 0.3:
+            # Lands the fee before the limit and rush hours on a target with the
+            # cart value surcharge, which moves in steps of a cent
+            surcharges = self.calculator._calculate_distance_surcharge(
+                delivery_distance
+            ) + self.calculator._calculate_item_surcharge(number_of_items)
+            cart_value_surcharge = rng.choice(self.fee_targets) - surcharges
+            if 0 <= cart_value_surcharge < rules.BASE_CART_VALUE:
+                cart_value = rules.BASE_CART_VALUE - cart_value_surcharge
+        return {
+            "cart_value": cart_value,
+            "delivery_distance": delivery_distance,
+            "number_of_items": number_of_items,
+            "time": self._time(),
+        }
+
+
+def boundary_orders(rules: PricingRules, count: int, seed: int = 0) -> list[dict]:
+    """Generate orders concentrated on the boundaries of every pricing rule.
+
+    Each input is mostly drawn from the values around where a rule changes: the free delivery threshold and base cart value, `BASE_DISTANCE` and every `ADDITIONAL_DISTANCE` step until the fee limit, the additional and bulk item limits, and inputs past the tables and columns of the faster engines. The cart value is often picked so the fee lands on `FEE_LIMIT` or a cent around it, before or after a rush hour multiplier. Order times fall on the edges of the rush hour windows, to the microsecond and second, next to their weekdays, in weeks with DST changes and outside the precompiled years of rush hour schedules, with and without UTC offsets.
+
+    Args:
+        rules (PricingRules): The rule set whose boundaries to cover
+        count (int): Number of orders
+        seed (int): Seed of the generator, the same seed gives the same orders
+
+    Returns:
+        list[dict]: Keyword arguments of `calculate_delivery_fee`
+    """
+    orders = _BoundaryOrders(rules, random.Random(seed))
+    return [orders.order() for _ in range(count)]
+
+
+def find_disagreements(
+    engines: dict[str, Engine],
+    orders: Sequence[dict],
+    reference: str = "scalar",
+) -> list[Disagreement]:
+    """Price orders with every engine and collect those not all engines agree on.
+
+    Args:
+        engines (dict[str, Engine]): The engines by name
+        orders (Sequence[dict]): The orders
+        reference (str): Name of the engine the others are checked against
+
+    Returns:
+        list[Disagreement]: The orders some engine priced differently, with the fee of every engine
+    """
+    fees = {name: engine(orders) for name, engine in engines.items()}
+    expected = fees[reference]
+    return [
+        Disagreement(
+            order, {name: engine_fees[i] for name, engine_fees in fees.items()}
+        )
+        for i, order in enumerate(orders)
+        if any(engine_fees[i] != expected[i] for engine_fees in fees.values())
+    ]
+
+
+def time_engines(
+    engines: dict[str, Engine], orders: Sequence[dict], repeat: int = 3
+) -> dict[str, float]:
+    """Time every engine pricing the same orders.
+
+    Args:
+        engines (dict[str, Engine]): The engines by name
+        orders (Sequence[dict]): The orders
+        repeat (int): Number of runs per engine, the fastest counts
+
+    Returns:
+        dict[str, float]: Seconds per order by engine
+    """
+    timings = {}
+    for name, engine in engines.items():
+        best = math.inf
+        for _ in range(repeat):
+            start = time_module.perf_counter()
+            engine(orders)
+            best = min(best, time_module.perf_counter() - start)
+        timings[name] = best / max(len(orders), 1)
+    return timings
@@ -0,0 +1,137 @@
+import datetime
+
+import annotated_types
+import orjson
+
+from app.schemas.fees import FeeCalculatorRequest
+
+_UTC = datetime.timezone.utc
+
+
+def _lower_bounds() -> dict[str, int]:
+    """Read the `gt` constraints of the integer fields off `FeeCalculatorRequest`."""
+    bounds = {}
+    for name, field in FeeCalculatorRequest.model_fields.items():
+        for constraint in field.metadata:
+            if isinstance(constraint, annotated_types.Gt):
+                bounds[name] = constraint.gt
+    return bounds
+
+
+LOWER_BOUNDS = _lower_bounds()
+_CART_VALUE_GT = LOWER_BOUNDS["cart_value"]
+_DELIVERY_DISTANCE_GT = LOWER_BOUNDS["delivery_distance"]
+_NUMBER_OF_ITEMS_GT = LOWER_BOUNDS["number_of_items"]
+
+
+def parse_iso_datetime(value: str) -> datetime.datetime | None:
+    """Parse the common `YYYY-MM-DDTHH:MM:SS[.ffffff][Z|±HH:MM]` form of an ISO 8601 datetime.
+
+    Slices fixed positions instead of going through a general parser. Anything outside this form returns None, for the caller to hand to Pydantic.
+
+    Args:
+        value (str): The datetime string
+
+    Returns:
+        datetime.datetime | None: The parsed datetime, or None if the value is not in the supported form
+    """
+    length = len(value)
+    if (
+        not value.isascii()
+        or length < 19
+        or value[4] != "-"
+        or value[7] != "-"
+        or value[10] != "T"
+        or value[13] != ":"
+        or value[16] != ":"
+    ):
+        return None
+
+    position = 19
+    microsecond = 0
+    if length > position and value[position] == ".":
+        end = position + 1
+        while end < length and value[end].isdigit():
+            end += 1
+        digits = value[position + 1 : end]
+        if not 1 <= len(digits) <= 6:
+            return None
+        microsecond = int(digits.ljust(6, "0"))
+        position = end
+
+    tzinfo = None
+    suffix = value[position:]
+    if suffix == "Z":
+        tzinfo = _UTC
+    elif suffix:
+        if len(suffix) != 6 or suffix[0] not in "+-" or suffix[3] != ":":
+            return None
+        hours, minutes = suffix[1:3], suffix[4:6]
+        if not (hours.isdigit() and minutes.isdigit()):
+            return None
+        offset = datetime.timedelta(hours=int(hours), minutes=int(minutes))
+        if offset >= datetime.timedelta(days=1):
+            return None
+        tzinfo = datetime.timezone(-offset if suffix[0] == "-" else offset)
+
+    fields = (
+        value[0:4],
+        value[5:7],
+        value[8:10],
+        value[11:13],
+        value[14:16],
+        value[17:19],
+    )
+    if not all(field.isdigit() for field in fields):
+        return None
+    try:
+        return datetime.datetime(*map(int, fields), microsecond, tzinfo=tzinfo)
+    except ValueError:
+        return None
+
+
+def decode_fee_request(
+    body: bytes,
+) -> tuple[int, int, int, datetime.datetime] | None:
+    """Decode a fee request body that is valid in its most common form.
+
+    Accepts a JSON object without `zone_id`, `location`, `include_quote_token` or `include_breakdown` whose integer fields are plain JSON integers satisfying the `gt` constraints of `FeeCalculatorRequest` and whose `time` `parse_iso_datetime` understands. Everything else, including every invalid body, returns None so the caller can fall back to full Pydantic validation, which then also produces the error details.
+
+    Args:
+        body (bytes): The raw request body
+
+    Returns:
+        tuple[int, int, int, datetime.datetime] | None: Cart value, delivery distance, number of items and time, or None if the body needs full validation
+    """
+    try:
+        data = orjson.loads(body)
+    except orjson.JSONDecodeError:
+        return None
+    if (
+        type(data) is not dict
+        or "zone_id" in data
+        or "location" in data
+        or "include_quote_token" in data
+        or "include_breakdown" in data
+    ):
+        return None
+
+    cart_value = data.get("cart_value")
+    delivery_distance = data.get("delivery_distance")
+    number_of_items = data.get("number_of_items")
+    time = data.get("time")
+    if (
+        type(cart_value) is not int
+        or type(delivery_distance) is not int
+        or type(number_of_items) is not int
+        or type(time) is not str
+        or cart_value <= _CART_VALUE_GT
+        or delivery_distance <= _DELIVERY_DISTANCE_GT
+        or number_of_items <= _NUMBER_OF_ITEMS_GT
+    ):
+        return None
+
+    time = parse_iso_datetime(time)
+    if time is None:
+        return None
+    return cart_value, delivery_distance, number_of_items, time
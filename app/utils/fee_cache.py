@@ -0,0 +1,166 @@
+import sys
+import threading
+import time as time_module
+from collections import OrderedDict
+from collections.abc import Callable
+
+from app.utils.fee_calculator import FeeCalculator
+
+CacheKey = tuple[int, int, int, float | None, float | None]
+
+# Upper estimate of the memory held per entry: the key tuple with its three ints
+# and rush hour and surge multipliers (shared floats or None), the value tuple
+# with its float expiry, and the hash table slots plus linked list node of the
+# OrderedDict, measured at up to 236 bytes while it resizes its table
+ENTRY_BYTES = (
+    sys.getsizeof((0, 0, 0, False, False))
+    + 3 * sys.getsizeof(2**40)
+    + sys.getsizeof((0, False, 0.0))
+    + sys.getsizeof(0.0)
+    + 240
+)
+# The largest int of the size ENTRY_BYTES counts for, orders with a larger
+# distance or number of items aren't cached
+MAX_KEY_VALUE = 2**60 - 1
+
+
+class FeeCache:
+    """Thread-safe LRU cache of delivery fees with a time to live.
+
+    The capacity is derived from a memory ceiling, so the cache can't grow without bound in long-lived workers.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int,
+        ttl: float,
+        clock: Callable[[], float] = time_module.monotonic,
+    ):
+        self.max_entries = max(max_bytes // ENTRY_BYTES, 1)
+        self.ttl = ttl
+        self._clock = clock
+        self._entries: OrderedDict[CacheKey, tuple[int, bool, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: CacheKey) -> tuple[int, bool] | None:
+        """Look up a fee, refreshing its position in the LRU order.
+
+        Args:
+            key (CacheKey): The normalized order
+
+        Returns:
+            tuple[int, bool] | None: The cached fee and whether the fee limit cut it, or None on a miss
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            delivery_fee, fee_limit_applied, expires_at = entry
+            if expires_at <= self._clock():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return delivery_fee, fee_limit_applied
+
+    def put(
+        self, key: CacheKey, delivery_fee: int, fee_limit_applied: bool = False
+    ) -> None:
+        """Store a fee, evicting the least recently used entry when full.
+
+        Args:
+            key (CacheKey): The normalized order
+            delivery_fee (int): The delivery fee in cents
+            fee_limit_applied (bool): Whether the fee limit cut the fee
+        """
+        with self._lock:
+            self._entries[key] = (
+                delivery_fee,
+                fee_limit_applied,
+                self._clock() + self.ttl,
+            )
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+class CachedFeeCalculator:
+    """Puts a `FeeCache` in front of `calculate_delivery_fee` of another calculator.
+
+    The fee depends on the order time only through the rush hour multiplier applying to it, so the time is normalized to that multiplier (None outside rush hours) in the cache key and quotes placed at different moments of the same window share an entry. The surge multiplier, if any, is part of the key as well. Cart values only change the fee up to the base cart value and every free order shares one key, while orders with a distance or number of items past `MAX_KEY_VALUE` are priced without the cache, so no entry outgrows `ENTRY_BYTES` whatever the client sends. Everything else is delegated to the wrapped calculator.
+    """
+
+    def __init__(self, fee_calculator: FeeCalculator, cache: FeeCache):
+        self.fee_calculator = fee_calculator
+        self.rules = fee_calculator.rules
+        self.cache = cache
+
+    def __getattr__(self, name: str):
+        return getattr(self.fee_calculator, name)
+
+    def calculate_delivery_fee(self, **inputs) -> int:
+        """Calculate the delivery fee, or return it from the cache.
+
+        Args:
+            **inputs: Arbitrary keyword arguments
+
+        Returns:
+            int: The delivery fee in cents
+        """
+        return self.calculate_delivery_fee_and_limit(**inputs)[0]
+
+    def calculate_delivery_fee_and_limit(self, **inputs) -> tuple[int, bool]:
+        """`calculate_delivery_fee`, also telling whether the fee limit cut the fee.
+
+        Args:
+            **inputs: Arbitrary keyword arguments
+
+        Returns:
+            tuple[int, bool]: The delivery fee in cents, and whether it is the fee limit in place of a higher fee
+        """
+        key = self._key(inputs)
+        if key is None:
+            return self.fee_calculator.calculate_delivery_fee_and_limit(**inputs)
+        entry = self.cache.get(key)
+        if entry is None:
+            entry = self.fee_calculator.calculate_delivery_fee_and_limit(**inputs)
+            self.cache.put(key, *entry)
+        return entry
+
+    def _key(self, inputs: dict) -> CacheKey | None:
+        """The cache key of an order, or None if its inputs are too large to cache."""
+        rules = self.rules
+        cart_value = inputs["cart_value"]
+        if cart_value >= rules.CART_VALUE_FOR_FREE_DELIVERY:
+            return (rules.CART_VALUE_FOR_FREE_DELIVERY, 0, 0, None, None)
+        delivery_distance = inputs["delivery_distance"]
+        number_of_items = inputs["number_of_items"]
+        if delivery_distance > MAX_KEY_VALUE or number_of_items > MAX_KEY_VALUE:
+            return None
+        return (
+            cart_value if cart_value < rules.BASE_CART_VALUE else rules.BASE_CART_VALUE,
+            delivery_distance,
+            number_of_items,
+            self.fee_calculator._rush_hour_multiplier(inputs["time"]),
+            inputs.get("surge_multiplier"),
+        )
@@ -1,5 +1,18 @@
 import datetime
 import math
+import zoneinfo
+from collections.abc import Sequence
+from typing import NamedTuple
+
+import numpy as np
+from pydantic import ConfigDict, Field, field_validator
+from pydantic.dataclasses import dataclass
+
+from app.utils.rush_hours import (
+    RushHourSchedule,
+    RushHourWindow,
+    build_rush_hour_schedule,
+)
 
 
 class Const:
@@ -25,9 +38,91 @@ class Const:
     RUSH_HOUR_MULTIPLIER = 1.2
 
 
+@dataclass(frozen=True, slots=True, config=ConfigDict(extra="forbid"))
+class PricingRules:
+    """A versioned set of pricing parameters, defaulting to `Const`.
+
+    A slotted dataclass rather than a `BaseModel`, as the calculators read these attributes on every call and slot access is roughly twice as fast.
+    """
+
+    VERSION: str = Field(default="default", min_length=1)
+
+    BASE_CART_VALUE: int = Field(default=Const.BASE_CART_VALUE, ge=0)
+
+    BASE_SURCHARGE: int = Field(default=Const.BASE_SURCHARGE, ge=0)
+    BASE_DISTANCE: int = Field(default=Const.BASE_DISTANCE, ge=0)
+    ADDITIONAL_DISTANCE_SURCHARGE: int = Field(
+        default=Const.ADDITIONAL_DISTANCE_SURCHARGE, ge=0
+    )
+    ADDITIONAL_DISTANCE: int = Field(default=Const.ADDITIONAL_DISTANCE, gt=0)
+
+    ADDITIONAL_ITEM_LIMIT: int = Field(default=Const.ADDITIONAL_ITEM_LIMIT, ge=0)
+    ADDITIONAL_ITEM_SURCHARGE: int = Field(
+        default=Const.ADDITIONAL_ITEM_SURCHARGE, ge=0
+    )
+    BULK_ITEM_LIMIT: int = Field(default=Const.BULK_ITEM_LIMIT, ge=0)
+    BULK_SURCHARGE: int = Field(default=Const.BULK_SURCHARGE, ge=0)
+
+    FEE_LIMIT: int = Field(default=Const.FEE_LIMIT, ge=0)
+
+    CART_VALUE_FOR_FREE_DELIVERY: int = Field(
+        default=Const.CART_VALUE_FOR_FREE_DELIVERY, ge=0
+    )
+
+    RUSH_HOUR_ISOWEEKDAY: int = Field(default=Const.RUSH_HOUR_ISOWEEKDAY, ge=1, le=7)
+    RUSH_HOUR_START: datetime.time = Const.RUSH_HOUR_START
+    RUSH_HOUR_END: datetime.time = Const.RUSH_HOUR_END
+    RUSH_HOUR_MULTIPLIER: float = Field(default=Const.RUSH_HOUR_MULTIPLIER, ge=0)
+
+    # Weekly windows in RUSH_HOUR_TIMEZONE, each with its own multiplier. They
+    # replace the single RUSH_HOUR_* window above, which is in wall-clock time
+    RUSH_HOURS: tuple[RushHourWindow, ...] | None = None
+    RUSH_HOUR_TIMEZONE: str = "UTC"
+
+    @field_validator("RUSH_HOUR_TIMEZONE")
+    @classmethod
+    def _check_timezone(cls, value: str) -> str:
+        try:
+            zoneinfo.ZoneInfo(value)
+        except (zoneinfo.ZoneInfoNotFoundError, ValueError):
+            raise ValueError(f"Unknown timezone {value!r}")
+        return value
+
+
+class FeeBreakdown(NamedTuple):
+    """A delivery fee and the components it is made of."""
+
+    delivery_fee: int
+    cart_value_surcharge: int
+    distance_surcharge: int
+    item_surcharge: int
+    rush_hour_surcharge: int
+    free_delivery: bool
+    fee_limit_applied: bool
+    surge_surcharge: int = 0
+
+
+# Shared by every free order, which has no components
+_FREE_DELIVERY_BREAKDOWN = FeeBreakdown(0, 0, 0, 0, 0, True, False)
+
+
 class FeeCalculator:
-    def __init__(self):
-        pass
+    def __init__(
+        self,
+        rules: PricingRules | None = None,
+        rush_hour_schedule: RushHourSchedule | None = None,
+    ):
+        """
+        Args:
+            rules (PricingRules | None): The rule set, the `Const` defaults if not given
+            rush_hour_schedule (RushHourSchedule | None): The schedule of the `RUSH_HOURS` of the rules, built from them if not given
+        """
+        self.rules = rules if rules is not None else PricingRules()
+        self.rush_hour_schedule = rush_hour_schedule
+        if self.rules.RUSH_HOURS is not None and rush_hour_schedule is None:
+            self.rush_hour_schedule = build_rush_hour_schedule(
+                self.rules.RUSH_HOURS, self.rules.RUSH_HOUR_TIMEZONE
+            )
 
     def _calculate_cart_value_surcharge(self, cart_value: int) -> int:
         """Calculate cart value surcharge.
@@ -42,8 +137,8 @@ class FeeCalculator:
             int: The surcharge in cents
         """
         surcharge = 0
-        if cart_value < Const.BASE_CART_VALUE:
-            surcharge += Const.BASE_CART_VALUE - cart_value
+        if cart_value < self.rules.BASE_CART_VALUE:
+            surcharge += self.rules.BASE_CART_VALUE - cart_value
 
         return surcharge
 
@@ -61,14 +156,14 @@ class FeeCalculator:
         Returns:
             int: The surcharge in cents
         """
-        surcharge = Const.BASE_SURCHARGE
-        if delivery_distance > Const.BASE_DISTANCE:
+        surcharge = self.rules.BASE_SURCHARGE
+        if delivery_distance > self.rules.BASE_DISTANCE:
             surcharge += (
                 math.ceil(
-                    (delivery_distance - Const.BASE_DISTANCE)
-                    / Const.ADDITIONAL_DISTANCE
+                    (delivery_distance - self.rules.BASE_DISTANCE)
+                    / self.rules.ADDITIONAL_DISTANCE
                 )
-                * Const.ADDITIONAL_DISTANCE_SURCHARGE
+                * self.rules.ADDITIONAL_DISTANCE_SURCHARGE
             )
 
         return surcharge
@@ -91,12 +186,12 @@ class FeeCalculator:
         """
         surcharge = 0
 
-        if number_of_items > Const.ADDITIONAL_ITEM_LIMIT:
+        if number_of_items > self.rules.ADDITIONAL_ITEM_LIMIT:
             surcharge += (
-                number_of_items - Const.ADDITIONAL_ITEM_LIMIT
-            ) * Const.ADDITIONAL_ITEM_SURCHARGE
-            if number_of_items > Const.BULK_ITEM_LIMIT:
-                surcharge += Const.BULK_SURCHARGE
+                number_of_items - self.rules.ADDITIONAL_ITEM_LIMIT
+            ) * self.rules.ADDITIONAL_ITEM_SURCHARGE
+            if number_of_items > self.rules.BULK_ITEM_LIMIT:
+                surcharge += self.rules.BULK_SURCHARGE
 
         return surcharge
 
@@ -111,7 +206,7 @@ class FeeCalculator:
         Returns:
             int: The delivery fee in cents
         """
-        return min(delivery_fee, Const.FEE_LIMIT)
+        return min(delivery_fee, self.rules.FEE_LIMIT)
 
     def _is_free_delivery(self, cart_value: int) -> bool:
         """Check if the order is eligible for free delivery
@@ -122,10 +217,39 @@ class FeeCalculator:
         Returns:
             bool: True if the order is eligible for free delivery, False otherwise
         """
-        if cart_value >= Const.CART_VALUE_FOR_FREE_DELIVERY:
+        if cart_value >= self.rules.CART_VALUE_FOR_FREE_DELIVERY:
             return True
         return False
 
+    def _rush_hour_multiplier(self, time: datetime.datetime) -> float | None:
+        """Find the rush hour multiplier applying at the order time.
+
+        Args:
+            time (datetime.datetime): Order time in UTC
+
+        Returns:
+            float | None: The multiplier, or None if the order is not placed during a rush hour
+        """
+        if self.rush_hour_schedule is not None:
+            return self.rush_hour_schedule.multiplier(time)
+        if (
+            time.isoweekday() == self.rules.RUSH_HOUR_ISOWEEKDAY
+            and self.rules.RUSH_HOUR_START <= time.time() < self.rules.RUSH_HOUR_END
+        ):
+            return self.rules.RUSH_HOUR_MULTIPLIER
+        return None
+
+    def _is_rush_hour(self, time: datetime.datetime) -> bool:
+        """Check if the order time falls in a rush hour window.
+
+        Args:
+            time (datetime.datetime): Order time in UTC
+
+        Returns:
+            bool: True if the order is placed during the rush hour, False otherwise
+        """
+        return self._rush_hour_multiplier(time) is not None
+
     def _calculate_rush_hour_surcharge(
         self, time: datetime.datetime, delivery_fee: int
     ) -> int:
@@ -139,17 +263,33 @@ class FeeCalculator:
         """
         surcharge = 0
 
-        if time.isoweekday() == Const.RUSH_HOUR_ISOWEEKDAY:
-            if Const.RUSH_HOUR_START <= time.time() < Const.RUSH_HOUR_END:
-                surcharge = int(
-                    delivery_fee * Const.RUSH_HOUR_MULTIPLIER - delivery_fee
-                )
+        multiplier = self._rush_hour_multiplier(time)
+        if multiplier is not None:
+            surcharge = int(delivery_fee * multiplier - delivery_fee)
 
         return surcharge
 
+    def _calculate_surge_surcharge(
+        self, surge_multiplier: float | None, delivery_fee: int
+    ) -> int:
+        """Calculate the demand surge surcharge to be added to the delivery fee.
+
+        Args:
+            surge_multiplier (float | None): The surge multiplier of the order's zone, None without surge pricing
+            delivery_fee (int): The delivery fee in cents, including the rush hour surcharge
+
+        Returns:
+            int: The surcharge in cents
+        """
+        if surge_multiplier is None:
+            return 0
+        return int(delivery_fee * surge_multiplier - delivery_fee)
+
     def calculate_delivery_fee(self, **inputs) -> int:
         """Calculate the delivery fee.
 
+        An optional `surge_multiplier` input applies on top of the rush hour surcharge, before the fee limit.
+
         Args:
             **inputs: Arbitrary keyword arguments
 
@@ -160,6 +300,7 @@ class FeeCalculator:
         delivery_distance = inputs.get("delivery_distance")
         number_of_items = inputs.get("number_of_items")
         time = inputs.get("time")
+        surge_multiplier = inputs.get("surge_multiplier")
 
         delivery_fee = 0
 
@@ -170,6 +311,229 @@ class FeeCalculator:
         delivery_fee += self._calculate_distance_surcharge(delivery_distance)
         delivery_fee += self._calculate_item_surcharge(number_of_items)
         delivery_fee += self._calculate_rush_hour_surcharge(time, delivery_fee)
+        delivery_fee += self._calculate_surge_surcharge(surge_multiplier, delivery_fee)
         delivery_fee = self._limit_delivery_fee(delivery_fee)
 
         return delivery_fee
+
+    def calculate_delivery_fee_and_limit(self, **inputs) -> tuple[int, bool]:
+        """`calculate_delivery_fee`, also telling whether the fee limit cut the fee.
+
+        Args:
+            **inputs: Arbitrary keyword arguments
+
+        Returns:
+            tuple[int, bool]: The delivery fee in cents, and whether it is the fee limit in place of a higher fee
+        """
+        cart_value = inputs.get("cart_value")
+        if self._is_free_delivery(cart_value):
+            return 0, False
+
+        delivery_fee = self._calculate_cart_value_surcharge(cart_value)
+        delivery_fee += self._calculate_distance_surcharge(
+            inputs.get("delivery_distance")
+        )
+        delivery_fee += self._calculate_item_surcharge(inputs.get("number_of_items"))
+        delivery_fee += self._calculate_rush_hour_surcharge(
+            inputs.get("time"), delivery_fee
+        )
+        delivery_fee += self._calculate_surge_surcharge(
+            inputs.get("surge_multiplier"), delivery_fee
+        )
+        limited_delivery_fee = self._limit_delivery_fee(delivery_fee)
+        return limited_delivery_fee, limited_delivery_fee < delivery_fee
+
+    def calculate_delivery_fee_breakdown(self, **inputs) -> FeeBreakdown:
+        """Calculate the delivery fee and keep the components it is made of.
+
+        Evaluates the same helpers in the same order as `calculate_delivery_fee`, so the fee always matches it. The rush hour and surge surcharges are the ones applied before the fee limit.
+
+        Args:
+            **inputs: Arbitrary keyword arguments
+
+        Returns:
+            FeeBreakdown: The delivery fee in cents and its components
+        """
+        cart_value = inputs.get("cart_value")
+        delivery_distance = inputs.get("delivery_distance")
+        number_of_items = inputs.get("number_of_items")
+        time = inputs.get("time")
+        surge_multiplier = inputs.get("surge_multiplier")
+
+        if self._is_free_delivery(cart_value):
+            return _FREE_DELIVERY_BREAKDOWN
+
+        cart_value_surcharge = self._calculate_cart_value_surcharge(cart_value)
+        distance_surcharge = self._calculate_distance_surcharge(delivery_distance)
+        item_surcharge = self._calculate_item_surcharge(number_of_items)
+        delivery_fee = cart_value_surcharge + distance_surcharge + item_surcharge
+        rush_hour_surcharge = self._calculate_rush_hour_surcharge(time, delivery_fee)
+        delivery_fee += rush_hour_surcharge
+        surge_surcharge = self._calculate_surge_surcharge(
+            surge_multiplier, delivery_fee
+        )
+        delivery_fee += surge_surcharge
+        limited_delivery_fee = self._limit_delivery_fee(delivery_fee)
+
+        return FeeBreakdown(
+            limited_delivery_fee,
+            cart_value_surcharge,
+            distance_surcharge,
+            item_surcharge,
+            rush_hour_surcharge,
+            False,
+            limited_delivery_fee < delivery_fee,
+            surge_surcharge,
+        )
+
+    def calculate_delivery_fees(
+        self,
+        cart_values: Sequence[int] | np.ndarray,
+        delivery_distances: Sequence[int] | np.ndarray,
+        numbers_of_items: Sequence[int] | np.ndarray,
+        times: Sequence[datetime.datetime] | np.ndarray,
+        surge_multipliers: Sequence[float] | np.ndarray | None = None,
+    ) -> np.ndarray:
+        """Calculate the delivery fees of many orders at once.
+
+        Applies the same rules as `calculate_delivery_fee` over whole columns, so the fee of every order matches the scalar path cent for cent.
+
+        Args:
+            cart_values (Sequence[int] | np.ndarray): Values of the shopping carts in cents
+            delivery_distances (Sequence[int] | np.ndarray): Delivery distances in meters
+            numbers_of_items (Sequence[int] | np.ndarray): Numbers of items in the shopping carts
+            times (Sequence[datetime.datetime] | np.ndarray): Order times, either datetimes or a `datetime64` array of wall-clock times (see `to_wall_clock`), which are taken as UTC with `RUSH_HOURS`
+            surge_multipliers (Sequence[float] | np.ndarray | None): Surge multiplier of each order, 1.0 for none, or None without surge pricing
+
+        Returns:
+            np.ndarray: The delivery fees in cents as an int64 array
+        """
+        inputs = (cart_values, delivery_distances, numbers_of_items)
+        cart_values = _to_column(cart_values)
+        delivery_distances = _to_column(delivery_distances)
+        numbers_of_items = _to_column(numbers_of_items)
+
+        rules = self.rules
+
+        delivery_fee = np.maximum(rules.BASE_CART_VALUE - cart_values, 0)
+
+        delivery_fee += rules.BASE_SURCHARGE
+        additional_distance = np.maximum(delivery_distances - rules.BASE_DISTANCE, 0)
+        delivery_fee += (
+            np.ceil(additional_distance / rules.ADDITIONAL_DISTANCE).astype(np.int64)
+            * rules.ADDITIONAL_DISTANCE_SURCHARGE
+        )
+
+        additional_items = np.maximum(numbers_of_items - rules.ADDITIONAL_ITEM_LIMIT, 0)
+        delivery_fee += additional_items * rules.ADDITIONAL_ITEM_SURCHARGE
+        # The bulk fee only applies on top of the per-item surcharge
+        bulk_item_limit = max(rules.BULK_ITEM_LIMIT, rules.ADDITIONAL_ITEM_LIMIT)
+        delivery_fee += np.where(
+            numbers_of_items > bulk_item_limit, rules.BULK_SURCHARGE, 0
+        )
+
+        if self.rush_hour_schedule is not None:
+            # 1.0 outside rush hours, which adds nothing
+            multipliers = self.rush_hour_schedule.multipliers_of(times)
+            delivery_fee += (delivery_fee * multipliers - delivery_fee).astype(np.int64)
+        else:
+            if not isinstance(times, np.ndarray):
+                times = to_wall_clock(times)
+            rush_hour = _is_rush_hour(times, self.rules)
+            delivery_fee += np.where(
+                rush_hour,
+                (delivery_fee * rules.RUSH_HOUR_MULTIPLIER - delivery_fee).astype(
+                    np.int64
+                ),
+                0,
+            )
+
+        if surge_multipliers is not None:
+            surge_multipliers = np.asarray(surge_multipliers, dtype=np.float64)
+            delivery_fee += (delivery_fee * surge_multipliers - delivery_fee).astype(
+                np.int64
+            )
+
+        delivery_fee = np.minimum(delivery_fee, rules.FEE_LIMIT)
+        delivery_fee[cart_values >= rules.CART_VALUE_FOR_FREE_DELIVERY] = 0
+
+        # The clipped orders, priced one by one as their fee can be below a large
+        # fee limit
+        clipped = (
+            (cart_values == _MAX_COLUMN_VALUE)
+            | (delivery_distances == _MAX_COLUMN_VALUE)
+            | (numbers_of_items == _MAX_COLUMN_VALUE)
+        )
+        for i in np.flatnonzero(clipped):
+            time = times[i]
+            if isinstance(time, np.datetime64):
+                time = time.astype("datetime64[us]").item()
+            delivery_fee[i] = self.calculate_delivery_fee(
+                cart_value=int(inputs[0][i]),
+                delivery_distance=int(inputs[1][i]),
+                number_of_items=int(inputs[2][i]),
+                time=time,
+                surge_multiplier=(
+                    None if surge_multipliers is None else float(surge_multipliers[i])
+                ),
+            )
+
+        return delivery_fee
+
+
+# Inputs are clipped to this value so the column arithmetic can't overflow int64,
+# and the orders clipped are priced by the scalar path
+_MAX_COLUMN_VALUE = 2**31 - 1
+
+
+def _to_column(values: Sequence[int] | np.ndarray) -> np.ndarray:
+    column = np.asarray(values)
+    if column.dtype == object:
+        # Python ints beyond the int64 range
+        column = np.minimum(column, _MAX_COLUMN_VALUE)
+    return np.minimum(column.astype(np.int64), _MAX_COLUMN_VALUE)
+
+
+def to_wall_clock(times: Sequence[datetime.datetime]) -> np.ndarray:
+    """Convert order times to a `datetime64[us]` array of their wall-clock values.
+
+    The scalar rules read the weekday and time of day straight off the datetime, ignoring its UTC offset, so the offset is dropped here as well.
+
+    Args:
+        times (Sequence[datetime.datetime]): Order times
+
+    Returns:
+        np.ndarray: The wall-clock times as a `datetime64[us]` array
+    """
+    return np.array(
+        [time.replace(tzinfo=None) for time in times], dtype="datetime64[us]"
+    )
+
+
+def _time_to_microseconds(time: datetime.time) -> int:
+    return (
+        (time.hour * 60 + time.minute) * 60 + time.second
+    ) * 1_000_000 + time.microsecond
+
+
+def _is_rush_hour(times: np.ndarray, rules: PricingRules) -> np.ndarray:
+    """Check which wall-clock times fall in the rush hour window.
+
+    Args:
+        times (np.ndarray): Wall-clock times as a `datetime64` array
+        rules (PricingRules): The rule set defining the rush hour window
+
+    Returns:
+        np.ndarray: Boolean mask of the times in the rush hour window
+    """
+    times = times.astype("datetime64[us]")
+    days = times.astype("datetime64[D]")
+    # 1970-01-01 was a Thursday, i.e. ISO weekday 4
+    isoweekdays = (days.astype(np.int64) + 3) % 7 + 1
+    time_of_day = (times - days).astype(np.int64)
+
+    return (
+        (isoweekdays == rules.RUSH_HOUR_ISOWEEKDAY)
+        & (time_of_day >= _time_to_microseconds(rules.RUSH_HOUR_START))
+        & (time_of_day < _time_to_microseconds(rules.RUSH_HOUR_END))
+    )
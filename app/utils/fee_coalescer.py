@@ -0,0 +1,145 @@
+import asyncio
+import time as time_module
+
+from app.utils.fee_calculator import FeeCalculator
+from app.utils.metrics import CounterChild, HistogramChild
+
+# Fee calculator, cache key and inputs of an order waiting to be priced
+_QueuedOrder = tuple[FeeCalculator, tuple, dict]
+
+
+class FeeCoalescer:
+    """Coalesces concurrent fee calculations on the event loop.
+
+    Orders are keyed like in the fee cache: the calculator, cart value, distance, number of items, the rush hour multiplier at the order time and the surge multiplier. A request whose key is already waiting shares its result instead of queueing another calculation. The distinct orders queued within `window` seconds of the first one are priced together with `calculate_delivery_fees`, one call per calculator, or right away once `max_batch` of them are queued.
+
+    Every request waits up to `window` for its batch, which is the price for fewer and cheaper calculations under a burst. A window of 0 only coalesces requests arriving in the same iteration of the event loop.
+
+    Batched orders go through the vectorized path of the calculator, which the fee cache and the per-call instrumentation don't see.
+    """
+
+    def __init__(
+        self,
+        window: float = 0.0005,
+        max_batch: int = 1024,
+        requests: CounterChild | None = None,
+        computations: CounterChild | None = None,
+        queue_seconds: HistogramChild | None = None,
+        batch_size: HistogramChild | None = None,
+    ):
+        """
+        Args:
+            window (float): Seconds the first order of a batch waits for more
+            max_batch (int): Number of distinct orders that flushes a batch early
+            requests (CounterChild | None): Counts requests entering the coalescer
+            computations (CounterChild | None): Counts the distinct orders actually priced
+            queue_seconds (HistogramChild | None): Time requests wait for their fee
+            batch_size (HistogramChild | None): Number of distinct orders per batch
+        """
+        self.window = window
+        self.max_batch = max_batch
+        self._requests = requests
+        self._computations = computations
+        self._queue_seconds = queue_seconds
+        self._batch_size = batch_size
+
+        self._pending: dict[tuple, asyncio.Future] = {}
+        self._queue: list[_QueuedOrder] = []
+        self._flush_handle: asyncio.TimerHandle | asyncio.Handle | None = None
+
+    async def calculate_delivery_fee(
+        self, fee_calculator: FeeCalculator, **inputs
+    ) -> int:
+        """Calculate the delivery fee of an order together with concurrent ones.
+
+        Args:
+            fee_calculator (FeeCalculator): The calculator pricing the order
+            **inputs: The inputs of `FeeCalculator.calculate_delivery_fee`
+
+        Returns:
+            int: The delivery fee in cents
+        """
+        start = time_module.perf_counter()
+        key = (
+            id(fee_calculator),
+            inputs["cart_value"],
+            inputs["delivery_distance"],
+            inputs["number_of_items"],
+            fee_calculator._rush_hour_multiplier(inputs["time"]),
+            inputs.get("surge_multiplier"),
+        )
+
+        future = self._pending.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = self._pending[key] = loop.create_future()
+            self._queue.append((fee_calculator, key, inputs))
+            if len(self._queue) >= self.max_batch:
+                self._flush()
+            elif self._flush_handle is None:
+                if self.window > 0:
+                    self._flush_handle = loop.call_later(self.window, self._flush)
+                else:
+                    self._flush_handle = loop.call_soon(self._flush)
+
+        if self._requests is not None:
+            self._requests.inc()
+        # A cancelled request must not cancel the calculation other requests share
+        delivery_fee = await asyncio.shield(future)
+        if self._queue_seconds is not None:
+            self._queue_seconds.observe(time_module.perf_counter() - start)
+        return delivery_fee
+
+    def _flush(self) -> None:
+        """Price the queued orders and resolve their futures."""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        queue, self._queue = self._queue, []
+        pending, self._pending = self._pending, {}
+        if not queue:
+            return
+
+        groups: dict[int, list[_QueuedOrder]] = {}
+        for order in queue:
+            groups.setdefault(id(order[0]), []).append(order)
+
+        for orders in groups.values():
+            fee_calculator = orders[0][0]
+            try:
+                if len(orders) == 1:
+                    delivery_fees = [
+                        fee_calculator.calculate_delivery_fee(**orders[0][2])
+                    ]
+                else:
+                    surge_multipliers = [
+                        inputs.get("surge_multiplier") for _, _, inputs in orders
+                    ]
+                    delivery_fees = fee_calculator.calculate_delivery_fees(
+                        cart_values=[inputs["cart_value"] for _, _, inputs in orders],
+                        delivery_distances=[
+                            inputs["delivery_distance"] for _, _, inputs in orders
+                        ],
+                        numbers_of_items=[
+                            inputs["number_of_items"] for _, _, inputs in orders
+                        ],
+                        times=[inputs["time"] for _, _, inputs in orders],
+                        surge_multipliers=(
+                            [1.0 if m is None else m for m in surge_multipliers]
+                            if any(m is not None for m in surge_multipliers)
+                            else None
+                        ),
+                    ).tolist()
+            except Exception as e:
+                for _, key, _ in orders:
+                    if not pending[key].done():
+                        pending[key].set_exception(e)
+                continue
+            for (_, key, _), delivery_fee in zip(orders, delivery_fees):
+                if not pending[key].done():
+                    pending[key].set_result(delivery_fee)
+
+        if self._computations is not None:
+            self._computations.inc(len(queue))
+        if self._batch_size is not None:
+            self._batch_size.observe(len(queue))
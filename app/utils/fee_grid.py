@@ -0,0 +1,267 @@
+import datetime
+import io
+import struct
+import sys
+import threading
+from collections import OrderedDict
+from typing import NamedTuple
+
+import numpy as np
+
+from app.utils.fee_calculator import FeeCalculator, PricingRules
+
+# Raw grids start with the magic, the format version, the size in bytes of a fee
+# and the length of each of the four axes, followed by the fees as little-endian
+# signed integers in C order
+MAGIC = b"FGRD"
+VERSION = 1
+_HEADER = struct.Struct("<4sBB4I")
+
+FORMATS = ("raw", "npy")
+MEDIA_TYPES = {"raw": "application/octet-stream", "npy": "application/x-npy"}
+
+_HOUR = datetime.timedelta(hours=1)
+_UTC = datetime.timezone.utc
+
+
+class GridAxis(NamedTuple):
+    """Values of an input from `first` to `last` inclusive, `step` apart."""
+
+    first: int
+    last: int
+    step: int
+
+    def values(self) -> np.ndarray:
+        return np.arange(self.first, self.last + 1, self.step, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return (self.last - self.first) // self.step + 1
+
+
+class GridSpec(NamedTuple):
+    """The orders a fee grid prices: every combination of its axes."""
+
+    # First hour of the grid, and the number of hours from it
+    start: datetime.datetime
+    hours: int
+    delivery_distance: GridAxis
+    cart_value: GridAxis
+    number_of_items: GridAxis
+
+    @property
+    def shape(self) -> tuple[int, int, int, int]:
+        return (
+            self.hours,
+            len(self.delivery_distance),
+            len(self.cart_value),
+            len(self.number_of_items),
+        )
+
+    @property
+    def cells(self) -> int:
+        hours, distances, cart_values, numbers_of_items = self.shape
+        return hours * distances * cart_values * numbers_of_items
+
+
+def compute_fee_grid(rules: PricingRules, spec: GridSpec) -> np.ndarray:
+    """Calculate the delivery fee of every order of a grid.
+
+    Each rule is a step function of one input, so the fee before the multipliers is the sum of a cart value, a distance and an item term, broadcast over the three axes. The hours only differ by their rush hour multiplier, so the multipliers and the fee limit are applied once per distinct multiplier and the hours sharing it get a copy. The arithmetic is that of `FeeCalculator.calculate_delivery_fees`, so every fee matches `calculate_delivery_fee` cent for cent.
+
+    Args:
+        rules (PricingRules): The rule set
+        spec (GridSpec): The orders to price, taking a naive `start` as UTC
+
+    Returns:
+        np.ndarray: The fees in cents, indexed by hour, delivery distance, cart value and number of items, as the smallest of int16, int32 and int64 the fee limit fits
+    """
+    cart_values = spec.cart_value.values()
+    delivery_distances = spec.delivery_distance.values()
+    numbers_of_items = spec.number_of_items.values()
+
+    cart_value_fee = np.maximum(rules.BASE_CART_VALUE - cart_values, 0)
+    additional_distance = np.maximum(delivery_distances - rules.BASE_DISTANCE, 0)
+    distance_fee = (
+        rules.BASE_SURCHARGE
+        + np.ceil(additional_distance / rules.ADDITIONAL_DISTANCE).astype(np.int64)
+        * rules.ADDITIONAL_DISTANCE_SURCHARGE
+    )
+    additional_items = np.maximum(numbers_of_items - rules.ADDITIONAL_ITEM_LIMIT, 0)
+    # The bulk fee only applies on top of the per-item surcharge
+    bulk_item_limit = max(rules.BULK_ITEM_LIMIT, rules.ADDITIONAL_ITEM_LIMIT)
+    item_fee = additional_items * rules.ADDITIONAL_ITEM_SURCHARGE + np.where(
+        numbers_of_items > bulk_item_limit, rules.BULK_SURCHARGE, 0
+    )
+    delivery_fee = (
+        distance_fee[:, None, None]
+        + cart_value_fee[None, :, None]
+        + item_fee[None, None, :]
+    )
+    free_delivery = cart_values >= rules.CART_VALUE_FOR_FREE_DELIVERY
+
+    dtype = next(
+        dtype
+        for dtype in (np.int16, np.int32, np.int64)
+        if rules.FEE_LIMIT <= np.iinfo(dtype).max
+    )
+    start = (
+        spec.start if spec.start.tzinfo is not None else spec.start.replace(tzinfo=_UTC)
+    )
+    fee_calculator = FeeCalculator(rules)
+    multipliers = [
+        fee_calculator._rush_hour_multiplier(start + hour * _HOUR)
+        for hour in range(spec.hours)
+    ]
+
+    grid = np.empty(spec.shape, dtype=dtype)
+    for multiplier in set(multipliers):
+        hour_fee = delivery_fee
+        if multiplier is not None:
+            hour_fee = hour_fee + (hour_fee * multiplier - hour_fee).astype(np.int64)
+        hour_fee = np.minimum(hour_fee, rules.FEE_LIMIT)
+        hour_fee[:, free_delivery, :] = 0
+        hours = [hour for hour, m in enumerate(multipliers) if m == multiplier]
+        grid[hours] = hour_fee
+    return grid
+
+
+def encode_fee_grid(grid: np.ndarray, format: str = "raw") -> bytes:
+    """Serialize a fee grid.
+
+    Args:
+        grid (np.ndarray): A grid of `compute_fee_grid`
+        format (str): `raw` for the header and the little-endian fees, or `npy` for the NumPy file format
+
+    Returns:
+        bytes: The serialized grid
+
+    Raises:
+        ValueError: If the format is unknown
+    """
+    if format == "npy":
+        buffer = io.BytesIO()
+        np.save(buffer, grid, allow_pickle=False)
+        return buffer.getvalue()
+    if format != "raw":
+        raise ValueError(f"Unknown grid format {format!r}, use {' or '.join(FORMATS)}")
+    grid = np.ascontiguousarray(grid, dtype=grid.dtype.newbyteorder("<"))
+    header = _HEADER.pack(MAGIC, VERSION, grid.dtype.itemsize, *grid.shape)
+    # Joined with the buffer of the grid, so the fees are copied only once
+    return b"".join((header, grid.data))
+
+
+def decode_fee_grid(data: bytes) -> np.ndarray:
+    """Read a grid serialized in the `raw` format.
+
+    Args:
+        data (bytes): The serialized grid
+
+    Returns:
+        np.ndarray: The fees, indexed by hour, delivery distance, cart value and number of items
+
+    Raises:
+        ValueError: If the data is not a grid of this format version
+    """
+    if len(data) < _HEADER.size:
+        raise ValueError("Not a fee grid")
+    magic, version, itemsize, *shape = _HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION or itemsize not in (2, 4, 8):
+        raise ValueError(f"Not a version {VERSION} fee grid")
+    dtype = np.dtype(f"<i{itemsize}")
+    if len(data) - _HEADER.size != dtype.itemsize * int(np.prod(shape)):
+        raise ValueError("Fee grid data doesn't match its shape")
+    return np.frombuffer(data, dtype=dtype, offset=_HEADER.size).reshape(shape)
+
+
+GridKey = tuple[PricingRules, GridSpec, str]
+
+
+class FeeGridCache:
+    """Thread-safe LRU cache of serialized fee grids, bounded by the bytes they hold.
+
+    Keys hold the rule set, so a grid is only served for the rules that priced it, and the grids of replaced rules age out.
+    """
+
+    def __init__(self, max_bytes: int):
+        """
+        Args:
+            max_bytes (int): Size of the grids held at most, a grid larger than this isn't cached
+        """
+        self.max_bytes = max_bytes
+        self._grids: OrderedDict[GridKey, bytes] = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._grids)
+
+    def get(self, key: GridKey) -> bytes | None:
+        """Look up a grid, refreshing its position in the LRU order.
+
+        Args:
+            key (GridKey): The rule set, the grid spec and the format
+
+        Returns:
+            bytes | None: The serialized grid, or None on a miss
+        """
+        with self._lock:
+            data = self._grids.get(key)
+            if data is None:
+                self.misses += 1
+                return None
+            self._grids.move_to_end(key)
+            self.hits += 1
+            return data
+
+    def put(self, key: GridKey, data: bytes) -> None:
+        """Store a grid, evicting the least recently used ones to make room.
+
+        Args:
+            key (GridKey): The rule set, the grid spec and the format
+            data (bytes): The serialized grid
+        """
+        size = sys.getsizeof(data)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._grids.pop(key, None)
+            if previous is not None:
+                self._size -= sys.getsizeof(previous)
+            self._grids[key] = data
+            self._size += size
+            while self._size > self.max_bytes:
+                _, evicted = self._grids.popitem(last=False)
+                self._size -= sys.getsizeof(evicted)
+                self.evictions += 1
+
+
+def fee_grid(
+    rules: PricingRules,
+    spec: GridSpec,
+    format: str = "raw",
+    cache: FeeGridCache | None = None,
+) -> bytes:
+    """Price and serialize a fee grid, or take it from the cache.
+
+    Args:
+        rules (PricingRules): The rule set
+        spec (GridSpec): The orders to price
+        format (str): The serialization, see `encode_fee_grid`
+        cache (FeeGridCache | None): Cache of recent grids, None to always compute
+
+    Returns:
+        bytes: The serialized grid
+    """
+    key = (rules, spec, format)
+    if cache is not None:
+        data = cache.get(key)
+        if data is not None:
+            return data
+    data = encode_fee_grid(compute_fee_grid(rules, spec), format)
+    if cache is not None:
+        cache.put(key, data)
+    return data
@@ -0,0 +1,103 @@
+import functools
+from collections.abc import Callable
+from typing import NamedTuple
+
+from app.utils.fee_calculator import FeeCalculator, PricingRules
+
+# Inputs a search can vary, and the largest value it considers for them
+SEARCH_INPUTS = ("cart_value", "delivery_distance", "number_of_items")
+MAX_VALUE = 2**31 - 1
+
+
+class SearchResult(NamedTuple):
+    """The values of an input whose fee meets the conditions of a search."""
+
+    # Smallest value, None if no value meets the conditions
+    min_value: int | None
+    # Largest value, None if there is no upper bound
+    max_value: int | None
+    # Fees at both ends, the fee at MAX_VALUE for no upper bound
+    min_value_fee: int | None
+    max_value_fee: int | None
+
+
+@functools.lru_cache(maxsize=64)
+def search_engine(rules: PricingRules) -> FeeCalculator:
+    """The engine a search prices with, so searches don't count as quotes in the metrics or fill the fee cache."""
+    return FeeCalculator(rules)
+
+
+def _interval(
+    fee: Callable[[int], int], accept: Callable[[int], bool]
+) -> tuple[int, int] | None:
+    """The values from 1 to `MAX_VALUE` whose fee is accepted, found by bisection.
+
+    The fee is monotone in the value, so the accepted values are an interval starting at 1 or ending at `MAX_VALUE`.
+    """
+    first, last = accept(fee(1)), accept(fee(MAX_VALUE))
+    if first and last:
+        return 1, MAX_VALUE
+    if not first and not last:
+        return None
+    low, high = 1, MAX_VALUE
+    # accept(fee(low)) == first and accept(fee(high)) == last throughout
+    while high - low > 1:
+        middle = (low + high) // 2
+        if accept(fee(middle)) == first:
+            low = middle
+        else:
+            high = middle
+    return (1, low) if first else (high, MAX_VALUE)
+
+
+def search_input(
+    fee_calculator: FeeCalculator,
+    vary: str,
+    max_fee: int | None = None,
+    min_fee: int | None = None,
+    **inputs,
+) -> SearchResult:
+    """Find the values of one input for which the fee of an order stays within bounds.
+
+    The fee goes down as the cart value grows, and up with the distance and the number of items: every surcharge is a step function of its input, and the rush hour and surge multipliers and the fee limit keep the order. So the values whose fee is at most `max_fee`, or at least `min_fee`, are an interval reaching to one end of the range, and bisection finds its other end in about 31 fee calculations. With both bounds, the result is the intersection of both intervals. E.g. the smallest cart value bringing the fee to `max_fee` or less is the `min_value` varying `cart_value`, and the number of items from which the fee limit applies is the `min_value` varying `number_of_items` with `min_fee` at the fee limit.
+
+    Args:
+        fee_calculator (FeeCalculator): The engine pricing the order
+        vary (str): The input to vary, one of `SEARCH_INPUTS`
+        max_fee (int | None): Largest fee accepted, in cents
+        min_fee (int | None): Smallest fee accepted, in cents
+        **inputs: The other inputs of `calculate_delivery_fee`, the varied one is ignored
+
+    Returns:
+        SearchResult: The values of the input between 1 and `MAX_VALUE` meeting both bounds
+
+    Raises:
+        ValueError: If the input can't be varied or no bound is given
+    """
+    if vary not in SEARCH_INPUTS:
+        raise ValueError(f"Can't search {vary!r}, only {', '.join(SEARCH_INPUTS)}")
+    if max_fee is None and min_fee is None:
+        raise ValueError("A search needs a max_fee or a min_fee")
+
+    calculate_delivery_fee = fee_calculator.calculate_delivery_fee
+    fees: dict[int, int] = {}
+
+    def fee(value: int) -> int:
+        if value not in fees:
+            fees[value] = calculate_delivery_fee(**{**inputs, vary: value})
+        return fees[value]
+
+    interval = (1, MAX_VALUE)
+    for accept in (
+        None if max_fee is None else (lambda delivery_fee: delivery_fee <= max_fee),
+        None if min_fee is None else (lambda delivery_fee: delivery_fee >= min_fee),
+    ):
+        if accept is None:
+            continue
+        bounds = _interval(fee, accept)
+        if bounds is None or bounds[0] > interval[1] or bounds[1] < interval[0]:
+            return SearchResult(None, None, None, None)
+        interval = (max(interval[0], bounds[0]), min(interval[1], bounds[1]))
+
+    low, high = interval
+    return SearchResult(low, None if high == MAX_VALUE else high, fee(low), fee(high))
@@ -0,0 +1,210 @@
+import json
+from collections.abc import AsyncIterable, AsyncIterator, Iterable, Iterator
+
+from pydantic import ValidationError
+from starlette.concurrency import run_in_threadpool
+
+from app.schemas.fees import FeeCalculatorRequest
+from app.utils.fee_calculator import FeeCalculator
+from app.utils.pricing_rules import ZonePricing, resolve_zone
+from app.utils.zones import UnknownZoneError
+
+DEFAULT_CHUNK_SIZE = 1000
+MAX_LINE_BYTES = 64 * 1024
+
+# Stands in for a line that was dropped for exceeding MAX_LINE_BYTES
+_TOO_LONG = None
+
+_TOO_LONG_ERRORS = [
+    {
+        "type": "line_too_long",
+        "loc": [],
+        "msg": f"Line should have at most {MAX_LINE_BYTES} bytes",
+    }
+]
+
+
+def _json_default(value: object) -> str:
+    if isinstance(value, bytes):
+        return value.decode(errors="replace")
+    return str(value)
+
+
+def _price_chunk(
+    fee_calculator: FeeCalculator,
+    numbered_lines: list[tuple[int, bytes | None]],
+    zones: ZonePricing | None = None,
+) -> bytes:
+    """Price one chunk of NDJSON lines.
+
+    Valid orders are priced together with `FeeCalculator.calculate_delivery_fees`, one call per rule set, invalid ones are reported on their own output line.
+
+    Args:
+        fee_calculator (FeeCalculator): The calculator pricing orders outside any zone
+        numbered_lines (list[tuple[int, bytes | None]]): 1-based line numbers and raw lines
+        zones (ZonePricing | None): The rule sets of orders with a `zone_id` or `location`
+
+    Returns:
+        bytes: One NDJSON output line per input line, in input order
+    """
+    results: list[dict] = []
+    # Orders and their output lines, per calculator pricing them
+    groups: dict[int, tuple[FeeCalculator, list[FeeCalculatorRequest], list[dict]]] = {}
+
+    for line_number, line in numbered_lines:
+        if line is _TOO_LONG:
+            results.append({"line": line_number, "errors": _TOO_LONG_ERRORS})
+            continue
+        try:
+            order = FeeCalculatorRequest.model_validate_json(line)
+            zone = resolve_zone(zones, order.zone_id, order.coordinates)
+        except ValidationError as e:
+            results.append({"line": line_number, "errors": e.errors(include_url=False)})
+            continue
+        except UnknownZoneError as e:
+            errors = [{"type": "unknown_zone", "loc": ["zone_id"], "msg": str(e)}]
+            results.append({"line": line_number, "errors": errors})
+            continue
+        result = {"line": line_number}
+        results.append(result)
+        order_calculator = fee_calculator if zone is None else zone.fee_calculator
+        _, orders, priced = groups.setdefault(
+            id(order_calculator), (order_calculator, [], [])
+        )
+        orders.append(order)
+        priced.append(result)
+
+    for order_calculator, orders, priced in groups.values():
+        delivery_fees = order_calculator.calculate_delivery_fees(
+            cart_values=[order.cart_value for order in orders],
+            delivery_distances=[order.delivery_distance for order in orders],
+            numbers_of_items=[order.number_of_items for order in orders],
+            times=[order.time for order in orders],
+        )
+        rule_version = order_calculator.rules.VERSION
+        for result, delivery_fee in zip(priced, delivery_fees.tolist()):
+            result["delivery_fee"] = delivery_fee
+            result["rule_version"] = rule_version
+
+    return b"".join(
+        json.dumps(result, default=_json_default).encode() + b"\n" for result in results
+    )
+
+
+class _LineSplitter:
+    """Split a byte stream into lines without holding more than one line in memory.
+
+    Lines longer than `MAX_LINE_BYTES` are dropped and returned as `_TOO_LONG`.
+    """
+
+    def __init__(self):
+        self._buffer = b""
+        self._too_long = False
+
+    def feed(self, chunk: bytes) -> list[bytes | None]:
+        """Return the lines completed by `chunk`."""
+        *lines, self._buffer = (self._buffer + chunk).split(b"\n")
+        result: list[bytes | None] = []
+        for line in lines:
+            if self._too_long:
+                # The rest of a line that was already dropped
+                self._too_long = False
+                result.append(_TOO_LONG)
+            elif len(line) > MAX_LINE_BYTES:
+                result.append(_TOO_LONG)
+            else:
+                result.append(line.rstrip(b"\r"))
+        if len(self._buffer) > MAX_LINE_BYTES:
+            self._buffer = b""
+            self._too_long = True
+        return result
+
+    def close(self) -> list[bytes | None]:
+        """Return the last line, which has no trailing newline."""
+        if self._too_long:
+            return [_TOO_LONG]
+        if self._buffer:
+            return [self._buffer.rstrip(b"\r")]
+        return []
+
+
+def _iter_lines(chunks: Iterable[bytes]) -> Iterator[bytes | None]:
+    """Split a byte stream into lines, see `_LineSplitter`."""
+    splitter = _LineSplitter()
+    for chunk in chunks:
+        yield from splitter.feed(chunk)
+    yield from splitter.close()
+
+
+async def _aiter_lines(chunks: AsyncIterable[bytes]) -> AsyncIterator[bytes | None]:
+    """Split an asynchronous byte stream into lines, see `_LineSplitter`."""
+    splitter = _LineSplitter()
+    async for chunk in chunks:
+        for line in splitter.feed(chunk):
+            yield line
+    for line in splitter.close():
+        yield line
+
+
+def price_ndjson(
+    chunks: Iterable[bytes],
+    fee_calculator: FeeCalculator,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    zones: ZonePricing | None = None,
+) -> Iterator[bytes]:
+    """Price a stream of newline-delimited JSON orders.
+
+    At most `chunk_size` lines are held in memory at a time, and the input is split into lines as it is read, so a line longer than `MAX_LINE_BYTES` is dropped without ever being held whole. Blank lines are skipped, every other line produces exactly one output line carrying its 1-based `line` number and either a `delivery_fee` with its `rule_version` or the validation `errors`.
+
+    Args:
+        chunks (Iterable[bytes]): Raw input bytes in blocks of any size, e.g. `iter(partial(file.read, 65536), b"")`
+        fee_calculator (FeeCalculator): The calculator pricing orders outside any zone
+        chunk_size (int): Number of lines priced together
+        zones (ZonePricing | None): The rule sets of orders with a `zone_id` or `location`
+
+    Yields:
+        bytes: Chunks of NDJSON output
+    """
+    chunk: list[tuple[int, bytes | None]] = []
+    for line_number, line in enumerate(_iter_lines(chunks), start=1):
+        if line is not _TOO_LONG and not line.strip():
+            continue
+        chunk.append((line_number, line))
+        if len(chunk) >= chunk_size:
+            yield _price_chunk(fee_calculator, chunk, zones)
+            chunk = []
+    if chunk:
+        yield _price_chunk(fee_calculator, chunk, zones)
+
+
+async def aprice_ndjson(
+    chunks: AsyncIterable[bytes],
+    fee_calculator: FeeCalculator,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    zones: ZonePricing | None = None,
+) -> AsyncIterator[bytes]:
+    """Asynchronous counterpart of `price_ndjson` over a raw byte stream.
+
+    The chunks are priced in the threadpool, so pricing a large stream does not block the event loop.
+
+    Args:
+        chunks (AsyncIterable[bytes]): Raw input bytes, e.g. `Request.stream()`
+        fee_calculator (FeeCalculator): The calculator pricing orders outside any zone
+        chunk_size (int): Number of lines priced together
+        zones (ZonePricing | None): The rule sets of orders with a `zone_id` or `location`
+
+    Yields:
+        bytes: Chunks of NDJSON output
+    """
+    chunk: list[tuple[int, bytes | None]] = []
+    line_number = 0
+    async for line in _aiter_lines(chunks):
+        line_number += 1
+        if line is not _TOO_LONG and not line.strip():
+            continue
+        chunk.append((line_number, line))
+        if len(chunk) >= chunk_size:
+            yield await run_in_threadpool(_price_chunk, fee_calculator, chunk, zones)
+            chunk = []
+    if chunk:
+        yield await run_in_threadpool(_price_chunk, fee_calculator, chunk, zones)
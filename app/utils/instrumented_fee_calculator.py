@@ -0,0 +1,146 @@
+import functools
+import time as time_module
+from collections.abc import Callable
+
+from app.utils.fee_calculator import FeeBreakdown, FeeCalculator
+from app.utils.metrics import Counter, Histogram, HistogramChild
+
+_perf_counter = time_module.perf_counter
+
+# The per-rule helpers of FeeCalculator, timed when the wrapped calculator runs them
+RULE_HELPERS = (
+    "_is_free_delivery",
+    "_calculate_cart_value_surcharge",
+    "_calculate_distance_surcharge",
+    "_calculate_item_surcharge",
+    "_calculate_rush_hour_surcharge",
+    "_calculate_surge_surcharge",
+    "_limit_delivery_fee",
+)
+
+
+def _timed(method: Callable, histogram: HistogramChild) -> Callable:
+    observe = histogram.observe
+
+    @functools.wraps(method)
+    def timed(*args, **kwargs):
+        start = _perf_counter()
+        result = method(*args, **kwargs)
+        observe(_perf_counter() - start)
+        return result
+
+    return timed
+
+
+def instrument_rule_helpers(
+    fee_calculator: FeeCalculator, rule_durations: Histogram
+) -> FeeCalculator:
+    """Time every rule helper the calculator evaluates.
+
+    The timers shadow the bound methods on the instance, so the calculator's own calls go through them. The compiled engine replaces the helpers with table lookups, so its helpers record nothing.
+
+    Args:
+        fee_calculator (FeeCalculator): The calculator to instrument in place
+        rule_durations (Histogram): Histogram labelled by rule
+
+    Returns:
+        FeeCalculator: The same calculator
+    """
+    for name in RULE_HELPERS:
+        helper = getattr(fee_calculator, name)
+        setattr(
+            fee_calculator,
+            name,
+            _timed(helper, rule_durations.labels(name.lstrip("_"))),
+        )
+    return fee_calculator
+
+
+class InstrumentedFeeCalculator:
+    """Records how long fee calculations take and which pricing rules fired.
+
+    Timing every rule helper costs several times the calculation itself, so the helpers are only profiled on a sample of the calls: every `profile_every`-th call is priced by `rule_profiler`, a calculator for the same rules set up with `instrument_rule_helpers`, and all other calls by the wrapped calculator untouched.
+
+    Everything but `calculate_delivery_fee` and `calculate_delivery_fee_breakdown` is delegated to the wrapped calculator.
+    """
+
+    def __init__(
+        self,
+        fee_calculator: FeeCalculator,
+        duration: HistogramChild,
+        rules_applied: Counter,
+        rule_profiler: FeeCalculator | None = None,
+        profile_every: int = 100,
+    ):
+        self.fee_calculator = fee_calculator
+        self.rules = fee_calculator.rules
+        self._observe = duration.observe
+        self._rule_profiler = rule_profiler
+        self._profile_every = profile_every
+        self._countdown = profile_every
+
+        self._free_delivery = rules_applied.labels("free_delivery")
+        self._fee_limit = rules_applied.labels("fee_limit")
+        self._rush_hour = rules_applied.labels("rush_hour")
+        self._bulk_items = rules_applied.labels("bulk_items")
+        self._surge = rules_applied.labels("surge")
+        self._bulk_item_limit = max(
+            self.rules.BULK_ITEM_LIMIT, self.rules.ADDITIONAL_ITEM_LIMIT
+        )
+
+    def __getattr__(self, name: str):
+        return getattr(self.fee_calculator, name)
+
+    def calculate_delivery_fee(self, **inputs) -> int:
+        """Calculate the delivery fee and record the metrics of the calculation.
+
+        Args:
+            **inputs: Arbitrary keyword arguments
+
+        Returns:
+            int: The delivery fee in cents
+        """
+        fee_calculator = self.fee_calculator
+        if self._rule_profiler is not None:
+            self._countdown -= 1
+            if self._countdown <= 0:
+                self._countdown = self._profile_every
+                fee_calculator = self._rule_profiler
+
+        start = _perf_counter()
+        delivery_fee, fee_limit_applied = (
+            fee_calculator.calculate_delivery_fee_and_limit(**inputs)
+        )
+        self._observe(_perf_counter() - start)
+
+        self._count_rules(inputs, fee_limit_applied)
+        return delivery_fee
+
+    def calculate_delivery_fee_breakdown(self, **inputs) -> FeeBreakdown:
+        """Calculate the delivery fee with its components and record the metrics of the calculation.
+
+        Args:
+            **inputs: Arbitrary keyword arguments
+
+        Returns:
+            FeeBreakdown: The delivery fee in cents and its components
+        """
+        start = _perf_counter()
+        breakdown = self.fee_calculator.calculate_delivery_fee_breakdown(**inputs)
+        self._observe(_perf_counter() - start)
+        self._count_rules(inputs, breakdown.fee_limit_applied)
+        return breakdown
+
+    def _count_rules(self, inputs: dict, fee_limit_applied: bool) -> None:
+        if inputs["cart_value"] >= self.rules.CART_VALUE_FOR_FREE_DELIVERY:
+            self._free_delivery.inc()
+            return
+        if fee_limit_applied:
+            self._fee_limit.inc()
+        if inputs["number_of_items"] > self._bulk_item_limit:
+            self._bulk_items.inc()
+        if self.fee_calculator._is_rush_hour(inputs["time"]):
+            self._rush_hour.inc()
+        surge_multiplier = inputs.get("surge_multiplier")
+        if surge_multiplier is not None and surge_multiplier != 1.0:
+            self._surge.inc()
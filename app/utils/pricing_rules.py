@@ -0,0 +1,295 @@
+import asyncio
+import dataclasses
+import json
+import logging
+from collections.abc import Callable
+from pathlib import Path
+from typing import NamedTuple
+
+from pydantic import TypeAdapter
+
+from app.utils.fee_calculator import FeeCalculator, PricingRules
+from app.utils.zones import UnknownZoneError, ZoneRules, load_zones
+
+logger = logging.getLogger(__name__)
+
+pricing_rules_adapter = TypeAdapter(PricingRules)
+
+
+class PricingSnapshot(NamedTuple):
+    rules: PricingRules
+    fee_calculator: FeeCalculator
+    zones: "ZonePricing | None" = None
+
+    def for_zone(
+        self, zone_id: str | None = None, location: tuple[float, float] | None = None
+    ) -> "PricingSnapshot":
+        """Pick the snapshot pricing an order in a zone.
+
+        Args:
+            zone_id (str | None): The zone of the order, takes precedence over `location`
+            location (tuple[float, float] | None): Latitude and longitude of the order
+
+        Returns:
+            PricingSnapshot: The snapshot of the zone's rule set, or this one for orders outside any zone with its own rules
+        """
+        return resolve_zone(self.zones, zone_id, location) or self
+
+    def locate(
+        self, zone_id: str | None = None, location: tuple[float, float] | None = None
+    ) -> tuple["PricingSnapshot", str | None]:
+        """`for_zone`, also returning the zone the order is in.
+
+        Args:
+            zone_id (str | None): The zone of the order, takes precedence over `location`
+            location (tuple[float, float] | None): Latitude and longitude of the order
+
+        Returns:
+            tuple[PricingSnapshot, str | None]: The snapshot pricing the order, and its zone or None if it is outside every zone
+        """
+        if self.zones is None:
+            resolve_zone(None, zone_id, location)
+            return self, None
+        position = self.zones.position(zone_id, location)
+        if position < 0:
+            return self, None
+        return (
+            self.zones.snapshot_at(position) or self,
+            self.zones.index.zone_ids[position],
+        )
+
+
+class ZonePricing:
+    """The per-zone counterpart of a snapshot: one snapshot per rule set in the zone file.
+
+    Every rule set is derived from the base rules by overriding some of their parameters, and gets a fee calculator of its own. Zones only hold the number of their rule set, so thousands of zones sharing a few rule sets cost a few calculators.
+    """
+
+    def __init__(
+        self,
+        zone_rules: ZoneRules,
+        rules: PricingRules,
+        build_fee_calculator: Callable[[PricingRules], FeeCalculator],
+    ):
+        self.zone_rules = zone_rules
+        self.index = zone_rules.index
+        self._zone_rule_sets = zone_rules.zone_rule_sets
+        self._snapshots: list[PricingSnapshot | None] = [None]
+        for name, overrides in zone_rules.rule_sets.items():
+            rule_set = pricing_rules_adapter.validate_python(
+                {
+                    **dataclasses.asdict(rules),
+                    "VERSION": f"{rules.VERSION}/{name}",
+                    **overrides,
+                }
+            )
+            self._snapshots.append(
+                PricingSnapshot(rule_set, build_fee_calculator(rule_set))
+            )
+
+    @property
+    def snapshots(self) -> list[PricingSnapshot]:
+        """The snapshots of the rule sets, in the order of the zone file."""
+        return self._snapshots[1:]
+
+    def position(
+        self, zone_id: str | None, location: tuple[float, float] | None
+    ) -> int:
+        """Find the zone of an order.
+
+        Args:
+            zone_id (str | None): The zone of the order, takes precedence over `location`
+            location (tuple[float, float] | None): Latitude and longitude of the order
+
+        Returns:
+            int: The position of the zone in the index, or -1 if the order is outside every zone
+
+        Raises:
+            UnknownZoneError: If `zone_id` is not a known zone
+        """
+        if zone_id is not None:
+            position = self.index.position(zone_id)
+            if position < 0:
+                raise UnknownZoneError(zone_id)
+            return position
+        if location is not None:
+            return self.index.locate(*location)
+        return -1
+
+    def snapshot_at(self, position: int) -> PricingSnapshot | None:
+        """The snapshot of the rule set of the zone at `position`, or None if the base rules apply."""
+        return self._snapshots[self._zone_rule_sets[position]]
+
+    def resolve(
+        self, zone_id: str | None, location: tuple[float, float] | None
+    ) -> PricingSnapshot | None:
+        """Look up the snapshot of the rule set of a zone.
+
+        Args:
+            zone_id (str | None): The zone of the order, takes precedence over `location`
+            location (tuple[float, float] | None): Latitude and longitude of the order
+
+        Returns:
+            PricingSnapshot | None: The snapshot, or None if the base rules apply
+        """
+        position = self.position(zone_id, location)
+        if position < 0:
+            return None
+        return self._snapshots[self._zone_rule_sets[position]]
+
+
+def resolve_zone(
+    zones: ZonePricing | None,
+    zone_id: str | None,
+    location: tuple[float, float] | None,
+) -> PricingSnapshot | None:
+    """`ZonePricing.resolve`, for when no zones may be configured.
+
+    Without zones every location gets the base rules and every zone id is unknown.
+
+    Raises:
+        UnknownZoneError: If `zone_id` is not a known zone
+    """
+    if zones is not None:
+        return zones.resolve(zone_id, location)
+    if zone_id is not None:
+        raise UnknownZoneError(zone_id)
+    return None
+
+
+def resolve_pricing_rules_file(path: str | Path) -> Path:
+    """Find the rule set file to load.
+
+    A directory holds one JSON file per rule set version, and the active one is the file whose name sorts last (e.g. `2024-03-01.json` or `v0002.json`).
+
+    Args:
+        path (str | Path): A JSON file or a directory of JSON files
+
+    Returns:
+        Path: The rule set file
+    """
+    path = Path(path)
+    if not path.is_dir():
+        return path
+
+    files = sorted(path.glob("*.json"))
+    if not files:
+        raise FileNotFoundError(f"No pricing rule sets in {path}")
+    return files[-1]
+
+
+def load_pricing_rules(path: str | Path) -> PricingRules:
+    """Load a rule set from a JSON file or a directory of them.
+
+    Parameters missing from the file keep their `Const` defaults, and a missing `VERSION` defaults to the file name without its extension.
+
+    Args:
+        path (str | Path): A JSON file or a directory of JSON files
+
+    Returns:
+        PricingRules: The loaded rule set
+
+    Raises:
+        ValueError: If the file doesn't hold a valid rule set
+    """
+    file = resolve_pricing_rules_file(path)
+    data = json.loads(file.read_bytes())
+    if not isinstance(data, dict):
+        raise ValueError(
+            f"{file} holds a JSON {type(data).__name__}, a rule set is an object"
+        )
+    data.setdefault("VERSION", file.stem)
+    return pricing_rules_adapter.validate_python(data)
+
+
+class PricingRulesStore:
+    """Holds the current pricing snapshot and swaps in new rule set versions.
+
+    Readers take `store.snapshot` once per request and price with it, so a request never mixes two versions. A reload builds the new snapshot completely before publishing it with a single attribute assignment, which is atomic, so the hot path needs no lock.
+
+    With a zone file, the snapshot also carries the zone index and the snapshots of the zone rule sets, rebuilt whenever the base rules or the zone file change.
+    """
+
+    def __init__(
+        self,
+        build_fee_calculator: Callable[[PricingRules], FeeCalculator] = FeeCalculator,
+        path: str | Path | None = None,
+        zones_path: str | Path | None = None,
+    ):
+        self._build_fee_calculator = build_fee_calculator
+        self._path = Path(path) if path is not None else None
+        self._zones_path = Path(zones_path) if zones_path is not None else None
+        self._zone_rules: ZoneRules | None = None
+        self._source: tuple | None = None
+
+        if self._path is None and self._zones_path is None:
+            self.snapshot = self._build_snapshot(PricingRules(), None)
+        else:
+            self.reload()
+
+    def _build_snapshot(
+        self, rules: PricingRules, zone_rules: ZoneRules | None
+    ) -> PricingSnapshot:
+        zones = None
+        if zone_rules is not None:
+            zones = ZonePricing(zone_rules, rules, self._build_fee_calculator)
+        return PricingSnapshot(rules, self._build_fee_calculator(rules), zones)
+
+    def _publish(self, snapshot: PricingSnapshot) -> PricingSnapshot:
+        self.snapshot = snapshot
+        logger.info("Published pricing rules version %s", snapshot.rules.VERSION)
+        return snapshot
+
+    def publish(self, rules: PricingRules) -> PricingSnapshot:
+        """Build a snapshot of `rules` and make it the current one.
+
+        Args:
+            rules (PricingRules): The new rule set
+
+        Returns:
+            PricingSnapshot: The published snapshot
+        """
+        return self._publish(self._build_snapshot(rules, self._zone_rules))
+
+    def reload(self) -> bool:
+        """Load the rule set and zone files again if either changed since the last load.
+
+        Returns:
+            bool: True if a new snapshot was published
+        """
+        if self._path is None and self._zones_path is None:
+            return False
+
+        file = None
+        source: tuple = (None, None)
+        if self._path is not None:
+            file = resolve_pricing_rules_file(self._path)
+            source = (file, file.stat().st_mtime_ns)
+        if self._zones_path is not None:
+            source += (self._zones_path.stat().st_mtime_ns,)
+        if source == self._source:
+            return False
+
+        rules = load_pricing_rules(file) if file is not None else PricingRules()
+        zone_rules = None
+        if self._zones_path is not None:
+            zone_rules = load_zones(self._zones_path)
+        self._publish(self._build_snapshot(rules, zone_rules))
+        self._zone_rules = zone_rules
+        self._source = source
+        return True
+
+    async def watch(self, interval: float) -> None:
+        """Poll the rule set and zone files and reload them when they change.
+
+        A rule set that fails to load is logged and the current snapshot stays in place.
+
+        Args:
+            interval (float): Seconds between polls
+        """
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await asyncio.to_thread(self.reload)
+            except Exception:
+                logger.exception("Failed to reload pricing rules from %s", self._path)
@@ -0,0 +1,93 @@
+import functools
+import hashlib
+from typing import NamedTuple
+
+import orjson
+
+from app.utils.fee_calculator import PricingRules
+from app.utils.rush_hours import RushHourWindow, week_template
+
+# Version of the layout of the export, bumped on incompatible changes
+FORMAT = 1
+
+
+class RulesExport(NamedTuple):
+    """A rule set serialized for clients to price orders themselves."""
+
+    body: bytes
+    # Strong ETag of the body, quoted
+    etag: str
+
+
+def _rush_hour_windows(rules: PricingRules) -> list[tuple[float, float, float]]:
+    if rules.RUSH_HOURS is not None:
+        return week_template(rules.RUSH_HOURS)
+    # The single window is compared with the wall-clock time of the order as
+    # given, and is empty unless it ends after it starts
+    if rules.RUSH_HOUR_START >= rules.RUSH_HOUR_END:
+        return []
+    return week_template(
+        [
+            RushHourWindow(
+                rules.RUSH_HOUR_ISOWEEKDAY,
+                rules.RUSH_HOUR_START,
+                rules.RUSH_HOUR_END,
+                rules.RUSH_HOUR_MULTIPLIER,
+            )
+        ]
+    )
+
+
+@functools.lru_cache(maxsize=64)
+def export_rules(rules: PricingRules) -> RulesExport:
+    """Serialize a rule set into the artifact `app.sdk.pricing` evaluates.
+
+    The artifact is a JSON object with the `FORMAT`, the rule `VERSION` and the pricing parameters under their rule file names. The rush hours are laid out as `RUSH_HOUR_WINDOWS`, a sorted table of start, end and multiplier, in seconds since Monday 00:00 local time, where an end past the week wraps around. Their `RUSH_HOUR_TIMEZONE` is null for the single `RUSH_HOUR_*` window, which applies to the wall-clock time of the order as given. Exports are cached per rule set, so serving one costs a lookup.
+
+    Args:
+        rules (PricingRules): The rule set
+
+    Returns:
+        RulesExport: The artifact and its ETag
+    """
+    body = orjson.dumps(
+        {
+            "FORMAT": FORMAT,
+            "VERSION": rules.VERSION,
+            "BASE_CART_VALUE": rules.BASE_CART_VALUE,
+            "BASE_SURCHARGE": rules.BASE_SURCHARGE,
+            "BASE_DISTANCE": rules.BASE_DISTANCE,
+            "ADDITIONAL_DISTANCE_SURCHARGE": rules.ADDITIONAL_DISTANCE_SURCHARGE,
+            "ADDITIONAL_DISTANCE": rules.ADDITIONAL_DISTANCE,
+            "ADDITIONAL_ITEM_LIMIT": rules.ADDITIONAL_ITEM_LIMIT,
+            "ADDITIONAL_ITEM_SURCHARGE": rules.ADDITIONAL_ITEM_SURCHARGE,
+            "BULK_ITEM_LIMIT": rules.BULK_ITEM_LIMIT,
+            "BULK_SURCHARGE": rules.BULK_SURCHARGE,
+            "FEE_LIMIT": rules.FEE_LIMIT,
+            "CART_VALUE_FOR_FREE_DELIVERY": rules.CART_VALUE_FOR_FREE_DELIVERY,
+            "RUSH_HOUR_TIMEZONE": (
+                rules.RUSH_HOUR_TIMEZONE if rules.RUSH_HOURS is not None else None
+            ),
+            "RUSH_HOUR_WINDOWS": _rush_hour_windows(rules),
+        }
+    )
+    return RulesExport(body, f'"{hashlib.sha256(body).hexdigest()[:32]}"')
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Tell whether an `If-None-Match` header matches an ETag, comparing weakly as RFC 9110 asks.
+
+    Args:
+        if_none_match (str | None): The header, None if the request has none
+        etag (str): The quoted ETag
+
+    Returns:
+        bool: True if the client's copy is current
+    """
+    if if_none_match is None:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
@@ -0,0 +1,324 @@
+import bisect
+import datetime
+import functools
+import zoneinfo
+from array import array
+from collections.abc import Sequence
+from typing import Annotated
+
+import numpy as np
+from pydantic import ConfigDict, Field
+from pydantic.dataclasses import dataclass
+
+_UTC = datetime.timezone.utc
+_NAIVE_EPOCH = datetime.datetime(1970, 1, 1)
+_DAY = 24 * 60 * 60
+_WEEK = 7 * _DAY
+# 1970-01-05, the first Monday after the epoch
+_FIRST_MONDAY = 4 * _DAY
+# The Gregorian calendar repeats every 400 years, weekdays included, and so do
+# the DST rules of a timezone past its last transition and its offset before
+# the first one
+_CALENDAR_CYCLE = datetime.timedelta(days=146_097)
+
+HORIZON_START = datetime.datetime(2000, 1, 1, tzinfo=_UTC)
+HORIZON_END = datetime.datetime(2100, 1, 1, tzinfo=_UTC)
+
+
+@dataclass(frozen=True, slots=True, config=ConfigDict(extra="forbid"))
+class RushHourWindow:
+    """A weekly rush hour window in local time.
+
+    The window ends on the next day if `END` is not after `START`, e.g. 22:00 to 02:00.
+    """
+
+    ISOWEEKDAY: Annotated[int, Field(ge=1, le=7)]
+    START: datetime.time
+    END: datetime.time
+    MULTIPLIER: Annotated[float, Field(ge=0)]
+
+
+def _seconds(time: datetime.time) -> float:
+    return time.hour * 3600 + time.minute * 60 + time.second + time.microsecond / 1e6
+
+
+def week_template(
+    windows: Sequence[RushHourWindow],
+) -> list[tuple[float, float, float]]:
+    """Lay the windows out as (start, end, multiplier) seconds since Monday 00:00, sorted by start."""
+    template = []
+    for window in windows:
+        start = (window.ISOWEEKDAY - 1) * _DAY + _seconds(window.START)
+        end = (window.ISOWEEKDAY - 1) * _DAY + _seconds(window.END)
+        if end <= start:
+            end += _DAY
+        template.append((start, end, window.MULTIPLIER))
+    template.sort()
+
+    for (_, end, _), (next_start, _, _) in zip(template, template[1:]):
+        if next_start < end:
+            raise ValueError("Rush hour windows must not overlap")
+    if template and template[-1][1] - _WEEK > template[0][0]:
+        raise ValueError("Rush hour windows must not overlap")
+    return template
+
+
+def _utc_offset(tz: datetime.tzinfo, timestamp: float) -> int:
+    offset = datetime.datetime.fromtimestamp(timestamp, tz).utcoffset()
+    return int(offset.total_seconds())
+
+
+def _offset_periods(
+    tz: datetime.tzinfo, start: int, end: int
+) -> list[tuple[int, int, int]]:
+    """Split [start, end) epoch seconds into periods of constant UTC offset.
+
+    The offset is sampled daily and every change is narrowed down to the second by bisection.
+
+    Returns:
+        list[tuple[int, int, int]]: Start, end and UTC offset in seconds of each period
+    """
+    periods = []
+    period_start = start
+    offset = _utc_offset(tz, start)
+    sample = start
+    while sample < end:
+        next_sample = min(sample + _DAY, end)
+        next_offset = _utc_offset(tz, next_sample) if next_sample < end else offset
+        if next_offset != offset:
+            low, high = sample, next_sample
+            while high - low > 1:
+                middle = (low + high) // 2
+                if _utc_offset(tz, middle) == offset:
+                    low = middle
+                else:
+                    high = middle
+            periods.append((period_start, high, offset))
+            period_start, offset = high, _utc_offset(tz, high)
+            # Look at the rest of this day again, for a second change within it
+            next_sample = high
+        sample = next_sample
+    periods.append((period_start, end, offset))
+    return periods
+
+
+class RushHourSchedule:
+    """Weekly rush hour windows in a timezone, precompiled into UTC intervals.
+
+    The windows are given in local wall-clock time, so their UTC position moves with daylight saving time. Instead of converting every order time to the timezone, the schedule walks the periods of constant UTC offset between `HORIZON_START` and `HORIZON_END` once and lays out every window occurrence as a UTC interval. The interval bounds end up in one sorted array, so an order time is in a window exactly when `bisect` puts its timestamp at an odd position. A table of where each week starts in that array narrows the bisection down to the handful of bounds in the week of the order.
+
+    A time is in a window when its local wall-clock time is, which is what `multiplier_by_conversion` checks directly and what times outside the horizon fall back to. Local times skipped by a DST change never occur, and the hour repeated when the clocks go back counts twice.
+    """
+
+    def __init__(
+        self,
+        windows: Sequence[RushHourWindow],
+        timezone: str = "UTC",
+        horizon_start: datetime.datetime = HORIZON_START,
+        horizon_end: datetime.datetime = HORIZON_END,
+    ):
+        self.windows = tuple(windows)
+        self.timezone = zoneinfo.ZoneInfo(timezone)
+        self._template = week_template(self.windows)
+        self._start = int(horizon_start.timestamp())
+        # The horizon is rounded up to whole weeks, see _week_positions below
+        self._weeks = -(-(int(horizon_end.timestamp()) - self._start) // _WEEK)
+        self._end = self._start + self._weeks * _WEEK
+
+        intervals: list[tuple[float, float, float]] = []
+        for period_start, period_end, offset in _offset_periods(
+            self.timezone, self._start, self._end
+        ):
+            # Seconds since the epoch in local wall-clock time
+            local_start = period_start + offset
+            local_end = period_end + offset
+            first_week = (local_start - _FIRST_MONDAY) // _WEEK - 1
+            last_week = (local_end - _FIRST_MONDAY) // _WEEK
+            for week in range(first_week, last_week + 1):
+                monday = _FIRST_MONDAY + week * _WEEK
+                for start, end, multiplier in self._template:
+                    start = max(monday + start, local_start)
+                    end = min(monday + end, local_end)
+                    if start < end:
+                        intervals.append((start - offset, end - offset, multiplier))
+        intervals.sort()
+
+        self.bounds = array("d")
+        self.multipliers = array("d")
+        for start, end, multiplier in intervals:
+            if (
+                self.bounds
+                and self.bounds[-1] == start
+                and self.multipliers[-1] == multiplier
+            ):
+                # An occurrence split at a DST change, or windows back to back
+                self.bounds[-1] = end
+                continue
+            self.bounds.extend((start, end))
+            self.multipliers.append(multiplier)
+
+        # Where the bounds of each week of the horizon start, so a lookup only
+        # bisects the few bounds of its week
+        self._week_positions = array(
+            "I",
+            (
+                bisect.bisect_right(self.bounds, self._start + week * _WEEK)
+                for week in range(self._weeks + 1)
+            ),
+        )
+
+        self._bounds_column = np.frombuffer(self.bounds, dtype=np.float64)
+        # One past the last interval, for positions after the last bound
+        self._multipliers_column = np.append(
+            np.frombuffer(self.multipliers, dtype=np.float64), 1.0
+        )
+
+    @property
+    def horizon(self) -> tuple[int, int]:
+        """Epoch seconds the horizon starts at, and its number of weeks."""
+        return self._start, self._weeks
+
+    def buffers(self) -> dict[str, Sequence]:
+        """The arrays a lookup reads, to rebuild the schedule with `from_buffers`."""
+        return {
+            "bounds": self.bounds,
+            "multipliers": self._multipliers_column,
+            "week_positions": self._week_positions,
+        }
+
+    @classmethod
+    def from_buffers(
+        cls,
+        windows: Sequence[RushHourWindow],
+        timezone: str,
+        horizon: tuple[int, int],
+        buffers: dict[str, Sequence],
+    ) -> "RushHourSchedule":
+        """Rebuild a schedule from the arrays of another, without laying out the intervals.
+
+        The arrays are used as they are, e.g. memoryviews of shared memory, so every process mapping them shares one copy.
+
+        Args:
+            windows (Sequence[RushHourWindow]): The windows of the schedule
+            timezone (str): Their timezone
+            horizon (tuple[int, int]): The `horizon` of the schedule
+            buffers (dict[str, Sequence]): The `buffers` of the schedule
+
+        Returns:
+            RushHourSchedule: The schedule
+        """
+        schedule = cls.__new__(cls)
+        schedule.windows = tuple(windows)
+        schedule.timezone = zoneinfo.ZoneInfo(timezone)
+        schedule._template = week_template(schedule.windows)
+        schedule._start, schedule._weeks = horizon
+        schedule._end = schedule._start + schedule._weeks * _WEEK
+        multipliers = buffers["multipliers"]
+        schedule.bounds = buffers["bounds"]
+        schedule.multipliers = multipliers[:-1]
+        schedule._week_positions = buffers["week_positions"]
+        schedule._bounds_column = np.frombuffer(schedule.bounds, dtype=np.float64)
+        schedule._multipliers_column = np.frombuffer(multipliers, dtype=np.float64)
+        return schedule
+
+    def multiplier(self, time: datetime.datetime) -> float | None:
+        """Find the rush hour window an order time falls in.
+
+        Args:
+            time (datetime.datetime): Order time, taken as UTC if naive
+
+        Returns:
+            float | None: The multiplier of the window, or None outside rush hours
+        """
+        if time.tzinfo is None:
+            # Much cheaper than attaching UTC with replace()
+            timestamp = (time - _NAIVE_EPOCH).total_seconds()
+        else:
+            timestamp = time.timestamp()
+        week = int((timestamp - self._start) // _WEEK)
+        if not 0 <= week < self._weeks:
+            return self.multiplier_by_conversion(time)
+        week_positions = self._week_positions
+        position = bisect.bisect_right(
+            self.bounds, timestamp, week_positions[week], week_positions[week + 1]
+        )
+        if position & 1:
+            return self.multipliers[position >> 1]
+        return None
+
+    def multiplier_by_conversion(self, time: datetime.datetime) -> float | None:
+        """`multiplier` by converting the order time to the timezone.
+
+        Args:
+            time (datetime.datetime): Order time, taken as UTC if naive
+
+        Returns:
+            float | None: The multiplier of the window, or None outside rush hours
+        """
+        if time.tzinfo is None:
+            time = time.replace(tzinfo=_UTC)
+        # Through UTC, as astimezone() returns a time already in the timezone as
+        # it is, even a wall-clock time skipped by a DST change
+        try:
+            local = time.astimezone(_UTC).astimezone(self.timezone)
+        except OverflowError:
+            # Within hours of the first or last datetime, where the local time is
+            # past the range. The same time 400 years in has the same weekday and
+            # wall-clock time.
+            shift = _CALENDAR_CYCLE if time.year < 5000 else -_CALENDAR_CYCLE
+            local = (time + shift).astimezone(_UTC).astimezone(self.timezone)
+        seconds = (local.isoweekday() - 1) * _DAY + _seconds(local.time())
+        for start, end, multiplier in self._template:
+            if start <= seconds < end or start <= seconds + _WEEK < end:
+                return multiplier
+        return None
+
+    def multipliers_of(
+        self, times: Sequence[datetime.datetime] | np.ndarray
+    ) -> np.ndarray:
+        """Vectorized `multiplier`, with 1.0 outside rush hours.
+
+        Args:
+            times (Sequence[datetime.datetime] | np.ndarray): Order times, either datetimes or a `datetime64` array of UTC times
+
+        Returns:
+            np.ndarray: The multipliers as a float64 array
+        """
+        if isinstance(times, np.ndarray):
+            timestamps = times.astype("datetime64[us]").astype(np.int64) / 1e6
+        else:
+            timestamps = np.array(
+                [
+                    (
+                        time.timestamp()
+                        if time.tzinfo is not None
+                        else time.replace(tzinfo=_UTC).timestamp()
+                    )
+                    for time in times
+                ],
+                dtype=np.float64,
+            )
+
+        positions = np.searchsorted(self._bounds_column, timestamps, side="right")
+        multipliers = np.where(
+            positions & 1, self._multipliers_column[positions >> 1], 1.0
+        )
+
+        outside = (timestamps < self._start) | (timestamps >= self._end)
+        for i in np.flatnonzero(outside):
+            # The time itself, as float timestamps are off by microseconds far
+            # from the epoch
+            time = times[i]
+            if isinstance(times, np.ndarray):
+                time = time.astype("datetime64[us]").item()
+            multiplier = self.multiplier_by_conversion(time)
+            multipliers[i] = 1.0 if multiplier is None else multiplier
+        return multipliers
+
+
+@functools.lru_cache(maxsize=64)
+def build_rush_hour_schedule(
+    windows: tuple[RushHourWindow, ...], timezone: str
+) -> RushHourSchedule:
+    """Build a schedule, shared by every rule set with the same windows and timezone."""
+    return RushHourSchedule(windows, timezone)
@@ -0,0 +1,462 @@
+import contextlib
+import fcntl
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections.abc import Callable, Iterator, Mapping, Sequence
+from pathlib import Path
+from typing import NamedTuple
+
+from app.utils.compiled_fee_calculator import CompiledFeeCalculator, CompiledTables
+from app.utils.fee_calculator import FeeCalculator, PricingRules
+from app.utils.pricing_rules import (
+    PricingRulesStore,
+    PricingSnapshot,
+    ZonePricing,
+    pricing_rules_adapter,
+)
+from app.utils.rush_hours import RushHourSchedule
+from app.utils.zones import ZoneIndex, ZoneRules
+
+logger = logging.getLogger(__name__)
+
+_MAGIC = b"FEETABLE"
+FORMAT_VERSION = 1
+# Magic, format version, generation and length of the JSON directory, which is
+# followed by the arrays it lists
+_HEADER = struct.Struct("<8sIQI")
+_ALIGNMENT = 8
+
+
+class SharedRuleSet(NamedTuple):
+    """A rule set and its tables, mapped from a table file."""
+
+    rules: PricingRules
+    rush_hour_schedule: RushHourSchedule | None
+    # None for rules the compiled engine can't tabulate
+    tables: CompiledTables | None
+
+    def build_engine(self) -> FeeCalculator:
+        """A fee calculator reading the mapped tables, compiled unless the rules can't be."""
+        if self.tables is None:
+            return FeeCalculator(self.rules, self.rush_hour_schedule)
+        return CompiledFeeCalculator(self.rules, self.rush_hour_schedule, self.tables)
+
+
+def compile_engine(rules: PricingRules) -> FeeCalculator:
+    """The compiled engine of the rules, or the default one if they can't be compiled."""
+    try:
+        return CompiledFeeCalculator(rules)
+    except ValueError:
+        return FeeCalculator(rules)
+
+
+def _align(offset: int) -> int:
+    return -(-offset // _ALIGNMENT) * _ALIGNMENT
+
+
+class _Layout:
+    """The directory and arrays of a table file being written."""
+
+    def __init__(self):
+        self.arrays: dict[str, list] = {}
+        self.buffers: list[memoryview] = []
+        self.size = 0
+
+    def add(self, name: str, values: Sequence) -> None:
+        if isinstance(values, list):
+            values = array("q", values)
+        buffer = memoryview(values).cast("B")
+        offset = _align(self.size)
+        self.buffers.append(bytes(offset - self.size))
+        self.buffers.append(buffer)
+        self.size = offset + buffer.nbytes
+        self.arrays[name] = [memoryview(values).format, offset, len(values)]
+
+
+def _layout_rule_set(layout: _Layout, number: int, snapshot: PricingSnapshot) -> dict:
+    rules = snapshot.rules
+    fee_calculator = snapshot.fee_calculator
+    entry = {
+        "rules": pricing_rules_adapter.dump_python(rules, mode="json"),
+        "schedule": None,
+        "rush_hour": None,
+    }
+    schedule = fee_calculator.rush_hour_schedule
+    if schedule is not None:
+        entry["schedule"] = schedule.horizon
+        for name, values in schedule.buffers().items():
+            layout.add(f"{number}/schedule/{name}", values)
+    if isinstance(fee_calculator, CompiledFeeCalculator):
+        tables = fee_calculator.tables
+        layout.add(f"{number}/cart_value", tables.cart_value)
+        layout.add(f"{number}/delivery_distance", tables.delivery_distance)
+        layout.add(f"{number}/number_of_items", tables.number_of_items)
+        entry["rush_hour"] = list(tables.rush_hour)
+        for i, table in enumerate(tables.rush_hour.values()):
+            layout.add(f"{number}/rush_hour/{i}", table)
+    return entry
+
+
+def write_tables(path: str | Path, snapshot: PricingSnapshot, generation: int) -> None:
+    """Write the tables of a snapshot to a table file, replacing the previous generation.
+
+    The file is written next to `path` and renamed over it, which is atomic: a process opening `path` maps either the previous generation or this one, never a mix. Processes that mapped the previous file keep it until they drop it, and the system frees it then.
+
+    Args:
+        path (str | Path): The table file, on a memory-backed filesystem such as `/dev/shm` so the mapped pages are shared without touching disk
+        snapshot (PricingSnapshot): The snapshot to publish, built with `compile_engine`
+        generation (int): Number of this generation, which processes compare to notice a new one
+    """
+    path = Path(path)
+    layout = _Layout()
+    snapshots = [snapshot]
+    if snapshot.zones is not None:
+        snapshots += snapshot.zones.snapshots
+    directory: dict = {
+        "rule_sets": [
+            _layout_rule_set(layout, number, rule_set)
+            for number, rule_set in enumerate(snapshots)
+        ],
+        "zones": None,
+    }
+
+    if snapshot.zones is not None:
+        zone_rules = snapshot.zones.zone_rules
+        index = zone_rules.index
+        encoded = [zone_id.encode() for zone_id in index.zone_ids]
+        offsets = array("I", [0])
+        for zone_id in encoded:
+            offsets.append(offsets[-1] + len(zone_id))
+        layout.add("zones/ids", b"".join(encoded))
+        layout.add("zones/id_offsets", offsets)
+        layout.add(
+            "zones/sorted_ids",
+            array("I", sorted(range(len(encoded)), key=index.zone_ids.__getitem__)),
+        )
+        layout.add("zones/rule_sets", zone_rules.zone_rule_sets)
+        for name, values in index.buffers().items():
+            layout.add(f"zones/{name}", values)
+        directory["zones"] = {"rule_sets": zone_rules.rule_sets, "grid": index.grid()}
+    directory["arrays"] = layout.arrays
+
+    encoded_directory = json.dumps(directory).encode()
+    header = _HEADER.pack(_MAGIC, FORMAT_VERSION, generation, len(encoded_directory))
+    head_size = len(header) + len(encoded_directory)
+    temporary = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(temporary, "wb") as f:
+        f.write(header)
+        f.write(encoded_directory)
+        f.write(bytes(_align(head_size) - head_size))
+        for buffer in layout.buffers:
+            f.write(buffer)
+    os.replace(temporary, path)
+
+
+def read_generation(path: str | Path) -> int | None:
+    """The generation of a table file, or None if there is no table file at `path`."""
+    try:
+        with open(path, "rb") as f:
+            header = f.read(_HEADER.size)
+    except FileNotFoundError:
+        return None
+    if len(header) < _HEADER.size:
+        return None
+    magic, version, generation, _ = _HEADER.unpack(header)
+    if magic != _MAGIC or version != FORMAT_VERSION:
+        return None
+    return generation
+
+
+@contextlib.contextmanager
+def _publication_lock(path: str | Path) -> Iterator[None]:
+    """Hold the lock of a table file between reading its generation and writing the next one.
+
+    Processes publishing to the same file otherwise read the same generation and write the same next one, and followers that already mapped the first never map the second. The lock is an exclusive `flock` on a lock file next to `path`, released when the publisher exits even if it crashes.
+    """
+    path = Path(path)
+    with open(path.with_name(f".{path.name}.lock"), "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+class _ZoneIds(Sequence):
+    """Zone ids stored as their UTF-8 bytes back to back, decoded when read."""
+
+    def __init__(self, ids: memoryview, offsets: memoryview):
+        self._ids = ids
+        self._offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, position):
+        positions = range(len(self))[position]
+        if isinstance(positions, range):
+            return [self[i] for i in positions]
+        return str(
+            self._ids[self._offsets[positions] : self._offsets[positions + 1]], "utf-8"
+        )
+
+
+class _ZonePositions(Mapping):
+    """The positions of zone ids, found by bisecting the positions sorted by id."""
+
+    def __init__(self, zone_ids: _ZoneIds, sorted_positions: memoryview):
+        self._zone_ids = zone_ids
+        self._sorted_positions = sorted_positions
+
+    def __getitem__(self, zone_id: str) -> int:
+        i = bisect_left(self._sorted_positions, zone_id, key=self._zone_ids.__getitem__)
+        if i < len(self._sorted_positions):
+            position = self._sorted_positions[i]
+            if self._zone_ids[position] == zone_id:
+                return position
+        raise KeyError(zone_id)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._zone_ids)
+
+    def __len__(self) -> int:
+        return len(self._zone_ids)
+
+
+class SharedTables:
+    """A table file mapped read-only into this process.
+
+    The tables are memoryviews of the mapping rather than copies, so every process mapping the same generation shares one copy of its pages, however many zones and rule sets it holds. A process only keeps the JSON directory and one `PricingRules` and calculator per rule set of its own.
+    """
+
+    def __init__(self, path: str | Path):
+        """
+        Args:
+            path (str | Path): The table file
+
+        Raises:
+            ValueError: If the file is not a table file of this format version
+        """
+        with open(path, "rb") as f:
+            # The mapping stays valid after the file is closed or replaced
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        buffer = memoryview(self._mmap)
+        magic, version, self.generation, length = _HEADER.unpack_from(buffer)
+        if magic != _MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"{path} is not a table file of version {FORMAT_VERSION}")
+        start = _HEADER.size
+        directory = json.loads(bytes(buffer[start : start + length]))
+        data = buffer[_align(start + length) :]
+        arrays = {
+            name: data[offset : offset + count * struct.calcsize(format)].cast(format)
+            for name, (format, offset, count) in directory["arrays"].items()
+        }
+
+        # By version, so the zone rule sets derived from the base rules find theirs
+        self.rule_sets: dict[str, SharedRuleSet] = {}
+        for number, entry in enumerate(directory["rule_sets"]):
+            rules = pricing_rules_adapter.validate_python(entry["rules"])
+            schedule = None
+            if entry["schedule"] is not None:
+                schedule = RushHourSchedule.from_buffers(
+                    rules.RUSH_HOURS,
+                    rules.RUSH_HOUR_TIMEZONE,
+                    tuple(entry["schedule"]),
+                    {
+                        name: arrays[f"{number}/schedule/{name}"]
+                        for name in ("bounds", "multipliers", "week_positions")
+                    },
+                )
+            tables = None
+            if entry["rush_hour"] is not None:
+                tables = CompiledTables(
+                    arrays[f"{number}/cart_value"],
+                    arrays[f"{number}/delivery_distance"],
+                    arrays[f"{number}/number_of_items"],
+                    {
+                        multiplier: arrays[f"{number}/rush_hour/{i}"]
+                        for i, multiplier in enumerate(entry["rush_hour"])
+                    },
+                )
+            self.rule_sets[rules.VERSION] = SharedRuleSet(rules, schedule, tables)
+        self.rules = next(iter(self.rule_sets.values())).rules
+
+        self.zone_rules: ZoneRules | None = None
+        zones = directory["zones"]
+        if zones is not None:
+            zone_ids = _ZoneIds(arrays["zones/ids"], arrays["zones/id_offsets"])
+            index = ZoneIndex.from_buffers(
+                zone_ids,
+                _ZonePositions(zone_ids, arrays["zones/sorted_ids"]),
+                {
+                    name[len("zones/") :]: values
+                    for name, values in arrays.items()
+                    if name.startswith("zones/")
+                },
+                zones["grid"],
+            )
+            self.zone_rules = ZoneRules(
+                index, zones["rule_sets"], arrays["zones/rule_sets"]
+            )
+
+    @property
+    def nbytes(self) -> int:
+        """Size of the mapping."""
+        return len(self._mmap)
+
+
+class SharedPricingRulesStore(PricingRulesStore):
+    """A store pricing with the tables of a table file, and following its generations.
+
+    Instead of loading the rule set and zone files, every worker maps the file a `TablesPublisher` writes them to, so the zone index, rush hour schedules and compiled tables exist once per machine rather than once per worker. `reload` checks the generation in the file header and maps a new generation when there is one, and `watch` does so periodically, so a rule change published by one process reaches every worker without a restart. Rules that can't be compiled are priced by the default engine over the mapped schedule.
+    """
+
+    def __init__(
+        self,
+        build_fee_calculator: Callable[[PricingRules, SharedRuleSet], FeeCalculator],
+        path: str | Path,
+        timeout: float = 30.0,
+    ):
+        """
+        Args:
+            build_fee_calculator (Callable[[PricingRules, SharedRuleSet], FeeCalculator]): Builds the calculator of a rule set from its mapped tables
+            path (str | Path): The table file
+            timeout (float): Seconds to wait for the first generation to be published
+
+        Raises:
+            TimeoutError: If no generation is published in time
+        """
+        # The rule set and zone files are read by the publisher, not here
+        self._build_shared_fee_calculator = build_fee_calculator
+        self._path = Path(path)
+        self.tables: SharedTables | None = None
+        deadline = time.monotonic() + timeout
+        while not self.reload():
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"No pricing tables were published to {path}")
+            time.sleep(0.05)
+
+    def _snapshot_of(self, tables: SharedTables) -> PricingSnapshot:
+        def build_fee_calculator(rules: PricingRules) -> FeeCalculator:
+            return self._build_shared_fee_calculator(
+                rules, tables.rule_sets[rules.VERSION]
+            )
+
+        zones = None
+        if tables.zone_rules is not None:
+            zones = ZonePricing(tables.zone_rules, tables.rules, build_fee_calculator)
+        return PricingSnapshot(tables.rules, build_fee_calculator(tables.rules), zones)
+
+    def publish(self, rules: PricingRules) -> PricingSnapshot:
+        """Publish `rules` to the table file as its next generation and map it.
+
+        The zones stay those of the current generation. Every process following the file picks the rules up on its next reload, until the publisher replaces them when the rule set or zone files change.
+
+        Args:
+            rules (PricingRules): The new rule set
+
+        Returns:
+            PricingSnapshot: The published snapshot
+        """
+        zones = None
+        if self.tables.zone_rules is not None:
+            zones = ZonePricing(self.tables.zone_rules, rules, compile_engine)
+        snapshot = PricingSnapshot(rules, compile_engine(rules), zones)
+        with _publication_lock(self._path):
+            generation = max(self.tables.generation, read_generation(self._path) or 0)
+            write_tables(self._path, snapshot, generation + 1)
+        self.reload()
+        return self.snapshot
+
+    def reload(self) -> bool:
+        """Map the table file again if a new generation was published to it.
+
+        Returns:
+            bool: True if a new snapshot was published
+        """
+        generation = read_generation(self._path)
+        if generation is None or (
+            self.tables is not None and generation == self.tables.generation
+        ):
+            return False
+        tables = SharedTables(self._path)
+        self._publish(self._snapshot_of(tables))
+        self.tables = tables
+        return True
+
+
+class TablesPublisher:
+    """Loads the rule set and zone files and publishes them to a table file.
+
+    One process per machine, the server process, publishes, and every worker maps the file with a `SharedPricingRulesStore`. Each publication is a new generation written next to the file and renamed over it.
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        rules_path: str | Path | None = None,
+        zones_path: str | Path | None = None,
+    ):
+        """
+        Args:
+            path (str | Path): The table file
+            rules_path (str | Path | None): Pricing rule set file or directory, the built-in rules if not given
+            zones_path (str | Path | None): Zone file
+        """
+        self.path = Path(path)
+        self.store = PricingRulesStore(compile_engine, rules_path, zones_path)
+        # Carry on from a file left by an earlier publisher, so the generation
+        # always changes
+        self.generation = read_generation(self.path) or 0
+        self.publish()
+
+    def publish(self) -> int:
+        """Publish the current rules as the next generation.
+
+        Returns:
+            int: The generation published
+        """
+        with _publication_lock(self.path):
+            # After any generation a worker published with its store
+            generation = read_generation(self.path) or 0
+            self.generation = max(self.generation, generation) + 1
+            write_tables(self.path, self.store.snapshot, self.generation)
+        logger.info(
+            "Published pricing tables generation %d of rules version %s to %s",
+            self.generation,
+            self.store.snapshot.rules.VERSION,
+            self.path,
+        )
+        return self.generation
+
+    def reload(self) -> bool:
+        """Publish the rule set and zone files if either changed since the last load.
+
+        Returns:
+            bool: True if a new generation was published
+        """
+        if not self.store.reload():
+            return False
+        self.publish()
+        return True
+
+    def run(self, interval: float, stop: threading.Event | None = None) -> None:
+        """Poll the rule set and zone files and publish them when they change, until `stop` is set.
+
+        Args:
+            interval (float): Seconds between polls
+            stop (threading.Event | None): Ends the loop when set
+        """
+        stop = stop or threading.Event()
+        while not stop.wait(interval):
+            try:
+                self.reload()
+            except Exception:
+                logger.exception("Failed to publish pricing tables to %s", self.path)
@@ -0,0 +1,276 @@
+import asyncio
+import logging
+import threading
+import time as time_module
+from collections.abc import Callable, Mapping
+from pathlib import Path
+
+from pydantic import NonNegativeFloat, TypeAdapter
+
+logger = logging.getLogger(__name__)
+
+capacity_adapter = TypeAdapter(dict[str, NonNegativeFloat])
+
+
+class SlidingWindowCounter:
+    """Counts events over the last `window` seconds in a ring buffer of `buckets` slots.
+
+    Each slot counts the events of one `window / buckets` long slice of time, and a running total holds the sum of all slots. Moving to a new slice clears the slots of the slices that went by, so adding an event and reading the total both take constant time, amortized over the slices. The total covers between `window` minus one slice and `window` seconds.
+
+    Not thread-safe, callers serialize access.
+    """
+
+    __slots__ = ("_width", "_counts", "_total", "_slice")
+
+    def __init__(self, window: float, buckets: int = 60):
+        """
+        Args:
+            window (float): Seconds of events counted
+            buckets (int): Slots the window is divided into
+        """
+        self._width = window / buckets
+        self._counts = [0] * buckets
+        self._total = 0
+        self._slice = 0
+
+    def _advance(self, now: float) -> int:
+        """Clear the slots of the slices gone by since the last event, and return the slot of `now`."""
+        current = int(now // self._width)
+        counts = self._counts
+        buckets = len(counts)
+        passed = current - self._slice
+        if passed > 0:
+            if passed >= buckets:
+                counts[:] = [0] * buckets
+                self._total = 0
+            else:
+                for slice_ in range(self._slice + 1, current + 1):
+                    slot = slice_ % buckets
+                    self._total -= counts[slot]
+                    counts[slot] = 0
+            self._slice = current
+        return self._slice % buckets
+
+    def add(self, now: float, count: int = 1) -> int:
+        """Count events.
+
+        Args:
+            now (float): The current time in seconds
+            count (int): Events to count
+
+        Returns:
+            int: The events in the window, including these
+        """
+        self._counts[self._advance(now)] += count
+        self._total += count
+        return self._total
+
+    def total(self, now: float) -> int:
+        """Count the events in the window.
+
+        Args:
+            now (float): The current time in seconds
+
+        Returns:
+            int: The events in the window
+        """
+        self._advance(now)
+        return self._total
+
+
+def load_capacity(path: str | Path) -> dict[str, float]:
+    """Load the courier capacity of the zones from a JSON file.
+
+    The file is a JSON object mapping zone ids to the number of orders the couriers of the zone can deliver over the surge window.
+
+    Args:
+        path (str | Path): The capacity file
+
+    Returns:
+        dict[str, float]: The capacity of every zone in the file
+    """
+    return capacity_adapter.validate_json(Path(path).read_bytes())
+
+
+class SurgePricing:
+    """Surge multipliers following the demand of each zone.
+
+    The demand of a zone is the number of quotes for it over the last `window` seconds, counted in a `SlidingWindowCounter`. Its capacity is the number of orders its couriers can deliver over the same time, supplied through `update_capacity` or a capacity file. While demand exceeds capacity, the multiplier grows by `sensitivity` for each multiple of the capacity in excess, in steps of `step` and up to `max_multiplier`. Stepping keeps the number of distinct multipliers small, so quotes stay cacheable and a fee doesn't change on every quote.
+
+    Only zones with a capacity are surge priced. Counting a quote and reading the multiplier take one dict lookup and a constant amount of work under a lock, which guards the counters against the threadpool the sync routes run in and costs little uncontended.
+
+    The counts are per worker process. With `capacity_share` set to the share of the traffic each worker receives, e.g. `1 / SERVER_WORKERS` behind an even load balancer, each worker compares its own share of the demand with its share of the capacity.
+    """
+
+    def __init__(
+        self,
+        window: float = 600.0,
+        buckets: int = 60,
+        sensitivity: float = 0.5,
+        max_multiplier: float = 2.0,
+        step: float = 0.1,
+        capacity_share: float = 1.0,
+        capacity_path: str | Path | None = None,
+        clock: Callable[[], float] = time_module.monotonic,
+    ):
+        """
+        Args:
+            window (float): Seconds of quotes counted as the demand of a zone
+            buckets (int): Slots of the demand counters, the window slides by `window / buckets` seconds
+            sensitivity (float): Multiplier added per multiple of the capacity the demand exceeds it by
+            max_multiplier (float): Largest multiplier
+            step (float): Step the multiplier moves in
+            capacity_share (float): Share of the capacity of every zone this process prices against
+            capacity_path (str | Path | None): Capacity file loaded by `reload`, see `load_capacity`
+            clock (Callable[[], float]): Time in seconds
+
+        Raises:
+            ValueError: If `max_multiplier` is below 1
+        """
+        if max_multiplier < 1:
+            raise ValueError("The surge multiplier can't go below 1")
+        self.window = window
+        self.buckets = buckets
+        self.sensitivity = sensitivity
+        self.capacity_share = capacity_share
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._step = step
+        # Every multiplier handed out is one of these shared floats
+        self._levels = [
+            round(1 + level * step, 6)
+            for level in range(1, int((max_multiplier - 1) / step + 1e-9) + 1)
+        ]
+        self._zones: dict[str, tuple[SlidingWindowCounter, float]] = {}
+        self._capacity_path = Path(capacity_path) if capacity_path else None
+        self._source: int | None = None
+        if self._capacity_path is not None:
+            self.reload()
+
+    def update_capacity(self, capacity: Mapping[str, float]) -> None:
+        """Replace the capacity of the zones.
+
+        Zones keep the demand counted so far, zones missing from `capacity` stop being surge priced.
+
+        Args:
+            capacity (Mapping[str, float]): Orders the couriers of each zone can deliver over the window
+        """
+        zones = self._zones
+        # Published with a single assignment, so readers see either version
+        self._zones = {
+            zone_id: (
+                (
+                    zones[zone_id][0]
+                    if zone_id in zones
+                    else SlidingWindowCounter(self.window, self.buckets)
+                ),
+                zone_capacity * self.capacity_share,
+            )
+            for zone_id, zone_capacity in capacity.items()
+        }
+
+    def _multiplier(self, demand: int, capacity: float) -> float | None:
+        if demand <= capacity:
+            return None
+        if capacity <= 0:
+            return self._levels[-1] if self._levels else None
+        # Nudged up so a ratio that is a whole number of steps isn't rounded down
+        level = int(
+            (demand - capacity) / capacity * self.sensitivity / self._step + 1e-9
+        )
+        if level <= 0 or not self._levels:
+            return None
+        return self._levels[min(level, len(self._levels)) - 1]
+
+    def quote(self, zone_id: str) -> float | None:
+        """Count a quote for a zone and return its surge multiplier.
+
+        Args:
+            zone_id (str): The zone of the quote
+
+        Returns:
+            float | None: The multiplier, or None if the zone doesn't surge
+        """
+        zone = self._zones.get(zone_id)
+        if zone is None:
+            return None
+        counter, capacity = zone
+        now = self._clock()
+        with self._lock:
+            demand = counter.add(now)
+        return self._multiplier(demand, capacity)
+
+    def quote_many(self, zone_ids: list[str | None]) -> list[float | None]:
+        """`quote` for the orders of a batch, taking the lock once.
+
+        Args:
+            zone_ids (list[str | None]): The zone of each order, None for orders outside any zone
+
+        Returns:
+            list[float | None]: The multiplier of each order
+        """
+        zones = self._zones
+        now = self._clock()
+        demands: list[tuple[int, float] | None] = []
+        with self._lock:
+            for zone_id in zone_ids:
+                zone = zones.get(zone_id) if zone_id is not None else None
+                if zone is None:
+                    demands.append(None)
+                else:
+                    demands.append((zone[0].add(now), zone[1]))
+        return [
+            self._multiplier(*demand) if demand is not None else None
+            for demand in demands
+        ]
+
+    def multiplier(self, zone_id: str) -> float | None:
+        """Read the surge multiplier of a zone without counting a quote.
+
+        Args:
+            zone_id (str): The zone
+
+        Returns:
+            float | None: The multiplier, or None if the zone doesn't surge
+        """
+        zone = self._zones.get(zone_id)
+        if zone is None:
+            return None
+        counter, capacity = zone
+        now = self._clock()
+        with self._lock:
+            demand = counter.total(now)
+        return self._multiplier(demand, capacity)
+
+    def reload(self) -> bool:
+        """Load the capacity file again if it changed since the last load.
+
+        Returns:
+            bool: True if the capacity was updated
+        """
+        if self._capacity_path is None:
+            return False
+        source = self._capacity_path.stat().st_mtime_ns
+        if source == self._source:
+            return False
+        self.update_capacity(load_capacity(self._capacity_path))
+        self._source = source
+        logger.info("Loaded courier capacity of %d zones", len(self._zones))
+        return True
+
+    async def watch(self, interval: float) -> None:
+        """Poll the capacity file and reload it when it changes.
+
+        A file that fails to load is logged and the current capacity stays in place.
+
+        Args:
+            interval (float): Seconds between polls
+        """
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await asyncio.to_thread(self.reload)
+            except Exception:
+                logger.exception(
+                    "Failed to reload courier capacity from %s", self._capacity_path
+                )
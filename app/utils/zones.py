@@ -0,0 +1,279 @@
+import math
+from array import array
+from collections.abc import Mapping, Sequence
+from pathlib import Path
+from typing import Any, NamedTuple
+
+from pydantic import Field, TypeAdapter
+from pydantic.dataclasses import dataclass
+
+# A zone without a rule set of its own is priced with the base rules
+BASE_RULE_SET = 0
+
+
+class UnknownZoneError(LookupError):
+    """A request named a zone that is not in the zone index."""
+
+    def __init__(self, zone_id: str):
+        super().__init__(f"Unknown zone_id {zone_id!r}")
+        self.zone_id = zone_id
+
+
+# The arrays and grid parameters a lookup reads
+_BUFFERS = (
+    "_xs",
+    "_ys",
+    "_vertex_offsets",
+    "_bounds",
+    "_cell_offsets",
+    "_cell_zones",
+)
+_GRID = ("_min_x", "_min_y", "_columns", "_rows", "_cell_width", "_cell_height")
+
+
+class ZoneIndex:
+    """Point-in-zone lookups over zone polygons, held in flat arrays.
+
+    Zones are bucketed into a uniform grid over their combined bounding box. A lookup reads the zone candidates of the one grid cell the point falls in, rejects them by bounding box and runs a point-in-polygon test on the rest. The grid has about `cells_per_zone` cells per zone, so a cell holds a handful of candidates regardless of how many zones there are.
+
+    Vertices, bounding boxes and the grid are stored in `array` buffers rather than Python objects, which keeps a zone down to its id, 32 bytes of bounding box and 16 bytes per vertex. Zones are numbered by their position in the input, and where zones overlap the first one containing the point wins.
+    """
+
+    def __init__(
+        self,
+        zones: Sequence[tuple[str, Sequence[tuple[float, float]]]],
+        cells_per_zone: float = 4.0,
+    ):
+        """
+        Args:
+            zones (Sequence[tuple[str, Sequence[tuple[float, float]]]]): Zone ids and polygons as (longitude, latitude) vertices
+            cells_per_zone (float): Grid cells allocated per zone
+        """
+        self.zone_ids = [zone_id for zone_id, _ in zones]
+        self._positions = {zone_id: i for i, zone_id in enumerate(self.zone_ids)}
+        if len(self._positions) != len(self.zone_ids):
+            raise ValueError("Zone ids must be unique")
+
+        self._xs = array("d")
+        self._ys = array("d")
+        self._vertex_offsets = array("I", [0])
+        self._bounds = array("d")
+        for zone_id, polygon in zones:
+            if len(polygon) < 3:
+                raise ValueError(f"Zone {zone_id!r} needs at least 3 vertices")
+            xs = [float(x) for x, _ in polygon]
+            ys = [float(y) for _, y in polygon]
+            self._xs.extend(xs)
+            self._ys.extend(ys)
+            self._vertex_offsets.append(len(self._xs))
+            self._bounds.extend((min(xs), min(ys), max(xs), max(ys)))
+
+        self._build_grid(cells_per_zone)
+
+    def _build_grid(self, cells_per_zone: float) -> None:
+        count = len(self.zone_ids)
+        if count == 0:
+            self._min_x = self._min_y = 0.0
+            self._columns = self._rows = 1
+            self._cell_width = self._cell_height = 1.0
+            self._cell_offsets = array("I", [0, 0])
+            self._cell_zones = array("I")
+            return
+
+        bounds = self._bounds
+        self._min_x = min(bounds[0::4])
+        self._min_y = min(bounds[1::4])
+        # Pad the extent so points on the far edges still fall inside the grid
+        width = (max(bounds[2::4]) - self._min_x) * (1 + 1e-9) or 1e-9
+        height = (max(bounds[3::4]) - self._min_y) * (1 + 1e-9) or 1e-9
+
+        cells = max(1, round(count * cells_per_zone))
+        self._columns = max(1, min(cells, round(math.sqrt(cells * width / height))))
+        self._rows = max(1, min(cells, round(cells / self._columns)))
+        self._cell_width = width / self._columns
+        self._cell_height = height / self._rows
+
+        buckets: list[list[int]] = [[] for _ in range(self._columns * self._rows)]
+        for position in range(count):
+            min_x, min_y, max_x, max_y = bounds[4 * position : 4 * position + 4]
+            first_column, first_row = self._cell(min_x, min_y)
+            last_column, last_row = self._cell(max_x, max_y)
+            for row in range(first_row, last_row + 1):
+                for column in range(first_column, last_column + 1):
+                    buckets[row * self._columns + column].append(position)
+
+        self._cell_offsets = array("I", [0])
+        self._cell_zones = array("I")
+        for bucket in buckets:
+            self._cell_zones.extend(bucket)
+            self._cell_offsets.append(len(self._cell_zones))
+
+    def _cell(self, x: float, y: float) -> tuple[int, int]:
+        column = int((x - self._min_x) / self._cell_width)
+        row = int((y - self._min_y) / self._cell_height)
+        return (
+            min(max(column, 0), self._columns - 1),
+            min(max(row, 0), self._rows - 1),
+        )
+
+    def buffers(self) -> dict[str, array]:
+        """The vertex, bounding box and grid arrays, to rebuild the index with `from_buffers`."""
+        return {name.lstrip("_"): getattr(self, name) for name in _BUFFERS}
+
+    def grid(self) -> dict[str, float]:
+        """The placement and size of the grid, to rebuild the index with `from_buffers`."""
+        return {name.lstrip("_"): getattr(self, name) for name in _GRID}
+
+    @classmethod
+    def from_buffers(
+        cls,
+        zone_ids: Sequence[str],
+        positions: Mapping[str, int],
+        buffers: dict[str, Sequence],
+        grid: dict[str, float],
+    ) -> "ZoneIndex":
+        """Rebuild an index from the arrays of another, without bucketing the zones again.
+
+        The arrays are used as they are, e.g. memoryviews of shared memory, so every process mapping them shares one copy.
+
+        Args:
+            zone_ids (Sequence[str]): The zone ids by position
+            positions (Mapping[str, int]): The position of every zone id
+            buffers (dict[str, Sequence]): The `buffers` of the index
+            grid (dict[str, float]): The `grid` of the index
+
+        Returns:
+            ZoneIndex: The index
+        """
+        index = cls.__new__(cls)
+        index.zone_ids = zone_ids
+        index._positions = positions
+        for name in _BUFFERS:
+            setattr(index, name, buffers[name.lstrip("_")])
+        for name in _GRID:
+            setattr(index, name, grid[name.lstrip("_")])
+        return index
+
+    def __len__(self) -> int:
+        return len(self.zone_ids)
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by the vertex, bounding box and grid arrays."""
+        return sum(buffer.itemsize * len(buffer) for buffer in self.buffers().values())
+
+    def position(self, zone_id: str) -> int:
+        """Find a zone by its id.
+
+        Args:
+            zone_id (str): The zone id
+
+        Returns:
+            int: The position of the zone, or -1 if there is no such zone
+        """
+        return self._positions.get(zone_id, -1)
+
+    def locate(self, latitude: float, longitude: float) -> int:
+        """Find the zone containing a point.
+
+        Args:
+            latitude (float): Latitude of the point
+            longitude (float): Longitude of the point
+
+        Returns:
+            int: The position of the zone, or -1 if no zone contains the point
+        """
+        x, y = longitude, latitude
+        column = (x - self._min_x) / self._cell_width
+        row = (y - self._min_y) / self._cell_height
+        if not (0 <= column < self._columns and 0 <= row < self._rows):
+            return -1
+
+        cell = int(row) * self._columns + int(column)
+        bounds = self._bounds
+        cell_zones = self._cell_zones
+        for i in range(self._cell_offsets[cell], self._cell_offsets[cell + 1]):
+            position = cell_zones[i]
+            b = 4 * position
+            if (
+                bounds[b] <= x <= bounds[b + 2]
+                and bounds[b + 1] <= y <= bounds[b + 3]
+                and self._contains(position, x, y)
+            ):
+                return position
+        return -1
+
+    def _contains(self, position: int, x: float, y: float) -> bool:
+        """Even-odd ray casting test of a point against one zone polygon."""
+        xs = self._xs
+        ys = self._ys
+        start = self._vertex_offsets[position]
+        end = self._vertex_offsets[position + 1]
+        inside = False
+        previous_x = xs[end - 1]
+        previous_y = ys[end - 1]
+        for i in range(start, end):
+            current_x = xs[i]
+            current_y = ys[i]
+            if (current_y > y) != (previous_y > y) and x < (previous_x - current_x) * (
+                y - current_y
+            ) / (previous_y - current_y) + current_x:
+                inside = not inside
+            previous_x = current_x
+            previous_y = current_y
+        return inside
+
+
+@dataclass(frozen=True)
+class ZoneDefinition:
+    id: str
+    polygon: list[tuple[float, float]] = Field(min_length=3)
+    rule_set: str | None = None
+
+
+@dataclass(frozen=True)
+class ZoneFile:
+    zones: list[ZoneDefinition]
+    rule_sets: dict[str, dict[str, Any]] = Field(default_factory=dict)
+
+
+zone_file_adapter = TypeAdapter(ZoneFile)
+
+
+class ZoneRules(NamedTuple):
+    index: ZoneIndex
+    # Rule parameters overridden by each named rule set, in file order
+    rule_sets: dict[str, dict[str, Any]]
+    # Per zone, BASE_RULE_SET or 1 + the position of its rule set in `rule_sets`
+    zone_rule_sets: array
+
+
+def load_zones(path: str | Path) -> ZoneRules:
+    """Load zones and their rule sets from a JSON file.
+
+    The file has a `zones` list of `{"id", "polygon", "rule_set"}` objects, with polygons as `[longitude, latitude]` vertices like GeoJSON, and a `rule_sets` object mapping rule set names to the `PricingRules` parameters they override. Zones without a `rule_set` use the base rules.
+
+    Args:
+        path (str | Path): The zone file
+
+    Returns:
+        ZoneRules: The zone index and the rule set of every zone
+    """
+    zone_file = zone_file_adapter.validate_json(Path(path).read_bytes())
+    rule_set_numbers = {
+        name: number for number, name in enumerate(zone_file.rule_sets, start=1)
+    }
+
+    zone_rule_sets = array("H")
+    for zone in zone_file.zones:
+        if zone.rule_set is None:
+            zone_rule_sets.append(BASE_RULE_SET)
+        elif zone.rule_set in rule_set_numbers:
+            zone_rule_sets.append(rule_set_numbers[zone.rule_set])
+        else:
+            raise ValueError(
+                f"Zone {zone.id!r} refers to unknown rule set {zone.rule_set!r}"
+            )
+
+    index = ZoneIndex([(zone.id, zone.polygon) for zone in zone_file.zones])
+    return ZoneRules(index, zone_file.rule_sets, zone_rule_sets)
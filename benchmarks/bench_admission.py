@@ -0,0 +1,140 @@
+"""Latency of admitted requests under overload, with and without admission control.
+
+Starts a single-worker server and measures its capacity with the closed-loop load generator of `benchmarks.load_test`. Then it offers it an open-loop load: requests arrive at a fixed Poisson rate whatever the server's latency, as from many independent clients, over a pool of at most `MAX_CONNECTIONS` keep-alive connections. The latency of a request counts from its arrival, so time spent waiting for a free connection counts too. For each multiple of the capacity in `LOAD_FACTORS`, it reports the rate of successful requests, the p50 and p99 latency of the admitted ones, the share rejected with 429 or 503 and the requests that failed otherwise.
+
+Without admission control a server past its capacity admits everything and queues it, so latency grows for as long as the overload lasts. With shedding driven by the queueing delay the excess is rejected quickly and the admitted requests keep a bounded latency.
+
+Run with `python -m benchmarks.bench_admission`.
+"""
+
+import asyncio
+import multiprocessing
+import random
+import time
+
+from benchmarks.load_test import (
+    PATH,
+    build_requests,
+    free_port,
+    read_response,
+    run_load,
+    start_server,
+    wait_until_ready,
+)
+
+HOST = "127.0.0.1"
+DURATION = 8.0
+PROCESSES = 2
+MAX_CONNECTIONS = 256
+LOAD_FACTORS = (0.5, 1.0, 1.5, 2.0)
+SETUPS = {
+    "none": {"ADMISSION_CONTROL_ENABLED": "false"},
+    "shedding": {"ADMISSION_CONTROL_ENABLED": "true"},
+}
+
+
+async def generate_load(port: int, rate: float, seed: int) -> tuple[list, float]:
+    """Send requests arriving at `rate` per second for `DURATION` seconds.
+
+    Returns:
+        tuple[list, float]: The status and latency of every request, with status 0 for a lost connection, and the seconds until the last one was answered
+    """
+    requests = build_requests(HOST, port, PATH)
+    rng = random.Random(seed)
+    idle: list = []
+    slots = asyncio.Semaphore(MAX_CONNECTIONS)
+    results: list = []
+
+    async def send(arrival: float, request: bytes) -> None:
+        async with slots:
+            reader, writer = (
+                idle.pop() if idle else await asyncio.open_connection(HOST, port)
+            )
+            try:
+                writer.write(request)
+                status = await read_response(reader)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                # Closed by the server, e.g. after its keep-alive timeout
+                writer.close()
+                status = 0
+            else:
+                idle.append((reader, writer))
+            results.append((status, time.perf_counter() - arrival))
+
+    tasks = []
+    arrival = start = time.perf_counter()
+    while arrival < start + DURATION:
+        arrival += rng.expovariate(rate)
+        await asyncio.sleep(max(arrival - time.perf_counter(), 0))
+        tasks.append(
+            asyncio.create_task(send(arrival, requests[len(tasks) % len(requests)]))
+        )
+    await asyncio.gather(*tasks)
+    for _, writer in idle:
+        writer.close()
+    return results, time.perf_counter() - start
+
+
+def _client_process(args: tuple) -> tuple[list, float]:
+    return asyncio.run(generate_load(*args))
+
+
+def measure(env: dict, rate: float) -> dict:
+    port = free_port()
+    server = start_server(1, port, env)
+    try:
+        wait_until_ready(HOST, port)
+        time.sleep(1.0)
+        with multiprocessing.Pool(PROCESSES) as pool:
+            samples = pool.map(
+                _client_process,
+                [(port, rate / PROCESSES, seed) for seed in range(PROCESSES)],
+            )
+    finally:
+        server.terminate()
+        server.wait()
+    results = [result for sample, _ in samples for result in sample]
+    # Requests queued by an overloaded server are answered after the load stops
+    elapsed = max(seconds for _, seconds in samples)
+    admitted = sorted(latency for status, latency in results if status == 200)
+    rejected = sum(status in (429, 503) for status, _ in results)
+    return {
+        "rps": len(admitted) / elapsed,
+        "p50": admitted[len(admitted) // 2],
+        "p99": admitted[int(len(admitted) * 0.99)],
+        "rejected": rejected / len(results),
+        "errors": len(results) - len(admitted) - rejected,
+    }
+
+
+def measure_capacity() -> float:
+    port = free_port()
+    server = start_server(1, port, SETUPS["none"])
+    try:
+        wait_until_ready(HOST, port)
+        time.sleep(1.0)
+        return run_load(HOST, port, processes=PROCESSES, duration=DURATION)["rps"]
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main() -> None:
+    capacity = measure_capacity()
+    print(f"1 worker, capacity {capacity:.0f} req/s, {DURATION:.0f} s per setup")
+    print(
+        f"{'offered':>8}  {'admission':<9}  {'ok req/s':>8}  {'p50 ms':>8}"
+        f"  {'p99 ms':>9}  {'rejected':>8}  {'errors':>6}"
+    )
+    for factor in LOAD_FACTORS:
+        for name, env in SETUPS.items():
+            result = measure(env, capacity * factor)
+            print(
+                f"{factor:>7.1f}x  {name:<9}  {result['rps']:>8.0f}"
+                f"  {result['p50'] * 1e3:>8.2f}  {result['p99'] * 1e3:>9.2f}"
+                f"  {result['rejected']:>8.1%}  {result['errors']:>6}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Latency of `calculate_fee` with the quote audit log off and on.
+
+First measures the cost of the audit log in-process: queueing a quote with `AuditLog.record`, which is all the request path does, and packing and writing a batch of records, which the writer thread does off the event loop.
+
+Then starts a single-worker server per setup and drives it with the closed-loop load generator of `benchmarks.load_test`, over 1 connection for the latency of a lone request and `CONNECTIONS` connections to saturate the worker. The setups take turns for `ROUNDS` rounds, so a slower stretch of a shared machine doesn't land on one of them, and the median of each measurement is reported: the throughput, the p50 and p99 latency, and how much p99 grew over the run without the audit log. The setups write to a temporary directory with the default batching, and with an fsync after every batch to show what batching the fsyncs saves. Once the server has shut down, the records in the directory are counted, so a setup that dropped quotes shows fewer records than requests answered.
+
+Run with `python -m benchmarks.bench_audit_log`.
+"""
+
+import asyncio
+import datetime
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from app.utils.audit_log import AuditLog, read_audit_file
+from benchmarks.common import measure, percentile, report
+from benchmarks.load_test import (
+    free_port,
+    run_load,
+    start_server,
+    wait_until_ready,
+)
+
+HOST = "127.0.0.1"
+DURATION = 5.0
+ROUNDS = 5
+CONNECTIONS = (1, 32)
+BATCH = 10_000
+# Environment of each setup, None for the audit log off
+SETUPS = {
+    "off": None,
+    "on": {},
+    "on, fsync every batch": {"AUDIT_LOG_FSYNC_INTERVAL": "0"},
+}
+
+_TIME = datetime.datetime(2024, 1, 15, 13, 0, tzinfo=datetime.timezone.utc)
+
+
+def measure_in_process() -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        audit_log = AuditLog(directory, max_queue=BATCH)
+
+        def queue_batch() -> None:
+            for i in range(BATCH):
+                audit_log.record(790 + i, 2235, 4, _TIME, 710, "default")
+            audit_log._pending = []
+
+        queue = measure(queue_batch) / BATCH
+        records = [
+            (time.time(), 790 + i, 2235, 4, _TIME, 710, "default", None)
+            for i in range(BATCH)
+        ]
+        write = measure(lambda: audit_log._write(records), repeat=3) / BATCH
+        asyncio.run(audit_log.close())
+    print("Cost per quote")
+    report({"record": queue, "pack and write": write})
+    print()
+
+
+def measure_server(env: dict, connections: int) -> dict:
+    port = free_port()
+    with tempfile.TemporaryDirectory() as directory:
+        if env is not None:
+            env = {**env, "AUDIT_LOG_PATH": directory}
+        server = start_server(1, port, env)
+        try:
+            wait_until_ready(HOST, port)
+            time.sleep(1.0)
+            result = run_load(
+                HOST, port, processes=1, connections=connections, duration=DURATION
+            )
+        finally:
+            # Shutting down writes the quotes still queued
+            server.terminate()
+            server.wait()
+        records = sum(
+            1 for path in Path(directory).iterdir() for _ in read_audit_file(path)
+        )
+    latencies = result["latencies"]
+    return {
+        "rps": result["rps"],
+        "p50": percentile(latencies, 0.5),
+        "p99": percentile(latencies, 0.99),
+        "requests": len(latencies) - result["errors"],
+        "records": records,
+    }
+
+
+def main() -> None:
+    measure_in_process()
+    print(f"1 worker, median of {ROUNDS} runs of {DURATION:.0f} s per setup")
+    print(
+        f"{'connections':>11}  {'audit log':<21}  {'req/s':>7}  {'p50 ms':>7}"
+        f"  {'p99 ms':>7}  {'p99 +':>6}  {'requests':>8}  {'records':>8}"
+    )
+    for connections in CONNECTIONS:
+        rounds = [
+            {name: measure_server(env, connections) for name, env in SETUPS.items()}
+            for _ in range(ROUNDS)
+        ]
+        baseline = None
+        for name in SETUPS:
+            result = {
+                key: statistics.median(r[name][key] for r in rounds)
+                for key in rounds[0][name]
+            }
+            if baseline is None:
+                baseline = result["p99"]
+            print(
+                f"{connections:>11}  {name:<21}  {result['rps']:>7.0f}"
+                f"  {result['p50'] * 1e3:>7.3f}  {result['p99'] * 1e3:>7.3f}"
+                f"  {result['p99'] / baseline - 1:>6.1%}  {result['requests']:>8.0f}"
+                f"  {result['records']:>8.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
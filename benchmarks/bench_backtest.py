@@ -0,0 +1,84 @@
+"""Throughput and memory of backtesting a rule change over memory-mapped order files.
+
+Writes `--rows` synthetic orders to a temporary directory in chunks, then re-prices them with the default rules and a changed rule set, with one process and with all cores. The memory allocated by the in-process run peaks at a few chunks whatever the number of rows, as the mapped files are only paged in.
+
+Run with `python -m benchmarks.bench_backtest [--rows 10000000]`.
+"""
+
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+from numpy.lib.format import open_memmap
+
+from app.utils.backtest import DEFAULT_CHUNK_SIZE, run_backtest
+from app.utils.fee_calculator import PricingRules
+
+COLUMNS = {
+    "cart_value": np.int32,
+    "delivery_distance": np.int32,
+    "number_of_items": np.int16,
+    "time": "datetime64[s]",
+}
+
+
+def write_orders(directory: Path, rows: int) -> None:
+    columns = {
+        name: open_memmap(directory / f"{name}.npy", "w+", dtype, (rows,))
+        for name, dtype in COLUMNS.items()
+    }
+    rng = np.random.default_rng(0)
+    start = np.datetime64("2024-01-01T00:00:00", "s")
+    for offset in range(0, rows, DEFAULT_CHUNK_SIZE):
+        count = min(DEFAULT_CHUNK_SIZE, rows - offset)
+        chunk = slice(offset, offset + count)
+        columns["cart_value"][chunk] = np.maximum(
+            rng.lognormal(np.log(2500), 0.7, count), 1
+        )
+        columns["delivery_distance"][chunk] = np.maximum(
+            rng.gamma(2.0, 1000.0, count), 1
+        )
+        columns["number_of_items"][chunk] = np.minimum(rng.geometric(1 / 3, count), 60)
+        columns["time"][chunk] = start + rng.integers(0, 90 * 24 * 3600, count)
+    for column in columns.values():
+        column.flush()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    args = parser.parse_args()
+
+    new_rules = PricingRules(VERSION="new", FEE_LIMIT=1200, RUSH_HOUR_MULTIPLIER=1.5)
+    with tempfile.TemporaryDirectory() as directory:
+        start = time.perf_counter()
+        write_orders(Path(directory), args.rows)
+        size = sum(path.stat().st_size for path in Path(directory).iterdir())
+        print(
+            f"Wrote {args.rows} orders, {size / 2**20:.0f} MiB, "
+            f"in {time.perf_counter() - start:.1f} s"
+        )
+
+        for workers in sorted({1, os.cpu_count() or 1}):
+            # Only allocations of this process are traced, so only the
+            # in-process run reports them
+            tracemalloc.start()
+            start = time.perf_counter()
+            result = run_backtest(directory, PricingRules(), new_rules, workers=workers)
+            seconds = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            allocated = f"peak allocated {peak / 2**20:.0f} MiB" if workers == 1 else ""
+            print(
+                f"{workers:>3} worker(s)  {seconds:>7.2f} s  "
+                f"{args.rows / seconds / 1e6:>6.2f} M orders/s  "
+                f"delta {result['delta_total'] / 100:+.2f} EUR  {allocated}"
+            )
+
+
+if __name__ == "__main__":
+    main()
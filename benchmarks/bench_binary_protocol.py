@@ -0,0 +1,232 @@
+"""The binary fee protocol compared with the JSON routes, over real sockets.
+
+Starts `python -m app.server` with one worker and `BINARY_PROTOCOL_ENABLED`, then for single orders and batches:
+
+- bytes on the wire per order, request and response, HTTP headers included for JSON
+- orders per second, with a client pipelining requests over a few connections
+- orders per core-second, the CPU time the server process spent, read from `/proc`, per order priced
+
+The client runs in this process on the same machine, so the orders per second are bounded by it as much as by the server; the core-seconds are the server's alone.
+
+Run with `python -m benchmarks.bench_binary_protocol [--duration 5]`.
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import time
+
+from app.utils.binary_protocol import BinaryFeeClient, encode_request, encode_response
+from benchmarks import load_test
+from benchmarks.common import realistic_orders
+
+HOST = "127.0.0.1"
+BATCH_SIZE = 100
+CONNECTIONS = 8
+
+_EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+_MICROSECOND = datetime.timedelta(microseconds=1)
+
+
+def cpu_seconds(pid: int) -> float:
+    """User and system CPU time of a process so far."""
+    with open(f"/proc/{pid}/stat") as f:
+        # The command name is in parentheses and may hold spaces
+        fields = f.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def json_requests(orders: list[dict], port: int, batch_size: int) -> list[bytes]:
+    """HTTP requests pricing the orders one by one or in batches."""
+    if batch_size == 1:
+        return load_test.build_requests(HOST, port, load_test.PATH, len(orders))
+    orders = [
+        {**order, "time": order["time"].isoformat().replace("+00:00", "Z")}
+        for order in orders
+    ]
+    requests = []
+    for start in range(0, len(orders), batch_size):
+        body = json.dumps({"orders": orders[start : start + batch_size]}).encode()
+        requests.append(
+            "POST /api/v1/fees/calculate_fees HTTP/1.1\r\n"
+            f"Host: {HOST}:{port}\r\n"
+            "Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            "\r\n".encode() + body
+        )
+    return requests
+
+
+def binary_batches(orders: list[dict], batch_size: int) -> list[list[tuple]]:
+    rows = [
+        (
+            order["cart_value"],
+            order["delivery_distance"],
+            order["number_of_items"],
+            (order["time"] - _EPOCH) // _MICROSECOND,
+        )
+        for order in orders
+    ]
+    return [
+        rows[start : start + batch_size] for start in range(0, len(rows), batch_size)
+    ]
+
+
+async def _json_connection(
+    port: int, requests: list[bytes], offset: int, deadline: float
+) -> tuple[int, int]:
+    """Send requests over one keep-alive connection until the deadline.
+
+    Returns:
+        tuple[int, int]: Requests answered and bytes received
+    """
+    reader, writer = await asyncio.open_connection(HOST, port)
+    answered = received = 0
+    while time.perf_counter() < deadline:
+        writer.write(requests[(offset + answered) % len(requests)])
+        head = await reader.readuntil(b"\r\n\r\n")
+        status = int(head[9:12])
+        content_length = 0
+        for line in head.split(b"\r\n"):
+            if line[:15].lower() == b"content-length:":
+                content_length = int(line[15:])
+        await reader.readexactly(content_length)
+        if status != 200:
+            raise RuntimeError(f"Request failed with status {status}")
+        answered += 1
+        received += len(head) + content_length
+    writer.close()
+    return answered, received
+
+
+async def _binary_connection(
+    port: int, batches: list[list[tuple]], offset: int, deadline: float
+) -> int:
+    """Stream batches over one connection until the deadline.
+
+    Returns:
+        int: Batches answered
+    """
+
+    def pending():
+        index = offset
+        while time.perf_counter() < deadline:
+            yield batches[index % len(batches)]
+            index += 1
+
+    client = await BinaryFeeClient.connect(HOST, port)
+    answered = 0
+    try:
+        async for response in client.stream(pending(), window=16):
+            if response.status != 0:
+                raise RuntimeError(f"Request failed: {response.text}")
+            answered += 1
+    finally:
+        await client.close()
+    return answered
+
+
+async def _json_run(port: int, requests: list[bytes], duration: float) -> tuple:
+    deadline = time.perf_counter() + duration
+    results = await asyncio.gather(
+        *(
+            _json_connection(port, requests, i * 97, deadline)
+            for i in range(CONNECTIONS)
+        )
+    )
+    return sum(answered for answered, _ in results), sum(b for _, b in results)
+
+
+async def _binary_run(port: int, batches: list[list[tuple]], duration: float) -> int:
+    deadline = time.perf_counter() + duration
+    results = await asyncio.gather(
+        *(
+            _binary_connection(port, batches, i * 97, deadline)
+            for i in range(CONNECTIONS)
+        )
+    )
+    return sum(results)
+
+
+def run(duration: float) -> dict[str, dict]:
+    """Measure every protocol and batch size against one server.
+
+    Returns:
+        dict[str, dict]: By name, the `bytes_per_order`, `orders_per_second` and `orders_per_core_second`
+    """
+    http_port = load_test.free_port()
+    binary_port = load_test.free_port()
+    server = load_test.start_server(
+        1,
+        http_port,
+        {
+            "BINARY_PROTOCOL_ENABLED": "true",
+            "BINARY_PROTOCOL_PORT": str(binary_port),
+            "METRICS_ENABLED": "false",
+        },
+    )
+    orders = realistic_orders(10_000)
+    results = {}
+    try:
+        load_test.wait_until_ready(HOST, http_port)
+        load_test.wait_until_ready(HOST, binary_port)
+        for batch_size in (1, BATCH_SIZE):
+            requests = json_requests(orders, http_port, batch_size)
+            # Warm up the routes, then measure
+            asyncio.run(_json_run(http_port, requests, 0.5))
+            cpu_start = cpu_seconds(server.pid)
+            start = time.perf_counter()
+            answered, received = asyncio.run(_json_run(http_port, requests, duration))
+            elapsed = time.perf_counter() - start
+            cpu = cpu_seconds(server.pid) - cpu_start
+            priced = answered * batch_size
+            sent = sum(len(request) for request in requests) / len(requests)
+            results[f"json[batch={batch_size}]"] = {
+                "bytes_per_order": (sent + received / answered) / batch_size,
+                "orders_per_second": priced / elapsed,
+                "orders_per_core_second": priced / cpu,
+            }
+
+            batches = binary_batches(orders, batch_size)
+            asyncio.run(_binary_run(binary_port, batches, 0.5))
+            cpu_start = cpu_seconds(server.pid)
+            start = time.perf_counter()
+            answered = asyncio.run(_binary_run(binary_port, batches, duration))
+            elapsed = time.perf_counter() - start
+            cpu = cpu_seconds(server.pid) - cpu_start
+            priced = answered * batch_size
+            request_size = len(encode_request(0, batches[0]))
+            response_size = len(encode_response(0, 0, "default", [0] * batch_size))
+            results[f"binary[batch={batch_size}]"] = {
+                "bytes_per_order": (request_size + response_size) / batch_size,
+                "orders_per_second": priced / elapsed,
+                "orders_per_core_second": priced / cpu,
+            }
+    finally:
+        server.terminate()
+        server.wait()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.bench_binary_protocol")
+    parser.add_argument("--duration", type=float, default=5.0)
+    args = parser.parse_args()
+
+    results = run(args.duration)
+    width = max(len(name) for name in results)
+    print(
+        f"{'':<{width}}  {'bytes/order':>11}  {'orders/s':>10}  {'orders/core-s':>13}"
+    )
+    for name, result in results.items():
+        print(
+            f"{name:<{width}}  {result['bytes_per_order']:>11.1f}"
+            f"  {result['orders_per_second']:>10.0f}"
+            f"  {result['orders_per_core_second']:>13.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+"""Microbenchmarks of the fee calculators.
+
+Run with `python -m benchmarks.bench_calculator`.
+"""
+
+from benchmarks.common import measure, random_orders, report
+from app.utils.compiled_fee_calculator import CompiledFeeCalculator
+from app.utils.fee_calculator import FeeCalculator
+
+
+def main() -> None:
+    orders = random_orders(1000)
+    calculators = {
+        "FeeCalculator": FeeCalculator(),
+        "CompiledFeeCalculator": CompiledFeeCalculator(),
+    }
+
+    results = {}
+    for name, calculator in calculators.items():
+
+        def run(calculate=calculator.calculate_delivery_fee):
+            for order in orders:
+                calculate(**order)
+
+        results[name] = measure(run) / len(orders)
+
+        def run_breakdown(calculate=calculator.calculate_delivery_fee_breakdown):
+            for order in orders:
+                calculate(**order)
+
+        results[f"{name} breakdown"] = measure(run_breakdown) / len(orders)
+
+    print(f"Per-order fee calculation over {len(orders)} random orders")
+    report(results, baseline="FeeCalculator")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Fee requests of a flash sale burst, priced one by one or through the coalescer.
+
+Most requests of the burst repeat a few popular cart shapes. Reports the time to answer the whole burst, the latency of the requests in it and the coalescing ratio for a few windows.
+
+Run with `python -m benchmarks.bench_coalescing`.
+"""
+
+import asyncio
+import random
+import time
+
+from app.utils.fee_calculator import FeeCalculator
+from app.utils.fee_coalescer import FeeCoalescer
+from app.utils.metrics import CounterChild
+from benchmarks.common import percentile, random_orders
+
+BURST = 5000
+
+
+def flash_sale_orders(count: int, hot_share: float = 0.9) -> list[dict]:
+    rng = random.Random(0)
+    hot = random_orders(20)
+    cold = random_orders(count)
+    return [
+        rng.choice(hot) if rng.random() < hot_share else cold[i] for i in range(count)
+    ]
+
+
+async def burst(orders: list[dict], price) -> tuple[float, list[float]]:
+    latencies = []
+
+    async def request(order):
+        # Yield first, so all requests of the burst are in flight together
+        await asyncio.sleep(0)
+        start = time.perf_counter()
+        await price(order)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(request(order) for order in orders))
+    return time.perf_counter() - start, sorted(latencies)
+
+
+def main() -> None:
+    fee_calculator = FeeCalculator()
+    orders = flash_sale_orders(BURST)
+
+    async def direct(order):
+        return fee_calculator.calculate_delivery_fee(**order)
+
+    configs = {"no coalescing": None}
+    for window in (0, 0.0005, 0.002):
+        configs[f"window {window * 1000:g} ms"] = window
+
+    print(f"Burst of {BURST} requests, 90% of them for 20 popular carts")
+    print(
+        f"{'':<16}{'total ms':>10}{'p50 µs':>10}{'p99 µs':>10}{'requests/computation':>22}"
+    )
+    for name, window in configs.items():
+        requests, computations = CounterChild(), CounterChild()
+        if window is None:
+            price = direct
+        else:
+            coalescer = FeeCoalescer(
+                window=window, requests=requests, computations=computations
+            )
+
+            async def price(order, coalescer=coalescer):
+                return await coalescer.calculate_delivery_fee(fee_calculator, **order)
+
+        # Best of a few bursts
+        total, latencies = min(asyncio.run(burst(orders, price)) for _ in range(5))
+        ratio = (
+            f"{requests.value / computations.value:.1f}" if computations.value else "-"
+        )
+        print(
+            f"{name:<16}{total * 1e3:>10.1f}{percentile(latencies, 0.5) * 1e6:>10.0f}"
+            f"{percentile(latencies, 0.99) * 1e6:>10.0f}{ratio:>22}"
+        )
+
+
+if __name__ == "__main__":
+    main()
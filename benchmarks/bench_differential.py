@@ -0,0 +1,60 @@
+"""Differential check and timing of every fee engine on the same orders.
+
+For the default rules and a timezone rush hour schedule, generates orders concentrated on the rule boundaries, checks that all engines price every order alike and times each of them on those orders. Exits with status 1 if any engine disagrees, so a faster engine can't change prices unnoticed.
+
+Run with `python -m benchmarks.bench_differential [--orders 100000]`.
+"""
+
+import argparse
+import datetime
+import sys
+
+from app.utils.differential import (
+    boundary_orders,
+    build_engines,
+    find_disagreements,
+    time_engines,
+)
+from app.utils.fee_calculator import PricingRules
+from app.utils.rush_hours import RushHourWindow
+from benchmarks.common import report
+
+RULE_SETS = {
+    "default": PricingRules(),
+    "Europe/Helsinki schedule": PricingRules(
+        VERSION="schedule",
+        RUSH_HOUR_TIMEZONE="Europe/Helsinki",
+        RUSH_HOURS=(
+            RushHourWindow(5, datetime.time(15), datetime.time(19), 1.2),
+            RushHourWindow(6, datetime.time(23), datetime.time(2), 1.7),
+        ),
+    ),
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--orders", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    disagreeing = False
+    for name, rules in RULE_SETS.items():
+        orders = boundary_orders(rules, args.orders, args.seed)
+        engines = build_engines(rules)
+        disagreements = find_disagreements(engines, orders)
+        print(
+            f"{name} rules, {len(orders)} boundary orders: "
+            f"{len(disagreements)} disagreement(s)"
+        )
+        for disagreement in disagreements[:10]:
+            print(f"  {disagreement.order}  {disagreement.fees}")
+        disagreeing |= bool(disagreements)
+        report(time_engines(engines, orders), baseline="scalar")
+        print()
+    if disagreeing:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
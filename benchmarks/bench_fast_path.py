@@ -0,0 +1,57 @@
+"""Throughput of the fast-path fee route compared with the FastAPI route.
+
+Requests are sent straight to the ASGI app in-process, so the numbers show the cost of the application itself without any network or HTTP parsing.
+
+Run with `python -m benchmarks.bench_fast_path`.
+"""
+
+import asyncio
+import json
+import os
+import time
+
+os.environ.setdefault("PROJECT_NAME", "benchmark")
+os.environ["FAST_PATH_ENABLED"] = "true"
+
+from app.main import app  # noqa: E402
+from benchmarks.common import asgi_request, random_orders  # noqa: E402
+
+REQUESTS = 20000
+
+
+async def requests_per_second(path: str, bodies: list[bytes]) -> float:
+    for body in bodies[:100]:
+        status, _ = await asgi_request(app, "POST", path, body)
+        assert status == 200, status
+
+    start = time.perf_counter()
+    for index in range(REQUESTS):
+        await asgi_request(app, "POST", path, bodies[index % len(bodies)])
+    return REQUESTS / (time.perf_counter() - start)
+
+
+async def main() -> None:
+    bodies = [
+        json.dumps(
+            {**order, "time": order["time"].isoformat().replace("+00:00", "Z")}
+        ).encode()
+        for order in random_orders(1000)
+    ]
+    results = {
+        "calculate_fee": await requests_per_second(
+            "/api/v1/fees/calculate_fee", bodies
+        ),
+        "calculate_fee_fast": await requests_per_second(
+            "/api/v1/fees/calculate_fee_fast", bodies
+        ),
+    }
+
+    print(f"In-process requests per second over {REQUESTS} requests")
+    for name, rps in results.items():
+        print(
+            f"{name:<20}  {rps:>10.0f} req/s  {rps / results['calculate_fee']:>6.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
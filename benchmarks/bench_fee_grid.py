@@ -0,0 +1,96 @@
+"""Pricing a week of fee heatmaps with the grid compared with pricing its orders.
+
+The grid is a dashboard's week: 168 hours of 20 distances, 200 cart values and 20 numbers of items, 13.4 million orders. It is priced by `compute_fee_grid`, serialized, and taken from the cache of recent grids. The same orders are priced as columns by `FeeCalculator.calculate_delivery_fees`, as a batch endpoint would, for one hour scaled up to the week, and one at a time by `calculate_delivery_fee` on a sample scaled up the same way. The calls to `calculate_fee` a dashboard made before come on top of the latter with their HTTP round trips.
+
+Run with `python -m benchmarks.bench_fee_grid`.
+"""
+
+import datetime
+
+import numpy as np
+
+from app.utils.fee_calculator import FeeCalculator, PricingRules
+from app.utils.fee_grid import (
+    FeeGridCache,
+    GridAxis,
+    GridSpec,
+    compute_fee_grid,
+    encode_fee_grid,
+    fee_grid,
+)
+from benchmarks.common import measure, report
+
+SPEC = GridSpec(
+    datetime.datetime(2024, 1, 15, tzinfo=datetime.timezone.utc),
+    168,
+    GridAxis(500, 10000, 500),
+    GridAxis(100, 20000, 100),
+    GridAxis(1, 20, 1),
+)
+SAMPLE = 10_000
+
+
+def main() -> None:
+    rules = PricingRules()
+    fee_calculator = FeeCalculator(rules)
+    hours, distances, cart_values, numbers_of_items = SPEC.shape
+    print(f"Grid of {SPEC.cells} orders, {SPEC.shape}")
+
+    columns = np.meshgrid(
+        SPEC.delivery_distance.values(),
+        SPEC.cart_value.values(),
+        SPEC.number_of_items.values(),
+        indexing="ij",
+    )
+    delivery_distance, cart_value, number_of_items = (
+        column.ravel() for column in columns
+    )
+    time = np.full(len(cart_value), np.datetime64("2024-01-19T16:00", "us"))
+    grid = compute_fee_grid(rules, SPEC)
+    assert (
+        fee_calculator.calculate_delivery_fees(
+            cart_value, delivery_distance, number_of_items, time
+        ).reshape(SPEC.shape[1:])
+        == grid[4 * 24 + 16]
+    ).all()
+
+    sample = np.random.default_rng(0).integers(0, len(cart_value), SAMPLE)
+    orders = [
+        {
+            "cart_value": int(cart_value[i]),
+            "delivery_distance": int(delivery_distance[i]),
+            "number_of_items": int(number_of_items[i]),
+            "time": SPEC.start,
+        }
+        for i in sample
+    ]
+    cache = FeeGridCache(256 * 1024 * 1024)
+    fee_grid(rules, SPEC, cache=cache)
+    report(
+        {
+            "one order at a time": measure(
+                lambda: [fee_calculator.calculate_delivery_fee(**o) for o in orders],
+                repeat=3,
+            )
+            / SAMPLE
+            * SPEC.cells,
+            "columns": measure(
+                lambda: fee_calculator.calculate_delivery_fees(
+                    cart_value, delivery_distance, number_of_items, time
+                ),
+                repeat=3,
+            )
+            * hours,
+            "grid": measure(lambda: compute_fee_grid(rules, SPEC)),
+            "grid, serialized": measure(
+                lambda: encode_fee_grid(compute_fee_grid(rules, SPEC))
+            ),
+            "grid, cached": measure(lambda: fee_grid(rules, SPEC, cache=cache)),
+        },
+        baseline="one order at a time",
+    )
+    print(f"{len(encode_fee_grid(grid))} bytes raw, int16")
+
+
+if __name__ == "__main__":
+    main()
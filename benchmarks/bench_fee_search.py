@@ -0,0 +1,77 @@
+"""Answering a threshold question with one search compared with scanning the input.
+
+Each question asks for the values of one input keeping the fee of an order within bounds: the smallest cart value bringing the fee to 600 or less, the number of items from which the fee limit applies and the largest delivery distance costing 1000 or less. The scan prices every value from 1 until the answer is settled, as a client without the search endpoint would, with calls the default engine can make without an HTTP round trip. Both get the same answer, checked before timing. The search takes about the same 31 fee calculations per bound whatever the answer, so a scan ending within a few dozen values, like the number of items, is as fast.
+
+Run with `python -m benchmarks.bench_fee_search`.
+"""
+
+import datetime
+
+from app.utils.fee_calculator import FeeCalculator, PricingRules
+from app.utils.fee_search import search_input
+from benchmarks.common import measure, report
+
+_TIME = datetime.datetime(2024, 1, 15, 13, 0, tzinfo=datetime.timezone.utc)
+
+# Question, the search and the other inputs of the order
+QUESTIONS = {
+    "cheapest cart value": (
+        {"vary": "cart_value", "max_fee": 600},
+        {"delivery_distance": 2235, "number_of_items": 4, "time": _TIME},
+    ),
+    "fee limit items": (
+        {"vary": "number_of_items", "min_fee": 1500},
+        {"cart_value": 1000, "delivery_distance": 1000, "time": _TIME},
+    ),
+    "longest distance": (
+        {"vary": "delivery_distance", "max_fee": 1000},
+        {"cart_value": 790, "number_of_items": 4, "time": _TIME},
+    ),
+}
+
+
+def scan(fee_calculator: FeeCalculator, vary: str, inputs: dict, accept) -> int:
+    """The first value from 1 whose fee `accept` changes its answer for."""
+    first = accept(fee_calculator.calculate_delivery_fee(**{**inputs, vary: 1}))
+    value = 2
+    while (
+        accept(fee_calculator.calculate_delivery_fee(**{**inputs, vary: value}))
+        == first
+    ):
+        value += 1
+    return value if not first else value - 1
+
+
+def main() -> None:
+    fee_calculator = FeeCalculator(PricingRules())
+    for name, (search, inputs) in QUESTIONS.items():
+        vary = search["vary"]
+        max_fee, min_fee = search.get("max_fee"), search.get("min_fee")
+
+        def accept(fee: int) -> bool:
+            return (max_fee is None or fee <= max_fee) and (
+                min_fee is None or fee >= min_fee
+            )
+
+        result = search_input(fee_calculator, vary, max_fee, min_fee, **inputs)
+        answer = result.min_value if result.max_value is None else result.max_value
+        assert scan(fee_calculator, vary, inputs, accept) == answer
+        print(f"{name}: {vary} {answer}")
+        report(
+            {
+                "scan": measure(
+                    lambda: scan(fee_calculator, vary, inputs, accept), repeat=3
+                ),
+                "search": measure(
+                    lambda: search_input(
+                        fee_calculator, vary, max_fee, min_fee, **inputs
+                    )
+                ),
+            },
+            baseline="scan",
+        )
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Per-request overhead of the latency and rule metrics.
+
+Settings are read once at import, so each configuration runs in its own process. Requests are sent straight to the ASGI app in-process.
+
+Run with `python -m benchmarks.bench_metrics`.
+"""
+
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+from benchmarks.common import asgi_request, random_orders
+
+REQUESTS = 20000
+PATHS = ("/api/v1/fees/calculate_fee", "/api/v1/fees/calculate_fee_fast")
+
+
+async def seconds_per_request(app, path: str, bodies: list[bytes]) -> float:
+    for body in bodies[:100]:
+        status, _ = await asgi_request(app, "POST", path, body)
+        assert status == 200, status
+
+    best = float("inf")
+    for _ in range(3):
+        start = time.perf_counter()
+        for index in range(REQUESTS):
+            await asgi_request(app, "POST", path, bodies[index % len(bodies)])
+        best = min(best, (time.perf_counter() - start) / REQUESTS)
+    return best
+
+
+def child() -> None:
+    from app.main import app
+
+    bodies = [
+        json.dumps(
+            {**order, "time": order["time"].isoformat().replace("+00:00", "Z")}
+        ).encode()
+        for order in random_orders(1000)
+    ]
+    results = {
+        path: asyncio.run(seconds_per_request(app, path, bodies)) for path in PATHS
+    }
+    print(json.dumps(results))
+
+
+def run(metrics_enabled: bool) -> dict[str, float]:
+    env = {
+        **os.environ,
+        "PROJECT_NAME": os.environ.get("PROJECT_NAME", "benchmark"),
+        "FAST_PATH_ENABLED": "true",
+        "METRICS_ENABLED": str(metrics_enabled).lower(),
+    }
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_metrics", "--child"],
+        env=env,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(output)
+
+
+def main() -> None:
+    disabled = run(metrics_enabled=False)
+    enabled = run(metrics_enabled=True)
+
+    print(f"Per-request time over {REQUESTS} in-process requests")
+    print(f"{'route':<34}  {'off µs':>8}  {'on µs':>8}  {'overhead µs':>11}")
+    for path in PATHS:
+        off, on = disabled[path] * 1e6, enabled[path] * 1e6
+        print(f"{path:<34}  {off:>8.1f}  {on:>8.1f}  {on - off:>11.1f}")
+
+
+if __name__ == "__main__":
+    if "--child" in sys.argv:
+        child()
+    else:
+        main()
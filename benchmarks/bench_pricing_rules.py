@@ -0,0 +1,50 @@
+"""Cost of reading the pricing snapshot compared with the hardcoded `Const` values.
+
+Run with `python -m benchmarks.bench_pricing_rules`.
+"""
+
+from app.utils.fee_calculator import Const, FeeCalculator
+from app.utils.pricing_rules import PricingRulesStore
+from benchmarks.common import measure, random_orders, report
+
+
+def main() -> None:
+    store = PricingRulesStore(FeeCalculator)
+    rules = store.snapshot.rules
+
+    print("Reading one pricing parameter")
+    report(
+        {
+            "Const.FEE_LIMIT": measure(lambda: Const.FEE_LIMIT),
+            "rules.FEE_LIMIT": measure(lambda: rules.FEE_LIMIT),
+            "store.snapshot.rules.FEE_LIMIT": measure(
+                lambda: store.snapshot.rules.FEE_LIMIT
+            ),
+        },
+        baseline="Const.FEE_LIMIT",
+    )
+
+    orders = random_orders(1000)
+    fee_calculator = store.snapshot.fee_calculator
+
+    def fixed_calculator():
+        for order in orders:
+            fee_calculator.calculate_delivery_fee(**order)
+
+    def snapshot_per_order():
+        for order in orders:
+            store.snapshot.fee_calculator.calculate_delivery_fee(**order)
+
+    print()
+    print("Pricing one order")
+    report(
+        {
+            "module-level calculator": measure(fixed_calculator) / len(orders),
+            "snapshot per order": measure(snapshot_per_order) / len(orders),
+        },
+        baseline="module-level calculator",
+    )
+
+
+if __name__ == "__main__":
+    main()
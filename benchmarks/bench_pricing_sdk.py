@@ -0,0 +1,63 @@
+"""Pricing orders with the client SDK compared with the engines of the service.
+
+Exports the default rules and a rule set with weekly rush hours in a timezone, and reports the size of each artifact. Then it prices the same orders with `app.sdk.pricing.FeeTable` and with the default and compiled engines, per order. A client pricing with the SDK saves the HTTP round trip of `calculate_fee` too, which `benchmarks.load_test` measures in milliseconds against the microseconds here.
+
+Run with `python -m benchmarks.bench_pricing_sdk`.
+"""
+
+import datetime
+
+from app.sdk.pricing import FeeTable
+from app.utils.compiled_fee_calculator import CompiledFeeCalculator
+from app.utils.fee_calculator import FeeCalculator, PricingRules
+from app.utils.rules_export import export_rules
+from app.utils.rush_hours import RushHourWindow
+from benchmarks.common import measure, realistic_orders, report
+
+RULE_SETS = {
+    "default": PricingRules(),
+    "Helsinki rush hours": PricingRules(
+        VERSION="helsinki",
+        RUSH_HOUR_TIMEZONE="Europe/Helsinki",
+        RUSH_HOURS=(
+            RushHourWindow(5, datetime.time(15), datetime.time(19), 1.2),
+            RushHourWindow(6, datetime.time(11), datetime.time(14), 1.1),
+        ),
+    ),
+}
+
+
+def main() -> None:
+    orders = realistic_orders(1000)
+    for name, rules in RULE_SETS.items():
+        export = export_rules(rules)
+        table = FeeTable.from_json(export.body, export.etag)
+        engines = {
+            "default engine": FeeCalculator(rules),
+            "compiled engine": CompiledFeeCalculator(rules),
+        }
+        for engine in engines.values():
+            for order in orders:
+                assert engine.calculate_delivery_fee(**order) == (
+                    table.calculate_delivery_fee(**order)
+                )
+
+        print(f"{name} rules, artifact of {len(export.body)} bytes")
+        results = {
+            engine_name: measure(
+                lambda engine=engine: [
+                    engine.calculate_delivery_fee(**order) for order in orders
+                ]
+            )
+            / len(orders)
+            for engine_name, engine in engines.items()
+        }
+        results["SDK"] = measure(
+            lambda: [table.calculate_delivery_fee(**order) for order in orders]
+        ) / len(orders)
+        report(results, baseline="default engine")
+        print()
+
+
+if __name__ == "__main__":
+    main()
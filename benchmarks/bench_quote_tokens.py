@@ -0,0 +1,106 @@
+"""Throughput of verifying quote tokens compared with pricing the orders again.
+
+Requests are sent straight to the ASGI app in-process, like in `bench_fast_path`, and the signer itself is timed against the fee calculators.
+
+Run with `python -m benchmarks.bench_quote_tokens`.
+"""
+
+import asyncio
+import json
+import os
+import time
+
+os.environ.setdefault("PROJECT_NAME", "benchmark")
+os.environ.setdefault("QUOTE_TOKEN_SECRET", "benchmark secret")
+
+from app.core.pricing import quote_signer  # noqa: E402
+from app.main import app  # noqa: E402
+from app.utils.compiled_fee_calculator import CompiledFeeCalculator  # noqa: E402
+from app.utils.fee_calculator import FeeCalculator  # noqa: E402
+from benchmarks.common import asgi_request, measure, random_orders, report  # noqa: E402
+
+REQUESTS = 20000
+
+
+async def requests_per_second(path: str, bodies: list[bytes]) -> float:
+    for body in bodies[:100]:
+        status, _ = await asgi_request(app, "POST", path, body)
+        assert status == 200, status
+
+    start = time.perf_counter()
+    for index in range(REQUESTS):
+        await asgi_request(app, "POST", path, bodies[index % len(bodies)])
+    return REQUESTS / (time.perf_counter() - start)
+
+
+def micro(orders: list[dict]) -> None:
+    fee_calculator = FeeCalculator()
+    compiled_fee_calculator = CompiledFeeCalculator()
+    order = orders[0]
+    delivery_fee = fee_calculator.calculate_delivery_fee(**order)
+    quote_token = quote_signer.sign(
+        *order.values(), delivery_fee, fee_calculator.rules.VERSION
+    )
+
+    print("Per call")
+    report(
+        {
+            "calculate_delivery_fee": measure(
+                lambda: fee_calculator.calculate_delivery_fee(**order)
+            ),
+            "compiled calculate_delivery_fee": measure(
+                lambda: compiled_fee_calculator.calculate_delivery_fee(**order)
+            ),
+            "sign": measure(
+                lambda: quote_signer.sign(
+                    *order.values(), delivery_fee, fee_calculator.rules.VERSION
+                )
+            ),
+            "verify": measure(lambda: quote_signer.verify(quote_token)),
+        },
+        baseline="calculate_delivery_fee",
+    )
+
+
+async def main() -> None:
+    orders = random_orders(1000)
+    micro(orders)
+
+    bodies = [
+        json.dumps(
+            {**order, "time": order["time"].isoformat().replace("+00:00", "Z")}
+        ).encode()
+        for order in orders
+    ]
+    quote_bodies = [
+        json.dumps({**json.loads(body), "include_quote_token": True}).encode()
+        for body in bodies
+    ]
+    verify_bodies = []
+    for body in quote_bodies[:1000]:
+        _, content = await asgi_request(app, "POST", "/api/v1/fees/calculate_fee", body)
+        verify_bodies.append(
+            json.dumps({"quote_token": json.loads(content)["quote_token"]}).encode()
+        )
+
+    results = {
+        "calculate_fee": await requests_per_second(
+            "/api/v1/fees/calculate_fee", bodies
+        ),
+        "calculate_fee + token": await requests_per_second(
+            "/api/v1/fees/calculate_fee", quote_bodies
+        ),
+        "verify_quote": await requests_per_second(
+            "/api/v1/fees/verify_quote", verify_bodies
+        ),
+    }
+
+    print(f"\nIn-process requests per second over {REQUESTS} requests")
+    for name, rps in results.items():
+        print(
+            f"{name:<22}  {rps:>10.0f} req/s  {rps / results['calculate_fee']:>6.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,99 @@
+"""Rush hour lookups: the precomputed UTC interval index against converting each order time to the timezone.
+
+Run with `python -m benchmarks.bench_rush_hours`.
+"""
+
+import datetime
+import time
+
+from app.utils.fee_calculator import FeeCalculator
+from app.utils.pricing_rules import pricing_rules_adapter
+from app.utils.rush_hours import RushHourSchedule
+from benchmarks.common import measure, random_orders, report
+
+rules = pricing_rules_adapter.validate_python(
+    {
+        "RUSH_HOUR_TIMEZONE": "Europe/Helsinki",
+        "RUSH_HOURS": [
+            {"ISOWEEKDAY": day, "START": "11:00", "END": "13:30", "MULTIPLIER": 1.1}
+            for day in range(1, 6)
+        ]
+        + [
+            {"ISOWEEKDAY": day, "START": "17:00", "END": "20:00", "MULTIPLIER": 1.2}
+            for day in range(1, 8)
+        ],
+    }
+)
+
+
+def main() -> None:
+    start = time.perf_counter()
+    schedule = RushHourSchedule(rules.RUSH_HOURS, rules.RUSH_HOUR_TIMEZONE)
+    print(
+        f"Building the index of {len(schedule.multipliers)} intervals took "
+        f"{time.perf_counter() - start:.3f} s, {len(schedule.bounds) * 8 / 1024:.0f} KiB"
+    )
+
+    orders = random_orders(1000)
+    times = [order["time"].replace(tzinfo=datetime.timezone.utc) for order in orders]
+    legacy = FeeCalculator()
+
+    def interval_index():
+        for order_time in times:
+            schedule.multiplier(order_time)
+
+    def tz_conversion():
+        for order_time in times:
+            schedule.multiplier_by_conversion(order_time)
+
+    def single_wall_clock_window():
+        for order_time in times:
+            legacy._rush_hour_multiplier(order_time)
+
+    print()
+    print(
+        f"Looking up the multiplier of one order time, {len(rules.RUSH_HOURS)} windows"
+    )
+    report(
+        {
+            "tz conversion": measure(tz_conversion) / len(times),
+            "interval index": measure(interval_index) / len(times),
+            "single wall-clock window": measure(single_wall_clock_window) / len(times),
+        },
+        baseline="tz conversion",
+    )
+
+    print()
+    print("Looking up the multipliers of 1000 order times at once")
+    report(
+        {
+            "tz conversion per time": measure(tz_conversion),
+            "interval index, vectorized": measure(
+                lambda: schedule.multipliers_of(times)
+            ),
+        },
+        baseline="tz conversion per time",
+    )
+
+    fee_calculator = FeeCalculator(rules)
+    print()
+    print("Pricing one order")
+    report(
+        {
+            "single wall-clock window": measure(
+                lambda: [legacy.calculate_delivery_fee(**order) for order in orders]
+            )
+            / len(orders),
+            "schedule": measure(
+                lambda: [
+                    fee_calculator.calculate_delivery_fee(**order) for order in orders
+                ]
+            )
+            / len(orders),
+        },
+        baseline="single wall-clock window",
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""Memory of the pricing tables per worker, loaded by each worker or mapped from a shared table file.
+
+For each zone count, starts `WORKERS` fresh worker processes that either load the rule set and zone files into a `PricingRulesStore` of compiled engines, as every uvicorn worker does by default, or map the file a `TablesPublisher` wrote, as with `SHARED_TABLES_PATH`. Every worker prices orders and looks up locations so the tables are paged in, then all of them read `/proc/self/smaps_rollup` at the same time:
+
+- `private`: memory of the tables only this worker holds, which is what each additional worker costs
+- `pss`: its proportional share, with the pages it shares split between the processes mapping them
+
+Both are measured relative to the worker before building its store. Also reports the time to load or map the tables and to price an order with each.
+
+Run with `python -m benchmarks.bench_shared_tables`. Linux only.
+"""
+
+import json
+import multiprocessing
+import tempfile
+import time
+from pathlib import Path
+
+from app.utils.pricing_rules import PricingRulesStore
+from app.utils.shared_tables import (
+    SharedPricingRulesStore,
+    TablesPublisher,
+    compile_engine,
+)
+from benchmarks.bench_zones import hexagon_zones
+from benchmarks.common import realistic_orders
+
+WORKERS = 4
+ZONE_COUNTS = (100, 10_000, 100_000)
+RULE_SETS = {
+    "center": {"BASE_SURCHARGE": 300},
+    "suburbs": {"ADDITIONAL_DISTANCE": 1000},
+    "islands": {"BASE_DISTANCE": 2000, "FEE_LIMIT": 2500},
+}
+
+_HELSINKI_RUSH_HOURS = {
+    "RUSH_HOUR_TIMEZONE": "Europe/Helsinki",
+    "RUSH_HOURS": [
+        {"ISOWEEKDAY": 5, "START": "15:00", "END": "19:00", "MULTIPLIER": 1.2},
+        {"ISOWEEKDAY": 6, "START": "11:00", "END": "14:00", "MULTIPLIER": 1.1},
+    ],
+}
+
+
+def memory_kib() -> dict[str, int]:
+    """Private and proportional set size of this process in KiB."""
+    fields = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            name, _, value = line.partition(":")
+            if value.strip().endswith("kB"):
+                fields[name] = int(value.split()[0])
+    return {
+        "private": fields["Private_Clean"] + fields["Private_Dirty"],
+        "pss": fields["Pss"],
+    }
+
+
+def _worker(mode, directory, barrier, results) -> None:
+    directory = Path(directory)
+    orders = realistic_orders(2000)
+    before = memory_kib()
+    start = time.perf_counter()
+    if mode == "shared":
+        store = SharedPricingRulesStore(
+            lambda rules, shared: shared.build_engine(), directory / "tables"
+        )
+    else:
+        store = PricingRulesStore(
+            compile_engine, directory / "rules.json", directory / "zones.json"
+        )
+    load_seconds = time.perf_counter() - start
+
+    snapshot = store.snapshot
+    index = snapshot.zones.index
+    # Touch every table and zone
+    for zone_id in index.zone_ids:
+        index.position(zone_id)
+    start = time.perf_counter()
+    for order in orders:
+        snapshot.fee_calculator.calculate_delivery_fee(**order)
+    price_seconds = (time.perf_counter() - start) / len(orders)
+    for i in range(0, len(index), max(len(index) // 2000, 1)):
+        snapshot.for_zone(index.zone_ids[i])
+        index.locate(60.0 + i / len(index) * 0.6, 24.5 + i / len(index) * 0.8)
+
+    # Measure while every worker is alive, so shared pages are split between them
+    barrier.wait()
+    after = memory_kib()
+    results.put(
+        {
+            "private": after["private"] - before["private"],
+            "pss": after["pss"] - before["pss"],
+            "load": load_seconds,
+            "price": price_seconds,
+        }
+    )
+    barrier.wait()
+
+
+def measure_workers(mode: str, directory: Path) -> dict[str, float]:
+    """Average the measurements of `WORKERS` workers running at once."""
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(WORKERS)
+    results = context.Queue()
+    workers = [
+        context.Process(target=_worker, args=(mode, str(directory), barrier, results))
+        for _ in range(WORKERS)
+    ]
+    for worker in workers:
+        worker.start()
+    samples = [results.get(timeout=300) for _ in workers]
+    for worker in workers:
+        worker.join()
+    return {name: sum(s[name] for s in samples) / WORKERS for name in samples[0]}
+
+
+def write_files(directory: Path, zone_count: int) -> None:
+    (directory / "rules.json").write_text(
+        json.dumps({"VERSION": "benchmark", **_HELSINKI_RUSH_HOURS})
+    )
+    names = [None, *RULE_SETS]
+    zones = [
+        {"id": zone_id, "polygon": polygon, "rule_set": names[i % len(names)]}
+        for i, (zone_id, polygon) in enumerate(hexagon_zones(zone_count))
+    ]
+    (directory / "zones.json").write_text(
+        json.dumps({"rule_sets": RULE_SETS, "zones": zones})
+    )
+
+
+def main() -> None:
+    print(
+        f"Per worker, {WORKERS} workers with the Helsinki rush hours and "
+        f"{len(RULE_SETS)} zone rule sets"
+    )
+    print(
+        f"{'zones':>7}  {'mode':<7}  {'private KiB':>11}  {'pss KiB':>8}"
+        f"  {'load ms':>8}  {'ns/order':>8}"
+    )
+    for zone_count in ZONE_COUNTS:
+        with tempfile.TemporaryDirectory(dir="/dev/shm") as directory:
+            directory = Path(directory)
+            write_files(directory, zone_count)
+            TablesPublisher(
+                directory / "tables", directory / "rules.json", directory / "zones.json"
+            )
+            for mode in ("loaded", "shared"):
+                result = measure_workers(mode, directory)
+                print(
+                    f"{zone_count:>7}  {mode:<7}  {result['private']:>11.0f}"
+                    f"  {result['pss']:>8.0f}  {result['load'] * 1e3:>8.1f}"
+                    f"  {result['price'] * 1e9:>8.0f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
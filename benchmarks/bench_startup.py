@@ -0,0 +1,133 @@
+"""Cold start of the fee service, with and without `LEAN_STARTUP`.
+
+Every sample is a fresh process, as an autoscaled instance would be:
+
+- `import`: importing `app.main`, which builds the settings, the pricing engine and the routes
+- `first_response`: from spawning `python -m app.server` to the first priced order, polling the port until it answers
+- `first_request`: the latency of that first request on its own, which the lean warm-up takes off the request path
+
+The `startup` group of `benchmarks.suite` runs the same measurements against a baseline, which is how CI catches startup regressions.
+
+Run with `python -m benchmarks.bench_startup [--runs 10]`.
+"""
+
+import argparse
+import http.client
+import os
+import subprocess
+import sys
+import time
+
+from benchmarks import load_test
+from benchmarks.common import summarize
+
+MODES = {"default": {"LEAN_STARTUP": "false"}, "lean": {"LEAN_STARTUP": "true"}}
+
+BODY = (
+    b'{"cart_value": 790, "delivery_distance": 2235, "number_of_items": 4, '
+    b'"time": "2024-01-15T13:00:00Z"}'
+)
+
+_IMPORT_APP = (
+    "import time; start = time.perf_counter(); import app.main; "
+    "print(time.perf_counter() - start)"
+)
+
+
+def _environment(mode: str) -> dict:
+    return {
+        **os.environ,
+        "PROJECT_NAME": os.environ.get("PROJECT_NAME", "benchmark"),
+        **MODES[mode],
+    }
+
+
+def import_seconds(mode: str) -> float:
+    """Seconds a fresh interpreter takes to import `app.main`."""
+    output = subprocess.run(
+        [sys.executable, "-c", _IMPORT_APP],
+        env=_environment(mode),
+        capture_output=True,
+        check=True,
+        text=True,
+    ).stdout
+    return float(output.split()[-1])
+
+
+def _post(port: int) -> int:
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    try:
+        connection.request(
+            "POST", load_test.PATH, BODY, {"Content-Type": "application/json"}
+        )
+        return connection.getresponse().status
+    finally:
+        connection.close()
+
+
+def first_response_seconds(mode: str, timeout: float = 30.0) -> tuple[float, float]:
+    """Start the production server and wait for it to price an order.
+
+    Returns:
+        tuple[float, float]: Seconds from spawning the server to the first response, and the latency of that request alone
+    """
+    port = load_test.free_port()
+    start = time.perf_counter()
+    server = load_test.start_server(1, port, _environment(mode))
+    try:
+        while time.perf_counter() - start < timeout:
+            if server.poll() is not None:
+                raise RuntimeError(f"Server exited with status {server.returncode}")
+            request_start = time.perf_counter()
+            try:
+                status = _post(port)
+            except ConnectionError:
+                time.sleep(0.002)
+                continue
+            end = time.perf_counter()
+            if status != 200:
+                raise RuntimeError(f"First request failed with status {status}")
+            return end - start, end - request_start
+        raise TimeoutError(f"Server on port {port} did not respond")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def startup_benchmarks(runs: int = 10) -> dict[str, dict]:
+    """Sample the import, first response and first request times of both modes.
+
+    The modes are interleaved, so a noisy spell on the machine hits both alike.
+    """
+    samples: dict[str, list[float]] = {}
+    for _ in range(runs):
+        for mode in MODES:
+            samples.setdefault(f"startup.import[{mode}]", []).append(
+                import_seconds(mode)
+            )
+            first_response, first_request = first_response_seconds(mode)
+            samples.setdefault(f"startup.first_response[{mode}]", []).append(
+                first_response
+            )
+            samples.setdefault(f"startup.first_request[{mode}]", []).append(
+                first_request
+            )
+    return {name: summarize(values) for name, values in sorted(samples.items())}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    results = startup_benchmarks(args.runs)
+    width = max(len(name) for name in results)
+    print(f"{'':<{width}}  {'p50 ms':>8}  {'p95 ms':>8}")
+    for name, stats in results.items():
+        print(
+            f"{name:<{width}}  {stats['p50'] * 1e3:>8.1f}  {stats['p95'] * 1e3:>8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
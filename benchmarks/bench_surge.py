@@ -0,0 +1,108 @@
+"""Cost of demand surge pricing per quote.
+
+Prices orders spread over `ZONES` surging zones with the default and compiled engines, with and without counting the quote in `SurgePricing` and applying its multiplier, and reports the time per quote and the difference. Then several threads quote at once for a few seconds, as the threadpool of the batch route would, to show the lock around the counters sustains far more than 10k quotes per second. The CPU a worker spends on surge pricing is the added time per quote times its quote rate, printed for 10k quotes per second.
+
+Run with `python -m benchmarks.bench_surge`.
+"""
+
+import random
+import threading
+import time
+
+from app.utils.compiled_fee_calculator import CompiledFeeCalculator
+from app.utils.fee_calculator import FeeCalculator
+from app.utils.surge import SurgePricing
+from benchmarks.common import measure, random_orders, report
+
+ZONES = 10_000
+THREADS = (1, 4)
+DURATION = 2.0
+QPS = 10_000
+
+
+def build_surge_pricing() -> SurgePricing:
+    surge_pricing = SurgePricing()
+    # Small capacities, so most zones surge and every quote gets a multiplier
+    surge_pricing.update_capacity({f"zone-{i}": 1 for i in range(ZONES)})
+    return surge_pricing
+
+
+def quote_rate(surge_pricing: SurgePricing, threads: int, zone_ids: list[str]) -> float:
+    """Quotes per second counted by `threads` threads quoting for `DURATION` seconds."""
+    counts = [0] * threads
+    deadline = time.perf_counter() + DURATION
+
+    def run(thread: int) -> None:
+        quote = surge_pricing.quote
+        count = 0
+        while time.perf_counter() < deadline:
+            for zone_id in zone_ids:
+                quote(zone_id)
+            count += len(zone_ids)
+        counts[thread] = count
+
+    workers = [threading.Thread(target=run, args=(i,)) for i in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return sum(counts) / DURATION
+
+
+def main() -> None:
+    rng = random.Random(0)
+    orders = random_orders(1000)
+    zone_ids = [f"zone-{rng.randrange(ZONES)}" for _ in orders]
+    surge_pricing = build_surge_pricing()
+    for zone_id in zone_ids * 20:
+        surge_pricing.quote(zone_id)
+
+    print(f"Counting a quote and reading the multiplier, {ZONES} zones")
+    report(
+        {
+            "quote": measure(
+                lambda: [surge_pricing.quote(zone_id) for zone_id in zone_ids]
+            )
+            / len(zone_ids),
+            "quote_many": measure(lambda: surge_pricing.quote_many(zone_ids))
+            / len(zone_ids),
+        }
+    )
+
+    for name, fee_calculator in (
+        ("default", FeeCalculator()),
+        ("compiled", CompiledFeeCalculator()),
+    ):
+        calculate_delivery_fee = fee_calculator.calculate_delivery_fee
+        quote = surge_pricing.quote
+
+        def without_surge():
+            for order in orders:
+                calculate_delivery_fee(**order)
+
+        def with_surge():
+            for order, zone_id in zip(orders, zone_ids):
+                calculate_delivery_fee(**order, surge_multiplier=quote(zone_id))
+
+        results = {
+            f"{name} engine": measure(without_surge) / len(orders),
+            f"{name} engine with surge": measure(with_surge) / len(orders),
+        }
+        print()
+        print(f"Pricing one order, {name} engine")
+        report(results, baseline=f"{name} engine")
+        added = results[f"{name} engine with surge"] - results[f"{name} engine"]
+        print(
+            f"Surge adds {added * 1e6:.2f} us per quote, "
+            f"{added * QPS:.1%} of a core at {QPS} quotes/s"
+        )
+
+    print()
+    print(f"Quotes per second counted over {DURATION:.0f} s")
+    for threads in THREADS:
+        rate = quote_rate(build_surge_pricing(), threads, zone_ids)
+        print(f"{threads} thread(s)  {rate:>12,.0f} quotes/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Zone lookups and their memory footprint as the number of zones grows.
+
+Zones are hexagons tiling an area the size of a city region, with a rule set per zone group. Compares the grid index with a linear scan over the zone polygons.
+
+Run with `python -m benchmarks.bench_zones`.
+"""
+
+import math
+import random
+import tracemalloc
+
+from app.utils.zones import ZoneIndex
+from benchmarks.common import measure, report
+
+
+def hexagon_zones(count: int) -> list[tuple[str, list[tuple[float, float]]]]:
+    """Tile roughly a 60 x 60 km area around Helsinki with `count` hexagons."""
+    side = math.ceil(math.sqrt(count))
+    radius = 0.5 / side
+    zones = []
+    for i in range(count):
+        row, column = divmod(i, side)
+        x = 24.5 + column * radius * 1.5
+        y = (
+            60.0
+            + row * radius * math.sqrt(3)
+            + (column % 2) * radius * math.sqrt(3) / 2
+        )
+        polygon = [
+            (
+                x + radius * math.cos(math.pi / 3 * k),
+                y + radius * math.sin(math.pi / 3 * k),
+            )
+            for k in range(6)
+        ]
+        zones.append((f"zone-{i}", polygon))
+    return zones
+
+
+def linear_scan(zones, latitude: float, longitude: float) -> int:
+    """Test every zone polygon in turn, as a reference for the grid index."""
+    for position, (_, polygon) in enumerate(zones):
+        inside = False
+        previous_x, previous_y = polygon[-1]
+        for x, y in polygon:
+            if (y > latitude) != (previous_y > latitude) and longitude < (
+                previous_x - x
+            ) * (latitude - y) / (previous_y - y) + x:
+                inside = not inside
+            previous_x, previous_y = x, y
+        if inside:
+            return position
+    return -1
+
+
+def main() -> None:
+    rng = random.Random(0)
+    points = [(rng.uniform(60.0, 60.6), rng.uniform(24.5, 25.3)) for _ in range(1000)]
+
+    for count in (100, 1000, 10000):
+        zones = hexagon_zones(count)
+        tracemalloc.start()
+        index = ZoneIndex(zones)
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        def grid_lookups():
+            for latitude, longitude in points:
+                index.locate(latitude, longitude)
+
+        zone_ids = [f"zone-{rng.randrange(count)}" for _ in points]
+
+        def zone_id_lookups():
+            for zone_id in zone_ids:
+                index.position(zone_id)
+
+        print(
+            f"{count} zones: {index.nbytes / count:.0f} bytes per zone in arrays, "
+            f"{current / count:.0f} bytes per zone in total"
+        )
+        results = {
+            "locate by coordinates": measure(grid_lookups, repeat=3) / len(points),
+            "look up by zone_id": measure(zone_id_lookups, repeat=3) / len(points),
+        }
+        if count <= 1000:
+            few_points = points[:20]
+            results["linear scan"] = measure(
+                lambda: [linear_scan(zones, *point) for point in few_points], repeat=1
+            ) / len(few_points)
+        report(results, baseline="locate by coordinates")
+        print()
+
+
+if __name__ == "__main__":
+    main()
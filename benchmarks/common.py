@@ -0,0 +1,207 @@
+import datetime
+import math
+import random
+import timeit
+from collections.abc import Callable, Sequence
+
+
+def measure(func: Callable[[], object], repeat: int = 5) -> float:
+    """Measure the fastest time per call of `func`.
+
+    Args:
+        func (Callable[[], object]): The code under measurement
+        repeat (int): Number of timing runs, the fastest one is reported
+
+    Returns:
+        float: Seconds per call
+    """
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def report(results: dict[str, float], baseline: str | None = None) -> None:
+    """Print per-call timings, optionally with the speedup over a baseline entry.
+
+    Args:
+        results (dict[str, float]): Seconds per call by benchmark name
+        baseline (str | None): Name of the entry the others are compared with
+    """
+    width = max(len(name) for name in results)
+    for name, seconds in results.items():
+        line = f"{name:<{width}}  {seconds * 1e9:>12.1f} ns/call"
+        if baseline is not None:
+            line += f"  {results[baseline] / seconds:>6.2f}x"
+        print(line)
+
+
+def percentile(sorted_values: Sequence[float], fraction: float) -> float:
+    """Nearest-rank percentile of already sorted values.
+
+    Args:
+        sorted_values (Sequence[float]): Values in ascending order
+        fraction (float): The percentile as a fraction, e.g. 0.99
+
+    Returns:
+        float: The percentile
+    """
+    rank = max(math.ceil(fraction * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+def summarize(latencies: Sequence[float], seconds: float | None = None) -> dict:
+    """Summarize latency samples into percentiles and throughput.
+
+    Args:
+        latencies (Sequence[float]): Latency samples in seconds
+        seconds (float | None): Wall-clock duration of the run, for concurrent runs whose throughput isn't the inverse of the mean latency
+
+    Returns:
+        dict: `p50`, `p95` and `p99` in seconds and `throughput` per second
+    """
+    latencies = sorted(latencies)
+    if seconds is None:
+        seconds = sum(latencies)
+    return {
+        "p50": percentile(latencies, 0.50),
+        "p95": percentile(latencies, 0.95),
+        "p99": percentile(latencies, 0.99),
+        "throughput": len(latencies) / seconds,
+    }
+
+
+def random_orders(count: int, seed: int = 0) -> list[dict]:
+    """Generate orders spread over the interesting ranges of every rule.
+
+    Args:
+        count (int): Number of orders
+        seed (int): Seed of the random generator
+
+    Returns:
+        list[dict]: Keyword arguments for `FeeCalculator.calculate_delivery_fee`
+    """
+    rng = random.Random(seed)
+    week_start = datetime.datetime(2024, 3, 11, tzinfo=datetime.timezone.utc)
+    return [
+        {
+            "cart_value": rng.randint(1, 25000),
+            "delivery_distance": rng.randint(1, 8000),
+            "number_of_items": rng.randint(1, 20),
+            "time": week_start + datetime.timedelta(minutes=rng.randrange(7 * 24 * 60)),
+        }
+        for _ in range(count)
+    ]
+
+
+async def asgi_request(
+    app, method: str, path: str, body: bytes = b"", headers: list | None = None
+) -> tuple[int, bytes]:
+    """Send one HTTP request straight to an ASGI app, without any network or client.
+
+    Args:
+        app: The ASGI application
+        method (str): HTTP method
+        path (str): Request path
+        body (bytes): Request body
+        headers (list | None): Raw `(name, value)` header pairs
+
+    Returns:
+        tuple[int, bytes]: Response status and body
+    """
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0", "spec_version": "2.3"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": b"",
+        "headers": (
+            headers if headers is not None else [(b"content-type", b"application/json")]
+        ),
+        "client": ("127.0.0.1", 50000),
+        "server": ("127.0.0.1", 8000),
+        "state": {},
+    }
+    request_sent = False
+    status = 0
+    chunks = []
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return status, b"".join(chunks)
+
+
+# Share of orders placed in each hour of the day, peaking at lunch and dinner
+_HOURLY_WEIGHTS = [
+    1,
+    1,
+    1,
+    1,
+    1,
+    2,
+    3,
+    5,
+    6,
+    6,
+    8,
+    14,
+    16,
+    11,
+    8,
+    8,
+    10,
+    15,
+    18,
+    15,
+    10,
+    6,
+    3,
+    2,
+]
+
+
+def realistic_orders(count: int, seed: int = 0) -> list[dict]:
+    """Generate orders following a plausible production distribution.
+
+    Cart values are log-normal around 25 EUR, distances gamma distributed around 2 km, item counts geometric around 3, and order times follow a daily curve with lunch and dinner peaks, a busier weekend and Friday rush hour traffic.
+
+    Args:
+        count (int): Number of orders
+        seed (int): Seed of the random generator
+
+    Returns:
+        list[dict]: Keyword arguments for `FeeCalculator.calculate_delivery_fee`
+    """
+    rng = random.Random(seed)
+    week_start = datetime.datetime(2024, 3, 11, tzinfo=datetime.timezone.utc)
+    daily_weights = [1.0, 0.9, 0.9, 1.0, 1.3, 1.4, 1.2]
+    orders = []
+    for _ in range(count):
+        day = rng.choices(range(7), weights=daily_weights)[0]
+        hour = rng.choices(range(24), weights=_HOURLY_WEIGHTS)[0]
+        orders.append(
+            {
+                "cart_value": max(int(rng.lognormvariate(math.log(2500), 0.7)), 1),
+                "delivery_distance": max(int(rng.gammavariate(2.0, 1000.0)), 1),
+                "number_of_items": min(int(rng.expovariate(1 / 3)) + 1, 60),
+                "time": week_start
+                + datetime.timedelta(days=day, hours=hour, seconds=rng.randrange(3600)),
+            }
+        )
+    return orders
@@ -0,0 +1,209 @@
+"""HTTP load test of the production server at different worker counts.
+
+For every worker count, starts `python -m app.server` on a free port, drives it with a closed-loop load generator running in several client processes over keep-alive connections, and reports the throughput.
+
+Run with `python -m benchmarks.load_test --workers 1 2 4`.
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import time
+
+from benchmarks.common import realistic_orders
+
+PATH = "/api/v1/fees/calculate_fee"
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def build_requests(host: str, port: int, path: str, count: int = 1000) -> list[bytes]:
+    requests = []
+    for order in realistic_orders(count):
+        order["time"] = order["time"].isoformat().replace("+00:00", "Z")
+        body = json.dumps(order).encode()
+        requests.append(
+            f"POST {path} HTTP/1.1\r\n"
+            f"Host: {host}:{port}\r\n"
+            "Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            "\r\n".encode() + body
+        )
+    return requests
+
+
+async def read_response(reader: asyncio.StreamReader) -> int:
+    head = await reader.readuntil(b"\r\n\r\n")
+    status = int(head[9:12])
+    content_length = 0
+    for line in head.split(b"\r\n"):
+        if line[:15].lower() == b"content-length:":
+            content_length = int(line[15:])
+    await reader.readexactly(content_length)
+    return status
+
+
+async def connection(
+    host: str,
+    port: int,
+    requests: list[bytes],
+    offset: int,
+    deadline: float,
+    latencies: list[float],
+) -> int:
+    """Send requests back to back over one keep-alive connection until the deadline.
+
+    Returns:
+        int: Number of failed requests
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    errors = 0
+    index = offset
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        writer.write(requests[index % len(requests)])
+        if await read_response(reader) != 200:
+            errors += 1
+        latencies.append(time.perf_counter() - start)
+        index += 1
+    writer.close()
+    return errors
+
+
+async def generate_load(
+    host: str,
+    port: int,
+    path: str,
+    connections: int,
+    duration: float,
+    seed: int,
+) -> tuple[list[float], int]:
+    requests = build_requests(host, port, path)
+    deadline = time.perf_counter() + duration
+    latencies: list[float] = []
+    errors = await asyncio.gather(
+        *(
+            connection(host, port, requests, seed * 7919 + i * 97, deadline, latencies)
+            for i in range(connections)
+        )
+    )
+    return latencies, sum(errors)
+
+
+def _client_process(args: tuple) -> tuple[list[float], int]:
+    return asyncio.run(generate_load(*args))
+
+
+def run_load(
+    host: str,
+    port: int,
+    path: str = PATH,
+    processes: int = 2,
+    connections: int = 32,
+    duration: float = 10.0,
+) -> dict:
+    """Drive a running server with a closed-loop load generator.
+
+    Args:
+        host (str): Server host
+        port (int): Server port
+        path (str): Request path
+        processes (int): Client processes, so the generator is not the bottleneck
+        connections (int): Keep-alive connections per client process
+        duration (float): Seconds of load
+
+    Returns:
+        dict: Throughput in requests per second, error count and the sorted latencies in seconds
+    """
+    with multiprocessing.Pool(processes) as pool:
+        results = pool.map(
+            _client_process,
+            [
+                (host, port, path, connections, duration, seed)
+                for seed in range(processes)
+            ],
+        )
+    latencies = sorted(latency for result in results for latency in result[0])
+    return {
+        "rps": len(latencies) / duration,
+        "errors": sum(result[1] for result in results),
+        "latencies": latencies,
+    }
+
+
+def wait_until_ready(host: str, port: int, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection((host, port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise TimeoutError(f"Server on {host}:{port} did not start")
+
+
+def start_server(workers: int, port: int, env: dict | None = None) -> subprocess.Popen:
+    server_env = {
+        **os.environ,
+        "PROJECT_NAME": os.environ.get("PROJECT_NAME", "load-test"),
+        "SERVER_HOST": "127.0.0.1",
+        "SERVER_PORT": str(port),
+        "SERVER_WORKERS": str(workers),
+        **(env or {}),
+    }
+    return subprocess.Popen(
+        [sys.executable, "-m", "app.server"],
+        env=server_env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.load_test")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--client-processes", type=int, default=2)
+    parser.add_argument("--connections", type=int, default=32)
+    parser.add_argument("--path", default=PATH)
+    args = parser.parse_args()
+
+    print(f"{'workers':>7}  {'req/s':>10}  {'p50 ms':>8}  {'p99 ms':>8}  {'errors':>6}")
+    for workers in args.workers:
+        port = free_port()
+        server = start_server(workers, port)
+        try:
+            wait_until_ready("127.0.0.1", port)
+            # Let every worker finish starting up before measuring
+            time.sleep(1.0)
+            result = run_load(
+                "127.0.0.1",
+                port,
+                path=args.path,
+                processes=args.client_processes,
+                connections=args.connections,
+                duration=args.duration,
+            )
+        finally:
+            server.terminate()
+            server.wait()
+        latencies = result["latencies"]
+        p50 = latencies[len(latencies) // 2] * 1e3
+        p99 = latencies[int(len(latencies) * 0.99)] * 1e3
+        print(
+            f"{workers:>7}  {result['rps']:>10.0f}  {p50:>8.2f}  {p99:>8.2f}"
+            f"  {result['errors']:>6}"
+        )
+
+
+if __name__ == "__main__":
+    main()
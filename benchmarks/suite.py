@@ -0,0 +1,297 @@
+"""Benchmark suite of the fee service with baselines and regression checks.
+
+Four groups of benchmarks, all over realistic order distributions:
+
+- `micro`: `FeeCalculator`, the compiled and vectorized engines and each rule helper, timed in batches of calls
+- `asgi`: the fee routes called in-process, covering request validation and response serialization
+- `http`: the production server under a closed-loop HTTP load
+- `startup`: importing the app and the first response of a fresh server, with and without `LEAN_STARTUP`, see `benchmarks/bench_startup.py`
+
+Every benchmark reports p50/p95/p99 latency and throughput. `--save-baseline` stores the results, later runs compare against them and exit with status 1 when a benchmark regresses past `--threshold`.
+
+Run with `python -m benchmarks.suite`, or `make bench` and `make bench_baseline`.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+os.environ.setdefault("PROJECT_NAME", "benchmark")
+os.environ.setdefault("FAST_PATH_ENABLED", "true")
+
+from app.utils.compiled_fee_calculator import CompiledFeeCalculator  # noqa: E402
+from app.utils.fee_calculator import FeeCalculator, to_wall_clock  # noqa: E402
+from benchmarks import bench_startup, load_test  # noqa: E402
+from benchmarks.common import asgi_request, realistic_orders, summarize  # noqa: E402
+
+DEFAULT_BASELINE = Path(__file__).parent / "baseline.json"
+GROUPS = ("micro", "asgi", "http", "startup")
+
+# Latency statistics regress upwards, throughput downwards. p99 rests on the
+# few slowest samples, so it is held to a looser threshold.
+HIGHER_IS_WORSE = ("p50", "p95", "p99")
+LOWER_IS_WORSE = ("throughput",)
+
+
+def time_batches(
+    func: Callable[[dict], object],
+    orders: list[dict],
+    batch_size: int = 100,
+    batches: int = 300,
+) -> dict:
+    """Time `func` over batches of orders and summarize the per-call times."""
+    for order in orders[:batch_size]:
+        func(order)
+
+    latencies = []
+    for batch in range(batches):
+        start_index = batch * batch_size % len(orders)
+        batch_orders = orders[start_index : start_index + batch_size]
+        start = time.perf_counter()
+        for order in batch_orders:
+            func(order)
+        latencies.append((time.perf_counter() - start) / len(batch_orders))
+    return summarize(latencies)
+
+
+def micro_benchmarks() -> dict[str, dict]:
+    orders = realistic_orders(10000)
+    fee_calculator = FeeCalculator()
+    compiled_fee_calculator = CompiledFeeCalculator()
+
+    results = {
+        "micro.calculate_delivery_fee": time_batches(
+            lambda order: fee_calculator.calculate_delivery_fee(**order), orders
+        ),
+        "micro.compiled.calculate_delivery_fee": time_batches(
+            lambda order: compiled_fee_calculator.calculate_delivery_fee(**order),
+            orders,
+        ),
+        "micro.is_free_delivery": time_batches(
+            lambda order: fee_calculator._is_free_delivery(order["cart_value"]),
+            orders,
+        ),
+        "micro.calculate_cart_value_surcharge": time_batches(
+            lambda order: fee_calculator._calculate_cart_value_surcharge(
+                order["cart_value"]
+            ),
+            orders,
+        ),
+        "micro.calculate_distance_surcharge": time_batches(
+            lambda order: fee_calculator._calculate_distance_surcharge(
+                order["delivery_distance"]
+            ),
+            orders,
+        ),
+        "micro.calculate_item_surcharge": time_batches(
+            lambda order: fee_calculator._calculate_item_surcharge(
+                order["number_of_items"]
+            ),
+            orders,
+        ),
+        "micro.calculate_rush_hour_surcharge": time_batches(
+            lambda order: fee_calculator._calculate_rush_hour_surcharge(
+                order["time"], 1000
+            ),
+            orders,
+        ),
+        "micro.limit_delivery_fee": time_batches(
+            lambda order: fee_calculator._limit_delivery_fee(order["cart_value"]),
+            orders,
+        ),
+    }
+
+    # Per-order time of the vectorized path on batches of 1000 orders
+    columns = [
+        [order["cart_value"] for order in orders],
+        [order["delivery_distance"] for order in orders],
+        [order["number_of_items"] for order in orders],
+        to_wall_clock([order["time"] for order in orders]),
+    ]
+    chunks = [
+        [column[start : start + 1000] for column in columns]
+        for start in range(0, len(orders), 1000)
+    ]
+    results["micro.calculate_delivery_fees"] = time_batches(
+        lambda chunk: fee_calculator.calculate_delivery_fees(*chunk),
+        chunks,
+        batch_size=1,
+        batches=200,
+    )
+    for statistic in ("p50", "p95", "p99"):
+        results["micro.calculate_delivery_fees"][statistic] /= 1000
+    results["micro.calculate_delivery_fees"]["throughput"] *= 1000
+    return results
+
+
+async def _time_requests(app, path: str, bodies: list[bytes], count: int) -> dict:
+    for body in bodies[:100]:
+        status, _ = await asgi_request(app, "POST", path, body)
+        assert status == 200, (path, status)
+
+    latencies = []
+    for index in range(count):
+        start = time.perf_counter()
+        await asgi_request(app, "POST", path, bodies[index % len(bodies)])
+        latencies.append(time.perf_counter() - start)
+    return summarize(latencies)
+
+
+def _json_order(order: dict) -> dict:
+    return {**order, "time": order["time"].isoformat().replace("+00:00", "Z")}
+
+
+def asgi_benchmarks() -> dict[str, dict]:
+    from app.main import app
+
+    orders = [_json_order(order) for order in realistic_orders(10000)]
+    bodies = [json.dumps(order).encode() for order in orders]
+    batch_bodies = [
+        json.dumps({"orders": orders[start : start + 100]}).encode()
+        for start in range(0, len(orders), 100)
+    ]
+
+    async def run() -> dict[str, dict]:
+        results = {
+            "asgi.calculate_fee": await _time_requests(
+                app, "/api/v1/fees/calculate_fee", bodies, 5000
+            ),
+            "asgi.calculate_fees[100]": await _time_requests(
+                app, "/api/v1/fees/calculate_fees", batch_bodies, 500
+            ),
+        }
+        if any(
+            getattr(route, "path", None) == "/api/v1/fees/calculate_fee_fast"
+            for route in app.routes
+        ):
+            results["asgi.calculate_fee_fast"] = await _time_requests(
+                app, "/api/v1/fees/calculate_fee_fast", bodies, 5000
+            )
+        return results
+
+    return asyncio.run(run())
+
+
+def http_benchmarks(duration: float, workers: int) -> dict[str, dict]:
+    port = load_test.free_port()
+    server = load_test.start_server(workers, port)
+    try:
+        load_test.wait_until_ready("127.0.0.1", port)
+        time.sleep(1.0)
+        result = load_test.run_load(
+            "127.0.0.1", port, processes=2, connections=16, duration=duration
+        )
+    finally:
+        server.terminate()
+        server.wait()
+    if result["errors"]:
+        raise RuntimeError(f"{result['errors']} requests failed during the load test")
+    return {
+        f"http.calculate_fee[workers={workers}]": summarize(
+            result["latencies"], duration
+        )
+    }
+
+
+def compare(
+    results: dict, baseline: dict, threshold: float, p99_threshold: float
+) -> list[str]:
+    """List the statistics that regressed past their threshold."""
+    regressions = []
+    for name, stats in results.items():
+        if name not in baseline:
+            continue
+        for statistic in HIGHER_IS_WORSE:
+            tolerated = p99_threshold if statistic == "p99" else threshold
+            if stats[statistic] > baseline[name][statistic] * (1 + tolerated):
+                regressions.append(f"{name} {statistic}")
+        for statistic in LOWER_IS_WORSE:
+            if stats[statistic] < baseline[name][statistic] * (1 - threshold):
+                regressions.append(f"{name} {statistic}")
+    return regressions
+
+
+def print_results(results: dict, baseline: dict) -> None:
+    width = max(len(name) for name in results)
+    print(
+        f"{'benchmark':<{width}}  {'p50 µs':>10}  {'p95 µs':>10}  {'p99 µs':>10}"
+        f"  {'ops/s':>12}  {'vs baseline':>11}"
+    )
+    for name, stats in results.items():
+        change = ""
+        if name in baseline:
+            ratio = stats["p50"] / baseline[name]["p50"] - 1
+            change = f"{ratio:+.1%}"
+        print(
+            f"{name:<{width}}  {stats['p50'] * 1e6:>10.3f}  {stats['p95'] * 1e6:>10.3f}"
+            f"  {stats['p99'] * 1e6:>10.3f}  {stats['throughput']:>12.0f}  {change:>11}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.suite")
+    parser.add_argument("groups", nargs="*", choices=GROUPS, default=GROUPS)
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument(
+        "--save-baseline", action="store_true", help="Store the results as baseline"
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.25,
+        help="Tolerated relative regression of p50, p95 and throughput",
+    )
+    parser.add_argument(
+        "--p99-threshold",
+        type=float,
+        default=None,
+        help="Tolerated relative regression of p99, twice --threshold by default",
+    )
+    parser.add_argument("--http-duration", type=float, default=10.0)
+    parser.add_argument("--http-workers", type=int, default=1)
+    parser.add_argument("--startup-runs", type=int, default=10)
+    args = parser.parse_args()
+
+    results = {}
+    if "micro" in args.groups:
+        results.update(micro_benchmarks())
+    if "asgi" in args.groups:
+        results.update(asgi_benchmarks())
+    if "http" in args.groups:
+        results.update(http_benchmarks(args.http_duration, args.http_workers))
+    if "startup" in args.groups:
+        results.update(bench_startup.startup_benchmarks(args.startup_runs))
+
+    baseline = {}
+    if args.baseline.exists():
+        baseline = json.loads(args.baseline.read_text())
+    print_results(results, baseline)
+
+    if args.save_baseline:
+        args.baseline.write_text(
+            json.dumps({**baseline, **results}, indent=2, sort_keys=True) + "\n"
+        )
+        print(f"Saved baseline to {args.baseline}")
+        return
+
+    p99_threshold = args.p99_threshold
+    if p99_threshold is None:
+        p99_threshold = 2 * args.threshold
+    regressions = compare(results, baseline, args.threshold, p99_threshold)
+    if regressions:
+        print(
+            f"Regressed by more than {args.threshold:.0%},"
+            f" or {p99_threshold:.0%} for p99:"
+        )
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,10 +3,41 @@ from collections.abc import Generator
 import pytest
 from fastapi.testclient import TestClient
 
+from app.api.routes import fees
+from app.core.pricing import build_fee_calculator, pricing_store
 from app.main import app
+from app.utils.pricing_rules import PricingRulesStore
+from app.utils.quote_tokens import QuoteSigner
+from app.utils.surge import SurgePricing
+from tests.utils.cases import write_zones, zones
 
 
 @pytest.fixture(scope="module")
 def client() -> Generator[TestClient, None, None]:
     with TestClient(app) as c:
         yield c
+
+
+@pytest.fixture
+def zone_pricing(tmp_path, monkeypatch):
+    path = tmp_path / "zones.json"
+    write_zones(path, zones)
+    store = PricingRulesStore(build_fee_calculator, zones_path=path)
+    monkeypatch.setattr(pricing_store, "snapshot", store.snapshot)
+
+
+@pytest.fixture
+def surge_pricing(monkeypatch):
+    # Demand over the capacity of one order surges by 0.5 per extra order
+    surge_pricing = SurgePricing(clock=lambda: 0.0)
+    surge_pricing.update_capacity({"east": 1})
+    monkeypatch.setattr(fees, "surge_pricing", surge_pricing)
+    return surge_pricing
+
+
+@pytest.fixture
+def quote_signer(monkeypatch):
+    signer = QuoteSigner([b"test secret"], 900)
+    monkeypatch.setattr(fees, "quote_signer", signer)
+    monkeypatch.setattr(fees.quote_verify_endpoint, "quote_signer", signer)
+    return signer
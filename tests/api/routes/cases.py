@@ -0,0 +1,134 @@
+# valid
+cases_1 = [
+    {
+        "cart_value": 790,
+        "delivery_distance": 2235,
+        "number_of_items": 4,
+        "time": "2024-01-15T13:00:00Z",
+        "expected": 710,
+    }
+]
+
+# invalid cart_value
+cases_2 = [
+    {
+        "cart_value": 0,
+        "delivery_distance": 2235,
+        "number_of_items": 4,
+        "time": "2024-01-15T13:00:00Z",
+    },
+    {
+        "cart_value": -1,
+        "delivery_distance": 2235,
+        "number_of_items": 4,
+        "time": "2024-01-15T13:00:00Z",
+    },
+    {
+        "cart_value": "string",
+        "delivery_distance": 2235,
+        "number_of_items": 4,
+        "time": "2024-01-15T13:00:00Z",
+    },
+    {
+        "cart_value": None,
+        "delivery_distance": 2235,
+        "number_of_items": 4,
+        "time": "2024-01-15T13:00:00Z",
+    },
+    {
+        "cart_value": 333.5,
+        "delivery_distance": 2235,
+        "number_of_items": 4,
+        "time": "2024-01-15T13:00:00Z",
+    },
+]
+
+# invalid delivery_distance
+cases_3 = [
+    {
+        "cart_value": 790,
+        "delivery_distance": 0,
+        "number_of_items": 4,
+        "time": "2024-01-15T13:00:00Z",
+    },
+    {
+        "cart_value": 790,
+        "delivery_distance": -1,
+        "number_of_items": 4,
+        "time": "2024-01-15T13:00:00Z",
+    },
+    {
+        "cart_value": 790,
+        "delivery_distance": "string",
+        "number_of_items": 4,
+        "time": "2024-01-15T13:00:00Z",
+    },
+    {
+        "cart_value": 790,
+        "delivery_distance": None,
+        "number_of_items": 4,
+        "time": "2024-01-15T13:00:00Z",
+    },
+    {
+        "cart_value": 790,
+        "delivery_distance": 333.5,
+        "number_of_items": 4,
+        "time": "2024-01-15T13:00:00Z",
+    },
+]
+
+# invalid number_of_items
+cases_4 = [
+    {
+        "cart_value": 790,
+        "delivery_distance": 2235,
+        "number_of_items": 0,
+        "time": "2024-01-15T13:00:00Z",
+    },
+    {
+        "cart_value": 790,
+        "delivery_distance": 2235,
+        "number_of_items": -1,
+        "time": "2024-01-15T13:00:00Z",
+    },
+    {
+        "cart_value": 790,
+        "delivery_distance": 2235,
+        "number_of_items": "two",
+        "time": "2024-01-15T13:00:00Z",
+    },
+    {
+        "cart_value": 790,
+        "delivery_distance": 2235,
+        "number_of_items": None,
+        "time": "2024-01-15T13:00:00Z",
+    },
+]
+
+# invalid time
+cases_5 = [
+    {
+        "cart_value": 790,
+        "delivery_distance": 2235,
+        "number_of_items": 4,
+        "time": "16 Mar 2024 10:00:00",
+    },
+    {"cart_value": 790, "delivery_distance": 2235, "number_of_items": 4, "time": None},
+]
+
+# missing fields
+cases_6 = [
+    {"cart_value": 790, "delivery_distance": 2235, "number_of_items": 4},
+    {"delivery_distance": 2235, "number_of_items": 4, "time": "2024-01-15T13:00:00Z"},
+    {"number_of_items": 4, "time": "2024-01-15T13:00:00Z"},
+    {"time": "2024-01-15T13:00:00Z"},
+]
+
+# Orders in the zones of tests.utils.cases.zones, with their fee and rule version
+zone_orders = [
+    ({"zone_id": "center"}, 810, "default/center"),
+    ({"zone_id": "east"}, 710, "default"),
+    ({"location": {"lat": 60.16, "lon": 24.92}}, 810, "default/center"),
+    ({"location": {"lat": 60.10, "lon": 24.92}}, 710, "default"),
+    ({"zone_id": "east", "location": {"lat": 60.16, "lon": 24.92}}, 710, "default"),
+]
@@ -0,0 +1,194 @@
+import asyncio
+import datetime
+import json
+
+import pytest
+from fastapi import status
+from fastapi.testclient import TestClient
+
+from app.api.routes import fees
+from app.api.routes.fast_fees import FastFeeEndpoint
+from app.core.config import settings
+from app.core.pricing import pricing_store
+from app.utils.audit_log import AuditLog, read_audit_file
+from tests.api.routes.cases import (
+    cases_1,
+    cases_2,
+    cases_3,
+    cases_4,
+    cases_5,
+    cases_6,
+    zone_orders,
+)
+
+valid_order = {key: value for key, value in cases_1[0].items() if key != "expected"}
+
+
+@pytest.fixture(scope="module")
+def fast_client():
+    # A bare endpoint has no lifespan, so the client is not used as a context manager
+    return TestClient(FastFeeEndpoint(pricing_store))
+
+
+def post_both(client, fast_client, **kwargs):
+    response = client.post(f"{settings.API_V1_STR}/fees/calculate_fee", **kwargs)
+    fast_response = fast_client.post("/", **kwargs)
+    return response, fast_response
+
+
+@pytest.mark.parametrize("data", cases_1)
+def test_calculate_fee_fast_valid(fast_client: TestClient, data: dict):
+    response = fast_client.post("/", json=valid_order)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {
+        "delivery_fee": data["expected"],
+        "rule_version": "default",
+    }
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        *cases_2,
+        *cases_3,
+        *cases_4,
+        *cases_5,
+        *cases_6,
+        {**valid_order, "cart_value": "790"},
+        {**valid_order, "cart_value": 790.0},
+        {**valid_order, "number_of_items": True},
+        {**valid_order, "time": "2024-01-15"},
+        {**valid_order, "time": "2024-01-15 13:00:00"},
+        {**valid_order, "time": "2024-02-30T13:00:00Z"},
+        {**valid_order, "time": "2024-03-15T16:00:00.123+02:00"},
+        {**valid_order, "time": 1710518400},
+        [valid_order],
+    ],
+)
+def test_calculate_fee_fast_matches_route(
+    client: TestClient, fast_client: TestClient, data
+):
+    response, fast_response = post_both(client, fast_client, json=data)
+    assert fast_response.status_code == response.status_code
+    assert fast_response.json() == response.json()
+
+
+@pytest.mark.parametrize(
+    "content, content_type",
+    [
+        (b"", "application/json"),
+        (b"{bad", "application/json"),
+        (json.dumps(valid_order).encode(), "text/plain"),
+        (json.dumps(valid_order).encode(), "application/merge-patch+json"),
+    ],
+)
+def test_calculate_fee_fast_raw_body(
+    client: TestClient, fast_client: TestClient, content: bytes, content_type: str
+):
+    response, fast_response = post_both(
+        client, fast_client, content=content, headers={"content-type": content_type}
+    )
+    assert fast_response.status_code == response.status_code
+    assert fast_response.json() == response.json()
+
+
+@pytest.mark.parametrize(
+    "zone",
+    [
+        *[zone for zone, _, _ in zone_orders],
+        {"zone_id": "missing"},
+        {"location": {"lat": 91, "lon": 24.92}},
+    ],
+)
+def test_calculate_fee_fast_zone_matches_route(
+    client: TestClient, fast_client: TestClient, zone_pricing, zone: dict
+):
+    response, fast_response = post_both(
+        client, fast_client, json={**valid_order, **zone}
+    )
+    assert fast_response.status_code == response.status_code
+    assert fast_response.json() == response.json()
+
+
+def test_calculate_fee_fast_quote_token(quote_signer):
+    fast_client = TestClient(FastFeeEndpoint(pricing_store, quote_signer=quote_signer))
+    response = fast_client.post("/", json={**valid_order, "include_quote_token": True})
+    assert response.status_code == status.HTTP_200_OK
+    content = response.json()
+    quote = quote_signer.verify(content["quote_token"])
+    assert quote.delivery_fee == content["delivery_fee"] == cases_1[0]["expected"]
+    assert quote.rule_version == content["rule_version"]
+    assert (quote.cart_value, quote.delivery_distance, quote.number_of_items) == (
+        790,
+        2235,
+        4,
+    )
+
+
+def test_calculate_fee_fast_quote_tokens_disabled_matches_route(
+    client: TestClient, fast_client: TestClient, monkeypatch
+):
+    monkeypatch.setattr(fees, "quote_signer", None)
+    response, fast_response = post_both(
+        client, fast_client, json={**valid_order, "include_quote_token": True}
+    )
+    assert fast_response.status_code == response.status_code == 422
+    assert fast_response.json() == response.json()
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        {**valid_order, "include_breakdown": True},
+        {**valid_order, "include_breakdown": False},
+        {**valid_order, "cart_value": 25000, "include_breakdown": True},
+        {**valid_order, "number_of_items": 40, "include_breakdown": True},
+        {
+            **valid_order,
+            "time": "2024-01-19T16:00:00Z",
+            "zone_id": "center",
+            "include_breakdown": True,
+        },
+        {**valid_order, "include_breakdown": "maybe"},
+    ],
+)
+def test_calculate_fee_fast_breakdown_matches_route(
+    client: TestClient, fast_client: TestClient, zone_pricing, data: dict
+):
+    response, fast_response = post_both(client, fast_client, json=data)
+    assert fast_response.status_code == response.status_code
+    assert fast_response.json() == response.json()
+
+
+def test_calculate_fee_fast_surge_matches_route(
+    client: TestClient, zone_pricing, surge_pricing
+):
+    fast_client = TestClient(
+        FastFeeEndpoint(pricing_store, surge_pricing=surge_pricing)
+    )
+    data = {**valid_order, "zone_id": "east", "include_breakdown": True}
+    # Both routes count their quotes as the demand of the same zone
+    response, fast_response = post_both(client, fast_client, json=data)
+    assert response.json()["delivery_fee"] == 710
+    assert fast_response.json()["delivery_fee"] == 1065
+    response, fast_response = post_both(client, fast_client, json=data)
+    assert fast_response.json() == response.json()
+    assert response.json()["breakdown"]["surge_surcharge"] == 710
+
+
+def test_calculate_fee_fast_audit_log(tmp_path):
+    audit_log = AuditLog(tmp_path)
+    fast_client = TestClient(FastFeeEndpoint(pricing_store, audit_log=audit_log))
+    response = fast_client.post("/", json=valid_order)
+    assert response.status_code == status.HTTP_200_OK
+    fast_client.post("/", json=cases_2[0])
+
+    asyncio.run(audit_log.close())
+    (path,) = tmp_path.iterdir()
+    (record,) = read_audit_file(path)
+    assert record.cart_value == valid_order["cart_value"]
+    assert record.time == datetime.datetime(
+        2024, 1, 15, 13, tzinfo=datetime.timezone.utc
+    )
+    assert record.delivery_fee == response.json()["delivery_fee"]
+    assert record.rule_version == "default"
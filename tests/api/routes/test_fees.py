@@ -1,134 +1,15 @@
+import asyncio
+
 import pytest
 from fastapi import status
 from fastapi.testclient import TestClient
 
+from app.api.routes import fees
 from app.core.config import settings
-
-# valid
-cases_1 = [
-    {
-        "cart_value": 790,
-        "delivery_distance": 2235,
-        "number_of_items": 4,
-        "time": "2024-01-15T13:00:00Z",
-        "expected": 710,
-    }
-]
-
-# invalid cart_value
-cases_2 = [
-    {
-        "cart_value": 0,
-        "delivery_distance": 2235,
-        "number_of_items": 4,
-        "time": "2024-01-15T13:00:00Z",
-    },
-    {
-        "cart_value": -1,
-        "delivery_distance": 2235,
-        "number_of_items": 4,
-        "time": "2024-01-15T13:00:00Z",
-    },
-    {
-        "cart_value": "string",
-        "delivery_distance": 2235,
-        "number_of_items": 4,
-        "time": "2024-01-15T13:00:00Z",
-    },
-    {
-        "cart_value": None,
-        "delivery_distance": 2235,
-        "number_of_items": 4,
-        "time": "2024-01-15T13:00:00Z",
-    },
-    {
-        "cart_value": 333.5,
-        "delivery_distance": 2235,
-        "number_of_items": 4,
-        "time": "2024-01-15T13:00:00Z",
-    },
-]
-
-# invalid delivery_distance
-cases_3 = [
-    {
-        "cart_value": 790,
-        "delivery_distance": 0,
-        "number_of_items": 4,
-        "time": "2024-01-15T13:00:00Z",
-    },
-    {
-        "cart_value": 790,
-        "delivery_distance": -1,
-        "number_of_items": 4,
-        "time": "2024-01-15T13:00:00Z",
-    },
-    {
-        "cart_value": 790,
-        "delivery_distance": "string",
-        "number_of_items": 4,
-        "time": "2024-01-15T13:00:00Z",
-    },
-    {
-        "cart_value": 790,
-        "delivery_distance": None,
-        "number_of_items": 4,
-        "time": "2024-01-15T13:00:00Z",
-    },
-    {
-        "cart_value": 790,
-        "delivery_distance": 333.5,
-        "number_of_items": 4,
-        "time": "2024-01-15T13:00:00Z",
-    },
-]
-
-# invalid number_of_items
-cases_4 = [
-    {
-        "cart_value": 790,
-        "delivery_distance": 2235,
-        "number_of_items": 0,
-        "time": "2024-01-15T13:00:00Z",
-    },
-    {
-        "cart_value": 790,
-        "delivery_distance": 2235,
-        "number_of_items": -1,
-        "time": "2024-01-15T13:00:00Z",
-    },
-    {
-        "cart_value": 790,
-        "delivery_distance": 2235,
-        "number_of_items": "two",
-        "time": "2024-01-15T13:00:00Z",
-    },
-    {
-        "cart_value": 790,
-        "delivery_distance": 2235,
-        "number_of_items": None,
-        "time": "2024-01-15T13:00:00Z",
-    },
-]
-
-# invalid time
-cases_5 = [
-    {
-        "cart_value": 790,
-        "delivery_distance": 2235,
-        "number_of_items": 4,
-        "time": "16 Mar 2024 10:00:00",
-    },
-    {"cart_value": 790, "delivery_distance": 2235, "number_of_items": 4, "time": None},
-]
-
-# missing fields
-cases_6 = [
-    {"cart_value": 790, "delivery_distance": 2235, "number_of_items": 4},
-    {"delivery_distance": 2235, "number_of_items": 4, "time": "2024-01-15T13:00:00Z"},
-    {"number_of_items": 4, "time": "2024-01-15T13:00:00Z"},
-    {"time": "2024-01-15T13:00:00Z"},
-]
+from app.core.pricing import pricing_store
+from app.utils.audit_log import AuditLog, read_audit_file
+from app.utils.fee_coalescer import FeeCoalescer
+from tests.api.routes.cases import cases_1, cases_2, cases_3, cases_4, cases_5, cases_6
 
 
 @pytest.mark.parametrize("data", cases_1)
@@ -147,6 +28,7 @@ def test_calculate_fee_valid(client: TestClient, data: dict):
     content = response.json()
     assert "delivery_fee" in content
     assert content["delivery_fee"] == data.get("expected")
+    assert content["rule_version"] == "default"
 
 
 @pytest.mark.parametrize("data", [*cases_2, *cases_3, *cases_4, *cases_5, *cases_6])
@@ -162,3 +44,123 @@ def test_calculate_fee_invalid(client: TestClient, data: dict):
         json=payload,
     )
     assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+def test_calculate_fees_batch(client: TestClient):
+    orders = [
+        {
+            "cart_value": 790,
+            "delivery_distance": 2235,
+            "number_of_items": 4,
+            "time": "2024-01-15T13:00:00Z",
+        },
+        {
+            "cart_value": 900,
+            "delivery_distance": 500,
+            "number_of_items": 2,
+            "time": "2024-03-15T15:00:00Z",
+        },
+        {
+            "cart_value": 20000,
+            "delivery_distance": 540,
+            "number_of_items": 12,
+            "time": "2024-03-14T08:00:00Z",
+        },
+    ]
+    response = client.post(
+        f"{settings.API_V1_STR}/fees/calculate_fees",
+        json={"orders": orders},
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {
+        "delivery_fees": [710, 360, 0],
+        "rule_version": "default",
+    }
+
+
+@pytest.mark.parametrize("data", [*cases_2, *cases_3, *cases_4, *cases_5, *cases_6])
+def test_calculate_fees_batch_invalid(client: TestClient, data: dict):
+    valid_order = {key: value for key, value in cases_1[0].items() if key != "expected"}
+    response = client.post(
+        f"{settings.API_V1_STR}/fees/calculate_fees",
+        json={"orders": [valid_order, data]},
+    )
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+def test_cache_stats(client: TestClient):
+    response = client.get(f"{settings.API_V1_STR}/fees/cache_stats")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["enabled"] is settings.FEE_CACHE_ENABLED
+
+
+def test_calculate_fee_coalesced(client: TestClient, monkeypatch):
+    monkeypatch.setattr(fees, "fee_coalescer", FeeCoalescer(window=0))
+    for data in cases_1:
+        order = {key: value for key, value in data.items() if key != "expected"}
+        response = client.post(f"{settings.API_V1_STR}/fees/calculate_fee", json=order)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["delivery_fee"] == data["expected"]
+
+
+def test_calculate_fee_breakdown(client: TestClient):
+    order = {key: value for key, value in cases_1[0].items() if key != "expected"}
+    response = client.post(
+        f"{settings.API_V1_STR}/fees/calculate_fee",
+        json={**order, "include_breakdown": True},
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {
+        "delivery_fee": 710,
+        "rule_version": "default",
+        "breakdown": {
+            "cart_value_surcharge": 210,
+            "distance_surcharge": 500,
+            "item_surcharge": 0,
+            "rush_hour_surcharge": 0,
+            "free_delivery": False,
+            "fee_limit_applied": False,
+            "surge_surcharge": 0,
+        },
+    }
+
+
+def test_calculate_fee_breakdown_batch(client: TestClient):
+    order = {key: value for key, value in cases_1[0].items() if key != "expected"}
+    response = client.post(
+        f"{settings.API_V1_STR}/fees/calculate_fees",
+        json={"orders": [{**order, "include_breakdown": True}]},
+    )
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+def test_calculate_fee_audit_log(client: TestClient, tmp_path, monkeypatch):
+    audit_log = AuditLog(tmp_path)
+    monkeypatch.setattr(fees, "audit_log", audit_log)
+    orders = [
+        {key: value for key, value in data.items() if key != "expected"}
+        for data in cases_1
+    ]
+    for order in orders:
+        response = client.post(f"{settings.API_V1_STR}/fees/calculate_fee", json=order)
+        assert response.status_code == status.HTTP_200_OK
+    # Rejected requests aren't quotes
+    client.post(f"{settings.API_V1_STR}/fees/calculate_fee", json=cases_2[0])
+    assert len(audit_log) == len(orders)
+
+    asyncio.run(audit_log.close())
+    (path,) = tmp_path.iterdir()
+    records = list(read_audit_file(path))
+    assert [
+        (r.cart_value, r.delivery_distance, r.number_of_items, r.delivery_fee)
+        for r in records
+    ] == [
+        (
+            order["cart_value"],
+            order["delivery_distance"],
+            order["number_of_items"],
+            data["expected"],
+        )
+        for order, data in zip(orders, cases_1)
+    ]
+    assert {r.rule_version for r in records} == {pricing_store.snapshot.rules.VERSION}
@@ -0,0 +1,77 @@
+import io
+
+import numpy as np
+import pytest
+from fastapi import status
+from fastapi.testclient import TestClient
+
+from app.api.routes import fees
+from app.core.config import settings
+from app.utils.fee_grid import FeeGridCache, decode_fee_grid
+
+grid = {
+    "start": "2024-01-19T00:00:00Z",
+    "hours": 24,
+    "delivery_distance": {"first": 500, "last": 3000, "step": 500},
+    "cart_value": {"first": 100, "last": 20000, "step": 100},
+    "number_of_items": {"first": 1, "last": 20},
+}
+
+
+def test_fee_grid(client: TestClient, monkeypatch):
+    cache = FeeGridCache(16 * 1024 * 1024)
+    monkeypatch.setattr(fees, "fee_grid_cache", cache)
+    url = f"{settings.API_V1_STR}/fees/grid"
+    response = client.post(url, json=grid)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"] == "application/octet-stream"
+    assert response.headers["x-rule-version"] == "default"
+    fees_grid = decode_fee_grid(response.content)
+    assert fees_grid.shape == (24, 6, 200, 20)
+    # 2000 m, a cart of 700 and 4 items, at 13:00 and in the Friday rush hour
+    assert fees_grid[13, 3, 6, 3] == 700
+    assert fees_grid[16, 3, 6, 3] == 840
+    assert (fees_grid[:, :, -1, :] == 0).all()
+
+    response = client.post(url, json={**grid, "format": "npy"})
+    assert response.headers["content-type"] == "application/x-npy"
+    assert (np.load(io.BytesIO(response.content)) == fees_grid).all()
+    client.post(url, json=grid)
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_fee_grid_zone(client: TestClient, zone_pricing):
+    url = f"{settings.API_V1_STR}/fees/grid"
+    response = client.post(url, json={**grid, "zone_id": "center"})
+    assert response.headers["x-rule-version"] == "default/center"
+    assert decode_fee_grid(response.content)[13, 3, 6, 3] == 800
+    response = client.post(url, json={**grid, "zone_id": "nowhere"})
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+@pytest.mark.parametrize("start", ["9999-12-31T00:00:00Z", "9999-12-31T00:00:00-05:00"])
+def test_fee_grid_last_day(client: TestClient, start: str):
+    response = client.post(
+        f"{settings.API_V1_STR}/fees/grid", json={**grid, "start": start}
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert decode_fee_grid(response.content).shape == (24, 6, 200, 20)
+
+
+@pytest.mark.parametrize(
+    "invalid",
+    [
+        {"hours": 169},
+        {"cart_value": {"first": 200, "last": 100}},
+        {"number_of_items": {"first": 1, "last": 20, "step": 0}},
+        {"delivery_distance": {"first": 0, "last": 3000}},
+        {"format": "csv"},
+        # Over the orders priced at once
+        {"hours": 168, "cart_value": {"first": 1, "last": 200000}},
+        # Past the last datetime
+        {"start": "9999-12-31T00:00:00Z", "hours": 168},
+    ],
+)
+def test_fee_grid_invalid(client: TestClient, invalid: dict):
+    response = client.post(f"{settings.API_V1_STR}/fees/grid", json={**grid, **invalid})
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
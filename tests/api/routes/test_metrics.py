@@ -0,0 +1,92 @@
+import re
+
+import pytest
+from fastapi import status
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.utils.fee_calculator import FeeCalculator
+
+pytestmark = pytest.mark.skipif(
+    not settings.METRICS_ENABLED, reason="metrics are disabled"
+)
+
+
+def sample(text: str, name: str) -> float:
+    match = re.search(rf"^{re.escape(name)} (\S+)$", text, re.MULTILINE)
+    return float(match.group(1)) if match else 0.0
+
+
+def test_metrics(client: TestClient):
+    before = client.get("/metrics").text
+    response = client.post(
+        f"{settings.API_V1_STR}/fees/calculate_fee",
+        json={
+            "cart_value": 790,
+            "delivery_distance": 9000,
+            "number_of_items": 14,
+            "time": "2024-03-15T16:00:00Z",
+        },
+    )
+    assert response.status_code == status.HTTP_200_OK
+
+    response = client.get("/metrics")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"].startswith("text/plain")
+    after = response.text
+
+    for rule in ("fee_limit", "rush_hour", "bulk_items"):
+        name = f'fee_rules_applied_total{{rule="{rule}"}}'
+        assert sample(after, name) == sample(before, name) + 1
+    name = 'fee_rules_applied_total{rule="free_delivery"}'
+    assert sample(after, name) == sample(before, name)
+
+    for stage in ("decode", "validation", "endpoint", "encode"):
+        name = (
+            f'fee_request_stage_seconds_count{{route="/calculate_fee",stage="{stage}"}}'
+        )
+        assert sample(after, name) == sample(before, name) + 1
+    assert sample(after, "fee_calculation_seconds_count") == (
+        sample(before, "fee_calculation_seconds_count") + 1
+    )
+
+
+def test_fee_at_limit_is_not_counted_as_limited(client: TestClient):
+    name = 'fee_rules_applied_total{rule="fee_limit"}'
+    before = client.get("/metrics").text
+    # 30 + 200 + 23 * 50 + 120 is exactly the fee limit, nothing is cut
+    response = client.post(
+        f"{settings.API_V1_STR}/fees/calculate_fee",
+        json={
+            "cart_value": 970,
+            "delivery_distance": 1000,
+            "number_of_items": 27,
+            "time": "2024-01-15T13:00:00Z",
+        },
+    )
+    assert response.json()["delivery_fee"] == 1500
+    assert sample(client.get("/metrics").text, name) == sample(before, name)
+
+
+def test_fee_limit_is_counted_in_one_pricing(client: TestClient, monkeypatch):
+    def calculate_delivery_fee_breakdown(self, **inputs):
+        raise AssertionError("Priced a second time for the metrics")
+
+    monkeypatch.setattr(
+        FeeCalculator,
+        "calculate_delivery_fee_breakdown",
+        calculate_delivery_fee_breakdown,
+    )
+    name = 'fee_rules_applied_total{rule="fee_limit"}'
+    before = client.get("/metrics").text
+    response = client.post(
+        f"{settings.API_V1_STR}/fees/calculate_fee",
+        json={
+            "cart_value": 790,
+            "delivery_distance": 9000,
+            "number_of_items": 14,
+            "time": "2024-03-15T16:00:00Z",
+        },
+    )
+    assert response.json()["delivery_fee"] == 1500
+    assert sample(client.get("/metrics").text, name) == sample(before, name) + 1
@@ -0,0 +1,100 @@
+import datetime
+
+import pytest
+from fastapi import status
+from fastapi.testclient import TestClient
+
+from app.api.routes import fees
+from app.core.config import settings
+from app.utils.quote_tokens import QuoteSigner
+from tests.api.routes.cases import cases_1
+
+
+def verify_quote(client: TestClient, quote_token: str):
+    return client.post(
+        f"{settings.API_V1_STR}/fees/verify_quote", json={"quote_token": quote_token}
+    )
+
+
+def test_quote_token(client: TestClient, quote_signer):
+    order = {key: value for key, value in cases_1[0].items() if key != "expected"}
+    response = client.post(
+        f"{settings.API_V1_STR}/fees/calculate_fee",
+        json={**order, "include_quote_token": True},
+    )
+    assert response.status_code == status.HTTP_200_OK
+    quote_token = response.json()["quote_token"]
+
+    response = verify_quote(client, quote_token)
+    assert response.status_code == status.HTTP_200_OK
+    quote = response.json()
+    assert quote.pop("expires_at").endswith("Z")
+    assert quote == {
+        "valid": True,
+        "cart_value": 790,
+        "delivery_distance": 2235,
+        "number_of_items": 4,
+        "time": "2024-01-15T13:00:00Z",
+        "delivery_fee": cases_1[0]["expected"],
+        "rule_version": "default",
+    }
+
+
+def test_quote_token_zone(client: TestClient, zone_pricing, quote_signer):
+    order = {key: value for key, value in cases_1[0].items() if key != "expected"}
+    response = client.post(
+        f"{settings.API_V1_STR}/fees/calculate_fee",
+        json={**order, "zone_id": "center", "include_quote_token": True},
+    )
+    quote = verify_quote(client, response.json()["quote_token"]).json()
+    assert quote["delivery_fee"] == 810
+    assert quote["rule_version"] == "default/center"
+
+
+def test_verify_quote_invalid(client: TestClient, quote_signer):
+    forged = QuoteSigner([b"other secret"], 900).sign(
+        790, 2235, 4, datetime.datetime(2024, 1, 15, 13), 0, "default"
+    )
+    assert verify_quote(client, forged).json() == {
+        "valid": False,
+        "reason": "signature",
+    }
+    assert verify_quote(client, "garbage").json() == {
+        "valid": False,
+        "reason": "malformed",
+    }
+
+
+@pytest.mark.parametrize(
+    "content", [b"", b"{bad", b"[]", b'{"quote_token": 1}', b'{"token": "x"}']
+)
+def test_verify_quote_bad_body(client: TestClient, quote_signer, content: bytes):
+    response = client.post(
+        f"{settings.API_V1_STR}/fees/verify_quote",
+        content=content,
+        headers={"Content-Type": "application/json"},
+    )
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+def test_quote_tokens_disabled(client: TestClient, monkeypatch):
+    monkeypatch.setattr(fees, "quote_signer", None)
+    monkeypatch.setattr(fees.quote_verify_endpoint, "quote_signer", None)
+    order = {key: value for key, value in cases_1[0].items() if key != "expected"}
+    response = client.post(
+        f"{settings.API_V1_STR}/fees/calculate_fee",
+        json={**order, "include_quote_token": True},
+    )
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    assert verify_quote(client, "garbage").status_code == (
+        status.HTTP_422_UNPROCESSABLE_ENTITY
+    )
+
+
+def test_quote_token_batch(client: TestClient, quote_signer):
+    order = {key: value for key, value in cases_1[0].items() if key != "expected"}
+    response = client.post(
+        f"{settings.API_V1_STR}/fees/calculate_fees",
+        json={"orders": [order, {**order, "include_quote_token": True}]},
+    )
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
@@ -0,0 +1,41 @@
+from fastapi import status
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.core.pricing import build_fee_calculator, pricing_store
+from app.utils.fee_calculator import PricingRules
+from app.utils.pricing_rules import PricingRulesStore
+
+
+def test_pricing_rules_etag(client: TestClient, monkeypatch):
+    url = f"{settings.API_V1_STR}/fees/rules"
+    response = client.get(url)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["VERSION"] == pricing_store.snapshot.rules.VERSION
+    etag = response.headers["etag"]
+    assert response.headers["cache-control"] == "no-cache"
+
+    for if_none_match in (etag, f"W/{etag}", f'"other", {etag}', "*"):
+        response = client.get(url, headers={"If-None-Match": if_none_match})
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        assert response.content == b""
+        assert response.headers["etag"] == etag
+    response = client.get(url, headers={"If-None-Match": '"other"'})
+    assert response.status_code == status.HTTP_200_OK
+
+    # New rules are a new table
+    store = PricingRulesStore(build_fee_calculator)
+    store.publish(PricingRules(VERSION="v2", FEE_LIMIT=1000))
+    monkeypatch.setattr(pricing_store, "snapshot", store.snapshot)
+    response = client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["FEE_LIMIT"] == 1000
+    assert response.headers["etag"] != etag
+
+
+def test_pricing_rules_zone(client: TestClient, zone_pricing):
+    url = f"{settings.API_V1_STR}/fees/rules"
+    response = client.get(url, params={"zone_id": "center"})
+    assert response.json()["VERSION"] == "default/center"
+    response = client.get(url, params={"zone_id": "nowhere"})
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
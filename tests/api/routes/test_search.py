@@ -0,0 +1,74 @@
+import pytest
+from fastapi import status
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+
+search = {
+    "vary": "cart_value",
+    "max_fee": 600,
+    "delivery_distance": 2235,
+    "number_of_items": 4,
+    "time": "2024-01-15T13:00:00Z",
+}
+
+
+def test_search_fees(client: TestClient):
+    response = client.post(f"{settings.API_V1_STR}/fees/search", json=search)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {
+        "min_value": 900,
+        "max_value": None,
+        "min_value_fee": 600,
+        "max_value_fee": 0,
+        "rule_version": "default",
+    }
+    # The number of items from which the fee limit applies
+    response = client.post(
+        f"{settings.API_V1_STR}/fees/search",
+        json={
+            "vary": "number_of_items",
+            "min_fee": 1500,
+            "cart_value": 1000,
+            "delivery_distance": 1000,
+            "time": "2024-01-15T13:00:00Z",
+        },
+    )
+    assert response.json()["min_value"] == 28
+
+
+@pytest.mark.parametrize(
+    "invalid",
+    [
+        {"max_fee": None},
+        {"delivery_distance": None},
+        {"vary": "time"},
+        {"max_fee": -1},
+        {"number_of_items": 0},
+    ],
+)
+def test_search_fees_invalid(client: TestClient, invalid: dict):
+    body = {
+        key: value for key, value in {**search, **invalid}.items() if value is not None
+    }
+    response = client.post(f"{settings.API_V1_STR}/fees/search", json=body)
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+def test_search_fees_zone(client: TestClient, zone_pricing, surge_pricing):
+    url = f"{settings.API_V1_STR}/fees/search"
+    response = client.post(url, json={**search, "zone_id": "center"})
+    # The base surcharge of center is 100 more
+    assert response.json()["rule_version"] == "default/center"
+    assert response.json()["min_value"] == 1000
+    response = client.post(url, json={**search, "zone_id": "nowhere"})
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+    # A surging zone is searched with its current multiplier, and searches
+    # don't count as demand
+    for _ in range(2):
+        surge_pricing.quote("east")
+    for _ in range(2):
+        response = client.post(url, json={**search, "zone_id": "east"})
+        assert response.json()["min_value"] == 20000
+    assert surge_pricing.multiplier("east") == 1.5
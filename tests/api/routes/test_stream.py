@@ -0,0 +1,46 @@
+import json
+
+from fastapi import status
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from tests.api.routes.cases import cases_1
+
+
+def test_calculate_fees_stream(client: TestClient):
+    content = (
+        b'{"cart_value": 790, "delivery_distance": 2235, "number_of_items": 4, "time": "2024-01-15T13:00:00Z"}\n'
+        b'{"cart_value": -1, "delivery_distance": 2235, "number_of_items": 4, "time": "2024-01-15T13:00:00Z"}\n'
+    )
+    response = client.post(
+        f"{settings.API_V1_STR}/fees/calculate_fees_stream",
+        content=content,
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"] == "application/x-ndjson"
+    results = [json.loads(line) for line in response.text.splitlines()]
+    assert results[0] == {"line": 1, "delivery_fee": 710, "rule_version": "default"}
+    assert results[1]["line"] == 2
+    assert results[1]["errors"][0]["type"] == "greater_than"
+
+
+def test_calculate_fees_stream_zones(client: TestClient, zone_pricing):
+    valid_order = {key: value for key, value in cases_1[0].items() if key != "expected"}
+    content = b"".join(
+        json.dumps({**valid_order, **zone}).encode() + b"\n"
+        for zone in [{"zone_id": "center"}, {"zone_id": "missing"}, {}]
+    )
+    response = client.post(
+        f"{settings.API_V1_STR}/fees/calculate_fees_stream",
+        content=content,
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+    results = [json.loads(line) for line in response.text.splitlines()]
+    assert results[0] == {
+        "line": 1,
+        "delivery_fee": 810,
+        "rule_version": "default/center",
+    }
+    assert results[1]["errors"][0]["type"] == "unknown_zone"
+    assert results[2] == {"line": 3, "delivery_fee": 710, "rule_version": "default"}
@@ -0,0 +1,35 @@
+from fastapi import status
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from tests.api.routes.cases import cases_1
+
+
+def test_calculate_fee_surge(client: TestClient, zone_pricing, surge_pricing):
+    valid_order = {key: value for key, value in cases_1[0].items() if key != "expected"}
+    fees_by_zone = []
+    for zone in ({"zone_id": "east"}, {"zone_id": "east"}, {"zone_id": "center"}):
+        response = client.post(
+            f"{settings.API_V1_STR}/fees/calculate_fee",
+            json={**valid_order, **zone, "include_breakdown": True},
+        )
+        assert response.status_code == status.HTTP_200_OK
+        body = response.json()
+        fees_by_zone.append(
+            (body["delivery_fee"], body["breakdown"]["surge_surcharge"])
+        )
+    # The second quote doubles the demand of east, a zone without capacity
+    # doesn't surge
+    assert fees_by_zone == [(710, 0), (1065, 355), (810, 0)]
+    assert surge_pricing.multiplier("east") == 1.5
+
+
+def test_calculate_fees_batch_surge(client: TestClient, zone_pricing, surge_pricing):
+    valid_order = {key: value for key, value in cases_1[0].items() if key != "expected"}
+    zones = [{"zone_id": "east"}] * 3 + [{"zone_id": "center"}, {}]
+    response = client.post(
+        f"{settings.API_V1_STR}/fees/calculate_fees",
+        json={"orders": [{**valid_order, **zone} for zone in zones]},
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["delivery_fees"] == [710, 1065, 1420, 810, 710]
@@ -0,0 +1,48 @@
+import pytest
+from fastapi import status
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from tests.api.routes.cases import cases_1, zone_orders
+
+
+@pytest.mark.parametrize("zone, expected, rule_version", zone_orders)
+def test_calculate_fee_zone(
+    client: TestClient, zone_pricing, zone: dict, expected: int, rule_version: str
+):
+    valid_order = {key: value for key, value in cases_1[0].items() if key != "expected"}
+    response = client.post(
+        f"{settings.API_V1_STR}/fees/calculate_fee", json={**valid_order, **zone}
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {"delivery_fee": expected, "rule_version": rule_version}
+
+
+@pytest.mark.parametrize(
+    "zone",
+    [
+        {"zone_id": "missing"},
+        {"location": {"lat": 91, "lon": 24.92}},
+        {"location": {"lat": 60.16}},
+    ],
+)
+def test_calculate_fee_zone_invalid(client: TestClient, zone_pricing, zone: dict):
+    valid_order = {key: value for key, value in cases_1[0].items() if key != "expected"}
+    response = client.post(
+        f"{settings.API_V1_STR}/fees/calculate_fee", json={**valid_order, **zone}
+    )
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+def test_calculate_fees_batch_zones(client: TestClient, zone_pricing):
+    valid_order = {key: value for key, value in cases_1[0].items() if key != "expected"}
+    response = client.post(
+        f"{settings.API_V1_STR}/fees/calculate_fees",
+        json={"orders": [{**valid_order, **zone} for zone, _, _ in zone_orders]},
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {
+        "delivery_fees": [expected for _, expected, _ in zone_orders],
+        "rule_version": "default",
+        "rule_versions": [rule_version for _, _, rule_version in zone_orders],
+    }
@@ -0,0 +1,65 @@
+from fastapi import status
+from fastapi.testclient import TestClient
+
+from app.api.admission import AdmissionMiddleware
+from app.core.config import settings
+from app.main import app
+from app.utils.admission import AdmissionController, DelayShedder, TokenBuckets
+
+FEE_PATH = f"{settings.API_V1_STR}/fees/calculate_fee"
+ORDER = {
+    "cart_value": 790,
+    "delivery_distance": 2235,
+    "number_of_items": 4,
+    "time": "2024-01-15T13:00:00Z",
+}
+
+
+def admission_client(controller: AdmissionController, **kwargs) -> TestClient:
+    return TestClient(
+        AdmissionMiddleware(app, controller, prefix=settings.API_V1_STR, **kwargs)
+    )
+
+
+def test_rate_limited_client_gets_429():
+    controller = AdmissionController(TokenBuckets(rate=0.001, burst=2))
+    client = admission_client(controller)
+    statuses = [client.post(FEE_PATH, json=ORDER).status_code for _ in range(3)]
+    assert statuses == [status.HTTP_200_OK] * 2 + [status.HTTP_429_TOO_MANY_REQUESTS]
+
+    response = client.post(FEE_PATH, json=ORDER)
+    assert response.json() == {"detail": "Rate limit exceeded, try again later"}
+    assert int(response.headers["retry-after"]) > 900
+    assert controller.in_flight == 0
+
+
+def test_clients_are_told_apart_by_header():
+    controller = AdmissionController(TokenBuckets(rate=0.001, burst=1))
+    client = admission_client(controller, client_header="X-Client-Id")
+    for client_id in ("a", "b"):
+        response = client.post(FEE_PATH, json=ORDER, headers={"x-client-id": client_id})
+        assert response.status_code == status.HTTP_200_OK
+    response = client.post(FEE_PATH, json=ORDER, headers={"x-client-id": "a"})
+    assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+
+
+def test_overloaded_server_sheds_with_503():
+    shedder = DelayShedder(0.01, window=0, increase=1.0, max_fraction=1.0)
+    shedder.observe(1.0, 0.0)
+    client = admission_client(AdmissionController(shedder=shedder))
+    response = client.post(FEE_PATH, json=ORDER)
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert response.headers["retry-after"] == "1"
+    assert response.json() == {"detail": "Server overloaded, try again later"}
+
+
+def test_routes_outside_prefix_are_admitted():
+    controller = AdmissionController(max_concurrency=1)
+    controller.in_flight = 1
+    client = admission_client(controller)
+    assert client.post(FEE_PATH, json=ORDER).status_code == (
+        status.HTTP_503_SERVICE_UNAVAILABLE
+    )
+    assert client.get("/not-under-the-prefix").status_code == (
+        status.HTTP_404_NOT_FOUND
+    )
@@ -0,0 +1,193 @@
+import asyncio
+import datetime
+import struct
+
+import pytest
+
+from app.api.binary import BinaryFeeServer
+from app.core.pricing import pricing_store
+from app.utils.binary_protocol import (
+    INVALID,
+    MALFORMED,
+    OK,
+    BinaryFeeClient,
+    decode_response,
+    encode_request,
+    encode_response,
+    read_frame,
+)
+from app.utils.differential import boundary_orders
+from app.utils.fee_calculator import FeeCalculator
+
+UTC = datetime.timezone.utc
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=UTC)
+
+
+def epoch_microseconds(time: datetime.datetime) -> int:
+    if time.tzinfo is None:
+        time = time.replace(tzinfo=UTC)
+    return (time - EPOCH) // datetime.timedelta(microseconds=1)
+
+
+# The times the protocol carries, those of a datetime in UTC
+MIN_TIME = epoch_microseconds(datetime.datetime.min)
+MAX_TIME = epoch_microseconds(datetime.datetime.max)
+ORDER = (790, 2235, 4, epoch_microseconds(datetime.datetime(2024, 1, 15, 13)))
+
+
+def serve(test, max_batch: int = 1000, path: str | None = None):
+    """Run `test` with a client connected to a fresh server."""
+
+    async def run():
+        server = await BinaryFeeServer(pricing_store, max_batch).start(
+            port=0, path=path
+        )
+        if path is None:
+            port = server.sockets[0].getsockname()[1]
+            client = await BinaryFeeClient.connect(port=port)
+        else:
+            client = await BinaryFeeClient.connect(path=path)
+        try:
+            return await test(client)
+        finally:
+            await client.close()
+            server.close()
+            await server.wait_closed()
+
+    return asyncio.run(run())
+
+
+def test_price_matches_http(client):
+    response = client.post(
+        "/api/v1/fees/calculate_fee",
+        json={
+            "cart_value": 790,
+            "delivery_distance": 2235,
+            "number_of_items": 4,
+            "time": "2024-01-15T13:00:00Z",
+        },
+    ).json()
+
+    async def test(binary_client):
+        return await binary_client.price([ORDER])
+
+    assert serve(test) == (1, OK, response["rule_version"], [response["delivery_fee"]])
+
+
+@pytest.mark.parametrize("batch_size", [1, 7, 8, 500])
+def test_batches_match_scalar(batch_size):
+    fee_calculator = FeeCalculator(pricing_store.snapshot.rules)
+    orders = [
+        (
+            order["cart_value"],
+            order["delivery_distance"],
+            order["number_of_items"],
+            epoch_microseconds(order["time"]),
+        )
+        for order in boundary_orders(fee_calculator.rules, 3000)
+        if max(order["cart_value"], order["delivery_distance"]) < 2**32
+        and order["number_of_items"] < 2**32
+        and MIN_TIME <= epoch_microseconds(order["time"]) <= MAX_TIME
+    ]
+    expected = [
+        fee_calculator.calculate_delivery_fee(
+            cart_value=cart_value,
+            delivery_distance=delivery_distance,
+            number_of_items=number_of_items,
+            time=EPOCH + datetime.timedelta(microseconds=time),
+        )
+        for cart_value, delivery_distance, number_of_items, time in orders
+    ]
+    batches = [
+        orders[start : start + batch_size]
+        for start in range(0, len(orders), batch_size)
+    ]
+
+    async def test(binary_client):
+        return [response async for response in binary_client.stream(batches)]
+
+    responses = serve(test)
+    assert [response.request_id for response in responses] == list(
+        range(1, len(batches) + 1)
+    )
+    assert all(response.status == OK for response in responses)
+    assert [fee for response in responses for fee in response.delivery_fees] == expected
+
+
+def test_stream_raises_on_unencodable_batch():
+    async def test(binary_client):
+        responses = []
+        with pytest.raises(struct.error):
+            async for response in binary_client.stream(
+                [[ORDER], [(2**64, 2235, 4, ORDER[3])], [ORDER]]
+            ):
+                responses.append(response)
+        return responses
+
+    responses = serve(lambda client: asyncio.wait_for(test(client), 5))
+    assert [(response.request_id, response.status) for response in responses] == [
+        (1, OK)
+    ]
+
+
+@pytest.mark.parametrize(
+    "order, message",
+    [
+        ((0, 2235, 4, ORDER[3]), "Order 1: cart_value should be greater than 0"),
+        ((790, 0, 4, ORDER[3]), "Order 1: delivery_distance should be greater than 0"),
+        ((790, 2235, 0, ORDER[3]), "Order 1: number_of_items should be greater than 0"),
+        ((790, 2235, 4, 2**62), "Order 1: time is out of range"),
+    ],
+)
+def test_invalid_order(order, message):
+    async def test(binary_client):
+        invalid = await binary_client.price([ORDER, order])
+        # The connection stays usable
+        return invalid, await binary_client.price([ORDER])
+
+    invalid, valid = serve(test)
+    assert invalid == (1, INVALID, message, [])
+    assert valid.status == OK
+
+
+def test_malformed_frame_keeps_connection():
+    async def test(binary_client):
+        frame = encode_request(5, [ORDER])
+        binary_client.writer.write(frame[:4] + b"\x09" + frame[5:])
+        payload = await read_frame(binary_client.reader, 1 << 20)
+        return decode_response(payload), await binary_client.price([ORDER])
+
+    malformed, valid = serve(test)
+    assert malformed.status == MALFORMED
+    assert "version 9" in malformed.text
+    assert valid.status == OK
+
+
+def test_oversized_frame_closes_connection():
+    async def test(binary_client):
+        binary_client.writer.write(encode_request(5, [ORDER] * 11))
+        payload = await read_frame(binary_client.reader, 1 << 20)
+        return decode_response(payload), await binary_client.reader.read()
+
+    malformed, rest = serve(test, max_batch=10)
+    assert malformed.status == MALFORMED
+    assert "exceeds" in malformed.text
+    assert rest == b""
+
+
+def test_unix_socket(tmp_path):
+    async def test(binary_client):
+        return await binary_client.price([ORDER, ORDER])
+
+    response = serve(test, path=str(tmp_path / "fees.sock"))
+    assert response.status == OK
+    assert response.delivery_fees == [710, 710]
+
+
+def test_frame_sizes():
+    # An order is 34 bytes on the wire and its fee 27, with a 7 byte rule version
+    assert len(encode_request(1, [ORDER])) == 34
+    assert len(encode_response(1, OK, "default", [710])) == 27
+    # Each more order in the batch costs 20 bytes, and its fee 4
+    assert len(encode_request(1, [ORDER] * 100)) == 34 + 99 * 20
+    assert len(encode_response(1, OK, "default", [710] * 100)) == 27 + 99 * 4
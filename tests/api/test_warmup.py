@@ -0,0 +1,67 @@
+import asyncio
+import os
+import subprocess
+import sys
+
+import pytest
+
+from app.api import warmup
+from app.api.warmup import warm_up
+from app.core.config import settings
+from app.utils.audit_log import read_audit_file
+from app.main import app
+
+
+def test_warm_up_sends_fee_routes():
+    warmed = asyncio.run(warm_up(app, settings.API_V1_STR))
+    assert f"{settings.API_V1_STR}/fees/calculate_fee" in warmed
+    assert f"{settings.API_V1_STR}/fees/calculate_fees" in warmed
+    fast_path = f"{settings.API_V1_STR}/fees/calculate_fee_fast"
+    assert (fast_path in warmed) == settings.FAST_PATH_ENABLED
+
+
+def test_warm_up_skips_routes_not_served():
+    assert asyncio.run(warm_up(app, "/not-served")) == []
+
+
+def test_warm_up_fails_on_error_response(monkeypatch):
+    monkeypatch.setattr(
+        warmup, "WARM_UP_REQUESTS", (("/fees/calculate_fee", b'{"cart_value": 0}'),)
+    )
+    with pytest.raises(RuntimeError, match="status 422"):
+        asyncio.run(warm_up(app, settings.API_V1_STR))
+
+
+# Starts the app, which warms up, then sends one quote of its own
+_START_APP = """
+from fastapi.testclient import TestClient
+
+from app.main import app
+
+with TestClient(app) as client:
+    response = client.post(
+        "/api/v1/fees/calculate_fee",
+        json={
+            "cart_value": 100,
+            "delivery_distance": 500,
+            "number_of_items": 1,
+            "time": "2024-01-15T13:00:00Z",
+        },
+    )
+    assert response.status_code == 200
+"""
+
+
+def test_warm_up_is_not_audited(tmp_path):
+    env = {
+        **os.environ,
+        "PROJECT_NAME": "test",
+        "LEAN_STARTUP": "true",
+        "FAST_PATH_ENABLED": "true",
+        "AUDIT_LOG_PATH": str(tmp_path),
+    }
+    subprocess.run([sys.executable, "-c", _START_APP], env=env, check=True)
+    records = [
+        record for path in tmp_path.iterdir() for record in read_audit_file(path)
+    ]
+    assert [record.cart_value for record in records] == [100]
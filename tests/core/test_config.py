@@ -0,0 +1,34 @@
+import pytest
+
+from app.core.config import Setting
+
+
+@pytest.fixture
+def env_file(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("PROJECT_NAME", "test")
+    (tmp_path / ".env").write_text("API_V1_STR=/from-env-file\n")
+
+
+def test_env_file_is_read(env_file, monkeypatch):
+    monkeypatch.delenv("LEAN_STARTUP", raising=False)
+    settings = Setting()
+    assert settings.API_V1_STR == "/from-env-file"
+    assert not settings.LEAN_STARTUP
+
+
+def test_lean_startup_skips_env_file(env_file, monkeypatch):
+    monkeypatch.setenv("LEAN_STARTUP", "true")
+    settings = Setting()
+    assert settings.API_V1_STR == "/api/v1"
+    assert settings.LEAN_STARTUP
+
+
+def test_lean_startup_only_read_from_environment(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("PROJECT_NAME", "test")
+    monkeypatch.delenv("LEAN_STARTUP", raising=False)
+    (tmp_path / ".env").write_text("LEAN_STARTUP=true\nAPI_V1_STR=/from-env-file\n")
+    # Set in .env, it is too late to skip reading .env
+    settings = Setting()
+    assert settings.API_V1_STR == "/from-env-file"
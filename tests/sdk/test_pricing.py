@@ -0,0 +1,184 @@
+import datetime
+import json
+import urllib.error
+import urllib.request
+
+import pytest
+from fastapi import status
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.sdk.pricing import FeeTable, fetch_fee_table
+from app.utils.differential import boundary_orders
+from app.utils.fee_calculator import FeeCalculator, PricingRules
+from app.utils.rules_export import export_rules
+from app.utils.rush_hours import RushHourWindow
+from tests.utils.cases import (
+    cases_1,
+    cases_2,
+    cases_3,
+    cases_5,
+    cases_6,
+    cases_7,
+    rule_sets,
+)
+
+legacy_rule_sets = [
+    PricingRules(
+        VERSION="microseconds",
+        RUSH_HOUR_ISOWEEKDAY=1,
+        RUSH_HOUR_START=datetime.time(9, 30, 0, 500),
+        RUSH_HOUR_END=datetime.time(11, 0, 0, 999999),
+    ),
+    # Ends before it starts, so never applies
+    PricingRules(
+        VERSION="empty",
+        RUSH_HOUR_START=datetime.time(19),
+        RUSH_HOUR_END=datetime.time(15),
+    ),
+]
+
+# A valid order the single-rule calculator cases fill in
+base_order = {
+    "cart_value": 1000,
+    "delivery_distance": 1000,
+    "number_of_items": 1,
+    "time": datetime.datetime(2024, 3, 14, 8, 0, 0),
+}
+
+calculator_cases = [
+    {**base_order, **{k: v for k, v in case.items() if k in base_order}}
+    for cases in (
+        cases_1,
+        cases_2,
+        cases_3,
+        cases_5,
+        cases_6,
+        cases_7,
+    )
+    for case in cases
+]
+
+
+def fee_table(rules: PricingRules) -> FeeTable:
+    export = export_rules(rules)
+    return FeeTable.from_json(export.body, export.etag)
+
+
+@pytest.mark.parametrize(
+    "rules", [*rule_sets, *legacy_rule_sets], ids=lambda rules: rules.VERSION
+)
+def test_fee_table_matches_calculator(rules):
+    table = fee_table(rules)
+    assert table.version == rules.VERSION
+    fee_calculator = FeeCalculator(rules)
+    surge_multipliers = (None, None, 1.0, 1.3, 2.0, 0.9)
+    for i, order in enumerate(boundary_orders(rules, 10000)):
+        order["surge_multiplier"] = surge_multipliers[i % len(surge_multipliers)]
+        assert table.calculate_delivery_fee(**order) == (
+            fee_calculator.calculate_delivery_fee(**order)
+        ), order
+
+
+@pytest.mark.parametrize(
+    "timezone, time, expected",
+    [
+        # Saturday 01:00 in Helsinki, past the last datetime
+        ("Europe/Helsinki", datetime.datetime(9999, 12, 31, 23, 0), None),
+        ("America/New_York", datetime.datetime(9999, 12, 31, 23, 0), 1.2),
+        ("Europe/Helsinki", datetime.datetime(1, 1, 1, 0, 30), 1.5),
+        # Sunday evening in New York, before the first datetime
+        ("America/New_York", datetime.datetime(1, 1, 1, 0, 30), None),
+        (
+            "Europe/Helsinki",
+            datetime.datetime(
+                1, 1, 1, 1, 0, tzinfo=datetime.timezone(datetime.timedelta(hours=2))
+            ),
+            1.5,
+        ),
+    ],
+)
+def test_fee_table_extreme_times(timezone, time, expected):
+    rules = PricingRules(
+        RUSH_HOUR_TIMEZONE=timezone,
+        RUSH_HOURS=(
+            RushHourWindow(5, datetime.time(15), datetime.time(19), 1.2),
+            RushHourWindow(1, datetime.time(0), datetime.time(3), 1.5),
+        ),
+    )
+    assert fee_table(rules).rush_hour_multiplier(time) == expected
+
+
+def test_fee_table_matches_calculator_cases():
+    table = fee_table(PricingRules())
+    for case in cases_7:
+        order = {k: v for k, v in case.items() if k in base_order}
+        # A free order doesn't need the number of items
+        order.setdefault("number_of_items", None)
+        assert table.calculate_delivery_fee(**order) == case["expected"]
+
+
+def test_fee_table_matches_server(client: TestClient):
+    response = client.get(f"{settings.API_V1_STR}/fees/rules")
+    assert response.status_code == status.HTTP_200_OK
+    table = FeeTable.from_json(response.content, response.headers["etag"])
+
+    priced = 0
+    for order in calculator_cases:
+        response = client.post(
+            f"{settings.API_V1_STR}/fees/calculate_fee",
+            json={**order, "time": order["time"].isoformat() + "Z"},
+        )
+        # Zero distances and cart values are outside the API
+        if response.status_code != status.HTTP_200_OK:
+            continue
+        assert response.json()["rule_version"] == table.version
+        assert response.json()["delivery_fee"] == (
+            table.calculate_delivery_fee(**order)
+        ), order
+        priced += 1
+    assert priced > len(calculator_cases) * 0.8
+
+
+def test_unknown_format():
+    artifact = json.loads(export_rules(PricingRules()).body)
+    with pytest.raises(ValueError):
+        FeeTable({**artifact, "FORMAT": 2})
+
+
+class _Response:
+    def __init__(self, response):
+        self._response = response
+        self.headers = response.headers
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def read(self):
+        return self._response.content
+
+
+def test_fetch_fee_table(client: TestClient, monkeypatch):
+    requests = []
+
+    def urlopen(request, timeout):
+        # The service through the test client instead of the network
+        requests.append(request)
+        headers = dict(request.header_items())
+        response = client.get(request.full_url, headers=headers)
+        if response.status_code != status.HTTP_200_OK:
+            raise urllib.error.HTTPError(
+                request.full_url, response.status_code, "", response.headers, None
+            )
+        return _Response(response)
+
+    monkeypatch.setattr(urllib.request, "urlopen", urlopen)
+    url = f"http://testserver{settings.API_V1_STR}/fees/rules"
+    table = fetch_fee_table(url)
+    assert table.version == "default"
+    assert table.etag is not None
+    assert fetch_fee_table(url, table) is table
+    assert requests[-1].get_header("If-none-match") == table.etag
@@ -0,0 +1,227 @@
+import datetime
+import json
+import os
+
+from app.utils.fee_calculator import PricingRules
+from app.utils.rush_hours import RushHourWindow
+
+# distance_surcharge
+cases_1 = [
+    {"delivery_distance": 0, "expected": 200},
+    {"delivery_distance": 1499, "expected": 300},
+    {"delivery_distance": 1500, "expected": 300},
+    {"delivery_distance": 1501, "expected": 400},
+]
+
+# cart_value_surcharge
+cases_2 = [
+    {"cart_value": 0, "expected": 1000},
+    {"cart_value": 890, "expected": 110},
+    {"cart_value": 1001, "expected": 0},
+]
+
+# item_surcharge
+cases_3 = [
+    {"number_of_items": 4, "expected": 0},
+    {"number_of_items": 5, "expected": 50},
+    {"number_of_items": 10, "expected": 300},
+    {"number_of_items": 13, "expected": 570},
+    {"number_of_items": 14, "expected": 620},
+]
+
+# limit_delivery_fee
+cases_4 = [
+    {"delivery_fee": 1500, "expected": 1500},
+    {"delivery_fee": 2000, "expected": 1500},
+    {"delivery_fee": 1264, "expected": 1264},
+]
+
+# is_free_delivery
+cases_5 = [
+    {"cart_value": 0, "expected": False},
+    {"cart_value": 6215, "expected": False},
+    {"cart_value": 20000, "expected": True},
+    {"cart_value": 26215, "expected": True},
+]
+
+# calculate_rush_hour_surcharge
+cases_6 = [
+    {
+        "time": datetime.datetime(2024, 3, 14, 8, 0, 0),
+        "delivery_fee": 1500,
+        "expected": 0,
+    },
+    {
+        "time": datetime.datetime(2024, 3, 15, 8, 45, 34),
+        "delivery_fee": 1246,
+        "expected": 0,
+    },
+    {
+        "time": datetime.datetime(2024, 3, 15, 18, 20, 54),
+        "delivery_fee": 1100,
+        "expected": 220,
+    },
+    {
+        "time": datetime.datetime(2024, 3, 15, 20, 20, 54),
+        "delivery_fee": 1100,
+        "expected": 0,
+    },
+]
+
+# calculate_delivery_fee
+cases_7 = [
+    {
+        "cart_value": 900,
+        "delivery_distance": 500,
+        "number_of_items": 2,
+        "time": datetime.datetime(2024, 3, 14, 8, 0, 0),
+        "expected": 300,
+    },
+    {
+        "cart_value": 1100,
+        "delivery_distance": 500,
+        "number_of_items": 2,
+        "time": datetime.datetime(2024, 3, 14, 8, 0, 0),
+        "expected": 200,
+    },
+    {
+        "cart_value": 800,
+        "delivery_distance": 1100,
+        "number_of_items": 2,
+        "time": datetime.datetime(2024, 3, 14, 8, 0, 0),
+        "expected": 500,
+    },
+    {
+        "cart_value": 800,
+        "delivery_distance": 1560,
+        "number_of_items": 2,
+        "time": datetime.datetime(2024, 3, 14, 8, 0, 0),
+        "expected": 600,
+    },
+    {
+        "cart_value": 800,
+        "delivery_distance": 2050,
+        "number_of_items": 2,
+        "time": datetime.datetime(2024, 3, 14, 8, 0, 0),
+        "expected": 700,
+    },
+    {
+        "cart_value": 900,
+        "delivery_distance": 570,
+        "number_of_items": 5,
+        "time": datetime.datetime(2024, 3, 14, 8, 0, 0),
+        "expected": 350,
+    },
+    {
+        "cart_value": 900,
+        "delivery_distance": 570,
+        "number_of_items": 10,
+        "time": datetime.datetime(2024, 3, 14, 8, 0, 0),
+        "expected": 600,
+    },
+    {
+        "cart_value": 800,
+        "delivery_distance": 570,
+        "number_of_items": 14,
+        "time": datetime.datetime(2024, 3, 14, 8, 0, 0),
+        "expected": 1020,
+    },
+    {
+        "cart_value": 20000,
+        "delivery_distance": 540,
+        "number_of_items": 12,
+        "time": datetime.datetime(2024, 3, 14, 8, 0, 0),
+        "expected": 0,
+    },
+    {
+        "cart_value": 25000,
+        "delivery_distance": 460,
+        "number_of_itesm": 4,
+        "time": datetime.datetime(2024, 3, 14, 8, 0, 0),
+        "expected": 0,
+    },
+    {
+        "cart_value": 900,
+        "delivery_distance": 500,
+        "number_of_items": 2,
+        "time": datetime.datetime(2024, 3, 15, 8, 0, 0),
+        "expected": 300,
+    },
+    {
+        "cart_value": 900,
+        "delivery_distance": 500,
+        "number_of_items": 2,
+        "time": datetime.datetime(2024, 3, 15, 15, 0, 0),
+        "expected": 360,
+    },
+    {
+        "cart_value": 900,
+        "delivery_distance": 1560,
+        "number_of_items": 2,
+        "time": datetime.datetime(2024, 3, 15, 18, 39, 12),
+        "expected": 600,
+    },
+    {
+        "cart_value": 860,
+        "delivery_distance": 3050,
+        "number_of_items": 14,
+        "time": datetime.datetime(2024, 3, 15, 18, 39, 12),
+        "expected": 1500,
+    },
+]
+
+
+rule_sets = [
+    PricingRules(),
+    PricingRules(
+        VERSION="changed",
+        FEE_LIMIT=1200,
+        ADDITIONAL_DISTANCE=333,
+        BULK_ITEM_LIMIT=3,
+        RUSH_HOUR_MULTIPLIER=1.5,
+    ),
+    PricingRules(
+        VERSION="free-items",
+        ADDITIONAL_ITEM_SURCHARGE=0,
+        ADDITIONAL_DISTANCE_SURCHARGE=0,
+        CART_VALUE_FOR_FREE_DELIVERY=500,
+    ),
+    # Not tabulated by the compiled engine
+    PricingRules(VERSION="discount", RUSH_HOUR_MULTIPLIER=0.8),
+    # Fees of orders past the int32 columns of the vectorized engine under the
+    # limit, with tables too large for the compiled engine
+    PricingRules(VERSION="uncapped", FEE_LIMIT=10**15, ADDITIONAL_DISTANCE=1),
+    PricingRules(
+        VERSION="schedule",
+        RUSH_HOUR_TIMEZONE="Europe/Helsinki",
+        RUSH_HOURS=(
+            RushHourWindow(5, datetime.time(15), datetime.time(19), 1.2),
+            RushHourWindow(6, datetime.time(23), datetime.time(2), 1.7),
+            # Across the hour skipped and repeated by DST changes
+            RushHourWindow(7, datetime.time(2, 30), datetime.time(3, 30), 1.3),
+        ),
+    ),
+]
+
+
+zones = {
+    "rule_sets": {"center": {"BASE_SURCHARGE": 300}},
+    "zones": [
+        {
+            "id": "center",
+            "rule_set": "center",
+            "polygon": [[24.90, 60.15], [24.95, 60.15], [24.95, 60.18], [24.90, 60.18]],
+        },
+        {
+            # A triangle right of the center
+            "id": "east",
+            "polygon": [[24.95, 60.15], [25.05, 60.15], [24.95, 60.25]],
+        },
+    ],
+}
+
+
+def write_zones(path, data, mtime_ns=None):
+    path.write_text(json.dumps(data))
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
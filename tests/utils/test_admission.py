@@ -0,0 +1,147 @@
+import asyncio
+import itertools
+import time
+
+import pytest
+
+from app.utils.admission import (
+    AdmissionController,
+    DelayShedder,
+    Rejection,
+    TokenBuckets,
+    retry_after_header,
+)
+from app.utils.metrics import CounterChild, GaugeChild, HistogramChild
+
+
+def test_bucket_allows_burst_then_refills():
+    buckets = TokenBuckets(rate=2, burst=3)
+    assert [buckets.take("a", 0.0) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert buckets.take("a", 0.0) == pytest.approx(0.5)
+    # Half a token since the last attempt, half of one more missing
+    assert buckets.take("a", 0.25) == pytest.approx(0.25)
+    assert buckets.take("a", 0.5) == 0.0
+    # Refills up to the burst only
+    assert [buckets.take("a", 100.0) for _ in range(4)][-1] > 0
+
+
+def test_buckets_are_per_client():
+    buckets = TokenBuckets(rate=1, burst=1)
+    assert buckets.take("a", 0.0) == 0.0
+    assert buckets.take("a", 0.0) > 0
+    assert buckets.take("b", 0.0) == 0.0
+
+
+def test_least_recently_seen_client_is_evicted():
+    buckets = TokenBuckets(rate=1, burst=1, max_clients=2)
+    buckets.take("a", 0.0)
+    buckets.take("b", 0.0)
+    buckets.take("a", 0.0)
+    buckets.take("c", 0.0)
+    assert len(buckets) == 2
+    # "b" was dropped and comes back with a full bucket, "a" is still empty
+    assert buckets.take("b", 0.0) == 0.0
+    assert buckets.take("c", 0.0) > 0
+
+
+def test_shedder_sheds_over_target_and_recovers():
+    fraction, delay = GaugeChild(), HistogramChild([0.01, 0.1])
+    shedder = DelayShedder(
+        0.01,
+        window=0,
+        increase=0.5,
+        decrease=0.25,
+        max_fraction=0.9,
+        fraction=fraction,
+        delay=delay,
+    )
+    assert shedder.admit()
+    shedder.observe(0.05, 0.0)
+    assert shedder.fraction == fraction.value == 0.5
+    shedder.observe(0.05, 0.0)
+    assert shedder.fraction == 0.9
+    shedder.observe(0.001, 0.0)
+    assert shedder.fraction == pytest.approx(0.65)
+    for _ in range(3):
+        shedder.observe(0.001, 0.0)
+    assert shedder.fraction == 0.0
+    assert delay.counts == [4, 2, 0]
+
+
+def test_shedder_decides_on_smallest_delay_of_window():
+    shedder = DelayShedder(0.01, window=0.1, increase=0.5)
+    # A spike among short delays is not a standing queue
+    for now, delay in ((0.0, 0.001), (0.05, 0.2), (0.1, 0.001)):
+        shedder.observe(delay, now)
+    assert shedder.fraction == 0.0
+    shedder.observe(0.05, 0.15)
+    assert shedder.fraction == 0.0
+    shedder.observe(0.03, 0.2)
+    assert shedder.fraction == 0.5
+
+
+def test_shedder_draws_against_fraction():
+    draws = itertools.cycle([0.1, 0.6])
+    shedder = DelayShedder(0.01, window=0, increase=0.5, draw=lambda: next(draws))
+    shedder.observe(1.0, 0.0)
+    assert [shedder.admit() for _ in range(4)] == [False, True, False, True]
+
+
+def test_shedder_monitor_measures_loop_delay():
+    shedder = DelayShedder(0.01, window=0, increase=1.0, max_fraction=1.0)
+
+    async def run():
+        task = asyncio.create_task(shedder.monitor(0.001))
+        await asyncio.sleep(0.01)
+        # Blocks the event loop well past the target
+        time.sleep(0.05)
+        await asyncio.sleep(0.01)
+        task.cancel()
+
+    asyncio.run(run())
+    assert shedder.fraction > 0
+
+
+def test_controller_limits_concurrency():
+    controller = AdmissionController(max_concurrency=2)
+    assert controller.admit("a") is None
+    assert controller.admit("a") is None
+    assert controller.admit("a") == Rejection(503, "concurrency", 1.0)
+    controller.release()
+    assert controller.in_flight == 1
+    assert controller.admit("a") is None
+
+
+def test_controller_rate_limits_clients():
+    rejected = {
+        reason: CounterChild() for reason in ("overload", "concurrency", "rate_limit")
+    }
+    controller = AdmissionController(
+        TokenBuckets(rate=0.5, burst=1), clock=lambda: 10.0, rejected=rejected
+    )
+    assert controller.admit("a") is None
+    rejection = controller.admit("a")
+    assert rejection.status == 429
+    assert rejection.retry_after == pytest.approx(2.0)
+    assert controller.in_flight == 1
+    assert rejected["rate_limit"].value == 1
+
+
+def test_controller_sheds_before_other_checks():
+    shedder = DelayShedder(
+        0.01, window=0, increase=1.0, max_fraction=1.0, draw=lambda: 0.5
+    )
+    buckets = TokenBuckets(rate=1, burst=1)
+    controller = AdmissionController(buckets, max_concurrency=1, shedder=shedder)
+    shedder.observe(1.0, 0.0)
+    assert controller.admit("a") == Rejection(503, "overload", 1.0)
+    # The shed request took no token
+    assert len(buckets) == 0
+    assert controller.in_flight == 0
+
+
+@pytest.mark.parametrize(
+    ("retry_after", "header"), [(0.01, b"1"), (1.0, b"1"), (2.5, b"3")]
+)
+def test_retry_after_header(retry_after, header):
+    assert retry_after_header(Rejection(429, "rate_limit", retry_after)) == header
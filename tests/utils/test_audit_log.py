@@ -0,0 +1,201 @@
+import asyncio
+import datetime
+
+import pytest
+
+from app.utils.audit_log import (
+    ACTIVE_SUFFIX,
+    SUFFIX,
+    AuditLog,
+    AuditRecord,
+    read_audit_file,
+)
+from app.utils.metrics import CounterChild
+
+UTC = datetime.timezone.utc
+TIME = datetime.datetime(2024, 1, 15, 13, 0, tzinfo=UTC)
+
+
+def record(audit_log, i, rule_version="default", surge_multiplier=None):
+    return audit_log.record(
+        790 + i, 2235, 4, TIME, 710 + i, rule_version, surge_multiplier
+    )
+
+
+def read_all(directory):
+    return [
+        record
+        for path in sorted(directory.iterdir())
+        for record in read_audit_file(path)
+    ]
+
+
+def test_records_are_written_and_read_back(tmp_path):
+    written = CounterChild()
+    audit_log = AuditLog(tmp_path, written=written)
+
+    async def run():
+        record(audit_log, 0)
+        record(audit_log, 1, "default/center", 1.5)
+        # Naive order times are UTC
+        audit_log.record(100, 500, 1, TIME.replace(tzinfo=None), 0, "default")
+        await audit_log.close()
+
+    before = datetime.datetime.now(UTC)
+    asyncio.run(run())
+    after = datetime.datetime.now(UTC)
+
+    assert [path.name.endswith(SUFFIX) for path in tmp_path.iterdir()] == [True]
+    records = read_all(tmp_path)
+    assert [record[1:] for record in records] == [
+        (790, 2235, 4, TIME, 710, "default", 1.0),
+        (791, 2235, 4, TIME, 711, "default/center", 1.5),
+        (100, 500, 1, TIME, 0, "default", 1.0),
+    ]
+    assert all(isinstance(record, AuditRecord) for record in records)
+    assert all(
+        before - datetime.timedelta(milliseconds=1) <= record.quoted_at <= after
+        for record in records
+    )
+    assert written.value == 3
+
+
+def test_batches_are_flushed_in_the_background(tmp_path):
+    audit_log = AuditLog(tmp_path, flush_interval=0.01)
+
+    async def run():
+        task = asyncio.create_task(audit_log.run())
+        record(audit_log, 0)
+        await asyncio.sleep(0.1)
+        assert len(audit_log) == 0
+        # Still being written to, under its active name
+        assert audit_log.path.name.endswith(ACTIVE_SUFFIX)
+        assert [r.cart_value for r in read_audit_file(audit_log.path)] == [790]
+        record(audit_log, 1)
+        task.cancel()
+        await audit_log.close()
+
+    asyncio.run(run())
+    assert [r.cart_value for r in read_all(tmp_path)] == [790, 791]
+
+
+def test_full_queue_drops_new_records(tmp_path):
+    dropped = {reason: CounterChild() for reason in ("queue_full", "write_error")}
+    audit_log = AuditLog(tmp_path, max_queue=2, dropped=dropped)
+
+    async def run():
+        assert [record(audit_log, i) for i in range(4)] == [True, True, False, False]
+        await audit_log.flush()
+        assert record(audit_log, 4)
+        await audit_log.close()
+
+    asyncio.run(run())
+    assert [r.cart_value for r in read_all(tmp_path)] == [790, 791, 794]
+    assert dropped["queue_full"].value == 2
+    assert dropped["write_error"].value == 0
+
+
+def test_files_are_rotated(tmp_path):
+    audit_log = AuditLog(tmp_path, max_file_bytes=200)
+
+    async def run():
+        for i in range(12):
+            record(audit_log, i, f"v{i % 2}")
+            await audit_log.flush()
+        await audit_log.close()
+
+    asyncio.run(run())
+    paths = sorted(tmp_path.iterdir())
+    assert len(paths) > 1
+    assert all(path.name.endswith(SUFFIX) for path in paths)
+    # Every file declares the rule versions it refers to
+    records = read_all(tmp_path)
+    assert [r.cart_value for r in records] == list(range(790, 802))
+    assert [r.rule_version for r in records] == ["v0", "v1"] * 6
+
+
+def test_values_out_of_range_are_dropped(tmp_path):
+    dropped = {reason: CounterChild() for reason in ("queue_full", "write_error")}
+    audit_log = AuditLog(tmp_path, dropped=dropped)
+
+    async def run():
+        audit_log.record(2**64, 2235, 4, TIME, 710, "default")
+        record(audit_log, 0)
+        await audit_log.close()
+
+    asyncio.run(run())
+    assert [r.cart_value for r in read_all(tmp_path)] == [790]
+    assert dropped["write_error"].value == 1
+
+
+def test_truncated_file_ends_at_last_whole_record(tmp_path):
+    audit_log = AuditLog(tmp_path)
+
+    async def run():
+        record(audit_log, 0)
+        record(audit_log, 1)
+        await audit_log.close()
+
+    asyncio.run(run())
+    (path,) = tmp_path.iterdir()
+    path.write_bytes(path.read_bytes()[:-5])
+    assert [r.cart_value for r in read_audit_file(path)] == [790]
+
+
+def test_not_an_audit_file(tmp_path):
+    path = tmp_path / "other.audit"
+    path.write_bytes(b"something else")
+    with pytest.raises(ValueError):
+        list(read_audit_file(path))
+
+
+def test_oversized_rule_version_is_dropped(tmp_path):
+    dropped = {reason: CounterChild() for reason in ("queue_full", "write_error")}
+    audit_log = AuditLog(tmp_path, dropped=dropped)
+
+    async def run():
+        record(audit_log, 0, rule_version="v" * 65536)
+        record(audit_log, 1)
+        await audit_log.flush()
+        # The dropped rule version was not given an id that later quotes reuse
+        record(audit_log, 2, rule_version="v" * 65536)
+        record(audit_log, 3, rule_version="other")
+        await audit_log.close()
+
+    asyncio.run(run())
+    records = read_all(tmp_path)
+    assert [r.cart_value for r in records] == [791, 793]
+    assert [r.rule_version for r in records] == ["default", "other"]
+    assert dropped["write_error"].value == 2
+
+
+def test_failed_write_does_not_stop_the_flushes(tmp_path):
+    dropped = {reason: CounterChild() for reason in ("queue_full", "write_error")}
+    audit_log = AuditLog(tmp_path, flush_interval=0.001, dropped=dropped)
+    write = audit_log._write
+    failures = [RuntimeError("unexpected")]
+
+    def fail_once(records):
+        if failures:
+            raise failures.pop()
+        write(records)
+
+    audit_log._write = fail_once
+
+    async def run():
+        task = asyncio.create_task(audit_log.run())
+        record(audit_log, 0)
+        while failures:
+            await asyncio.sleep(0.001)
+        record(audit_log, 1)
+        for _ in range(1000):
+            if not len(audit_log) or task.done():
+                break
+            await asyncio.sleep(0.001)
+        assert not task.done()
+        task.cancel()
+        await audit_log.close()
+
+    asyncio.run(run())
+    assert [r.cart_value for r in read_all(tmp_path)] == [791]
+    assert dropped["write_error"].value == 1
@@ -0,0 +1,183 @@
+import json
+
+import numpy as np
+import pytest
+
+from app import cli
+from app.utils.backtest import (
+    DELTA_EDGES,
+    SEGMENTATIONS,
+    open_order_columns,
+    run_backtest,
+    write_order_columns,
+)
+from app.utils.fee_calculator import FeeCalculator, PricingRules
+
+new_rules = PricingRules(VERSION="new", FEE_LIMIT=1200, RUSH_HOUR_MULTIPLIER=1.5)
+
+
+def random_columns(count: int, seed: int = 0) -> dict[str, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    week_start = np.datetime64("2024-03-11T00:00:00", "s")
+    return {
+        "cart_value": rng.integers(1, 25000, count, dtype=np.int32),
+        "delivery_distance": rng.integers(1, 8000, count, dtype=np.int32),
+        "number_of_items": rng.integers(1, 25, count, dtype=np.int16),
+        "time": week_start + rng.integers(0, 7 * 24 * 3600, count),
+    }
+
+
+@pytest.fixture(scope="module")
+def orders(tmp_path_factory):
+    directory = tmp_path_factory.mktemp("orders")
+    columns = random_columns(5000)
+    write_order_columns(directory, **columns)
+    return directory, columns
+
+
+def scalar_fees(rules: PricingRules, columns: dict[str, np.ndarray]) -> np.ndarray:
+    fee_calculator = FeeCalculator(rules)
+    return np.array(
+        [
+            fee_calculator.calculate_delivery_fee(
+                cart_value=int(cart_value),
+                delivery_distance=int(delivery_distance),
+                number_of_items=int(number_of_items),
+                time=time,
+            )
+            for cart_value, delivery_distance, number_of_items, time in zip(
+                columns["cart_value"],
+                columns["delivery_distance"],
+                columns["number_of_items"],
+                columns["time"].tolist(),
+            )
+        ]
+    )
+
+
+@pytest.mark.parametrize("workers, chunk_size", [(1, 1000), (1, 777), (2, 1024)])
+def test_backtest_matches_scalar(orders, workers, chunk_size):
+    directory, columns = orders
+    result = run_backtest(
+        directory,
+        PricingRules(),
+        new_rules,
+        chunk_size=chunk_size,
+        workers=workers,
+    )
+    old_fees = scalar_fees(PricingRules(), columns)
+    new_fees = scalar_fees(new_rules, columns)
+    deltas = new_fees - old_fees
+
+    assert result["old_version"] == "default"
+    assert result["new_version"] == "new"
+    assert result["orders"] == 5000
+    assert result["old_total"] == old_fees.sum()
+    assert result["new_total"] == new_fees.sum()
+    assert result["delta_total"] == deltas.sum()
+    assert result["decreased_orders"] == (deltas < 0).sum()
+    assert result["unchanged_orders"] == (deltas == 0).sum()
+    assert result["increased_orders"] == (deltas > 0).sum()
+
+    expected_histogram = np.bincount(
+        np.searchsorted(DELTA_EDGES, deltas, "right"), minlength=len(DELTA_EDGES) + 1
+    )
+    assert result["delta_histogram"] == expected_histogram.tolist()
+    assert len(result["delta_bins"]) == len(DELTA_EDGES) + 1
+
+    for name, segments in result["segments"].items():
+        assert [segment["segment"] for segment in segments] == list(
+            SEGMENTATIONS[name].labels
+        )
+        assert sum(segment["orders"] for segment in segments) == 5000
+        assert sum(segment["delta_total"] for segment in segments) == deltas.sum()
+        assert (
+            np.sum([segment["delta_histogram"] for segment in segments], axis=0)
+            == expected_histogram
+        ).all()
+
+
+def test_backtest_segments(orders):
+    directory, columns = orders
+    result = run_backtest(directory, PricingRules(), new_rules, segment_by=["weekday"])
+    assert list(result["segments"]) == ["weekday"]
+    weekdays = columns["time"].astype("datetime64[D]").tolist()
+    fridays = [i for i, day in enumerate(weekdays) if day.isoweekday() == 5]
+    friday = result["segments"]["weekday"][4]
+    assert friday["segment"] == "Fri"
+    assert friday["orders"] == len(fridays)
+    assert (
+        friday["new_total"]
+        == scalar_fees(
+            new_rules, {name: column[fridays] for name, column in columns.items()}
+        ).sum()
+    )
+
+
+def test_backtest_same_rules(orders):
+    directory, _ = orders
+    result = run_backtest(directory, PricingRules(), PricingRules(), segment_by=[])
+    assert result["delta_total"] == 0
+    assert result["unchanged_orders"] == 5000
+
+
+def test_backtest_empty(tmp_path):
+    write_order_columns(tmp_path, **random_columns(0))
+    result = run_backtest(tmp_path, PricingRules(), new_rules)
+    assert result["orders"] == result["old_total"] == 0
+    assert result["segments"]["hour"][0]["orders"] == 0
+
+
+def test_backtest_memory_maps(orders):
+    directory, _ = orders
+    columns = open_order_columns(directory)
+    assert all(isinstance(column, np.memmap) for column in columns.values())
+
+
+@pytest.mark.parametrize(
+    "change",
+    [
+        lambda columns: columns.pop("time"),
+        lambda columns: columns.update(time=columns["cart_value"]),
+        lambda columns: columns.update(cart_value=columns["cart_value"] * 1.0),
+        lambda columns: columns.update(cart_value=columns["cart_value"][:-1]),
+    ],
+)
+def test_backtest_invalid_columns(tmp_path, change):
+    columns = random_columns(10)
+    change(columns)
+    for name, column in columns.items():
+        np.save(tmp_path / f"{name}.npy", column)
+    with pytest.raises(ValueError):
+        run_backtest(tmp_path, PricingRules(), new_rules)
+
+
+def test_backtest_invalid_arguments(orders):
+    directory, _ = orders
+    with pytest.raises(ValueError):
+        run_backtest(directory, PricingRules(), new_rules, segment_by=["city"])
+    with pytest.raises(ValueError):
+        run_backtest(directory, PricingRules(), new_rules, delta_edges=(-1, 2))
+
+
+def test_backtest_cli(orders, tmp_path, capsys):
+    directory, _ = orders
+    rules_path = tmp_path / "rules.json"
+    rules_path.write_text(json.dumps({"VERSION": "new", "FEE_LIMIT": 1200}))
+    cli.main(
+        [
+            "backtest",
+            str(directory),
+            "--new-rules",
+            str(rules_path),
+            "--segment-by",
+            "distance",
+            "--workers",
+            "1",
+        ]
+    )
+    result = json.loads(capsys.readouterr().out)
+    assert result["new_version"] == "new"
+    assert result["orders"] == 5000
+    assert result["delta_total"] < 0
+    assert list(result["segments"]) == ["distance"]
@@ -0,0 +1,69 @@
+import struct
+
+import numpy as np
+import pytest
+
+from app.utils.binary_protocol import (
+    INVALID,
+    OK,
+    ORDER,
+    ORDER_DTYPE,
+    MalformedFrameError,
+    decode_request,
+    decode_response,
+    encode_request,
+    encode_response,
+)
+
+orders = [(790, 2235, 4, 1705323600000000), (900, 500, 2, -1)]
+
+
+def test_request_round_trip():
+    frame = encode_request(7, orders)
+    (length,) = struct.unpack_from("<I", frame)
+    assert length == len(frame) - 4
+    # 10 bytes of header and 20 per order
+    assert length == 10 + 2 * ORDER.size == 50
+
+    request_id, decoded = decode_request(frame[4:])
+    assert request_id == 7
+    assert decoded.dtype == ORDER_DTYPE
+    assert decoded.tolist() == orders
+
+
+def test_request_from_array():
+    array = np.array(orders, dtype=ORDER_DTYPE)
+    assert encode_request(7, array) == encode_request(7, orders)
+
+
+def test_request_value_out_of_range():
+    with pytest.raises(struct.error):
+        encode_request(1, [(2**32, 1, 1, 0)])
+
+
+@pytest.mark.parametrize(
+    "payload, message",
+    [
+        (b"\x01\x01", "shorter"),
+        (bytes([2]) + encode_request(1, orders)[5:], "version 2"),
+        (b"\x01\x09" + encode_request(1, orders)[6:], "kind 9"),
+        (encode_request(1, orders)[4:-1], "doesn't match 2 orders"),
+    ],
+)
+def test_malformed_request(payload, message):
+    with pytest.raises(MalformedFrameError, match=message):
+        decode_request(payload)
+
+
+def test_response_round_trip():
+    frame = encode_response(7, OK, "default", np.array([710, 0]))
+    assert decode_response(frame[4:]) == (7, OK, "default", [710, 0])
+    frame = encode_response(8, INVALID, "Order 0: cart_value should be greater than 0")
+    assert decode_response(frame[4:]) == (
+        8,
+        INVALID,
+        "Order 0: cart_value should be greater than 0",
+        [],
+    )
+    with pytest.raises(MalformedFrameError):
+        decode_response(frame[4:-1])
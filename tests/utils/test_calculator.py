@@ -2,172 +2,16 @@ import datetime
 
 import pytest
 
-from app.utils.fee_calculator import FeeCalculator
-
-# distance_surcharge
-cases_1 = [
-    {"delivery_distance": 0, "expected": 200},
-    {"delivery_distance": 1499, "expected": 300},
-    {"delivery_distance": 1500, "expected": 300},
-    {"delivery_distance": 1501, "expected": 400},
-]
-
-# cart_value_surcharge
-cases_2 = [
-    {"cart_value": 0, "expected": 1000},
-    {"cart_value": 890, "expected": 110},
-    {"cart_value": 1001, "expected": 0},
-]
-
-# item_surcharge
-cases_3 = [
-    {"number_of_items": 4, "expected": 0},
-    {"number_of_items": 5, "expected": 50},
-    {"number_of_items": 10, "expected": 300},
-    {"number_of_items": 13, "expected": 570},
-    {"number_of_items": 14, "expected": 620},
-]
-
-# limit_delivery_fee
-cases_4 = [
-    {"delivery_fee": 1500, "expected": 1500},
-    {"delivery_fee": 2000, "expected": 1500},
-    {"delivery_fee": 1264, "expected": 1264},
-]
-
-# is_free_delivery
-cases_5 = [
-    {"cart_value": 0, "expected": False},
-    {"cart_value": 6215, "expected": False},
-    {"cart_value": 20000, "expected": True},
-    {"cart_value": 26215, "expected": True},
-]
-
-# calculate_rush_hour_surcharge
-cases_6 = [
-    {
-        "time": datetime.datetime(2024, 3, 14, 8, 0, 0),
-        "delivery_fee": 1500,
-        "expected": 0,
-    },
-    {
-        "time": datetime.datetime(2024, 3, 15, 8, 45, 34),
-        "delivery_fee": 1246,
-        "expected": 0,
-    },
-    {
-        "time": datetime.datetime(2024, 3, 15, 18, 20, 54),
-        "delivery_fee": 1100,
-        "expected": 220,
-    },
-    {
-        "time": datetime.datetime(2024, 3, 15, 20, 20, 54),
-        "delivery_fee": 1100,
-        "expected": 0,
-    },
-]
-
-# calculate_delivery_fee
-cases_7 = [
-    {
-        "cart_value": 900,
-        "delivery_distance": 500,
-        "number_of_items": 2,
-        "time": datetime.datetime(2024, 3, 14, 8, 0, 0),
-        "expected": 300,
-    },
-    {
-        "cart_value": 1100,
-        "delivery_distance": 500,
-        "number_of_items": 2,
-        "time": datetime.datetime(2024, 3, 14, 8, 0, 0),
-        "expected": 200,
-    },
-    {
-        "cart_value": 800,
-        "delivery_distance": 1100,
-        "number_of_items": 2,
-        "time": datetime.datetime(2024, 3, 14, 8, 0, 0),
-        "expected": 500,
-    },
-    {
-        "cart_value": 800,
-        "delivery_distance": 1560,
-        "number_of_items": 2,
-        "time": datetime.datetime(2024, 3, 14, 8, 0, 0),
-        "expected": 600,
-    },
-    {
-        "cart_value": 800,
-        "delivery_distance": 2050,
-        "number_of_items": 2,
-        "time": datetime.datetime(2024, 3, 14, 8, 0, 0),
-        "expected": 700,
-    },
-    {
-        "cart_value": 900,
-        "delivery_distance": 570,
-        "number_of_items": 5,
-        "time": datetime.datetime(2024, 3, 14, 8, 0, 0),
-        "expected": 350,
-    },
-    {
-        "cart_value": 900,
-        "delivery_distance": 570,
-        "number_of_items": 10,
-        "time": datetime.datetime(2024, 3, 14, 8, 0, 0),
-        "expected": 600,
-    },
-    {
-        "cart_value": 800,
-        "delivery_distance": 570,
-        "number_of_items": 14,
-        "time": datetime.datetime(2024, 3, 14, 8, 0, 0),
-        "expected": 1020,
-    },
-    {
-        "cart_value": 20000,
-        "delivery_distance": 540,
-        "number_of_items": 12,
-        "time": datetime.datetime(2024, 3, 14, 8, 0, 0),
-        "expected": 0,
-    },
-    {
-        "cart_value": 25000,
-        "delivery_distance": 460,
-        "number_of_itesm": 4,
-        "time": datetime.datetime(2024, 3, 14, 8, 0, 0),
-        "expected": 0,
-    },
-    {
-        "cart_value": 900,
-        "delivery_distance": 500,
-        "number_of_items": 2,
-        "time": datetime.datetime(2024, 3, 15, 8, 0, 0),
-        "expected": 300,
-    },
-    {
-        "cart_value": 900,
-        "delivery_distance": 500,
-        "number_of_items": 2,
-        "time": datetime.datetime(2024, 3, 15, 15, 0, 0),
-        "expected": 360,
-    },
-    {
-        "cart_value": 900,
-        "delivery_distance": 1560,
-        "number_of_items": 2,
-        "time": datetime.datetime(2024, 3, 15, 18, 39, 12),
-        "expected": 600,
-    },
-    {
-        "cart_value": 860,
-        "delivery_distance": 3050,
-        "number_of_items": 14,
-        "time": datetime.datetime(2024, 3, 15, 18, 39, 12),
-        "expected": 1500,
-    },
-]
+from app.utils.fee_calculator import FeeBreakdown, FeeCalculator
+from tests.utils.cases import (
+    cases_1,
+    cases_2,
+    cases_3,
+    cases_4,
+    cases_5,
+    cases_6,
+    cases_7,
+)
 
 
 @pytest.fixture(scope="module")
@@ -248,3 +92,91 @@ def test_calculate_delivery_fee(fee_calculator, calculate_delivery_fee):
     }
     expected_fee = calculate_delivery_fee.get("expected")
     assert fee_calculator.calculate_delivery_fee(**inputs) == expected_fee
+
+
+@pytest.mark.parametrize("calculate_delivery_fee", cases_7)
+def test_calculate_delivery_fee_breakdown(fee_calculator, calculate_delivery_fee):
+    inputs = {
+        key: value for key, value in calculate_delivery_fee.items() if key != "expected"
+    }
+    breakdown = fee_calculator.calculate_delivery_fee_breakdown(**inputs)
+    assert breakdown.delivery_fee == calculate_delivery_fee["expected"]
+    if breakdown.free_delivery:
+        assert breakdown == FeeBreakdown(0, 0, 0, 0, 0, True, False)
+        return
+    total = sum(breakdown[1:5])
+    assert breakdown.delivery_fee == min(total, fee_calculator.rules.FEE_LIMIT)
+    assert breakdown.fee_limit_applied == (total > fee_calculator.rules.FEE_LIMIT)
+
+
+@pytest.mark.parametrize(
+    "inputs, expected",
+    [
+        (
+            (790, 2235, 4, datetime.datetime(2024, 1, 15, 13, 0, 0)),
+            FeeBreakdown(710, 210, 500, 0, 0, False, False),
+        ),
+        (
+            (890, 1499, 5, datetime.datetime(2024, 3, 15, 16, 0, 0)),
+            FeeBreakdown(552, 110, 300, 50, 92, False, False),
+        ),
+        (
+            (860, 3050, 14, datetime.datetime(2024, 3, 15, 18, 39, 12)),
+            FeeBreakdown(1500, 140, 700, 620, 292, False, True),
+        ),
+        (
+            (20000, 3050, 14, datetime.datetime(2024, 3, 15, 18, 39, 12)),
+            FeeBreakdown(0, 0, 0, 0, 0, True, False),
+        ),
+    ],
+)
+def test_calculate_delivery_fee_breakdown_components(fee_calculator, inputs, expected):
+    cart_value, delivery_distance, number_of_items, time = inputs
+    assert (
+        fee_calculator.calculate_delivery_fee_breakdown(
+            cart_value=cart_value,
+            delivery_distance=delivery_distance,
+            number_of_items=number_of_items,
+            time=time,
+        )
+        == expected
+    )
+
+
+def test_calculate_delivery_fees_matches_scalar(fee_calculator):
+    cases = [case for case in cases_7 if "number_of_items" in case]
+    delivery_fees = fee_calculator.calculate_delivery_fees(
+        cart_values=[case["cart_value"] for case in cases],
+        delivery_distances=[case["delivery_distance"] for case in cases],
+        numbers_of_items=[case["number_of_items"] for case in cases],
+        times=[case["time"] for case in cases],
+    )
+    assert delivery_fees.tolist() == [case["expected"] for case in cases]
+
+
+def test_calculate_delivery_fees_grid(fee_calculator):
+    orders = [
+        (cart_value, delivery_distance, number_of_items, time)
+        for cart_value in (1, 999, 1000, 1001, 19999, 20000)
+        for delivery_distance in (1, 999, 1000, 1001, 1500, 1501, 9999)
+        for number_of_items in (1, 4, 5, 12, 13, 40)
+        for time in (
+            datetime.datetime(2024, 3, 15, 14, 59, 59, 999999),
+            datetime.datetime(2024, 3, 15, 15, 0, 0),
+            datetime.datetime(2024, 3, 15, 18, 59, 59, 999999),
+            datetime.datetime(2024, 3, 15, 19, 0, 0),
+            datetime.datetime(2024, 3, 16, 16, 0, 0),
+            datetime.datetime(2024, 3, 15, 16, 0, tzinfo=datetime.timezone.utc),
+        )
+    ]
+    delivery_fees = fee_calculator.calculate_delivery_fees(*zip(*orders))
+    expected_fees = [
+        fee_calculator.calculate_delivery_fee(
+            cart_value=cart_value,
+            delivery_distance=delivery_distance,
+            number_of_items=number_of_items,
+            time=time,
+        )
+        for cart_value, delivery_distance, number_of_items, time in orders
+    ]
+    assert delivery_fees.tolist() == expected_fees
@@ -0,0 +1,89 @@
+import datetime
+import time
+
+import pytest
+
+from app.utils.compiled_fee_calculator import CompiledFeeCalculator
+from app.utils.fee_calculator import FeeCalculator, PricingRules
+from app.utils.shared_tables import compile_engine
+from tests.utils.cases import cases_7
+
+
+@pytest.fixture(scope="module")
+def fee_calculator():
+    return CompiledFeeCalculator()
+
+
+@pytest.mark.parametrize("calculate_delivery_fee", cases_7)
+def test_calculate_delivery_fee(fee_calculator, calculate_delivery_fee):
+    inputs = {
+        key: value for key, value in calculate_delivery_fee.items() if key != "expected"
+    }
+    expected_fee = calculate_delivery_fee.get("expected")
+    assert fee_calculator.calculate_delivery_fee(**inputs) == expected_fee
+
+
+def test_calculate_delivery_fee_matches_scalar(fee_calculator):
+    scalar_calculator = FeeCalculator()
+    for cart_value in (1, 999, 1000, 1001, 19999, 20000, 10**20):
+        for delivery_distance in (1, 1000, 1001, 1500, 1501, 7500, 7501, 10**20):
+            for number_of_items in (1, 4, 5, 12, 13, 40, 43, 44, 10**20):
+                for time in (
+                    datetime.datetime(2024, 3, 15, 14, 59, 59),
+                    datetime.datetime(2024, 3, 15, 15, 0, 0),
+                    datetime.datetime(2024, 3, 15, 18, 59, 59),
+                    datetime.datetime(2024, 3, 15, 19, 0, 0),
+                ):
+                    inputs = {
+                        "cart_value": cart_value,
+                        "delivery_distance": delivery_distance,
+                        "number_of_items": number_of_items,
+                        "time": time,
+                    }
+                    assert fee_calculator.calculate_delivery_fee(
+                        **inputs
+                    ) == scalar_calculator.calculate_delivery_fee(**inputs)
+
+
+def test_calculate_delivery_fee_breakdown_matches(fee_calculator):
+    scalar_calculator = FeeCalculator()
+    for cart_value in (1, 999, 1000, 19999, 20000):
+        for delivery_distance in (1, 1000, 1501, 7501):
+            for number_of_items in (1, 5, 13, 40):
+                for time in (
+                    datetime.datetime(2024, 3, 15, 16, 0, 0),
+                    datetime.datetime(2024, 3, 16, 16, 0, 0),
+                ):
+                    inputs = {
+                        "cart_value": cart_value,
+                        "delivery_distance": delivery_distance,
+                        "number_of_items": number_of_items,
+                        "time": time,
+                    }
+                    breakdown = fee_calculator.calculate_delivery_fee_breakdown(
+                        **inputs
+                    )
+                    assert breakdown == (
+                        scalar_calculator.calculate_delivery_fee_breakdown(**inputs)
+                    )
+                    assert breakdown.delivery_fee == (
+                        fee_calculator.calculate_delivery_fee(**inputs)
+                    )
+
+
+@pytest.mark.parametrize(
+    "rules",
+    [
+        PricingRules(VERSION="fee-limit", FEE_LIMIT=1_000_000),
+        PricingRules(VERSION="cart-value", BASE_CART_VALUE=10_000_000),
+        PricingRules(VERSION="distance", ADDITIONAL_DISTANCE=100_000),
+    ],
+    ids=lambda rules: rules.VERSION,
+)
+def test_large_tables_are_not_compiled(rules):
+    start = time.perf_counter()
+    with pytest.raises(ValueError, match="entries"):
+        CompiledFeeCalculator(rules)
+    assert time.perf_counter() - start < 0.1
+    # Left to the default engine
+    assert type(compile_engine(rules)) is FeeCalculator
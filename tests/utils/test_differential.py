@@ -0,0 +1,124 @@
+import datetime
+import math
+
+import pytest
+
+from app.utils.differential import (
+    boundary_orders,
+    build_engines,
+    find_disagreements,
+    time_engines,
+)
+from app.utils.fee_cache import CachedFeeCalculator, FeeCache
+from app.utils.fee_calculator import FeeCalculator, PricingRules
+from app.utils.shared_tables import compile_engine
+from tests.utils.cases import rule_sets
+
+
+@pytest.mark.parametrize("rules", rule_sets, ids=lambda rules: rules.VERSION)
+def test_engines_agree(rules):
+    engines = build_engines(rules)
+    assert ("compiled" in engines) == (rules.VERSION not in ("discount", "uncapped"))
+    assert find_disagreements(engines, boundary_orders(rules, 10000)) == []
+
+
+@pytest.mark.parametrize("rules", rule_sets, ids=lambda rules: rules.VERSION)
+def test_engines_agree_with_surge(rules):
+    orders = boundary_orders(rules, 5000, seed=1)
+    # Some orders without surge pricing, and a discount the compiled engine
+    # can't take from its tables
+    surge_multipliers = (None, 1.0, 1.1, 1.3, 1.5, 2.0, 0.9)
+    for i, order in enumerate(orders):
+        order["surge_multiplier"] = surge_multipliers[i % len(surge_multipliers)]
+    assert find_disagreements(build_engines(rules), orders) == []
+
+
+@pytest.mark.parametrize("rules", rule_sets, ids=lambda rules: rules.VERSION)
+def test_engines_agree_on_fee_limit(rules):
+    fee_calculator = FeeCalculator(rules)
+    engines = [fee_calculator, compile_engine(rules)]
+    engines.append(CachedFeeCalculator(engines[-1], FeeCache(1 << 30, math.inf)))
+    surge_multipliers = (None, 1.0, 1.3, 0.9)
+    for i, order in enumerate(boundary_orders(rules, 3000, seed=2)):
+        order["surge_multiplier"] = surge_multipliers[i % len(surge_multipliers)]
+        breakdown = fee_calculator.calculate_delivery_fee_breakdown(**order)
+        expected = (breakdown.delivery_fee, breakdown.fee_limit_applied)
+        for engine in engines:
+            assert engine.calculate_delivery_fee_and_limit(**order) == expected, order
+        # From the cache
+        assert engines[-1].calculate_delivery_fee_and_limit(**order) == expected
+
+
+def test_boundary_orders_cover_rules():
+    rules = PricingRules()
+    orders = boundary_orders(rules, 5000)
+    distances = {order["delivery_distance"] for order in orders}
+    assert {999, 1000, 1001, 1499, 1500, 1501, 8001} <= distances
+    assert {3, 4, 5, 11, 12, 13} <= {order["number_of_items"] for order in orders}
+    assert {999, 1000, 19999, 20000} <= {order["cart_value"] for order in orders}
+    assert min(order["cart_value"] for order in orders) >= 1
+
+    fee_calculator = FeeCalculator(rules)
+    breakdowns = [
+        fee_calculator.calculate_delivery_fee_breakdown(**order) for order in orders
+    ]
+    fees_before_limit = {
+        breakdown.cart_value_surcharge
+        + breakdown.distance_surcharge
+        + breakdown.item_surcharge
+        for breakdown in breakdowns
+    }
+    assert {1499, 1500, 1501, 1250} <= fees_before_limit
+
+    times = {order["time"].replace(tzinfo=None).time() for order in orders}
+    assert {
+        datetime.time(14, 59, 59, 999999),
+        datetime.time(15),
+        datetime.time(18, 59, 59, 999999),
+        datetime.time(19),
+    } <= times
+
+
+def test_boundary_orders_are_seeded():
+    rules = PricingRules()
+    assert boundary_orders(rules, 100, seed=1) == boundary_orders(rules, 100, seed=1)
+    assert boundary_orders(rules, 100, seed=1) != boundary_orders(rules, 100, seed=2)
+
+
+class _RushHourEndIncluded(FeeCalculator):
+    def _rush_hour_multiplier(self, time):
+        rules = self.rules
+        if (
+            time.isoweekday() == rules.RUSH_HOUR_ISOWEEKDAY
+            and rules.RUSH_HOUR_START <= time.time() <= rules.RUSH_HOUR_END
+        ):
+            return rules.RUSH_HOUR_MULTIPLIER
+        return None
+
+
+class _FeeLimitOffByOne(FeeCalculator):
+    def _limit_delivery_fee(self, delivery_fee):
+        return min(delivery_fee, self.rules.FEE_LIMIT + 1)
+
+
+@pytest.mark.parametrize("mutant", [_RushHourEndIncluded, _FeeLimitOffByOne])
+def test_off_by_one_engine_is_caught(mutant):
+    rules = PricingRules()
+    fee_calculator = mutant(rules)
+    engines = build_engines(rules)
+    engines["mutant"] = lambda orders: [
+        fee_calculator.calculate_delivery_fee(**order) for order in orders
+    ]
+    disagreements = find_disagreements(engines, boundary_orders(rules, 2000))
+    assert disagreements
+    for disagreement in disagreements:
+        assert disagreement.fees["mutant"] != disagreement.fees["scalar"]
+        assert disagreement.fees["compiled"] == disagreement.fees["scalar"]
+
+
+def test_time_engines():
+    rules = PricingRules()
+    engines = build_engines(rules)
+    timings = time_engines(engines, boundary_orders(rules, 100), repeat=1)
+    assert list(timings) == list(engines)
+    assert all(seconds > 0 for seconds in timings.values())
@@ -0,0 +1,149 @@
+import datetime
+import tracemalloc
+
+import pytest
+
+from app.utils.compiled_fee_calculator import CompiledFeeCalculator
+from app.utils.fee_cache import MAX_KEY_VALUE, CachedFeeCalculator, FeeCache
+from app.utils.fee_calculator import FeeCalculator
+from tests.utils.cases import cases_7
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def order(time, cart_value=790):
+    return {
+        "cart_value": cart_value,
+        "delivery_distance": 2235,
+        "number_of_items": 4,
+        "time": time,
+    }
+
+
+@pytest.mark.parametrize("fee_calculator", [FeeCalculator(), CompiledFeeCalculator()])
+@pytest.mark.parametrize("calculate_delivery_fee", cases_7)
+def test_cached_fees_match(fee_calculator, calculate_delivery_fee):
+    inputs = {
+        key: value for key, value in calculate_delivery_fee.items() if key != "expected"
+    }
+    inputs.setdefault("number_of_items", None)
+    cached_calculator = CachedFeeCalculator(fee_calculator, FeeCache(2**20, 60))
+    for _ in range(2):
+        assert (
+            cached_calculator.calculate_delivery_fee(**inputs)
+            == calculate_delivery_fee["expected"]
+        )
+    assert cached_calculator.cache.stats()["hits"] == 1
+
+
+def test_time_is_normalized_to_rush_hour_bucket():
+    cached_calculator = CachedFeeCalculator(FeeCalculator(), FeeCache(2**20, 60))
+    cached_calculator.calculate_delivery_fee(
+        **order(datetime.datetime(2024, 3, 15, 15))
+    )
+    assert (
+        cached_calculator.calculate_delivery_fee(
+            **order(datetime.datetime(2024, 3, 15, 18, 59))
+        )
+        == 852
+    )
+    assert (
+        cached_calculator.calculate_delivery_fee(
+            **order(datetime.datetime(2024, 3, 15, 19))
+        )
+        == 710
+    )
+    assert (
+        cached_calculator.calculate_delivery_fee(
+            **order(datetime.datetime(2024, 3, 14, 16))
+        )
+        == 710
+    )
+    stats = cached_calculator.cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (2, 2, 2)
+
+
+def test_eviction():
+    cache = FeeCache(max_bytes=1, ttl=60)
+    assert cache.max_entries == 1
+    cache.put((1, 1, 1, False), 10)
+    cache.put((2, 1, 1, False), 20)
+    assert cache.get((1, 1, 1, False)) is None
+    assert cache.get((2, 1, 1, False)) == (20, False)
+    assert cache.stats()["evictions"] == 1
+
+
+def test_lru_order():
+    cache = FeeCache(max_bytes=1, ttl=60)
+    cache.max_entries = 2
+    cache.put((1, 1, 1, False), 10)
+    cache.put((2, 1, 1, False), 20)
+    cache.get((1, 1, 1, False))
+    cache.put((3, 1, 1, False), 30)
+    assert cache.get((1, 1, 1, False)) == (10, False)
+    assert cache.get((2, 1, 1, False)) is None
+
+
+def test_expiration():
+    clock = FakeClock()
+    cache = FeeCache(max_bytes=2**20, ttl=60, clock=clock)
+    cache.put((1, 1, 1, False), 10)
+    clock.now = 59.9
+    assert cache.get((1, 1, 1, False)) == (10, False)
+    clock.now = 60
+    assert cache.get((1, 1, 1, False)) is None
+    stats = cache.stats()
+    assert (stats["expirations"], stats["entries"]) == (1, 0)
+
+
+def test_memory_ceiling():
+    max_bytes = 1024 * 1024
+    cached_calculator = CachedFeeCalculator(FeeCalculator(), FeeCache(max_bytes, 60))
+    time = datetime.datetime(2024, 3, 14, 16)
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    # The largest inputs cached
+    for i in range(2 * cached_calculator.cache.max_entries):
+        cached_calculator.calculate_delivery_fee(
+            cart_value=999,
+            delivery_distance=MAX_KEY_VALUE - i,
+            number_of_items=MAX_KEY_VALUE - i,
+            time=time,
+        )
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert after - before <= max_bytes
+
+
+def test_keys_are_normalized():
+    cached_calculator = CachedFeeCalculator(FeeCalculator(), FeeCache(2**20, 60))
+    time = datetime.datetime(2024, 3, 14, 16)
+    for cart_value in (1000, 1001, 19999):
+        assert cached_calculator.calculate_delivery_fee(**order(time, cart_value)) == (
+            500
+        )
+    for cart_value in (20000, 20001, 10**4000):
+        assert cached_calculator.calculate_delivery_fee(**order(time, cart_value)) == (
+            0
+        )
+    stats = cached_calculator.cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (4, 2, 2)
+
+
+def test_oversized_inputs_are_not_cached():
+    cached_calculator = CachedFeeCalculator(FeeCalculator(), FeeCache(2**20, 60))
+    time = datetime.datetime(2024, 3, 14, 16)
+    for inputs in (
+        {"delivery_distance": 10**30},
+        {"number_of_items": 10**30},
+    ):
+        assert cached_calculator.calculate_delivery_fee(
+            **{**order(time), **inputs}
+        ) == (1500)
+    assert cached_calculator.cache.stats()["entries"] == 0
@@ -0,0 +1,156 @@
+import asyncio
+import datetime
+
+import pytest
+
+from app.utils.fee_calculator import FeeCalculator
+from app.utils.fee_coalescer import FeeCoalescer
+from app.utils.metrics import CounterChild, HistogramChild
+
+order = {
+    "cart_value": 790,
+    "delivery_distance": 2235,
+    "number_of_items": 4,
+    "time": datetime.datetime(2024, 1, 15, 13, 0, 0),
+}
+
+
+class CountingFeeCalculator(FeeCalculator):
+    def __init__(self):
+        super().__init__()
+        self.scalar_calls = 0
+        self.vector_calls = []
+
+    def calculate_delivery_fee(self, **inputs) -> int:
+        self.scalar_calls += 1
+        return super().calculate_delivery_fee(**inputs)
+
+    def calculate_delivery_fees(self, cart_values, *args, **kwargs):
+        self.vector_calls.append(len(cart_values))
+        return super().calculate_delivery_fees(cart_values, *args, **kwargs)
+
+
+def gather(coalescer, fee_calculator, orders):
+    async def run():
+        return await asyncio.gather(
+            *(
+                coalescer.calculate_delivery_fee(fee_calculator, **order)
+                for order in orders
+            )
+        )
+
+    return asyncio.run(run())
+
+
+def test_identical_orders_share_one_calculation():
+    fee_calculator = CountingFeeCalculator()
+    requests, computations = CounterChild(), CounterChild()
+    coalescer = FeeCoalescer(window=0.001, requests=requests, computations=computations)
+    # Different moments of the same rush hour window price the same
+    orders = [
+        {**order, "time": datetime.datetime(2024, 1, 19, 15, minute, 0)}
+        for minute in range(50)
+    ]
+    assert gather(coalescer, fee_calculator, orders) == [852] * 50
+    assert fee_calculator.scalar_calls == 1
+    assert fee_calculator.vector_calls == []
+    assert (requests.value, computations.value) == (50, 1)
+
+
+def test_distinct_orders_are_priced_in_one_batch():
+    fee_calculator = CountingFeeCalculator()
+    batch_size = HistogramChild((1, 10, 100))
+    coalescer = FeeCoalescer(window=0.001, batch_size=batch_size)
+    orders = [{**order, "cart_value": cart_value} for cart_value in range(1, 2001, 40)]
+    expected = [FeeCalculator().calculate_delivery_fee(**order) for order in orders]
+    assert gather(coalescer, fee_calculator, orders) == expected
+    assert fee_calculator.vector_calls == [len(orders)]
+    assert batch_size.counts == [0, 0, 1, 0]
+
+
+def test_max_batch_flushes_early():
+    fee_calculator = CountingFeeCalculator()
+    coalescer = FeeCoalescer(window=10.0, max_batch=10)
+    orders = [{**order, "cart_value": cart_value} for cart_value in range(1, 31)]
+    gather(coalescer, fee_calculator, orders)
+    assert fee_calculator.vector_calls == [10, 10, 10]
+
+
+def test_zero_window_coalesces_within_a_loop_iteration():
+    fee_calculator = CountingFeeCalculator()
+    coalescer = FeeCoalescer(window=0)
+    orders = [{**order, "cart_value": cart_value} for cart_value in range(1, 11)]
+    gather(coalescer, fee_calculator, orders * 2)
+    assert fee_calculator.vector_calls == [10]
+
+
+def test_calculators_are_batched_separately():
+    first, second = CountingFeeCalculator(), CountingFeeCalculator()
+    coalescer = FeeCoalescer(window=0.001)
+
+    async def run():
+        return await asyncio.gather(
+            coalescer.calculate_delivery_fee(first, **order),
+            coalescer.calculate_delivery_fee(second, **order),
+        )
+
+    assert asyncio.run(run()) == [710, 710]
+    assert (first.scalar_calls, second.scalar_calls) == (1, 1)
+
+
+def test_errors_reach_every_waiting_request():
+    class FailingFeeCalculator(FeeCalculator):
+        def calculate_delivery_fee(self, **inputs) -> int:
+            raise RuntimeError("boom")
+
+    coalescer = FeeCoalescer(window=0.001)
+
+    async def run():
+        return await asyncio.gather(
+            coalescer.calculate_delivery_fee(FailingFeeCalculator(), **order),
+            return_exceptions=True,
+        )
+
+    [error] = asyncio.run(run())
+    assert isinstance(error, RuntimeError)
+
+
+def test_cancelled_request_does_not_cancel_shared_calculation():
+    fee_calculator = CountingFeeCalculator()
+    queue_seconds = HistogramChild((0.1,))
+    coalescer = FeeCoalescer(window=0.01, queue_seconds=queue_seconds)
+
+    async def run():
+        first = asyncio.create_task(
+            coalescer.calculate_delivery_fee(fee_calculator, **order)
+        )
+        second = asyncio.create_task(
+            coalescer.calculate_delivery_fee(fee_calculator, **order)
+        )
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(run()) == 710
+    assert fee_calculator.scalar_calls == 1
+    assert sum(queue_seconds.counts) == 1
+
+
+@pytest.mark.parametrize("window", [0, 0.0005])
+def test_coalesced_fees_match_scalar(window):
+    fee_calculator = FeeCalculator()
+    coalescer = FeeCoalescer(window=window)
+    orders = [
+        {
+            "cart_value": cart_value,
+            "delivery_distance": delivery_distance,
+            "number_of_items": number_of_items,
+            "time": datetime.datetime(2024, 1, 19, hour, 0, 0),
+        }
+        for cart_value in (1, 890, 1000, 20000)
+        for delivery_distance in (1, 1499, 1501, 10000)
+        for number_of_items in (1, 5, 13)
+        for hour in (14, 15, 19)
+    ]
+    expected = [fee_calculator.calculate_delivery_fee(**order) for order in orders]
+    assert gather(coalescer, fee_calculator, orders) == expected
@@ -0,0 +1,136 @@
+import datetime
+import io
+import sys
+
+import numpy as np
+import pytest
+
+from app.utils.fee_calculator import FeeCalculator, PricingRules
+from app.utils.fee_grid import (
+    FeeGridCache,
+    GridAxis,
+    GridSpec,
+    compute_fee_grid,
+    decode_fee_grid,
+    encode_fee_grid,
+    fee_grid,
+)
+from tests.utils.cases import rule_sets
+
+UTC = datetime.timezone.utc
+WEEK_START = datetime.datetime(2024, 1, 15, tzinfo=UTC)
+# Steps off the rule boundaries and past free delivery and the fee limit
+spec = GridSpec(
+    WEEK_START,
+    168,
+    GridAxis(1, 8001, 750),
+    GridAxis(1, 21001, 1500),
+    GridAxis(1, 31, 3),
+)
+
+
+@pytest.mark.parametrize("rules", rule_sets, ids=lambda rules: rules.VERSION)
+def test_grid_matches_engine(rules):
+    grid = compute_fee_grid(rules, spec)
+    assert grid.shape == spec.shape == (168, 11, 15, 11)
+    assert grid.dtype == (np.int16 if rules.FEE_LIMIT < 2**15 else np.int64)
+    fee_calculator = FeeCalculator(rules)
+    for hour in range(spec.hours):
+        time = WEEK_START + datetime.timedelta(hours=hour)
+        for i, delivery_distance in enumerate(spec.delivery_distance.values()):
+            for j, cart_value in enumerate(spec.cart_value.values()):
+                for k, number_of_items in enumerate(spec.number_of_items.values()):
+                    assert grid[hour, i, j, k] == fee_calculator.calculate_delivery_fee(
+                        cart_value=int(cart_value),
+                        delivery_distance=int(delivery_distance),
+                        number_of_items=int(number_of_items),
+                        time=time,
+                    )
+
+
+def test_grid_axes():
+    axis = GridAxis(100, 1000, 300)
+    assert list(axis.values()) == [100, 400, 700, 1000]
+    assert len(axis) == 4
+    assert len(GridAxis(100, 999, 300)) == 3
+    assert GridSpec(WEEK_START, 2, axis, axis, GridAxis(5, 5, 1)).cells == 32
+
+
+def test_naive_start_is_utc():
+    rules = PricingRules()
+    naive = spec._replace(start=WEEK_START.replace(tzinfo=None))
+    assert (compute_fee_grid(rules, naive) == compute_fee_grid(rules, spec)).all()
+
+
+def test_large_fee_limit_widens_the_grid():
+    rules = PricingRules(
+        VERSION="expensive", FEE_LIMIT=100_000, ADDITIONAL_ITEM_SURCHARGE=5000
+    )
+    grid = compute_fee_grid(rules, spec)
+    assert grid.dtype == np.int32
+    assert grid.max() > np.iinfo(np.int16).max
+
+
+def test_huge_fee_limit_widens_the_grid_to_int64():
+    rules = PricingRules(VERSION="huge", FEE_LIMIT=10**15, ADDITIONAL_DISTANCE=1)
+    longest = spec._replace(
+        hours=1, delivery_distance=GridAxis(2**31 - 1, 2**31 - 1, 1)
+    )
+    grid = compute_fee_grid(rules, longest)
+    assert grid.dtype == np.int64
+    assert grid[0, 0, 0, 0] == FeeCalculator(rules).calculate_delivery_fee(
+        cart_value=1, delivery_distance=2**31 - 1, number_of_items=1, time=WEEK_START
+    )
+    assert (decode_fee_grid(encode_fee_grid(grid)) == grid).all()
+
+
+@pytest.mark.parametrize("fee_limit", [1500, 100_000])
+def test_encodings(fee_limit):
+    grid = compute_fee_grid(PricingRules(FEE_LIMIT=fee_limit), spec)
+    raw = encode_fee_grid(grid)
+    assert raw[:4] == b"FGRD"
+    decoded = decode_fee_grid(raw)
+    assert decoded.dtype == grid.dtype
+    assert (decoded == grid).all()
+    assert (np.load(io.BytesIO(encode_fee_grid(grid, "npy"))) == grid).all()
+    with pytest.raises(ValueError):
+        encode_fee_grid(grid, "csv")
+
+
+@pytest.mark.parametrize(
+    "data", [b"", b"FGRD", b"NOPE" + bytes(18), b"FGRD\x01\x02" + bytes(16) + b"x"]
+)
+def test_not_a_grid(data):
+    with pytest.raises(ValueError):
+        decode_fee_grid(data)
+
+
+def test_cache_per_rule_set():
+    cache = FeeGridCache(10 * 1024 * 1024)
+    rules = PricingRules()
+    data = fee_grid(rules, spec, cache=cache)
+    assert fee_grid(rules, spec, cache=cache) is data
+    # Other rules and formats are grids of their own
+    changed = PricingRules(VERSION="changed", BASE_SURCHARGE=300)
+    assert fee_grid(changed, spec, cache=cache) != data
+    assert fee_grid(rules, spec, "npy", cache=cache) != data
+    assert (cache.hits, cache.misses, len(cache)) == (1, 3, 3)
+
+
+def test_cache_evicts_least_recently_used():
+    rules = PricingRules()
+    specs = [
+        spec._replace(start=WEEK_START + datetime.timedelta(hours=hour), hours=1)
+        for hour in range(3)
+    ]
+    cache = FeeGridCache(2 * sys.getsizeof(fee_grid(rules, specs[0])))
+    for s in specs:
+        fee_grid(rules, s, cache=cache)
+    assert cache.evictions == 1
+    assert cache.get((rules, specs[0], "raw")) is None
+    assert cache.get((rules, specs[1], "raw")) is not None
+    assert cache.get((rules, specs[2], "raw")) is not None
+    # A grid over the whole budget isn't kept
+    fee_grid(rules, spec, cache=cache)
+    assert cache.get((rules, spec, "raw")) is None
+    assert len(cache) == 2
@@ -0,0 +1,102 @@
+import datetime
+
+import pytest
+
+from app.utils.fee_calculator import FeeCalculator, PricingRules
+from app.utils.fee_search import MAX_VALUE, SearchResult, search_engine, search_input
+from tests.utils.cases import rule_sets
+
+UTC = datetime.timezone.utc
+TIME = datetime.datetime(2024, 1, 15, 13, 0, tzinfo=UTC)
+RUSH_HOUR = datetime.datetime(2024, 1, 19, 16, 0, tzinfo=UTC)
+
+orders = {
+    "cart_value": {"delivery_distance": 2235, "number_of_items": 4},
+    "delivery_distance": {"cart_value": 790, "number_of_items": 4},
+    "number_of_items": {"cart_value": 1000, "delivery_distance": 1000},
+}
+bounds = [(600, None), (None, 700), (1000, 600), (1500, 1200), (0, None), (None, 1)]
+
+
+def test_cheapest_cart_value():
+    fee_calculator = FeeCalculator(PricingRules())
+    inputs = {"delivery_distance": 2235, "number_of_items": 4, "time": TIME}
+    # The small order surcharge brings the fee over 600 below a cart of 900
+    assert search_input(
+        fee_calculator, "cart_value", max_fee=600, **inputs
+    ) == SearchResult(900, None, 600, 0)
+    # Only free delivery brings it below the base surcharge
+    assert search_input(
+        fee_calculator, "cart_value", max_fee=400, **inputs
+    ) == SearchResult(20000, None, 0, 0)
+
+
+def test_fee_limit_threshold():
+    fee_calculator = FeeCalculator(PricingRules())
+    inputs = {"cart_value": 1000, "delivery_distance": 1000, "time": TIME}
+    assert fee_calculator.calculate_delivery_fee(number_of_items=27, **inputs) == 1470
+    assert search_input(
+        fee_calculator, "number_of_items", min_fee=1500, **inputs
+    ) == SearchResult(28, None, 1500, 1500)
+    # The other way round, the largest order below the fee limit
+    assert search_input(
+        fee_calculator, "number_of_items", max_fee=1499, **inputs
+    ) == SearchResult(1, 27, 200, 1470)
+
+
+def test_no_value_meets_the_bounds():
+    fee_calculator = FeeCalculator(PricingRules())
+    inputs = {"cart_value": 1000, "delivery_distance": 1000, "time": TIME}
+    assert search_input(
+        fee_calculator, "number_of_items", min_fee=1501, **inputs
+    ) == SearchResult(None, None, None, None)
+    assert search_input(
+        fee_calculator, "number_of_items", min_fee=1000, max_fee=900, **inputs
+    ) == SearchResult(None, None, None, None)
+
+
+@pytest.mark.parametrize("rules", rule_sets, ids=lambda rules: rules.VERSION)
+@pytest.mark.parametrize("vary", list(orders))
+@pytest.mark.parametrize("time", [TIME, RUSH_HOUR], ids=["normal", "rush_hour"])
+@pytest.mark.parametrize("surge_multiplier", [None, 1.5])
+def test_search_matches_scan(rules, vary, time, surge_multiplier):
+    fee_calculator = FeeCalculator(rules)
+    inputs = {**orders[vary], "time": time, "surge_multiplier": surge_multiplier}
+    values = range(1, 25000)
+    fees = [
+        fee_calculator.calculate_delivery_fee(**{**inputs, vary: value})
+        for value in values
+    ]
+    for max_fee, min_fee in bounds:
+        result = search_input(fee_calculator, vary, max_fee, min_fee, **inputs)
+        accepted = [
+            value
+            for value, fee in zip(values, fees)
+            if (max_fee is None or fee <= max_fee)
+            and (min_fee is None or fee >= min_fee)
+        ]
+        if result.min_value is None:
+            assert accepted == []
+            continue
+        high = MAX_VALUE if result.max_value is None else result.max_value
+        assert accepted == [v for v in values if result.min_value <= v <= high]
+        assert result.min_value_fee == fee_calculator.calculate_delivery_fee(
+            **{**inputs, vary: result.min_value}
+        )
+        assert result.max_value_fee == fee_calculator.calculate_delivery_fee(
+            **{**inputs, vary: high}
+        )
+
+
+def test_invalid_search():
+    fee_calculator = FeeCalculator(PricingRules())
+    with pytest.raises(ValueError):
+        search_input(fee_calculator, "time", max_fee=600, time=TIME)
+    with pytest.raises(ValueError):
+        search_input(fee_calculator, "cart_value", **orders["cart_value"], time=TIME)
+
+
+def test_search_engine_is_shared_per_rule_set():
+    rules = PricingRules(VERSION="search")
+    assert search_engine(rules) is search_engine(rules)
+    assert search_engine(rules).rules is rules
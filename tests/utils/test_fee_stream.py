@@ -0,0 +1,136 @@
+import asyncio
+import json
+import threading
+
+from app import cli
+from app.utils.fee_calculator import FeeCalculator
+from app.utils import fee_stream
+from app.utils.fee_stream import MAX_LINE_BYTES, aprice_ndjson, price_ndjson
+
+lines = [
+    b'{"cart_value": 790, "delivery_distance": 2235, "number_of_items": 4, "time": "2024-01-15T13:00:00Z"}\n',
+    b"\n",
+    b'{"cart_value": 0, "delivery_distance": 2235, "number_of_items": 4, "time": "2024-01-15T13:00:00Z"}\n',
+    b"not json\n",
+    b'{"cart_value": 900, "delivery_distance": 500, "number_of_items": 2, "time": "2024-03-15T15:00:00Z"}',
+]
+
+
+def parse_output(chunks):
+    return [json.loads(line) for line in b"".join(chunks).splitlines()]
+
+
+def check_results(results):
+    assert [result["line"] for result in results] == [1, 3, 4, 5]
+    assert results[0]["delivery_fee"] == 710
+    assert results[1]["errors"][0]["type"] == "greater_than"
+    assert results[1]["errors"][0]["loc"] == ["cart_value"]
+    assert results[2]["errors"][0]["type"] == "json_invalid"
+    assert results[3]["delivery_fee"] == 360
+
+
+def test_price_ndjson():
+    for chunk_size in (1, 2, 1000):
+        chunks = list(price_ndjson(lines, FeeCalculator(), chunk_size=chunk_size))
+        check_results(parse_output(chunks))
+
+
+def test_price_ndjson_blocks():
+    data = b"".join(lines)
+    for size in (1, 7, 4096):
+        blocks = [data[start : start + size] for start in range(0, len(data), size)]
+        check_results(parse_output(price_ndjson(blocks, FeeCalculator())))
+
+
+def test_price_ndjson_chunks_are_bounded():
+    chunks = list(price_ndjson(lines, FeeCalculator(), chunk_size=2))
+    assert [len(chunk.splitlines()) for chunk in chunks] == [2, 2]
+
+
+def test_aprice_ndjson():
+    async def stream(data, size):
+        for start in range(0, len(data), size):
+            yield data[start : start + size]
+
+    async def run(size):
+        data = b"".join(lines)
+        return [
+            chunk async for chunk in aprice_ndjson(stream(data, size), FeeCalculator())
+        ]
+
+    for size in (1, 7, 4096):
+        check_results(parse_output(asyncio.run(run(size))))
+
+
+def test_aprice_ndjson_prices_off_the_event_loop(monkeypatch):
+    threads = []
+    price_chunk = fee_stream._price_chunk
+
+    def record_thread(*args):
+        threads.append(threading.get_ident())
+        return price_chunk(*args)
+
+    monkeypatch.setattr(fee_stream, "_price_chunk", record_thread)
+
+    async def stream():
+        yield b"".join(lines)
+
+    async def run():
+        chunks = aprice_ndjson(stream(), FeeCalculator(), chunk_size=2)
+        return threading.get_ident(), [chunk async for chunk in chunks]
+
+    loop_thread, chunks = asyncio.run(run())
+    check_results(parse_output(chunks))
+    assert len(threads) == 2 and loop_thread not in threads
+
+
+def test_price_ndjson_line_too_long():
+    too_long = b'{"cart_value": "' + b"1" * MAX_LINE_BYTES + b'"}\n'
+    results = parse_output(price_ndjson([too_long, lines[0]], FeeCalculator()))
+    assert results[0]["errors"][0]["type"] == "line_too_long"
+    assert results[1] == {"line": 2, "delivery_fee": 710, "rule_version": "default"}
+
+
+def test_price_ndjson_long_line_is_never_held_whole():
+    def blocks():
+        yield b'{"cart_value": "'
+        for _ in range(64):
+            # The buffer must have dropped the line before it grows much larger
+            yield b"1" * MAX_LINE_BYTES
+        yield b'"}\n' + lines[0]
+
+    results = parse_output(price_ndjson(blocks(), FeeCalculator()))
+    assert results[0]["errors"][0]["type"] == "line_too_long"
+    assert results[1] == {"line": 2, "delivery_fee": 710, "rule_version": "default"}
+
+
+def test_price_cli_with_zones(tmp_path):
+    zones_path = tmp_path / "zones.json"
+    zones_path.write_text(
+        json.dumps(
+            {
+                "rule_sets": {"center": {"VERSION": "center", "BASE_SURCHARGE": 300}},
+                "zones": [
+                    {
+                        "id": "center",
+                        "polygon": [[60, 24], [61, 24], [61, 25], [60, 25]],
+                        "rule_set": "center",
+                    }
+                ],
+            }
+        )
+    )
+    order = json.loads(lines[0])
+    orders = [order, {**order, "zone_id": "center"}, {**order, "zone_id": "north"}]
+    input_path = tmp_path / "orders.ndjson"
+    input_path.write_text("".join(json.dumps(order) + "\n" for order in orders))
+    output_path = tmp_path / "fees.ndjson"
+
+    cli.main(
+        ["price", str(input_path), "-o", str(output_path), "--zones", str(zones_path)]
+    )
+
+    results = [json.loads(line) for line in output_path.read_text().splitlines()]
+    assert results[0] == {"line": 1, "delivery_fee": 710, "rule_version": "default"}
+    assert results[1] == {"line": 2, "delivery_fee": 810, "rule_version": "center"}
+    assert results[2]["errors"][0]["type"] == "unknown_zone"
@@ -0,0 +1,49 @@
+from app.utils.metrics import Registry
+
+
+def test_render_counter_and_gauge():
+    registry = Registry()
+    counter = registry.counter("quotes", "Quotes", ["rule"])
+    counter.labels("rush_hour").inc()
+    counter.labels("rush_hour").inc(2)
+    gauge = registry.gauge("in_flight", "In flight requests")
+    gauge.labels().set(3)
+    gauge.labels().dec()
+    assert registry.render().splitlines() == [
+        "# HELP quotes Quotes",
+        "# TYPE quotes counter",
+        'quotes_total{rule="rush_hour"} 3',
+        "# HELP in_flight In flight requests",
+        "# TYPE in_flight gauge",
+        "in_flight 2",
+    ]
+
+
+def test_render_histogram():
+    registry = Registry()
+    histogram = registry.histogram(
+        "duration_seconds", "Duration", ["stage"], buckets=[0.1, 1.0]
+    )
+    child = histogram.labels('de"code')
+    for value in (0.05, 0.1, 0.5, 2.0):
+        child.observe(value)
+    assert registry.render().splitlines() == [
+        "# HELP duration_seconds Duration",
+        "# TYPE duration_seconds histogram",
+        'duration_seconds_bucket{stage="de\\"code",le="0.1"} 2',
+        'duration_seconds_bucket{stage="de\\"code",le="1.0"} 3',
+        'duration_seconds_bucket{stage="de\\"code",le="+Inf"} 4',
+        'duration_seconds_sum{stage="de\\"code"} 2.65',
+        'duration_seconds_count{stage="de\\"code"} 4',
+    ]
+
+
+def test_labels_are_checked():
+    registry = Registry()
+    counter = registry.counter("quotes", "Quotes", ["rule"])
+    try:
+        counter.labels()
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("Missing labels should be rejected")
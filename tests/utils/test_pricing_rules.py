@@ -0,0 +1,131 @@
+import datetime
+import json
+import os
+
+import pytest
+from pydantic import ValidationError
+
+from app.utils.compiled_fee_calculator import CompiledFeeCalculator
+from app.utils.fee_calculator import FeeCalculator, PricingRules
+from app.utils.pricing_rules import PricingRulesStore, load_pricing_rules
+
+order = {
+    "cart_value": 790,
+    "delivery_distance": 2235,
+    "number_of_items": 4,
+    "time": datetime.datetime(2024, 3, 15, 16, 0, 0),
+}
+
+
+def write_rules(path, data, mtime_ns=None):
+    path.write_text(json.dumps(data))
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_default_rules_match_const():
+    assert FeeCalculator(PricingRules()).calculate_delivery_fee(**order) == 852
+
+
+def test_load_pricing_rules_file(tmp_path):
+    path = tmp_path / "rules.json"
+    write_rules(path, {"VERSION": "v2", "FEE_LIMIT": 800})
+    rules = load_pricing_rules(path)
+    assert rules.VERSION == "v2"
+    assert rules.FEE_LIMIT == 800
+    assert rules.BASE_CART_VALUE == PricingRules().BASE_CART_VALUE
+
+
+def test_load_pricing_rules_directory(tmp_path):
+    write_rules(tmp_path / "2024-01-01.json", {"FEE_LIMIT": 800})
+    write_rules(tmp_path / "2024-03-01.json", {"FEE_LIMIT": 900})
+    rules = load_pricing_rules(tmp_path)
+    assert rules.VERSION == "2024-03-01"
+    assert rules.FEE_LIMIT == 900
+
+
+def test_load_pricing_rules_invalid(tmp_path):
+    path = tmp_path / "rules.json"
+    write_rules(path, {"ADDITIONAL_DISTANCE": 0})
+    with pytest.raises(ValidationError):
+        load_pricing_rules(path)
+    write_rules(path, {"UNKNOWN": 1})
+    with pytest.raises(ValidationError):
+        load_pricing_rules(path)
+    # Valid JSON, but not an object
+    path.write_text('[{"FEE_LIMIT": 800}]')
+    with pytest.raises(ValueError, match="JSON list"):
+        load_pricing_rules(path)
+
+
+@pytest.mark.parametrize("build_fee_calculator", [FeeCalculator, CompiledFeeCalculator])
+def test_store_reload(tmp_path, build_fee_calculator):
+    path = tmp_path / "rules.json"
+    write_rules(path, {"VERSION": "v1"}, mtime_ns=1_000_000_000)
+    store = PricingRulesStore(build_fee_calculator, path)
+    snapshot = store.snapshot
+    assert snapshot.rules.VERSION == "v1"
+    assert snapshot.fee_calculator.calculate_delivery_fee(**order) == 852
+    assert not store.reload()
+
+    write_rules(
+        path, {"VERSION": "v2", "RUSH_HOUR_MULTIPLIER": 1.5}, mtime_ns=2_000_000_000
+    )
+    assert store.reload()
+    assert store.snapshot.rules.VERSION == "v2"
+    assert store.snapshot.fee_calculator.calculate_delivery_fee(**order) == 1065
+    # A snapshot taken before the reload keeps pricing with its own version
+    assert snapshot.fee_calculator.calculate_delivery_fee(**order) == 852
+
+
+def test_store_keeps_snapshot_on_invalid_rules(tmp_path):
+    path = tmp_path / "rules.json"
+    write_rules(path, {"VERSION": "v1"}, mtime_ns=1_000_000_000)
+    store = PricingRulesStore(FeeCalculator, path)
+    write_rules(path, {"FEE_LIMIT": -1}, mtime_ns=2_000_000_000)
+    with pytest.raises(ValidationError):
+        store.reload()
+    assert store.snapshot.rules.VERSION == "v1"
+
+
+@pytest.mark.parametrize(
+    "rules",
+    [
+        PricingRules(FEE_LIMIT=700, RUSH_HOUR_MULTIPLIER=1.37),
+        PricingRules(ADDITIONAL_DISTANCE=333, ADDITIONAL_DISTANCE_SURCHARGE=0),
+        PricingRules(ADDITIONAL_ITEM_SURCHARGE=0, BULK_ITEM_LIMIT=2),
+        PricingRules(
+            RUSH_HOUR_ISOWEEKDAY=6,
+            RUSH_HOUR_START=datetime.time(0, 0),
+            RUSH_HOUR_END=datetime.time(23, 30),
+        ),
+    ],
+)
+def test_engines_agree_on_custom_rules(rules):
+    scalar_calculator = FeeCalculator(rules)
+    compiled_calculator = CompiledFeeCalculator(rules)
+    orders = [
+        (cart_value, delivery_distance, number_of_items, time)
+        for cart_value in (1, 500, 1000, 19999, 20000)
+        for delivery_distance in (1, 1000, 1333, 1334, 5000, 10**6)
+        for number_of_items in (1, 2, 3, 5, 13, 10**4)
+        for time in (
+            datetime.datetime(2024, 3, 15, 16, 0),
+            datetime.datetime(2024, 3, 16, 12, 0),
+            datetime.datetime(2024, 3, 16, 23, 45),
+        )
+    ]
+    expected_fees = []
+    for cart_value, delivery_distance, number_of_items, time in orders:
+        inputs = {
+            "cart_value": cart_value,
+            "delivery_distance": delivery_distance,
+            "number_of_items": number_of_items,
+            "time": time,
+        }
+        expected_fees.append(scalar_calculator.calculate_delivery_fee(**inputs))
+        assert compiled_calculator.calculate_delivery_fee(**inputs) == expected_fees[-1]
+    assert (
+        scalar_calculator.calculate_delivery_fees(*zip(*orders)).tolist()
+        == expected_fees
+    )
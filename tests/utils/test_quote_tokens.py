@@ -0,0 +1,163 @@
+import base64
+import datetime
+import hmac
+
+import pytest
+
+from app.utils.quote_tokens import (
+    TAG_SIZE,
+    InvalidQuoteTokenError,
+    Quote,
+    QuoteSigner,
+    _HmacSha256,
+)
+
+UTC = datetime.timezone.utc
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+def order(**overrides):
+    return {
+        "cart_value": 790,
+        "delivery_distance": 2235,
+        "number_of_items": 4,
+        "time": datetime.datetime(2024, 1, 15, 13, 0, tzinfo=UTC),
+        "delivery_fee": 710,
+        "rule_version": "default",
+        **overrides,
+    }
+
+
+@pytest.mark.parametrize(
+    "secret", [b"", b"secret", b"k" * 64, b"k" * 65, bytes(range(200))]
+)
+def test_hmac_matches_stdlib(secret):
+    for payload in [b"", b"payload", bytes(range(256)) * 3]:
+        assert (
+            _HmacSha256(secret).tag(payload)
+            == hmac.digest(secret, payload, "sha256")[:TAG_SIZE]
+        )
+
+
+def test_round_trip():
+    clock = FakeClock()
+    signer = QuoteSigner([b"secret"], 900, clock=clock)
+    quote = signer.verify(signer.sign(**order()))
+    assert quote == Quote(
+        **order(),
+        expires_at=datetime.datetime.fromtimestamp(clock.now + 900, UTC),
+    )
+
+
+@pytest.mark.parametrize(
+    "time",
+    [
+        datetime.datetime(2024, 1, 15, 13, 0, 0, 123456),
+        datetime.datetime(
+            2024,
+            1,
+            15,
+            15,
+            0,
+            0,
+            123456,
+            tzinfo=datetime.timezone(datetime.timedelta(hours=2)),
+        ),
+        datetime.datetime(1900, 1, 1, 13, 0, tzinfo=UTC),
+    ],
+)
+def test_time_kept_as_utc_instant(time):
+    signer = QuoteSigner([b"secret"], 900)
+    quote = signer.verify(signer.sign(**order(time=time)))
+    assert quote.time.tzinfo == UTC
+    if time.tzinfo is None:
+        time = time.replace(tzinfo=UTC)
+    assert quote.time == time
+
+
+def test_unicode_rule_version():
+    signer = QuoteSigner([b"secret"], 900)
+    quote = signer.verify(signer.sign(**order(rule_version="2024-05/Köln")))
+    assert quote.rule_version == "2024-05/Köln"
+
+
+def test_token_is_compact_and_url_safe():
+    token = QuoteSigner([b"secret"], 900).sign(**order())
+    assert len(token) < 100
+    assert set(token) <= set(
+        "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_"
+    )
+
+
+def test_expired():
+    clock = FakeClock()
+    signer = QuoteSigner([b"secret"], 900, clock=clock)
+    token = signer.sign(**order())
+    clock.now += 899
+    signer.verify(token)
+    clock.now += 1
+    with pytest.raises(InvalidQuoteTokenError) as e:
+        signer.verify(token)
+    assert e.value.reason == "expired"
+
+
+def test_wrong_secret():
+    token = QuoteSigner([b"secret"], 900).sign(**order())
+    with pytest.raises(InvalidQuoteTokenError) as e:
+        QuoteSigner([b"other"], 900).verify(token)
+    assert e.value.reason == "signature"
+
+
+def test_tampered_payload():
+    signer = QuoteSigner([b"secret"], 900)
+    raw = bytearray(base64.urlsafe_b64decode(signer.sign(**order()) + "=="))
+    # The low byte of the fee
+    raw[41] ^= 1
+    token = base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+    with pytest.raises(InvalidQuoteTokenError) as e:
+        signer.verify(token)
+    assert e.value.reason == "signature"
+
+
+@pytest.mark.parametrize(
+    "token",
+    [
+        "",
+        "abc",
+        "not a token!",
+        "é" * 100,
+        "A" * 30,
+        "A" * 29,
+        "A" * 78 + "==",
+        "A+/" * 30,
+    ],
+)
+def test_malformed(token):
+    with pytest.raises(InvalidQuoteTokenError) as e:
+        QuoteSigner([b"secret"], 900).verify(token)
+    assert e.value.reason == "malformed"
+
+
+def test_secret_rotation():
+    old = QuoteSigner([b"old"], 900)
+    rotated = QuoteSigner([b"new", b"old"], 900)
+    assert rotated.verify(old.sign(**order())).delivery_fee == 710
+    with pytest.raises(InvalidQuoteTokenError):
+        old.verify(rotated.sign(**order()))
+
+
+def test_inputs_out_of_range():
+    with pytest.raises(ValueError):
+        QuoteSigner([b"secret"], 900).sign(**order(cart_value=2**64))
+
+
+def test_requires_secret():
+    with pytest.raises(ValueError):
+        QuoteSigner([], 900)
@@ -0,0 +1,266 @@
+import dataclasses
+import datetime
+import random
+import zoneinfo
+
+import numpy as np
+import pytest
+from pydantic import ValidationError
+
+from app.utils.compiled_fee_calculator import CompiledFeeCalculator
+from app.utils.fee_cache import CachedFeeCalculator, FeeCache
+from app.utils.fee_calculator import FeeCalculator
+from app.utils.pricing_rules import pricing_rules_adapter
+from app.utils.rush_hours import RushHourSchedule, RushHourWindow
+
+UTC = datetime.timezone.utc
+HELSINKI = zoneinfo.ZoneInfo("Europe/Helsinki")
+
+windows = (
+    RushHourWindow(
+        ISOWEEKDAY=5, START=datetime.time(15), END=datetime.time(19), MULTIPLIER=1.2
+    ),
+    # Across midnight into Sunday
+    RushHourWindow(
+        ISOWEEKDAY=6, START=datetime.time(22), END=datetime.time(2), MULTIPLIER=1.1
+    ),
+    # The hour skipped in spring and repeated in autumn in Europe/Helsinki
+    RushHourWindow(
+        ISOWEEKDAY=7,
+        START=datetime.time(3, 30),
+        END=datetime.time(4, 30),
+        MULTIPLIER=1.5,
+    ),
+)
+
+
+@pytest.fixture(scope="module")
+def helsinki():
+    return RushHourSchedule(windows, "Europe/Helsinki")
+
+
+@pytest.mark.parametrize(
+    "time, expected",
+    [
+        # Winter, UTC+2
+        (datetime.datetime(2024, 1, 19, 12, 59, tzinfo=UTC), None),
+        (datetime.datetime(2024, 1, 19, 13, 0, tzinfo=UTC), 1.2),
+        (datetime.datetime(2024, 1, 19, 16, 59, 59, tzinfo=UTC), 1.2),
+        (datetime.datetime(2024, 1, 19, 17, 0, tzinfo=UTC), None),
+        # Summer, UTC+3
+        (datetime.datetime(2024, 7, 19, 12, 0, tzinfo=UTC), 1.2),
+        (datetime.datetime(2024, 7, 19, 16, 0, tzinfo=UTC), None),
+        (datetime.datetime(2024, 7, 20, 19, 0, tzinfo=UTC), 1.1),
+        (datetime.datetime(2024, 7, 20, 22, 59, tzinfo=UTC), 1.1),
+        (datetime.datetime(2024, 7, 20, 23, 0, tzinfo=UTC), None),
+        # Clocks go forward at 01:00 UTC on 2024-03-31, from 03:00 to 04:00 local
+        (datetime.datetime(2024, 3, 31, 0, 59, tzinfo=UTC), None),
+        (datetime.datetime(2024, 3, 31, 1, 0, tzinfo=UTC), 1.5),
+        (datetime.datetime(2024, 3, 31, 1, 29, tzinfo=UTC), 1.5),
+        (datetime.datetime(2024, 3, 31, 1, 30, tzinfo=UTC), None),
+        # Clocks go back at 01:00 UTC on 2024-10-27, from 04:00 to 03:00 local
+        (datetime.datetime(2024, 10, 27, 0, 30, tzinfo=UTC), 1.5),
+        (datetime.datetime(2024, 10, 27, 1, 0, tzinfo=UTC), None),
+        (datetime.datetime(2024, 10, 27, 1, 29, tzinfo=UTC), None),
+        (datetime.datetime(2024, 10, 27, 1, 30, tzinfo=UTC), 1.5),
+        (datetime.datetime(2024, 10, 27, 2, 30, tzinfo=UTC), None),
+        # Naive times are UTC, other offsets are converted
+        (datetime.datetime(2024, 1, 19, 13, 0), 1.2),
+        (
+            datetime.datetime(
+                2024,
+                1,
+                19,
+                15,
+                0,
+                tzinfo=datetime.timezone(datetime.timedelta(hours=2)),
+            ),
+            1.2,
+        ),
+        # Outside the precomputed horizon
+        (datetime.datetime(1990, 1, 19, 13, 0, tzinfo=UTC), 1.2),
+        (datetime.datetime(2150, 1, 17, 21, 0, tzinfo=UTC), 1.1),
+        # Local times skipped by the clocks going forward are the instants they
+        # denote, 03:15 at UTC+2 is 04:15 at UTC+3
+        (datetime.datetime(2024, 3, 31, 3, 15, tzinfo=HELSINKI), 1.5),
+        (datetime.datetime(2150, 3, 29, 3, 15, tzinfo=HELSINKI), 1.5),
+    ],
+)
+def test_schedule_multiplier(helsinki, time, expected):
+    assert helsinki.multiplier(time) == expected
+    assert helsinki.multiplier_by_conversion(time) == expected
+    assert helsinki.multipliers_of([time])[0] == (expected or 1.0)
+
+
+@pytest.mark.parametrize("timezone", ["UTC", "Europe/Helsinki", "America/New_York"])
+def test_schedule_matches_conversion(timezone):
+    schedule = RushHourSchedule(windows, timezone)
+    rng = random.Random(0)
+    times = [
+        datetime.datetime.fromtimestamp(rng.uniform(9e8, 4.2e9), UTC)
+        for _ in range(20000)
+    ]
+    # Every minute around the DST changes of a few years
+    for year in (2001, 2024, 2077):
+        for month in (3, 10, 11):
+            start = datetime.datetime(year, month, 1, tzinfo=UTC)
+            times += [start + datetime.timedelta(minutes=k) for k in range(0, 44640, 3)]
+
+    expected = [schedule.multiplier_by_conversion(time) for time in times]
+    assert [schedule.multiplier(time) for time in times] == expected
+    assert schedule.multipliers_of(times).tolist() == [
+        multiplier or 1.0 for multiplier in expected
+    ]
+
+
+def test_schedule_datetime64_times_are_utc(helsinki):
+    times = np.array(["2024-01-19T13:00", "2024-01-19T17:00"], dtype="datetime64[us]")
+    assert helsinki.multipliers_of(times).tolist() == [1.2, 1.0]
+
+
+@pytest.mark.parametrize(
+    "windows",
+    [
+        [
+            {"ISOWEEKDAY": 5, "START": "15:00", "END": "19:00", "MULTIPLIER": 1.2},
+            {"ISOWEEKDAY": 5, "START": "18:00", "END": "20:00", "MULTIPLIER": 1.5},
+        ],
+        [
+            {"ISOWEEKDAY": 7, "START": "22:00", "END": "02:00", "MULTIPLIER": 1.2},
+            {"ISOWEEKDAY": 1, "START": "01:00", "END": "03:00", "MULTIPLIER": 1.5},
+        ],
+    ],
+)
+def test_overlapping_windows_are_rejected(windows):
+    with pytest.raises(ValueError):
+        FeeCalculator(pricing_rules_adapter.validate_python({"RUSH_HOURS": windows}))
+
+
+def test_unknown_timezone_is_rejected():
+    with pytest.raises(ValidationError):
+        pricing_rules_adapter.validate_python({"RUSH_HOUR_TIMEZONE": "Mars/Olympus"})
+
+
+rules = pricing_rules_adapter.validate_python(
+    {
+        "RUSH_HOUR_TIMEZONE": "Europe/Helsinki",
+        "RUSH_HOURS": [
+            {"ISOWEEKDAY": 5, "START": "15:00", "END": "19:00", "MULTIPLIER": 1.2},
+            {"ISOWEEKDAY": 6, "START": "11:00", "END": "14:00", "MULTIPLIER": 1.35},
+        ],
+    }
+)
+
+
+def random_orders(count):
+    rng = random.Random(1)
+    start = datetime.datetime(2024, 1, 1, tzinfo=UTC)
+    return [
+        {
+            "cart_value": rng.randint(1, 2500),
+            "delivery_distance": rng.randint(1, 8000),
+            "number_of_items": rng.randint(1, 20),
+            "time": start + datetime.timedelta(minutes=rng.randrange(2 * 7 * 24 * 60)),
+        }
+        for _ in range(count)
+    ]
+
+
+def test_calculators_agree_with_schedule():
+    fee_calculator = FeeCalculator(rules)
+    compiled_fee_calculator = CompiledFeeCalculator(rules)
+    orders = random_orders(3000)
+
+    expected = [fee_calculator.calculate_delivery_fee(**order) for order in orders]
+    assert [
+        compiled_fee_calculator.calculate_delivery_fee(**order) for order in orders
+    ] == expected
+    assert (
+        fee_calculator.calculate_delivery_fees(
+            cart_values=[order["cart_value"] for order in orders],
+            delivery_distances=[order["delivery_distance"] for order in orders],
+            numbers_of_items=[order["number_of_items"] for order in orders],
+            times=[order["time"] for order in orders],
+        ).tolist()
+        == expected
+    )
+
+
+@pytest.mark.parametrize(
+    "time, expected",
+    [
+        # 15:00 local
+        (datetime.datetime(2024, 1, 19, 13, 0, tzinfo=UTC), 852),
+        (datetime.datetime(2024, 1, 19, 17, 0, tzinfo=UTC), 710),
+        (datetime.datetime(2024, 1, 20, 10, 0, tzinfo=UTC), 958),
+    ],
+)
+def test_schedule_multipliers(time, expected):
+    order = {
+        "cart_value": 790,
+        "delivery_distance": 2235,
+        "number_of_items": 4,
+        "time": time,
+    }
+    assert FeeCalculator(rules).calculate_delivery_fee(**order) == expected
+
+
+@pytest.mark.parametrize(
+    "timezone, time, expected",
+    [
+        # Saturday 01:00 in Helsinki, past the last datetime
+        ("Europe/Helsinki", datetime.datetime(9999, 12, 31, 23, 0, tzinfo=UTC), 710),
+        # Friday 18:00 in New York
+        ("America/New_York", datetime.datetime(9999, 12, 31, 23, 0), 852),
+        # Sunday evening in New York, before the first datetime
+        ("America/New_York", datetime.datetime(1, 1, 1, 1, 0, tzinfo=UTC), 710),
+        # Sunday 10:39 in Helsinki, 09:00 UTC on the day before the first one
+        (
+            "Europe/Helsinki",
+            datetime.datetime(
+                1, 1, 1, 0, 0, tzinfo=datetime.timezone(datetime.timedelta(hours=15))
+            ),
+            710,
+        ),
+    ],
+)
+def test_schedule_extreme_times(timezone, time, expected):
+    fee_calculator = FeeCalculator(
+        dataclasses.replace(rules, RUSH_HOUR_TIMEZONE=timezone)
+    )
+    order = {"cart_value": 790, "delivery_distance": 2235, "number_of_items": 4}
+    assert fee_calculator.calculate_delivery_fee(**order, time=time) == expected
+    assert fee_calculator.calculate_delivery_fees(
+        cart_values=[order["cart_value"]],
+        delivery_distances=[order["delivery_distance"]],
+        numbers_of_items=[order["number_of_items"]],
+        times=[time],
+    ).tolist() == [expected]
+
+
+def test_compiled_rejects_multiplier_below_one():
+    low = pricing_rules_adapter.validate_python(
+        {
+            "RUSH_HOURS": [
+                {"ISOWEEKDAY": 5, "START": "15:00", "END": "19:00", "MULTIPLIER": 0.5}
+            ]
+        }
+    )
+    with pytest.raises(ValueError):
+        CompiledFeeCalculator(low)
+
+
+def test_cache_keys_by_multiplier():
+    cached = CachedFeeCalculator(FeeCalculator(rules), FeeCache(1024 * 1024, 60))
+    order = {"cart_value": 790, "delivery_distance": 2235, "number_of_items": 4}
+    friday = datetime.datetime(2024, 1, 19, 13, 0, tzinfo=UTC)
+    saturday = datetime.datetime(2024, 1, 20, 10, 0, tzinfo=UTC)
+    assert cached.calculate_delivery_fee(**order, time=friday) == 852
+    assert cached.calculate_delivery_fee(**order, time=saturday) == 958
+    assert (
+        cached.calculate_delivery_fee(
+            **order, time=friday + datetime.timedelta(hours=1)
+        )
+        == 852
+    )
+    assert cached.cache.stats()["hits"] == 1
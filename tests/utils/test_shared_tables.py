@@ -0,0 +1,249 @@
+import json
+import multiprocessing
+import os
+import random
+
+import pytest
+
+from app.utils.compiled_fee_calculator import CompiledFeeCalculator
+from app.utils.differential import boundary_orders
+from app.utils.fee_calculator import FeeCalculator, PricingRules
+from app.utils.pricing_rules import PricingRulesStore
+from app.utils.shared_tables import (
+    SharedPricingRulesStore,
+    TablesPublisher,
+    read_generation,
+)
+from app.utils.zones import load_zones
+
+HELSINKI_RUSH_HOURS = {
+    "VERSION": "helsinki",
+    "RUSH_HOUR_TIMEZONE": "Europe/Helsinki",
+    "RUSH_HOURS": [
+        {"ISOWEEKDAY": 5, "START": "15:00", "END": "19:00", "MULTIPLIER": 1.2},
+        {"ISOWEEKDAY": 6, "START": "22:00", "END": "02:00", "MULTIPLIER": 1.1},
+    ],
+}
+
+
+def build_shared_engine(rules, shared):
+    return shared.build_engine()
+
+
+def write_json(path, data, mtime_ns=None):
+    path.write_text(json.dumps(data))
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+    return path
+
+
+def square(x, y, size):
+    return [[x, y], [x + size, y], [x + size, y + size], [x, y + size]]
+
+
+def write_zones(path, count, seed=0):
+    rng = random.Random(seed)
+    return write_json(
+        path,
+        {
+            "rule_sets": {
+                "center": {"BASE_SURCHARGE": 300},
+                "discount": {"RUSH_HOUR_MULTIPLIER": 0.8},
+            },
+            "zones": [
+                {
+                    "id": f"zone-{i}",
+                    "polygon": square(
+                        rng.uniform(0, 10), rng.uniform(0, 10), rng.uniform(0.1, 1)
+                    ),
+                    "rule_set": rng.choice(["center", "discount", None]),
+                }
+                for i in range(count)
+            ],
+        },
+    )
+
+
+@pytest.mark.parametrize(
+    "rules",
+    [
+        {"VERSION": "default"},
+        HELSINKI_RUSH_HOURS,
+        # Not compilable, priced by the default engine
+        {"VERSION": "discount", "RUSH_HOUR_MULTIPLIER": 0.8},
+    ],
+)
+def test_shared_engine_matches_scalar(tmp_path, rules):
+    rules_path = write_json(tmp_path / "rules.json", rules)
+    TablesPublisher(tmp_path / "tables", rules_path)
+    store = SharedPricingRulesStore(build_shared_engine, tmp_path / "tables")
+
+    shared = store.snapshot.fee_calculator
+    assert store.snapshot.rules.VERSION == rules["VERSION"]
+    assert isinstance(shared, CompiledFeeCalculator) == (rules["VERSION"] != "discount")
+    scalar = FeeCalculator(store.snapshot.rules)
+    for order in boundary_orders(store.snapshot.rules, 5000):
+        assert shared.calculate_delivery_fee(**order) == (
+            scalar.calculate_delivery_fee(**order)
+        ), order
+
+
+def test_tables_are_mapped(tmp_path):
+    rules_path = write_json(tmp_path / "rules.json", HELSINKI_RUSH_HOURS)
+    TablesPublisher(tmp_path / "tables", rules_path)
+    store = SharedPricingRulesStore(build_shared_engine, tmp_path / "tables")
+
+    fee_calculator = store.snapshot.fee_calculator
+    for table in (
+        *fee_calculator.tables[:3],
+        *fee_calculator.tables.rush_hour.values(),
+    ):
+        assert isinstance(table, memoryview)
+        assert table.readonly
+    assert isinstance(fee_calculator.rush_hour_schedule.bounds, memoryview)
+
+
+def test_shared_zones_match_loaded_zones(tmp_path):
+    zones_path = write_zones(tmp_path / "zones.json", 300)
+    TablesPublisher(tmp_path / "tables", zones_path=zones_path)
+    store = SharedPricingRulesStore(build_shared_engine, tmp_path / "tables")
+    loaded = load_zones(zones_path)
+    index = store.snapshot.zones.index
+
+    assert list(index.zone_ids) == loaded.index.zone_ids
+    assert index.nbytes == loaded.index.nbytes
+    for position, zone_id in enumerate(loaded.index.zone_ids):
+        assert index.position(zone_id) == position
+    assert index.position("zone-300") == -1
+    assert index.position("") == -1
+
+    rng = random.Random(1)
+    for _ in range(2000):
+        latitude, longitude = rng.uniform(-1, 11), rng.uniform(-1, 11)
+        assert index.locate(latitude, longitude) == loaded.index.locate(
+            latitude, longitude
+        )
+
+    assert store.snapshot.for_zone("zone-0").rules.VERSION in (
+        "default",
+        "default/center",
+        "default/discount",
+    )
+    for zone_id in ("zone-0", "zone-1", "zone-2", "zone-3"):
+        expected = PricingRulesStore(FeeCalculator, zones_path=zones_path).snapshot
+        assert (
+            store.snapshot.for_zone(zone_id).rules == expected.for_zone(zone_id).rules
+        )
+
+
+def test_new_generation_is_picked_up(tmp_path):
+    rules_path = write_json(tmp_path / "rules.json", {"VERSION": "v1"}, 1_000_000_000)
+    publisher = TablesPublisher(tmp_path / "tables", rules_path)
+    store = SharedPricingRulesStore(build_shared_engine, tmp_path / "tables")
+    old_snapshot = store.snapshot
+    assert not store.reload()
+
+    write_json(rules_path, {"VERSION": "v2", "FEE_LIMIT": 800}, 2_000_000_000)
+    assert publisher.reload()
+    assert not publisher.reload()
+    assert read_generation(tmp_path / "tables") == 2
+    assert store.reload()
+    assert store.snapshot.rules.VERSION == "v2"
+    assert store.tables.generation == 2
+
+    # The replaced generation stays mapped for whoever still prices with it
+    order = boundary_orders(old_snapshot.rules, 1)[0]
+    assert old_snapshot.fee_calculator.calculate_delivery_fee(**order) == (
+        FeeCalculator(old_snapshot.rules).calculate_delivery_fee(**order)
+    )
+
+
+def test_store_publishes_new_generation(tmp_path):
+    zones_path = write_zones(tmp_path / "zones.json", 30)
+    publisher = TablesPublisher(tmp_path / "tables", zones_path=zones_path)
+    store = SharedPricingRulesStore(build_shared_engine, tmp_path / "tables")
+    other = SharedPricingRulesStore(build_shared_engine, tmp_path / "tables")
+
+    rules = PricingRules(VERSION="v2", FEE_LIMIT=1000)
+    snapshot = store.publish(rules)
+    assert snapshot is store.snapshot
+    assert snapshot.rules == rules
+    assert isinstance(snapshot.fee_calculator, CompiledFeeCalculator)
+    assert store.tables.generation == 2
+    assert snapshot.for_zone("zone-0").rules.VERSION.startswith("v2")
+    for order in boundary_orders(rules, 1000):
+        assert snapshot.fee_calculator.calculate_delivery_fee(**order) == (
+            FeeCalculator(rules).calculate_delivery_fee(**order)
+        )
+
+    assert other.reload()
+    assert other.snapshot.rules == rules
+    # The publisher's next generation replaces it
+    assert publisher.publish() == 3
+    assert store.reload()
+    assert store.snapshot.rules.VERSION == "default"
+
+
+def test_publisher_continues_generations(tmp_path):
+    TablesPublisher(tmp_path / "tables")
+    assert TablesPublisher(tmp_path / "tables").generation == 2
+
+
+def test_store_waits_for_tables(tmp_path):
+    with pytest.raises(TimeoutError):
+        SharedPricingRulesStore(build_shared_engine, tmp_path / "tables", timeout=0.1)
+    (tmp_path / "tables").write_bytes(b"not a table file")
+    with pytest.raises(TimeoutError):
+        SharedPricingRulesStore(build_shared_engine, tmp_path / "tables", timeout=0.1)
+
+
+def _follow(path, connection):
+    store = SharedPricingRulesStore(build_shared_engine, path)
+    connection.send(store.snapshot.rules.VERSION)
+    connection.recv()
+    store.reload()
+    connection.send(store.snapshot.rules.VERSION)
+
+
+def test_generation_reaches_other_processes(tmp_path):
+    rules_path = write_json(tmp_path / "rules.json", {"VERSION": "v1"}, 1_000_000_000)
+    publisher = TablesPublisher(tmp_path / "tables", rules_path)
+
+    parent, child = multiprocessing.Pipe()
+    worker = multiprocessing.Process(target=_follow, args=(tmp_path / "tables", child))
+    worker.start()
+    try:
+        assert parent.recv() == "v1"
+        write_json(rules_path, {"VERSION": "v2"}, 2_000_000_000)
+        publisher.reload()
+        parent.send(None)
+        assert parent.recv() == "v2"
+    finally:
+        worker.join(10)
+    assert worker.exitcode == 0
+
+
+def _publish_concurrently(path, start, count):
+    store = SharedPricingRulesStore(build_shared_engine, path)
+    start.wait()
+    for i in range(count):
+        store.publish(PricingRules(VERSION=f"{os.getpid()}-{i}"))
+
+
+def test_concurrent_publishers_write_distinct_generations(tmp_path):
+    TablesPublisher(tmp_path / "tables")
+    start = multiprocessing.Event()
+    workers = [
+        multiprocessing.Process(
+            target=_publish_concurrently, args=(tmp_path / "tables", start, 20)
+        )
+        for _ in range(4)
+    ]
+    for worker in workers:
+        worker.start()
+    start.set()
+    for worker in workers:
+        worker.join(60)
+        assert worker.exitcode == 0
+    # Two publishers writing the same generation would leave it short
+    assert read_generation(tmp_path / "tables") == 81
@@ -0,0 +1,144 @@
+import json
+import os
+import threading
+
+import pytest
+
+from app.utils.surge import SlidingWindowCounter, SurgePricing, load_capacity
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_counter_slides_by_bucket():
+    counter = SlidingWindowCounter(60, buckets=6)
+    for second in range(0, 60, 5):
+        counter.add(second)
+    assert counter.total(59) == 12
+    # The first 10 second slice leaves the window
+    assert counter.total(60) == 10
+    assert counter.total(105) == 2
+    assert counter.total(115) == 0
+    assert counter.add(115, 3) == 3
+
+
+def test_counter_clears_after_idle_window():
+    counter = SlidingWindowCounter(10, buckets=10)
+    counter.add(0.5, 7)
+    assert counter.total(9.5) == 7
+    assert counter.total(1000) == 0
+    assert counter.add(1000.5) == 1
+
+
+def test_multiplier_follows_demand_over_capacity():
+    clock = Clock()
+    surge = SurgePricing(window=60, buckets=6, clock=clock)
+    surge.update_capacity({"center": 10})
+    multipliers = [surge.quote("center") for _ in range(35)]
+    # Half of the excess over capacity is added, in steps of 0.1, up to 2.0
+    assert multipliers[:10] == [None] * 10
+    assert multipliers[10:14] == [None, 1.1, 1.1, 1.2]
+    assert multipliers[19] == 1.5
+    assert multipliers[29:] == [2.0] * 6
+    assert surge.multiplier("center") == 2.0
+    clock.now = 61
+    assert surge.multiplier("center") is None
+
+
+def test_zones_without_capacity_dont_surge():
+    surge = SurgePricing(clock=Clock())
+    surge.update_capacity({"closed": 0})
+    assert surge.quote("elsewhere") is None
+    assert surge.quote("closed") == 2.0
+
+
+@pytest.mark.parametrize(
+    "sensitivity, step, max_multiplier, expected",
+    [(1.0, 0.25, 3.0, 2.0), (0.5, 0.1, 1.3, 1.3), (0.5, 0.1, 1.0, None)],
+)
+def test_multiplier_settings(sensitivity, step, max_multiplier, expected):
+    surge = SurgePricing(
+        sensitivity=sensitivity,
+        step=step,
+        max_multiplier=max_multiplier,
+        clock=Clock(),
+    )
+    surge.update_capacity({"center": 10})
+    for _ in range(20):
+        multiplier = surge.quote("center")
+    assert multiplier == expected
+
+
+def test_capacity_share_scales_capacity():
+    surge = SurgePricing(capacity_share=0.25, clock=Clock())
+    surge.update_capacity({"center": 40})
+    assert [surge.quote("center") for _ in range(12)][-3:] == [None, None, 1.1]
+
+
+def test_update_capacity_keeps_demand():
+    surge = SurgePricing(clock=Clock())
+    surge.update_capacity({"center": 10, "east": 10})
+    for _ in range(20):
+        surge.quote("center")
+    surge.update_capacity({"center": 20})
+    assert surge.multiplier("center") is None
+    assert surge.quote("east") is None
+    surge.update_capacity({"center": 10})
+    assert surge.multiplier("center") == 1.5
+
+
+def test_quote_many_counts_each_order():
+    surge = SurgePricing(clock=Clock())
+    surge.update_capacity({"center": 1})
+    assert surge.quote_many(["center", None, "east", "center", "center"]) == [
+        None,
+        None,
+        None,
+        1.5,
+        2.0,
+    ]
+
+
+def test_concurrent_quotes_are_all_counted():
+    surge = SurgePricing(window=3600, clock=Clock())
+    surge.update_capacity({"center": 1e9})
+
+    def quote():
+        for _ in range(10000):
+            surge.quote("center")
+
+    threads = [threading.Thread(target=quote) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    counter, _ = surge._zones["center"]
+    assert counter.total(0.0) == 40000
+
+
+def test_reload_capacity_file(tmp_path):
+    path = tmp_path / "capacity.json"
+    path.write_text(json.dumps({"center": 1}))
+    os.utime(path, ns=(1_000_000_000, 1_000_000_000))
+    surge = SurgePricing(capacity_path=path, clock=Clock())
+    surge.quote("center")
+    assert surge.quote("center") == 1.5
+    assert not surge.reload()
+
+    path.write_text(json.dumps({"center": 2, "east": 5}))
+    os.utime(path, ns=(2_000_000_000, 2_000_000_000))
+    assert surge.reload()
+    assert surge.multiplier("center") is None
+    assert surge.multiplier("east") is None
+
+
+def test_load_capacity_rejects_negative(tmp_path):
+    path = tmp_path / "capacity.json"
+    path.write_text(json.dumps({"center": -1}))
+    with pytest.raises(ValueError):
+        load_capacity(path)
@@ -0,0 +1,169 @@
+import datetime
+import json
+import random
+
+import pytest
+from pydantic import ValidationError
+
+from app.utils.pricing_rules import PricingRulesStore
+from app.utils.zones import UnknownZoneError, ZoneIndex, load_zones
+from tests.utils.cases import write_zones, zones
+
+order = {
+    "cart_value": 790,
+    "delivery_distance": 2235,
+    "number_of_items": 4,
+    "time": datetime.datetime(2024, 1, 15, 13, 0, 0),
+}
+
+
+def square(x, y, size):
+    return [(x, y), (x + size, y), (x + size, y + size), (x, y + size)]
+
+
+@pytest.mark.parametrize(
+    "latitude, longitude, expected",
+    [
+        (60.16, 24.92, "center"),
+        (60.16, 24.97, "east"),
+        (60.22, 24.96, "east"),
+        # Inside the bounding box of the triangle but not the triangle
+        (60.24, 25.04, None),
+        (60.10, 24.92, None),
+        (0.0, 0.0, None),
+    ],
+)
+def test_zone_index_locate(latitude, longitude, expected):
+    index = ZoneIndex(
+        [(zone["id"], zone["polygon"]) for zone in zones["zones"]], cells_per_zone=1
+    )
+    position = index.locate(latitude, longitude)
+    assert (index.zone_ids[position] if position >= 0 else None) == expected
+
+
+def test_zone_index_matches_brute_force():
+    rng = random.Random(0)
+    polygons = [
+        (
+            f"zone-{i}",
+            square(rng.uniform(0, 10), rng.uniform(0, 10), rng.uniform(0.1, 1)),
+        )
+        for i in range(500)
+    ]
+    index = ZoneIndex(polygons)
+    for _ in range(2000):
+        x, y = rng.uniform(-1, 11), rng.uniform(-1, 11)
+        expected = next(
+            (
+                i
+                for i, (_, polygon) in enumerate(polygons)
+                if polygon[0][0] < x < polygon[1][0]
+                and polygon[0][1] < y < polygon[2][1]
+            ),
+            -1,
+        )
+        assert index.locate(y, x) == expected
+
+
+def test_zone_index_position():
+    index = ZoneIndex([("a", square(0, 0, 1)), ("b", square(1, 0, 1))])
+    assert index.position("b") == 1
+    assert index.position("c") == -1
+    assert len(index) == 2
+    assert index.nbytes > 0
+
+
+def test_zone_index_empty():
+    index = ZoneIndex([])
+    assert index.locate(0.0, 0.0) == -1
+
+
+def test_zone_index_rejects_duplicate_ids():
+    with pytest.raises(ValueError):
+        ZoneIndex([("a", square(0, 0, 1)), ("a", square(1, 0, 1))])
+
+
+def test_load_zones(tmp_path):
+    path = tmp_path / "zones.json"
+    write_zones(path, zones)
+    zone_rules = load_zones(path)
+    assert zone_rules.index.zone_ids == ["center", "east"]
+    assert zone_rules.rule_sets == {"center": {"BASE_SURCHARGE": 300}}
+    assert list(zone_rules.zone_rule_sets) == [1, 0]
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        {**zones, "zones": [{**zones["zones"][0], "rule_set": "missing"}]},
+        {**zones, "zones": [{**zones["zones"][0], "polygon": [[0, 0], [1, 1]]}]},
+        {"rule_sets": {}},
+    ],
+)
+def test_load_zones_invalid(tmp_path, data):
+    path = tmp_path / "zones.json"
+    write_zones(path, data)
+    with pytest.raises((ValueError, ValidationError)):
+        load_zones(path)
+
+
+def test_store_prices_by_zone(tmp_path):
+    path = tmp_path / "zones.json"
+    write_zones(path, zones)
+    snapshot = PricingRulesStore(zones_path=path).snapshot
+
+    center = snapshot.for_zone("center")
+    assert center.rules.VERSION == "default/center"
+    assert center.rules.BASE_SURCHARGE == 300
+    assert center.fee_calculator.calculate_delivery_fee(**order) == 810
+    assert snapshot.for_zone(location=(60.16, 24.92)) is center
+    # A zone id takes precedence over the location
+    assert snapshot.for_zone("east", (60.16, 24.92)) is snapshot
+    assert snapshot.for_zone(location=(60.10, 24.92)) is snapshot
+    assert snapshot.for_zone() is snapshot
+    with pytest.raises(UnknownZoneError):
+        snapshot.for_zone("missing")
+
+
+def test_store_without_zones():
+    snapshot = PricingRulesStore().snapshot
+    assert snapshot.zones is None
+    assert snapshot.for_zone(location=(60.16, 24.92)) is snapshot
+    with pytest.raises(UnknownZoneError):
+        snapshot.for_zone("center")
+
+
+def test_store_zone_rules_derive_from_base_rules(tmp_path):
+    rules_path = tmp_path / "rules.json"
+    rules_path.write_text(json.dumps({"VERSION": "v2", "FEE_LIMIT": 800}))
+    zones_path = tmp_path / "zones.json"
+    write_zones(zones_path, zones)
+    snapshot = PricingRulesStore(path=rules_path, zones_path=zones_path).snapshot
+    center = snapshot.for_zone("center")
+    assert center.rules.VERSION == "v2/center"
+    assert center.rules.FEE_LIMIT == 800
+
+
+def test_store_reloads_zones(tmp_path):
+    path = tmp_path / "zones.json"
+    write_zones(path, zones, mtime_ns=1_000_000_000)
+    store = PricingRulesStore(zones_path=path)
+    assert store.reload() is False
+
+    changed = {**zones, "rule_sets": {"center": {"BASE_SURCHARGE": 400}}}
+    write_zones(path, changed, mtime_ns=2_000_000_000)
+    assert store.reload() is True
+    assert store.snapshot.for_zone("center").rules.BASE_SURCHARGE == 400
+
+
+def test_store_keeps_snapshot_on_invalid_zone_rules(tmp_path):
+    path = tmp_path / "zones.json"
+    write_zones(path, zones, mtime_ns=1_000_000_000)
+    store = PricingRulesStore(zones_path=path)
+    snapshot = store.snapshot
+
+    invalid = {**zones, "rule_sets": {"center": {"NOT_A_RULE": 1}}}
+    write_zones(path, invalid, mtime_ns=2_000_000_000)
+    with pytest.raises(ValidationError):
+        store.reload()
+    assert store.snapshot is snapshot